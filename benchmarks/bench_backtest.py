@@ -0,0 +1,87 @@
+# benchmarks/bench_backtest.py
+"""
+Compare the loop and vectorized simple_backtest engines.
+
+Checks bit-identical results on the bundled data/AAPL_*_1d.csv files, then
+times both engines on synthetic minute bars.
+
+    python -m benchmarks.bench_backtest --bars 200000 1000000
+"""
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.backtest import simple_backtest
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+
+
+def synthetic_minute_bars(n_bars: int, seed: int = 0) -> pd.DataFrame:
+    """Random-walk minute bars with SMA crossover entry/exit columns."""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 5e-4, n_bars)))
+    df = pd.DataFrame({
+        "Date": pd.date_range("2020-01-01 09:30", periods=n_bars, freq="min", tz="UTC"),
+        "Close": close,
+    })
+    fast = df["Close"].rolling(20).mean()
+    slow = df["Close"].rolling(100).mean()
+    signal = (fast > slow).astype(int)
+    prev = signal.shift(1).fillna(0)
+    df["entry"] = (signal == 1) & (prev == 0)
+    df["exit"] = (signal == 0) & (prev == 1)
+    return df
+
+
+def check_parity():
+    from src.indicators import add_rsi
+    from src.strategy import generate_signals
+
+    for path in sorted(DATA_DIR.glob("AAPL_*_1d.csv")):
+        df = pd.read_csv(path)
+        df["Date"] = pd.to_datetime(df["Date"], utc=True)
+        df = generate_signals(add_rsi(df, length=14), fast_sma=20, slow_sma=50, rsi_threshold=70)
+        loop_df, loop_summary = simple_backtest(df, mode="loop")
+        vec_df, vec_summary = simple_backtest(df, mode="vectorized")
+
+        assert np.array_equal(loop_df["equity"].to_numpy(), vec_df["equity"].to_numpy()), path.name
+        assert loop_summary["trades"] == vec_summary["trades"], path.name
+        for key, value in loop_summary.items():
+            if key != "trades":
+                assert value == vec_summary[key], (path.name, key)
+        print(f"{path.name}: identical ({loop_summary['num_trades']} trades)")
+
+
+def time_engine(df, mode):
+    start = time.perf_counter()
+    simple_backtest(df, mode=mode)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bars", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--loop-max", type=int, default=200_000,
+                        help="skip the iterrows engine above this many bars")
+    parser.add_argument("--skip-parity", action="store_true")
+    args = parser.parse_args()
+
+    if not args.skip_parity:
+        check_parity()
+
+    print(f"{'bars':>10} {'loop s':>10} {'vector s':>10} {'speedup':>9}")
+    for n_bars in args.bars:
+        df = synthetic_minute_bars(n_bars)
+        vec = time_engine(df, "vectorized")
+        if n_bars <= args.loop_max:
+            loop = time_engine(df, "loop")
+            print(f"{n_bars:>10} {loop:>10.3f} {vec:>10.3f} {loop / vec:>8.1f}x")
+        else:
+            print(f"{n_bars:>10} {'-':>10} {vec:>10.3f} {'-':>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# benchmarks/bench_chart.py
+"""
+plot_trades on long histories: figure size and build time, full vs bounded.
+
+1. Checks: aggregated candles keep the window's open, high, low, close and
+   volume, every trade is counted in exactly one marker, and zooming into
+   one day of a year of minute bars gives 1Min candles again.
+2. For 10k to 1M minute bars with one trade per 25 bars: the figure with every
+   candle and trade (the previous plot_trades) against the bounded one --
+   build time, JSON serialization time and payload size.
+3. lttb on a 1M-point equity curve.
+
+    python -m benchmarks.bench_chart --bars 10000 100000 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from src.chart_data import MAX_CANDLES, candles, lttb, markers
+from src.utils import plot_trades
+
+TRADE_EVERY = 25
+
+
+def minute_bars(n_bars, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 5e-4, n_bars)))
+    open_ = np.concatenate(([100.0], close[:-1]))
+    dates = pd.date_range("2020-01-02 14:30", periods=n_bars, freq="min", tz="UTC")
+    return pd.DataFrame({"Date": dates, "Open": open_, "High": np.maximum(open_, close) * 1.0005,
+                         "Low": np.minimum(open_, close) * 0.9995, "Close": close,
+                         "Volume": rng.integers(100, 10_000, n_bars).astype(np.float64)})
+
+
+def trade_list(df):
+    rows = df.iloc[::TRADE_EVERY]
+    return [{"type": "BUY" if i % 2 == 0 else "SELL", "date": date, "price": price}
+            for i, (date, price) in enumerate(zip(rows["Date"], rows["Close"]))]
+
+
+def full_figure(df, trades):
+    """Every candle and trade, as plot_trades drew them before."""
+    fig = go.Figure(data=[go.Candlestick(x=df["Date"], open=df["Open"], high=df["High"], low=df["Low"],
+                                         close=df["Close"], name="Price")])
+    for side, symbol, color in (("BUY", "triangle-up", "green"), ("SELL", "triangle-down", "red")):
+        picked = [t for t in trades if t["type"] == side]
+        fig.add_trace(go.Scatter(x=[t["date"] for t in picked], y=[t["price"] for t in picked], mode="markers",
+                                 marker=dict(symbol=symbol, color=color, size=12), name=side))
+    fig.update_layout(template="plotly_dark", xaxis_rangeslider_visible=False)
+    return fig
+
+
+def check():
+    df = minute_bars(365 * 390)
+    trades = trade_list(df)
+    bars, timeframe = candles(df)
+    assert len(bars["ts"]) <= MAX_CANDLES
+    assert bars["Open"][0] == df["Open"].iloc[0] and bars["Close"][-1] == df["Close"].iloc[-1]
+    assert bars["High"].max() == df["High"].max() and bars["Low"].min() == df["Low"].min()
+    assert bars["Volume"].sum() == df["Volume"].sum()
+    joined = markers(trades, bars["ts"])
+    assert joined["count"].sum() == len(trades) and len(joined) <= 2 * len(bars["ts"])
+    day = df["Date"].iloc[100 * 390]
+    zoomed, zoomed_tf = candles(df, start=day, end=day + pd.Timedelta(hours=6))
+    assert zoomed_tf is None and len(zoomed["ts"]) == 361
+    print(f"{len(df):,} bars -> {len(bars['ts'])} {timeframe} candles (OHLCV kept), {len(trades):,} trades -> "
+          f"{len(joined)} markers; a 6-hour zoom -> {len(zoomed['ts'])} 1Min candles")
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def compare(sizes):
+    full_figure(minute_bars(10), [])  # plotly's first figure loads its templates
+    print(f"\n{'bars':>9} {'figure':<8} {'build ms':>9} {'to_json ms':>11} {'payload MB':>11} {'points':>9}")
+    for n_bars in sizes:
+        df = minute_bars(n_bars)
+        trades = trade_list(df)
+        for name, build in (("full", lambda: full_figure(df, trades)), ("bounded", lambda: plot_trades(df, trades))):
+            fig, built = _timed(build)
+            payload, serialized = _timed(fig.to_json)
+            points = sum(len(trace.x) for trace in fig.data)
+            print(f"{n_bars:>9,} {name:<8} {built * 1e3:>9.1f} {serialized * 1e3:>11.1f} "
+                  f"{len(payload) / 1e6:>11.2f} {points:>9,}")
+
+
+def time_lttb(n_points=1_000_000):
+    equity = 10_000 + np.cumsum(np.random.default_rng(1).normal(0, 1, n_points))
+    keep, elapsed = _timed(lambda: lttb(np.arange(n_points), equity, MAX_CANDLES))
+    print(f"\nlttb: {n_points:,} equity points -> {len(keep)} in {elapsed * 1e3:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bars", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    check()
+    compare(args.bars)
+    time_lttb()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+# benchmarks/bench_compact_bars.py
+"""
+CompactBars: float32 drift and memory footprint.
+
+1. Drift: runs add_rsi + generate_signals + simple_backtest on data/AAPL_*_1d.csv
+   and a synthetic minute series, as DataFrames (float64) and as CompactBars.
+   float64 CompactBars must match the DataFrame pipeline exactly; for float32
+   the indicator error, differing entry/exit bars and final-capital drift are
+   reported and checked against the bounds documented in src/compact_bars.py.
+2. Memory: loads a synthetic universe from a BarStore and runs the same
+   pipeline, keeping every symbol's results, once as DataFrames and once as one
+   CompactBars. Peak traced memory (tracemalloc) and wall time are compared.
+
+    python -m benchmarks.bench_compact_bars --symbols 500 --bars 10000
+"""
+import argparse
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.backtest import simple_backtest
+from src.bar_store import BarStore
+from src.compact_bars import CompactBars
+from src.indicators import add_rsi
+from src.strategy import generate_signals
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+PARAMS = dict(fast_sma=20, slow_sma=50, rsi_threshold=70)
+
+# documented float32 bounds (src/compact_bars.py)
+MAX_SMA_REL_ERR = 1e-6
+MAX_RSI_ABS_ERR = 0.05  # RSI points
+MAX_CAPITAL_REL_DRIFT = 1e-5
+
+
+def synthetic_bars(n_bars, seed=0, start="2015-01-02 14:30"):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 5e-4, n_bars)))
+    return pd.DataFrame({"Date": pd.date_range(start, periods=n_bars, freq="min", tz="UTC"),
+                         "Open": close, "High": close * 1.0005, "Low": close * 0.9995, "Close": close,
+                         "Volume": rng.integers(100, 10_000, n_bars).astype(np.float64)})
+
+
+def frame_pipeline(df):
+    return simple_backtest(generate_signals(add_rsi(df.copy(), length=14), **PARAMS))
+
+
+def compact_pipeline(bars):
+    return simple_backtest(generate_signals(add_rsi(bars, length=14), **PARAMS))
+
+
+def _max_err(approx, exact, relative=True):
+    mask = ~np.isnan(exact)
+    err = np.abs(approx[mask] - exact[mask])
+    if relative:
+        err /= np.abs(exact[mask])
+    return float(err.max()) if mask.any() else 0.0
+
+
+def check_drift(name, df):
+    ref_df, ref = frame_pipeline(df)
+    kept = ref_df.index  # rows generate_signals kept
+
+    bars64, summaries = compact_pipeline(CompactBars.from_frame(df, symbol=name, dtype=np.float64))
+    got = summaries[name]
+    valid = bars64["valid"]
+    assert np.array_equal(bars64["entry"][valid], ref_df["entry"].to_numpy()), name
+    assert np.array_equal(bars64["exit"][valid], ref_df["exit"].to_numpy()), name
+    assert np.array_equal(bars64["equity"][valid], ref_df["equity"].to_numpy()), name
+    assert [(t["type"], t["qty"], t["price"], t["date"], t.get("pnl")) for t in got["trades"]] == \
+           [(t["type"], t["qty"], t["price"], t["date"], t.get("pnl")) for t in ref["trades"]], name
+
+    bars32, summaries = compact_pipeline(CompactBars.from_frame(df, symbol=name, dtype=np.float32))
+    got = summaries[name]
+    valid = bars32["valid"]
+    rsi_err = _max_err(bars32["RSI"][valid].astype(np.float64), ref_df["RSI"].to_numpy(), relative=False)
+    sma_err = _max_err(bars32["SMA_slow"][valid].astype(np.float64), ref_df["SMA_slow"].to_numpy())
+    flips = int(np.count_nonzero(bars32["entry"][valid] != ref_df["entry"].to_numpy())
+                + np.count_nonzero(bars32["exit"][valid] != ref_df["exit"].to_numpy()))
+    drift = abs(got["final_capital"] - ref["final_capital"]) / ref["final_capital"]
+    print(f"{name:<22} {len(kept):>8} bars  float64 identical | float32: RSI {rsi_err:.1e} pts, SMA {sma_err:.1e} "
+          f"rel, {flips} entry/exit flips, {got['num_trades']} vs {ref['num_trades']} trades, "
+          f"final capital drift {drift:.1e}")
+    assert rsi_err < MAX_RSI_ABS_ERR and sma_err < MAX_SMA_REL_ERR, name
+    if flips == 0 and got["num_trades"] == ref["num_trades"]:
+        assert drift < MAX_CAPITAL_REL_DRIFT, name
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 1e6
+
+
+def check_memory(n_symbols, n_bars):
+    symbols = [f"S{i:04d}" for i in range(n_symbols)]
+    with tempfile.TemporaryDirectory() as root:
+        store = BarStore(root)
+        for i, symbol in enumerate(symbols):
+            store.write(symbol, "1Min", synthetic_bars(n_bars, seed=i))
+
+        def frames():
+            results = {}
+            for symbol in symbols:
+                results[symbol] = frame_pipeline(store.read(symbol, "1Min"))
+            return results
+
+        def compact():
+            return compact_pipeline(CompactBars.from_store(store, symbols, "1Min"))
+
+        frame_results, frame_s, frame_mb = measure(frames)
+        held_mb = sum(df.memory_usage(deep=True).sum() for df, _ in frame_results.values()) / 1e6
+        del frame_results
+        (bars, _), compact_s, compact_mb = measure(compact)
+
+    rows = n_symbols * n_bars
+    print(f"\n{n_symbols} symbols x {n_bars} bars = {rows:,} rows, RSI + signals + backtest kept for every symbol")
+    print(f"  DataFrames (float64):   peak {frame_mb:>9.1f} MB  held {held_mb:>8.1f} MB  {frame_s:>7.2f}s")
+    print(f"  CompactBars (float32):  peak {compact_mb:>9.1f} MB  held {bars.nbytes / 1e6:>8.1f} MB  "
+          f"{compact_s:>7.2f}s")
+    print(f"  peak memory / {frame_mb / compact_mb:.2f}, held / {held_mb / (bars.nbytes / 1e6):.2f}, "
+          f"{frame_mb / rows * 1e6:.0f} -> {compact_mb / rows * 1e6:.0f} bytes/row at peak")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--bars", type=int, default=10_000, help="bars per symbol")
+    args = parser.parse_args()
+
+    for path in sorted(DATA_DIR.glob("AAPL_*_1d.csv")):
+        df = pd.read_csv(path)
+        df["Date"] = pd.to_datetime(df["Date"], utc=True)
+        check_drift(path.stem, df)
+    check_drift("synthetic 200k min", synthetic_bars(200_000))
+    check_memory(args.symbols, args.bars)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,410 @@
+# benchmarks/bench_engine_state.py
+"""
+Engine snapshots and warm restarts (src.engine_state) for PaperTradingEngine,
+trading through the order gateway against a local FakeAlpacaServer.
+
+--days of synthetic minute bars: all but the last session are history
+(served by a FakeAlpacaREST), the last session is traded bar by bar, each
+bar written to the bar store as it closes (where a poll would put it).
+
+1. Startup: PaperTradingEngine.prepare() cold with an empty bar store (the
+   whole lookback fetched and replayed), cold with the bars already stored,
+   and warm from a snapshot; snapshot size, save (with and without fsync)
+   and load times.
+2. Crashes between bars: the engine is dropped without stopping after every
+   --crash-every bars and after every order, then restarted from its
+   snapshot. Its orders must equal an uninterrupted run's, and after every
+   restart its indicator state must equal that run's at the same bar.
+3. Crashes with an order in flight: right after an order is accepted but
+   before it fills, and after it is recorded but before it is sent. The
+   restarted engine must count the first and not the second, and always hold
+   what the broker holds.
+4. Downtime: bars that close while the engine is down are caught up on
+   restart; its indicator state must equal the uninterrupted run's.
+5. A damaged snapshot, or one taken with other strategy parameters, is
+   ignored: a cold warm-up, with the position taken from the broker.
+
+In every run the broker position must stay within [0, qty] (never entered
+twice, never sold short). Exits with status 1 when a check fails or warm
+restarts take more than --budget milliseconds (median).
+
+    python -m benchmarks.bench_engine_state --days 30 --crash-every 25
+"""
+import argparse
+import logging
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.bar_store import BarStore
+from src.broker_alpaca import AlpacaBroker
+from src.engine_state import SnapshotStore
+from src.event_engine import replay_bars
+from src.fake_alpaca import FakeAlpacaREST, FakeAlpacaServer, session_timestamps
+from src.paper_trading_engine import PaperTradingEngine
+from src.strategy import StreamingSignals
+from src.trade_logger import TradeLogger
+
+SYMBOL = "SNAP"
+PARAMS = dict(fast_sma=5, slow_sma=20, rsi_threshold=70, rsi_length=14)
+GATEWAY = dict(key_id="bench", secret_key="bench", rate=1000, burst=8, backoff=0.02, poll_interval=0.02)
+
+
+class Crash(BaseException):
+    """The process dying mid-bar (not an Exception, so nothing on the way handles it)."""
+
+
+def _frame(bars: pd.DataFrame) -> pd.DataFrame:
+    return pd.DataFrame({"Date": bars.index, "Open": bars["open"].to_numpy(), "High": bars["high"].to_numpy(),
+                         "Low": bars["low"].to_numpy(), "Close": bars["close"].to_numpy(),
+                         "Volume": bars["volume"].to_numpy()})
+
+
+class Market:
+    """History behind a FakeAlpacaREST, a copy of the bar store, and a FakeAlpacaServer taking the orders."""
+
+    def __init__(self, history, live, store_root, fill_delay=0.0):
+        self.api = FakeAlpacaREST({SYMBOL: history})
+        self.store = BarStore(store_root)
+        self.live = _frame(live)
+        self.bars = list(replay_bars(self.live))
+        self.server = FakeAlpacaServer(fill_delay=fill_delay, cash=1e7).start()
+        self.server.broker.api = self.api
+        self.low = self.high = 0
+
+    def arrive(self, i):
+        self.store.write(SYMBOL, "1Min", self.live.iloc[i:i + 1])
+
+    def held(self):
+        held = self.server.broker.positions.get(SYMBOL, (0, 0.0))[0]
+        self.low, self.high = min(self.low, held), max(self.high, held)
+        return held
+
+    def close(self):
+        self.server.stop()
+
+
+class Session:
+    """One engine after another on a Market, sharing a snapshot directory (a process and its restarts)."""
+
+    def __init__(self, market, root, journal, days, states=None):
+        self.market = market
+        self.snapshots = SnapshotStore(Path(root) / "state")
+        self.journal = journal
+        self.days = days
+        self.engine = None
+        self.fills = []
+        self.startups = []
+        self.states = states or {}
+        self.restored = True  # every restart's indicator state == the uninterrupted run's at its last bar
+
+    def start(self, signals=None):
+        broker = AlpacaBroker(api=self.market.api, gateway_options=dict(base_url=self.market.server.url, **GATEWAY))
+        self.engine = PaperTradingEngine(broker, SYMBOL, qty=1, timeframe="1Min", store=self.market.store,
+                                         snapshots=self.snapshots, logger=self.journal)
+        start = time.perf_counter()
+        self.engine.prepare(signals or StreamingSignals(**PARAMS), lookback_days=self.days)
+        self.startups.append(time.perf_counter() - start)
+        if self.engine.last_bar_ts in self.states:
+            self.restored &= self.engine.signals.state() == self.states[self.engine.last_bar_ts]
+        return self.engine
+
+    def bar(self, i):
+        self.market.arrive(i)
+        self.engine.on_bar(self.market.bars[i])
+        self.market.held()
+
+    def settle(self, accepted_only=False, timeout=10.0):
+        """Wait for the engine's orders to finish (or only to be accepted)."""
+        deadline = time.monotonic() + timeout
+        gateway = self.engine.broker.orders
+        while time.monotonic() < deadline:
+            if not gateway.pending() and (accepted_only or not self.engine.pending):
+                return
+            time.sleep(0.005)
+        raise TimeoutError("orders did not settle")
+
+    def crash(self):
+        """Drop the engine without stop() or a final snapshot; only its gateway threads are shut down."""
+        self.fills += [(order.ts, order.side) for order in self.engine.core.fills]
+        self.engine.broker.close()
+        self.engine = None
+
+    def finish(self):
+        self.settle()
+        self.crash()
+        self.market.held()
+        return self.fills
+
+
+def _history(days, seed=0):
+    """Random-walk minute bars over `days` (FakeAlpacaREST's lowercase frame), split into history and last session."""
+    end = pd.Timestamp.now(tz="UTC").normalize() - pd.Timedelta(days=1)
+    index = session_timestamps(end - pd.Timedelta(days=days), end, "1Min")
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.001, len(index))))
+    bars = pd.DataFrame({"open": close, "high": close * 1.0005, "low": close * 0.9995, "close": close,
+                         "volume": rng.integers(100, 10000, len(index)).astype(float)}, index=index.rename("timestamp"))
+    sessions = index.tz_convert("America/New_York").normalize()
+    live = sessions == sessions[-1]
+    return bars[~live], bars[live]
+
+
+def startup(history, live, root, journal, days):
+    print(f"1. startup, {len(history)} history bars ({days} days of 1Min), prepare() to ready to trade")
+    market = Market(history, live, root / "store")
+    session = Session(market, root / "startup", journal, days)
+    calls = market.api.request_count
+    session.start()
+    cold_calls = market.api.request_count - calls
+    session.crash()
+    shutil.copytree(root / "store", root / "base")  # history only, for the other checks
+    session.snapshots.clear(SYMBOL, "1Min")
+    session.start()
+    session.crash()  # leaves a snapshot
+    for i in range(30):
+        session.start()
+        session.bar(i)
+        session.crash()
+    session.start()
+    session.crash()
+    market.close()
+    cold_empty, cold_stored, warm = session.startups[0], session.startups[1], session.startups[2:]
+    print(f"   {'cold, empty bar store':<34} {cold_empty * 1e3:9.1f} ms   ({cold_calls} REST requests)")
+    print(f"   {'cold, bars in the store':<34} {cold_stored * 1e3:9.1f} ms")
+    print(f"   {'warm, from the snapshot':<34} {np.median(warm) * 1e3:9.1f} ms   (median of {len(warm)}, "
+          f"max {max(warm) * 1e3:.1f} ms)")
+
+    state = session.snapshots.load(SYMBOL, "1Min")
+    path = session.snapshots.path(SYMBOL, "1Min")
+    timings = {}
+    for fsync in (True, False):
+        store = SnapshotStore(root / "timing", fsync=fsync)
+        times = []
+        for _ in range(200):
+            start = time.perf_counter()
+            store.save(state)
+            times.append(time.perf_counter() - start)
+        timings[fsync] = np.median(times)
+    start = time.perf_counter()
+    for _ in range(1000):
+        session.snapshots.load(SYMBOL, "1Min")
+    load = (time.perf_counter() - start) / 1000
+    print(f"   snapshot: {path.stat().st_size} bytes; save {timings[True] * 1e6:.0f} us (fsync), "
+          f"{timings[False] * 1e6:.0f} us (no fsync); load {load * 1e6:.0f} us")
+    return warm
+
+
+def reference(history, live, store, root, journal, days):
+    """The uninterrupted run: fills, and the indicator state after every bar (by bar ts)."""
+    market = Market(history, live, _copy(store, root / "store"))
+    session = Session(market, root, journal, days)
+    session.start()
+    states = {}
+    for i, bar in enumerate(market.bars):
+        session.bar(i)
+        states[bar.ts] = session.engine.signals.state()
+    fills = session.finish()
+    market.close()
+    return fills, states, market
+
+
+def _copy(store, root):
+    shutil.copytree(store, root)
+    return root
+
+
+def _bounded(label, market, failures):
+    if market.low < 0 or market.high > 1:
+        failures.append(f"{label}: broker position went to {market.low if market.low < 0 else market.high}")
+
+
+def between_bars(history, live, store, root, journal, days, every, expected, states, failures):
+    market = Market(history, live, _copy(store, root / "store"))
+    session = Session(market, root, journal, days, states)
+    session.start()
+    order_bars = {ts for ts, _ in expected}
+    crashes = 0
+    for i, bar in enumerate(market.bars):
+        session.bar(i)
+        if (i + 1) % every == 0 or bar.ts in order_bars:
+            session.settle()
+            session.crash()
+            session.start()
+            crashes += 1
+    fills = session.finish()
+    market.close()
+    same = fills == expected
+    print(f"\n2. {crashes} crashes between bars (every {every} bars and after each order): "
+          f"{len(fills)} orders {'==' if same else '!='} the uninterrupted run's, broker holds {market.held()}; "
+          f"restored indicator state {'==' if session.restored else '!='} the uninterrupted run's each time")
+    if not same:
+        failures.append(f"crashes between bars: orders {fills} != {expected}")
+    if not session.restored:
+        failures.append("crashes between bars: restored indicator state differs")
+    _bounded("crashes between bars", market, failures)
+    return session.startups[1:]
+
+
+def in_flight(history, live, store, root, journal, days, expected, expected_held, states, failures):
+    print("\n3. crashes with an order in flight")
+    order_bars = {ts for ts, _ in expected}
+
+    # accepted by the broker, not filled yet: fills come 0.5 s later
+    market = Market(history, live, _copy(store, root / "accepted" / "store"), fill_delay=0.5)
+    session = Session(market, root / "accepted", journal, days, states)
+    session.start()
+    crashes = 0
+    for i, bar in enumerate(market.bars):
+        session.bar(i)
+        if bar.ts in order_bars:
+            session.settle(accepted_only=True)
+            session.crash()
+            session.start()
+            crashes += 1
+    fills = session.finish()
+    time.sleep(0.6)
+    held = market.held()
+    market.close()
+    same = fills == expected and held == expected_held and session.restored
+    print(f"   {crashes} crashes with the order accepted, unfilled: {len(fills)} orders "
+          f"{'==' if same else '!='} the uninterrupted run's, broker holds {held}")
+    if not same:
+        failures.append(f"crashes after accept: orders {fills}, held {held}, state restored {session.restored}")
+    _bounded("crashes after accept", market, failures)
+
+    # recorded in the snapshot, then the process dies before the gateway gets it
+    market = Market(history, live, _copy(store, root / "unsent" / "store"))
+    session = Session(market, root / "unsent", journal, days, states)
+    engine = session.start()
+    lost, consistent = [], True
+    for i, bar in enumerate(market.bars):
+        if bar.ts in order_bars:
+            def crash(*args, **kwargs):
+                raise Crash()
+            engine.broker.submit_order = crash
+        try:
+            session.bar(i)
+        except Crash:
+            lost += list(engine.pending)
+            session.crash()
+            engine = session.start()
+            consistent &= engine.core.position == market.held() and not engine.pending
+        else:
+            engine.broker.__dict__.pop("submit_order", None)
+    session.finish()
+    placed = [client_order_id for client_order_id in lost if client_order_id in market.server.by_client_id]
+    held, position = market.held(), engine.core.position
+    market.close()
+    print(f"   {len(lost)} crashes with the order recorded, unsent: {len(placed)} of them placed, restarted "
+          f"engine {'==' if consistent else '!='} broker position each time, ends holding {position} "
+          f"(broker {held})")
+    consistent &= session.restored
+    if placed or not consistent or held != position:
+        failures.append(f"crashes before send: {placed} placed, consistent {consistent}, {position} vs {held}")
+    _bounded("crashes before send", market, failures)
+
+
+def downtime(history, live, store, root, journal, days, states, failures, down=15):
+    market = Market(history, live, _copy(store, root / "store"))
+    session = Session(market, root, journal, days)
+    session.start()
+    middle = len(market.bars) // 2
+    for i in range(middle):
+        session.bar(i)
+    session.settle()
+    session.crash()
+    for i in range(middle, middle + down):
+        market.arrive(i)
+    engine = session.start()
+    same = engine.signals.state() == states[market.bars[middle + down - 1].ts]
+    caught_up = engine.last_bar_ts == market.bars[middle + down - 1].ts
+    for i in range(middle + down, len(market.bars)):
+        session.bar(i)
+    session.finish()
+    held = market.held()
+    market.close()
+    print(f"\n4. {down} bars closed while down: caught up on restart in {session.startups[-1] * 1e3:.1f} ms, "
+          f"indicator state {'==' if same and caught_up else '!='} the uninterrupted run's; "
+          f"engine holds {engine.core.position}, broker {held}")
+    if not (same and caught_up) or engine.core.position != held:
+        failures.append("downtime: state differs after catching up")
+    _bounded("downtime", market, failures)
+
+
+def damaged(history, live, store, root, journal, days, expected, failures):
+    print("\n5. unusable snapshots while long")
+    first_buy = next(ts for ts, side in expected if side == "buy")
+    for label, corrupt, signals in (("truncated", True, None),
+                                    ("other parameters", False, dict(PARAMS, fast_sma=PARAMS["fast_sma"] + 1))):
+        market = Market(history, live, _copy(store, root / label / "store"))
+        session = Session(market, root / label, journal, days)
+        session.start()
+        i = 0
+        while market.bars[i].ts != first_buy:
+            session.bar(i)
+            i += 1
+        session.bar(i)
+        session.settle()
+        session.crash()
+        path = session.snapshots.path(SYMBOL, "1Min")
+        if corrupt:
+            path.write_bytes(path.read_bytes()[:100])
+        logging.disable(logging.WARNING)
+        engine = session.start(StreamingSignals(**(signals or PARAMS)))
+        logging.disable(logging.NOTSET)
+        held = market.held()
+        print(f"   {label:<18} ignored: cold warm-up in {session.startups[-1] * 1e3:6.1f} ms, engine position "
+              f"{engine.core.position} (broker {held}), in_position {engine.in_position}")
+        if engine.core.position != held or not engine.in_position:
+            failures.append(f"{label} snapshot: engine {engine.core.position}, broker {held}")
+        session.finish()
+        market.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=30, help="calendar days of minute bars (history + 1 session)")
+    parser.add_argument("--crash-every", type=int, default=25, help="bars between crashes in check 2")
+    parser.add_argument("--budget", type=float, default=50.0, help="milliseconds allowed for a warm restart (median)")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    history, live = _history(args.days)
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        journal = TradeLogger(root / "trades.db")
+        warm = startup(history, live, root / "startup", journal, args.days)
+        store = root / "startup" / "base"
+        expected, states, market = reference(history, live, store, root / "reference", journal, args.days)
+        expected_held = market.held()
+        print(f"\n   uninterrupted run: {len(live)} live bars, {len(expected)} orders, broker holds {expected_held}")
+        if not expected:
+            failures.append("no orders in the live session: nothing to check")
+        else:
+            warm += between_bars(history, live, store, root / "between", journal, args.days, args.crash_every,
+                                 expected, states, failures)
+            in_flight(history, live, store, root / "in_flight", journal, args.days, expected, expected_held,
+                      states, failures)
+            downtime(history, live, store, root / "downtime", journal, args.days, states, failures)
+            damaged(history, live, store, root / "damaged", journal, args.days, expected, failures)
+        journal.close()
+
+    median = np.median(warm) * 1e3
+    print(f"\nwarm restarts: {len(warm)}, median {median:.1f} ms (budget {args.budget:g} ms), "
+          f"slowest {max(warm) * 1e3:.1f} ms")
+    if median > args.budget:
+        failures.append(f"warm restarts took {median:.1f} ms (median) > {args.budget:g} ms")
+    if failures:
+        print("\nFAILED:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
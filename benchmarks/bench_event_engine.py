@@ -0,0 +1,156 @@
+# benchmarks/bench_event_engine.py
+"""
+Event-driven core: parity and replay throughput.
+
+1. Replays data/AAPL_*_1d.csv through EventEngine + SignalStrategy and checks
+   the trades against generate_signals + simple_backtest, both bar by bar
+   (run) and with the signals precomputed (replay).
+   Then 50 seeded cent-grid series with long flat stretches (SMA 5/20,
+   where fast and slow tie often): run and replay must place the same
+   trades, and StreamingSignals.batch must equal update() bar for bar.
+2. Runs the same strategy in live mode (PolledBarFeed over a simulated clock
+   that reveals a few bars per poll) and checks the trades equal the replay.
+3. Times replay of synthetic minute bars from a BarStore, bar by bar and
+   precomputed; the two must place the same trades. Exits with status 1 when
+   the precomputed replay runs below --target bars/s.
+
+    python -m benchmarks.bench_event_engine --bars 1000000
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.backtest import simple_backtest
+from src.bar_store import BarStore
+from src.event_engine import EventEngine, PolledBarFeed, SignalStrategy, replay_bars
+from src.indicators import add_rsi
+from src.strategy import StreamingSignals, generate_signals
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+PARAMS = dict(fast_sma=20, slow_sma=50, rsi_threshold=70)
+DAY_NS = 86_400_000_000_000
+
+
+def load(path):
+    df = pd.read_csv(path)
+    df["Date"] = pd.to_datetime(df["Date"], utc=True)
+    return df
+
+
+def check_backtest_parity():
+    for path in sorted(DATA_DIR.glob("AAPL_*_1d.csv")):
+        df = load(path)
+        _, summary = simple_backtest(generate_signals(add_rsi(df.copy(), length=14), **PARAMS))
+        expected = [dict(t, date=t["date"].tz_convert("UTC")) for t in summary["trades"]]
+        engine = EventEngine(SignalStrategy(StreamingSignals(**PARAMS)))
+        engine.run(replay_bars(df))
+        assert engine.trades() == expected, path.name
+        precomputed = EventEngine(SignalStrategy(StreamingSignals(**PARAMS)))
+        precomputed.replay(df)
+        assert precomputed.trades() == expected, f"{path.name} (precomputed)"
+        print(f"{path.name}: replay == precomputed replay == simple_backtest ({len(engine.fills)} fills)")
+
+
+def cent_grid(n_bars, seed):
+    """Prices moving in cents with long flat stretches: SMA ties that only exact arithmetic keeps apart."""
+    rng = np.random.default_rng(seed)
+    close = np.round(100 + np.cumsum(rng.choice([-0.01, 0, 0, 0, 0.01], n_bars)), 2)
+    return pd.DataFrame({"Date": pd.date_range("2024-01-02", periods=n_bars, freq="min", tz="UTC"),
+                         "Open": close, "High": close, "Low": close, "Close": close,
+                         "Volume": np.full(n_bars, 100.0)})
+
+
+def check_tie_parity(n_series=50, n_bars=2000):
+    params = dict(fast_sma=5, slow_sma=20, rsi_threshold=70)
+    fills = 0
+    for seed in range(n_series):
+        df = cent_grid(n_bars, seed)
+        streamed = StreamingSignals(**params)
+        updates = [streamed.update(close) for close in df["Close"].tolist()]
+        batch = StreamingSignals(**params).batch(df["Close"].to_numpy())
+        for name, values in batch.items():
+            assert np.array_equal(np.array([u[name] for u in updates], dtype=np.float64),
+                                  values.astype(np.float64), equal_nan=True), f"seed {seed}: batch {name} != update"
+        engine = EventEngine(SignalStrategy(StreamingSignals(**params)))
+        engine.run(replay_bars(df))
+        precomputed = EventEngine(SignalStrategy(StreamingSignals(**params)))
+        precomputed.replay(df)
+        assert [o.as_tuple() for o in precomputed.fills] == [o.as_tuple() for o in engine.fills], f"seed {seed}"
+        assert precomputed.cash == engine.cash, f"seed {seed}"
+        fills += len(engine.fills)
+    print(f"{n_series} cent-grid series, SMA 5/20: replay == precomputed replay ({fills} fills), "
+          f"batch signals == update()")
+
+
+def check_live_parity(bars_per_poll=3):
+    df = load(DATA_DIR / "AAPL_5y_1d.csv")
+    ts = df["Date"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+    clock = {"now": int(ts[0])}
+
+    def fetch(start):
+        visible = df[ts <= clock["now"]]
+        return visible if start is None else visible[visible["Date"] >= start]
+
+    def sleep(_):
+        clock["now"] += bars_per_poll * DAY_NS
+
+    feed = PolledBarFeed(fetch, "1Day", poll_interval=0, clock=lambda: clock["now"], sleep=sleep,
+                         running=lambda: clock["now"] <= int(ts[-1]) + 4 * DAY_NS)
+    live = EventEngine(SignalStrategy(StreamingSignals(**PARAMS)))
+    live.run(feed)
+    replay = EventEngine(SignalStrategy(StreamingSignals(**PARAMS)))
+    replay.run(replay_bars(df))
+    assert [o.as_tuple() for o in live.fills] == [o.as_tuple() for o in replay.fills]
+    print(f"live (polled, {bars_per_poll} bars/poll) == replay ({len(live.fills)} fills)")
+
+
+def time_replay(n_bars) -> float:
+    """Bars/s of the precomputed replay (after checking its trades equal the bar-by-bar run's)."""
+    rng = np.random.default_rng(0)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 5e-4, n_bars)))
+    df = pd.DataFrame({"Date": pd.date_range("2020-01-01", periods=n_bars, freq="min", tz="UTC"),
+                       "Open": close, "High": close * 1.001, "Low": close * 0.999, "Close": close,
+                       "Volume": np.full(n_bars, 1000.0)})
+    with tempfile.TemporaryDirectory() as root:
+        store = BarStore(root)
+        store.write("SYN", "1Min", df)
+        rates, fills = [], []
+        for label in ("bar by bar", "precomputed"):
+            start = time.perf_counter()
+            engine = EventEngine(SignalStrategy(StreamingSignals(fast_sma=20, slow_sma=100, rsi_threshold=70)))
+            data = store.read_arrays("SYN", "1Min")
+            if label == "precomputed":
+                engine.replay(data)
+            else:
+                engine.run(replay_bars(data))
+            elapsed = time.perf_counter() - start
+            rates.append(n_bars / elapsed)
+            fills.append([o.as_tuple() for o in engine.fills])
+            print(f"{n_bars:>10} bars  {label:<12} {elapsed:>8.2f}s {n_bars / elapsed:>12,.0f} bars/s "
+                  f"({len(engine.fills)} fills)")
+    assert fills[0] == fills[1], "precomputed replay placed different trades"
+    return rates[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bars", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--target", type=float, default=300_000, help="bars/s required of the precomputed replay")
+    args = parser.parse_args()
+
+    check_backtest_parity()
+    check_tie_parity()
+    check_live_parity()
+    slowest = min(time_replay(n_bars) for n_bars in args.bars)
+    if slowest < args.target:
+        print(f"\nFAILED: precomputed replay at {slowest:,.0f} bars/s < {args.target:,.0f}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
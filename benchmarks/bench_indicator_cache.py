@@ -0,0 +1,134 @@
+# benchmarks/bench_indicator_cache.py
+"""
+IndicatorCache: correctness and the time saved on repeated work.
+
+1. Correctness: on data/AAPL_5y_1d.csv and synthetic minute bars, cached SMA,
+   RSI and MACD must equal the uncached functions exactly (memory and disk
+   hits); results extended after appended bars are checked against a full
+   recompute (a few ulp allowed).
+2. Timing per indicator: cold compute, memory hit, disk hit, and extension
+   after 1 and 1,000 appended bars.
+3. Backtest-tab reruns: add_rsi + generate_signals (the indicator work; the
+   backtest itself is not cached) for a sequence of SMA/RSI-threshold tweaks,
+   with and without a cache.
+
+    python -m benchmarks.bench_indicator_cache --bars 1000000
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.indicator_cache import IndicatorCache, _macd, _rsi, _sma
+from src.indicators import add_rsi
+from src.strategy import generate_signals
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+CASES = [("sma", _sma, dict(window=50)), ("rsi", _rsi, dict(length=14)), ("macd", _macd, {})]
+MAX_EXTEND_REL_ERR = 1e-12
+TWEAKS = [(20, 50, 70), (10, 50, 70), (10, 30, 70), (10, 30, 60), (20, 50, 70), (15, 40, 65), (10, 50, 70)]
+
+
+def synthetic_closes(n_bars, seed=0):
+    rng = np.random.default_rng(seed)
+    return 100 * np.exp(np.cumsum(rng.normal(0, 5e-4, n_bars)))
+
+
+def _rel_err(approx, exact):
+    """Largest error relative to the indicator's largest magnitude (MACD crosses zero)."""
+    mask = ~np.isnan(exact)
+    assert np.array_equal(np.isnan(approx), ~mask)
+    return float(np.abs(approx[mask] - exact[mask]).max() / np.abs(exact[mask]).max()) if mask.any() else 0.0
+
+
+def check(name, closes):
+    errs = []
+    with tempfile.TemporaryDirectory() as root:
+        for indicator, compute, params in CASES:
+            exact = compute(closes, **params)
+            cache = IndicatorCache(disk_dir=root)
+            assert np.array_equal(cache.get(indicator, closes, **params), exact, equal_nan=True), indicator
+            assert np.array_equal(cache.get(indicator, closes.copy(), **params), exact, equal_nan=True), indicator
+            assert np.array_equal(IndicatorCache(disk_dir=root).get(indicator, closes, **params), exact,
+                                  equal_nan=True), indicator
+
+            head = IndicatorCache()
+            head.get(indicator, closes[:len(closes) * 3 // 4], **params)
+            extended = head.get(indicator, closes, **params)
+            assert head.stats["extend"] == 1, (indicator, head.stats)
+            errs.append(f"{indicator} {_rel_err(extended, exact):.0e}")
+            assert _rel_err(extended, exact) < MAX_EXTEND_REL_ERR, indicator
+    print(f"{name:<20} {len(closes):>9} bars  cached == uncached; extension rel. error: {', '.join(errs)}")
+
+
+def _best(fn, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def timings(n_bars):
+    closes = synthetic_closes(n_bars + 1_000, seed=1)
+    base = closes[:n_bars]
+    print(f"\n{n_bars:,} bars (ms)      cold       hit  disk hit  +1 bar  +1000 bars")
+    with tempfile.TemporaryDirectory() as root:
+        for indicator, compute, params in CASES:
+            cold = _best(lambda: compute(base, **params))
+            cache = IndicatorCache(disk_dir=root)
+            cache.get(indicator, base, **params)
+            hit = _best(lambda: cache.get(indicator, base, **params))
+            disk = _best(lambda: IndicatorCache(disk_dir=root).get(indicator, base, **params))
+
+            def extend(k):
+                fresh = IndicatorCache()
+                fresh.get(indicator, base, **params)
+                start = time.perf_counter()
+                fresh.get(indicator, closes[:n_bars + k], **params)
+                return time.perf_counter() - start
+
+            print(f"{indicator:<17} {cold * 1e3:>8.2f} {hit * 1e3:>9.3f} {disk * 1e3:>9.2f} "
+                  f"{min(extend(1) for _ in range(3)) * 1e3:>7.2f} {min(extend(1000) for _ in range(3)) * 1e3:>11.2f}")
+
+
+def reruns(name, df):
+    def run(cache):
+        for fast, slow, threshold in TWEAKS:
+            generate_signals(add_rsi(df.copy(), length=14, cache=cache), fast_sma=fast, slow_sma=slow,
+                             rsi_threshold=threshold, cache=cache)
+
+    plain = _best(lambda: run(None), repeat=3)
+    cache = IndicatorCache()
+    first = _best(lambda: run(cache), repeat=1)
+    warm = _best(lambda: run(cache), repeat=3)
+    info = cache.info()
+    print(f"{name:<20} {len(TWEAKS)} reruns: uncached {plain * 1e3:8.1f} ms, cached first pass "
+          f"{first * 1e3:8.1f} ms, repeated {warm * 1e3:8.1f} ms "
+          f"({info['entries']} entries, {info['mb']:.1f} MB, hit rate {info['hit_rate']:.0%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bars", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    aapl = pd.read_csv(DATA_DIR / "AAPL_5y_1d.csv")
+    aapl["Date"] = pd.to_datetime(aapl["Date"], utc=True)
+    minute = pd.DataFrame({"Date": pd.date_range("2020-01-01", periods=args.bars, freq="min", tz="UTC"),
+                           "Close": synthetic_closes(args.bars)})
+
+    check("AAPL 5y daily", aapl["Close"].to_numpy(dtype=np.float64))
+    check("synthetic minute", minute["Close"].to_numpy())
+    timings(args.bars)
+    print()
+    reruns("AAPL 5y daily", aapl)
+    reruns("synthetic minute", minute)
+
+
+if __name__ == "__main__":
+    main()
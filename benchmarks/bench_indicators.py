@@ -0,0 +1,246 @@
+# benchmarks/bench_indicators.py
+"""
+NumPy indicator kernels (src.indicator_kernels) against pandas_ta.
+
+1. Golden check on the bundled AAPL CSVs: SMA, EMA, RSI, MACD, ATR,
+   Bollinger Bands and VWAP must equal pandas_ta's pandas code path
+   (talib=False) to 1e-9 relative, with NaN in the same places. pandas_ta is
+   optional: without it the kernels are checked against the same formulas
+   written in pandas (REFERENCE below); with it, against both.
+2. Throughput on --bars synthetic closes (default 10M): kernel vs the pandas
+   formula (and pandas_ta when installed), best of --repeat, plus peak
+   memory allocated during one call.
+3. Flat start: RSI of a symbol whose first closes do not move (illiquid,
+   newly listed) is NaN until the first move, from the kernel, the pandas
+   formula and src.indicators' StreamingRSI alike, then equal to 1e-9.
+4. 2-D batch: --symbols columns of --bars / symbols rows in one kernel call,
+   against calling the kernel and the pandas formula symbol by symbol.
+
+    python -m benchmarks.bench_indicators --bars 10000000 --symbols 500
+"""
+import argparse
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src import indicator_kernels as kernels
+from src.indicators import StreamingRSI
+from src.replay_server import load_bars
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+RTOL = 1e-9
+
+
+# pandas_ta's pandas code path, formula for formula
+def _rma(x, length):
+    return x.ewm(alpha=1.0 / length, min_periods=length).mean()
+
+
+def _ema(close, length):
+    close = close.loc[close.first_valid_index():].copy()
+    seed = close.iloc[:length].mean()
+    close.iloc[:length - 1] = np.nan
+    close.iloc[length - 1] = seed
+    return close.ewm(span=length, adjust=False).mean()
+
+
+def _rsi(close, length=14):
+    negative = close.diff()
+    positive = negative.copy()
+    positive[positive < 0] = 0
+    negative[negative > 0] = 0
+    positive_avg, negative_avg = _rma(positive, length), _rma(negative, length)
+    return 100 * positive_avg / (positive_avg + negative_avg.abs())
+
+
+def _macd(close, fast=12, slow=26, signal=9):
+    line = _ema(close, fast) - _ema(close, slow)
+    signal_line = _ema(line, signal).reindex(line.index)
+    return pd.concat([line, line - signal_line, signal_line], axis=1)
+
+
+def _atr(high, low, close, length=14):
+    previous = close.shift(1)
+    true_range = pd.concat([high - low, (high - previous).abs(), (low - previous).abs()], axis=1).max(axis=1)
+    true_range.iloc[0] = np.nan
+    return _rma(true_range, length)
+
+
+def _bbands(close, length=20, std=2.0):
+    middle = close.rolling(length).mean()
+    deviation = close.rolling(length).var(ddof=0).apply(np.sqrt)
+    return pd.concat([middle - std * deviation, middle, middle + std * deviation], axis=1)
+
+
+def _vwap(high, low, close, volume, anchor="W"):
+    weighted = (high + low + close) / 3 * volume
+    periods = weighted.index.to_period(anchor)
+    return weighted.groupby(periods).cumsum() / volume.groupby(periods).cumsum()
+
+
+REFERENCE = {"sma": lambda d: d["Close"].rolling(20).mean(),
+             "ema": lambda d: _ema(d["Close"], 12),
+             "rsi": lambda d: _rsi(d["Close"]),
+             "macd": lambda d: _macd(d["Close"]),
+             "atr": lambda d: _atr(d["High"], d["Low"], d["Close"]),
+             "bbands": lambda d: _bbands(d["Close"]),
+             "vwap": lambda d: _vwap(d["High"], d["Low"], d["Close"], d["Volume"])}
+
+PANDAS_TA = {"sma": lambda ta, d: ta.sma(d["Close"], 20, talib=False),
+             "ema": lambda ta, d: ta.ema(d["Close"], 12, talib=False),
+             "rsi": lambda ta, d: ta.rsi(d["Close"], 14, talib=False),
+             "macd": lambda ta, d: ta.macd(d["Close"], talib=False),
+             "atr": lambda ta, d: ta.atr(d["High"], d["Low"], d["Close"], 14, talib=False),
+             "bbands": lambda ta, d: ta.bbands(d["Close"], 20, 2.0, talib=False).iloc[:, :3],
+             "vwap": lambda ta, d: ta.vwap(d["High"], d["Low"], d["Close"], d["Volume"], anchor="W")}
+
+
+def kernel(name, d):
+    """The kernel for `name` on a frame with a (naive UTC) DatetimeIndex."""
+    columns = {c: d[c].to_numpy() for c in ("High", "Low", "Close", "Volume")}
+    close = columns["Close"]
+    if name == "sma":
+        return kernels.sma(close, 20)
+    if name == "ema":
+        return kernels.ema(close, 12)
+    if name == "rsi":
+        return kernels.rsi(close, 14)
+    if name == "macd":
+        return kernels.macd(close)
+    if name == "atr":
+        return kernels.atr(columns["High"], columns["Low"], close, 14)
+    if name == "bbands":
+        return kernels.bbands(close, 20, 2.0)
+    return kernels.vwap(columns["High"], columns["Low"], close, columns["Volume"],
+                        groups=d.index.to_period("W").asi8)
+
+
+def _pandas_ta():
+    try:
+        import pandas_ta
+    except ImportError:
+        return None
+    return pandas_ta
+
+
+def _compare(got, expected, label):
+    expected = np.asarray(expected, dtype=np.float64).reshape(got.shape)
+    assert np.array_equal(np.isnan(got), np.isnan(expected)), f"{label}: NaN in different places"
+    valid = ~np.isnan(expected)
+    error = np.abs(got[valid] - expected[valid]) / np.maximum(np.abs(expected[valid]), 1e-300)
+    worst = error.max() if len(error) else 0.0
+    assert worst <= RTOL, f"{label}: relative error {worst:.1e} > {RTOL:.0e}"
+    return worst
+
+
+def golden():
+    ta = _pandas_ta()
+    references = {"pandas formula": lambda name, d: REFERENCE[name](d)}
+    if ta is not None:
+        references["pandas_ta"] = lambda name, d: PANDAS_TA[name](ta, d)
+    else:
+        print("pandas_ta not installed: checking against the pandas formulas only")
+    for path in sorted(DATA_DIR.glob("AAPL_*.csv")):
+        d = load_bars(path)
+        d.index = pd.DatetimeIndex(d.pop("Date")).tz_localize(None)
+        errors = {}
+        for name in REFERENCE:
+            got = kernel(name, d)
+            for label, reference in references.items():
+                errors[name] = max(errors.get(name, 0.0), _compare(got, reference(name, d), f"{path.name} {name}"))
+        print(f"{path.name:<16} {len(d):>5} bars == {' and '.join(references)}; max rel. error "
+              + ", ".join(f"{name} {error:.0e}" for name, error in errors.items()))
+
+
+def flat_start():
+    closes = np.r_[np.full(40, 100.0), 100.5, 100.25, np.full(10, 100.25), 99.75, 101.0]
+    expected = _rsi(pd.Series(closes)).to_numpy()
+    got = kernels.rsi(closes, 14)
+    rsi = StreamingRSI(14)
+    streamed = np.array([rsi.update(close) for close in closes])
+    for label, values in (("kernel", got), ("StreamingRSI", streamed)):
+        _compare(values, expected, f"flat start rsi {label}")
+    assert np.isnan(got[:40]).all() and not np.isnan(got[40:]).any()
+    print(f"flat start: RSI NaN for the {np.isnan(got).sum()} bars before the first move, kernel == StreamingRSI "
+          f"== pandas formula")
+
+
+def synthetic(n_bars, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 2e-4, n_bars)))
+    spread = np.abs(rng.normal(0, 5e-4, n_bars)) * close
+    index = pd.date_range("2000-01-03", periods=n_bars, freq="min")
+    return pd.DataFrame({"High": close + spread, "Low": close - spread, "Close": close,
+                         "Volume": rng.integers(100, 10_000, n_bars).astype(np.float64)}, index=index)
+
+
+def _best(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def _peak_mb(fn):
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 2 ** 20
+
+
+def throughput(n_bars, repeat):
+    d = synthetic(n_bars)
+    ta = _pandas_ta()
+    for name in REFERENCE:
+        kernel(name, d.iloc[:1000])  # imports and compiles the filter kernel
+    print(f"\n{n_bars:,} bars   kernel s  pandas s  speedup  Mbars/s  peak MB kernel / pandas"
+          + ("   pandas_ta s" if ta is not None else ""))
+    for name in REFERENCE:
+        fast = _best(lambda: kernel(name, d), repeat)
+        slow = _best(lambda: REFERENCE[name](d), repeat)
+        line = (f"{name:<12} {fast:>9.3f} {slow:>9.3f} {slow / fast:>7.1f}x {n_bars / fast / 1e6:>8.1f}  "
+                f"{_peak_mb(lambda: kernel(name, d)):>9.0f} / {_peak_mb(lambda: REFERENCE[name](d)):<6.0f}")
+        if ta is not None:
+            line += f" {_best(lambda: PANDAS_TA[name](ta, d), repeat):>10.3f}"
+        print(line)
+
+
+def batch(n_bars, n_symbols, repeat):
+    rows = n_bars // n_symbols
+    closes = np.column_stack([synthetic(rows, seed)["Close"].to_numpy() for seed in range(n_symbols)])
+    frame = pd.DataFrame(closes)
+    print(f"\n2-D batch, {n_symbols} symbols x {rows:,} bars   one call s   per symbol s   pandas per symbol s")
+    for name, fn, ref in (("rsi", lambda x: kernels.rsi(x, 14), _rsi),
+                          ("ema", lambda x: kernels.ema(x, 12), lambda c: _ema(c, 12)),
+                          ("macd", kernels.macd, _macd)):
+        together = fn(closes)
+        separately = [fn(closes[:, j]) for j in range(n_symbols)]
+        assert all(np.array_equal(together[..., j], separately[j], equal_nan=True) for j in range(n_symbols)), name
+        one = _best(lambda: fn(closes), repeat)
+        each = _best(lambda: [fn(closes[:, j]) for j in range(n_symbols)], repeat)
+        pandas_each = _best(lambda: [ref(frame[j]) for j in range(n_symbols)], 1)
+        print(f"{name:<38} {one:>11.3f} {each:>14.3f} {pandas_each:>21.3f}")
+    print("batched results == per-symbol results, bit for bit")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bars", type=int, default=10_000_000)
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    golden()
+    flat_start()
+    throughput(args.bars, args.repeat)
+    batch(args.bars, args.symbols, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# benchmarks/bench_mock_broker.py
+"""
+MockBroker order-matching throughput.
+
+Places a random mix of market, limit and stop orders around a synthetic
+random-walk price and matches them bar by bar (with slippage, commission and
+a 50% volume participation cap, so some orders fill partially). Reports
+orders/s, fills, the final order states and the size of the order history.
+
+    python -m benchmarks.bench_mock_broker --orders 1000000 --bars 20000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from src.broker_mock import MockBroker
+
+
+def run(n_orders, n_bars, seed=0):
+    rng = np.random.default_rng(seed)
+    per_bar = max(1, n_orders // n_bars)
+    n_orders = per_bar * n_bars
+    price = (100 * np.exp(np.cumsum(rng.normal(0, 1e-3, n_bars)))).tolist()
+    types = rng.choice(["market", "limit", "stop"], n_orders).tolist()
+    sides = rng.choice(["buy", "sell"], n_orders).tolist()
+    offsets = np.abs(rng.normal(0, 0.5, n_orders)).tolist()
+    qtys = rng.integers(1, 100, n_orders).tolist()
+
+    broker = MockBroker(cash=1e12, slippage_bps=1, commission_pct=1e-4, participation=0.5)
+    place_order = broker.place_order
+    start = time.perf_counter()
+    k = 0
+    for i, p in enumerate(price):
+        for _ in range(per_bar):
+            order_type, side = types[k], sides[k]
+            away = offsets[k] if side == "buy" else -offsets[k]  # limits below / stops above for buys
+            if order_type == "market":
+                place_order("SYN", qtys[k], side=side)
+            elif order_type == "limit":
+                place_order("SYN", qtys[k], side=side, order_type="limit", limit_price=p - away)
+            else:
+                place_order("SYN", qtys[k], side=side, order_type="stop", stop_price=p + away)
+            k += 1
+        broker.on_bar("SYN", i, p, p * 1.002, p * 0.998, p * 1.0005, volume=5000)
+    elapsed = time.perf_counter() - start
+
+    history = broker.history()
+    states = ", ".join(f"{status} {count}" for status, count in history["status"].value_counts().items())
+    print(f"{n_orders:>10} orders {n_bars:>7} bars {elapsed:>8.2f}s {n_orders / elapsed:>10,.0f} orders/s")
+    print(f"{'':>10} {len(broker.fills())} fills; {states}; "
+          f"history {broker._orders.nbytes / 1e6:.1f} MB + fills {broker._fills.nbytes / 1e6:.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--bars", type=int, default=20_000)
+    args = parser.parse_args()
+    for n_orders in args.orders:
+        run(n_orders, args.bars)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# benchmarks/bench_optimizer.py
+"""
+Time grid_search sweeps on the bundled 5y daily file and on synthetic minute
+bars, for an increasing number of worker processes.
+
+First, on both datasets, a small grid (several RSI lengths, run on the
+largest --workers) must score every combination exactly as add_rsi +
+generate_signals + simple_backtest do for the same parameters: same trade
+count, final capital and return, and the other metrics to 1e-9 relative.
+
+    python -m benchmarks.bench_optimizer --workers 1 2 4 8
+"""
+import argparse
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.backtest import simple_backtest
+from src.indicators import add_rsi
+from src.optimizer import grid_search
+from src.strategy import generate_signals
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+
+GRID = dict(fast_sma=range(5, 40, 2), slow_sma=range(20, 200, 5), rsi_threshold=range(40, 90, 5))
+PARITY_GRID = dict(fast_sma=(5, 10, 20), slow_sma=(20, 50, 100), rsi_threshold=(50, 70, 101), rsi_length=(7, 14))
+EXACT = ("num_trades", "final_capital", "total_return_pct")
+RTOL = 1e-9
+
+
+def synthetic_minute_bars(n_bars: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "Date": pd.date_range("2020-01-01 09:30", periods=n_bars, freq="min", tz="UTC"),
+        "Close": 100 * np.exp(np.cumsum(rng.normal(0, 5e-4, n_bars))),
+    })
+
+
+def reference(df, fast_sma, slow_sma, rsi_threshold, rsi_length) -> dict:
+    """simple_backtest's summary for one combination, the slow way."""
+    df = df.copy()
+    df["Date"] = pd.to_datetime(df["Date"], utc=True)
+    signals = generate_signals(add_rsi(df, length=rsi_length), fast_sma=fast_sma, slow_sma=slow_sma,
+                               rsi_threshold=rsi_threshold)
+    return simple_backtest(signals)[1]
+
+
+def check_parity(name, df, workers):
+    ranked = grid_search(df, **PARITY_GRID, max_workers=workers)
+    for row in ranked.to_dict("records"):
+        combo = tuple(int(row[key]) for key in ("fast_sma", "slow_sma", "rsi_threshold", "rsi_length"))
+        expected = reference(df, *combo)
+        for key in EXACT:
+            assert row[key] == expected[key], (name, combo, key, row[key], expected[key])
+        for key in ("CAGR", "Sharpe_Ratio", "Max_Drawdown", "Win_Rate"):
+            assert np.isclose(row[key], expected[key], rtol=RTOL, atol=0), (name, combo, key, row[key], expected[key])
+    print(f"{name}: {len(ranked)} combos == add_rsi + generate_signals + simple_backtest ({workers} workers)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, os.cpu_count() or 1}))
+    parser.add_argument("--minute-bars", type=int, default=98_280, help="~1 year of regular-session minutes")
+    args = parser.parse_args()
+
+    daily = pd.read_csv(DATA_DIR / "AAPL_5y_1d.csv")
+    datasets = {"AAPL 5y daily": daily, f"synthetic {args.minute_bars} min": synthetic_minute_bars(args.minute_bars)}
+
+    for name, df in datasets.items():
+        check_parity(name, df, max(args.workers))
+
+    print(f"\n{'dataset':<26} {'workers':>7} {'combos':>7} {'seconds':>8} {'combos/s':>9}")
+    for name, df in datasets.items():
+        for workers in args.workers:
+            start = time.perf_counter()
+            ranked = grid_search(df, **GRID, max_workers=workers)
+            elapsed = time.perf_counter() - start
+            print(f"{name:<26} {workers:>7} {len(ranked):>7} {elapsed:>8.2f} {len(ranked) / elapsed:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+# benchmarks/bench_order_gateway.py
+"""
+Order gateway (src.order_gateway) against a local fake Alpaca REST server
+(src.fake_alpaca.FakeAlpacaServer) with injected latency and failures.
+
+1. Correctness under faults: --orders market orders through a server that
+   answers 5% of requests with 500 and loses 5% of order responses. Every
+   submission must end as exactly one filled order on the server (no
+   duplicates from retries, none missing), and a buy above the buying power
+   must fail once with its 403 instead of being retried.
+2. Rate limiting: against a server allowing --server-limit requests per
+   second, a gateway capped below it must never be answered 429; one capped
+   above it (in bursts of 8) must pause on the 429s and on
+   X-RateLimit-Remaining: 0 until the reset, and still place every order once.
+3. Blocking vs gateway: the same orders sent one by one and waited on (what
+   the engine used to do per signal) against gateway.submit(), all at once
+   and paced at --pace per second: time the caller is blocked per order,
+   orders per second, the p50/p90/p99 of submit to accepted and submit to
+   filled (polled vs trade_updates stream), and the TCP connections opened.
+
+Exits with status 1 when a check fails.
+
+    python -m benchmarks.bench_order_gateway --orders 500 --latency 0.03
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from src.fake_alpaca import FakeAlpacaServer
+from src.order_gateway import OrderError, OrderGateway
+
+CREDENTIALS = {"key_id": "bench", "secret_key": "bench"}
+
+
+def _ms(seconds):
+    p50, p90, p99 = np.percentile(np.asarray(seconds) * 1e3, [50, 90, 99])
+    return f"{p50:7.1f} {p90:7.1f} {p99:7.1f}"
+
+
+def _placed_once(server, tickets):
+    """Failures if the server does not hold exactly one filled order per ticket."""
+    failures = []
+    placed = {}
+    for order in server.orders.values():
+        placed[order["client_order_id"]] = placed.get(order["client_order_id"], 0) + 1
+    if len(server.orders) != len(tickets):
+        failures.append(f"{len(server.orders)} orders on the server for {len(tickets)} submissions")
+    if any(placed.get(t.client_order_id) != 1 for t in tickets):
+        failures.append("an order is missing or placed twice")
+    if any(t.status != "filled" or t.order["id"] != server.by_client_id[t.client_order_id]["id"] for t in tickets):
+        failures.append("a ticket does not track its order to filled")
+    return failures
+
+
+def correctness(n_orders, latency, workers):
+    print(f"1. faults: {n_orders} orders, {latency * 1e3:.0f} ms latency, 5% HTTP 500, 5% responses lost")
+    failures = []
+    with FakeAlpacaServer(latency=latency, jitter=latency / 2, error_rate=0.05, drop_rate=0.05,
+                          fill_delay=0.05, seed=1) as server:
+        with OrderGateway(base_url=server.url, workers=workers, rate=1000, burst=workers, backoff=0.02,
+                          poll_interval=0.05, **CREDENTIALS) as gateway:
+            tickets = [gateway.submit(f"SYM{i % 50}", 1 + i % 3, "buy") for i in range(n_orders)]
+            for ticket in tickets:
+                ticket.wait(60)
+            failures += _placed_once(server, tickets)
+
+            posts = server.stats[("POST", "/v2/orders", "dropped")]
+            resolved = server.stats[("GET", "/v2/orders:by_client_order_id", 200)]
+            errors = sum(count for (method, route, status), count in server.stats.items() if status == 500)
+            print(f"   {len(server.orders)} orders on the server, all filled; {errors} HTTP 500 and {posts} lost "
+                  f"responses retried, {resolved} resolved by client_order_id lookup instead of re-sending")
+
+            before = server.stats[("POST", "/v2/orders", 403)]
+            rejected = gateway.submit("SYM0", 1e12, "buy")
+            try:
+                rejected.result(10)
+                failures.append("an order above the buying power was accepted")
+            except OrderError as exc:
+                sent = server.stats[("POST", "/v2/orders", 403)] - before
+                print(f"   order above buying power: {rejected.status}, '{exc}', sent {sent}x")
+                if exc.status != 403 or sent != 1:
+                    failures.append("a rejected order was retried or misreported")
+    return failures
+
+
+def rate_limits(n_orders, server_limit):
+    print(f"\n2. rate limits: server allows {server_limit} requests/s")
+    failures = []
+    for label, rate, burst in (("below", server_limit * 0.8, 1), ("above", server_limit * 3, 8)):
+        with FakeAlpacaServer(rate_limit=server_limit, rate_window=1.0, seed=2) as server:
+            # polling off: only order requests count against the limit here
+            with OrderGateway(base_url=server.url, workers=8, rate=rate, burst=burst, backoff=0.05,
+                              poll_interval=3600, **CREDENTIALS) as gateway:
+                start = time.perf_counter()
+                tickets = [gateway.submit("SYM0", 1, "buy") for _ in range(n_orders)]
+                for ticket in tickets:
+                    ticket.result(120)
+                elapsed = time.perf_counter() - start
+            limited = server.stats[("POST", "/v2/orders", 429)]
+            once = len(server.orders) == n_orders and len(server.by_client_id) == n_orders
+            print(f"   gateway {rate:5.0f}/s ({label}): {n_orders} orders in {elapsed:5.2f} s, {limited:3d} x 429, "
+                  f"{'each placed once' if once else 'NOT placed once'}")
+            if not once or (label == "below" and limited):
+                failures.append(f"rate limit {label}: {limited} x 429, {len(server.orders)} orders")
+    return failures
+
+
+def _blocking(server, n_orders):
+    """The old path: one synchronous REST call per order, the caller waits for each."""
+    import requests
+
+    session = requests.Session()
+    session.headers.update({"APCA-API-KEY-ID": "bench", "APCA-API-SECRET-KEY": "bench"})
+    blocked = []
+    start = time.perf_counter()
+    for i in range(n_orders):
+        t = time.perf_counter()
+        response = session.post(server.url + "/v2/orders", json={"symbol": "SYM0", "qty": "1", "side": "buy",
+                                                                  "type": "market", "time_in_force": "gtc"})
+        response.raise_for_status()
+        blocked.append(time.perf_counter() - t)
+    return blocked, time.perf_counter() - start
+
+
+def _gateway_run(server, n_orders, workers, pace=None, stream=False):
+    """Submit n_orders (all at once, or `pace` per second); returns (blocked times, seconds to all acked, tickets)."""
+    with OrderGateway(base_url=server.url, workers=workers, rate=1000, burst=workers,
+                      poll_interval=3600 if stream else 0.05, **CREDENTIALS) as gateway:
+        if stream:
+            server.subscribe(gateway.on_trade_update)
+        blocked, tickets = [], []
+        start = time.perf_counter()
+        for i in range(n_orders):
+            if pace:
+                time.sleep(max(0.0, start + i / pace - time.perf_counter()))
+            t = time.perf_counter()
+            tickets.append(gateway.submit("SYM0", 1, "buy"))
+            blocked.append(time.perf_counter() - t)
+        for ticket in tickets:
+            ticket.result(60)
+        elapsed = time.perf_counter() - start
+        for ticket in tickets:
+            ticket.wait(60)
+    return blocked, elapsed, tickets
+
+
+def compare(n_orders, latency, workers, pace):
+    print(f"\n3. {n_orders} orders, {latency * 1e3:.0f} ms latency (+ jitter), fills after 50 ms")
+    print(f"   {'':<34} {'blocked/order ms':>16}  {'orders/s':>8}   {'ack ms p50/p90/p99':>23}   "
+          f"{'fill ms p50/p90/p99':>23}  connections")
+    options = dict(latency=latency, jitter=latency / 2, fill_delay=0.05, seed=3)
+    with FakeAlpacaServer(**options) as server:
+        blocked, elapsed = _blocking(server, n_orders)
+        print(f"   {'blocking, one by one':<34} {np.mean(blocked) * 1e3:>16.2f}  {n_orders / elapsed:>8.0f}   "
+              f"{_ms(blocked):>23}   {'':>23}  {server.connections:>11}")
+
+    for label, rate, stream in (("gateway, all at once", None, False),
+                                (f"gateway, {pace}/s, polled fills", pace, False),
+                                (f"gateway, {pace}/s, streamed fills", pace, True)):
+        with FakeAlpacaServer(**options) as server:
+            blocked, elapsed, tickets = _gateway_run(server, n_orders, workers, rate, stream)
+        acks = [t.accepted_at - t.submitted_at for t in tickets]
+        fills = [t.finished_at - t.submitted_at for t in tickets]
+        print(f"   {label:<34} {np.mean(blocked) * 1e3:>16.3f}  {n_orders / elapsed:>8.0f}   "
+              f"{_ms(acks):>23}   {_ms(fills):>23}  {server.connections:>11}")
+    print("   all at once: latency includes queueing behind earlier orders; paced: below the gateway's capacity")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.03, help="server latency, seconds")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--pace", type=int, default=50, help="orders per second for the latency runs")
+    parser.add_argument("--server-limit", type=int, default=50, help="server rate limit, requests per second")
+    args = parser.parse_args()
+
+    failures = correctness(args.orders, args.latency, args.workers)
+    failures += rate_limits(min(args.orders, args.server_limit * 4), args.server_limit)
+    compare(args.orders, args.latency, args.workers, args.pace)
+    if failures:
+        print("\nFAILED:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
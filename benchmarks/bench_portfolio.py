@@ -0,0 +1,106 @@
+# benchmarks/bench_portfolio.py
+"""
+Time batched signals + the shared-cash portfolio backtest on a synthetic
+universe, against N separate generate_signals pipelines.
+
+Checks the one-symbol case against simple_backtest on the bundled
+data/AAPL_*_1d.csv files first, then the batched signals against
+add_rsi + generate_signals symbol by symbol, including symbols with missing
+bars (NaN closes in the middle of their history, as BarStore.read_matrix
+gives them).
+
+    python -m benchmarks.bench_portfolio --symbols 500 --days 2520
+"""
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.backtest import simple_backtest
+from src.indicators import add_rsi
+from src.portfolio_backtest import SIZING_RULES, portfolio_backtest
+from src.strategy import generate_signals, generate_signals_matrix
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+
+
+def synthetic_universe(n_days: int, n_symbols: int, seed: int = 0):
+    """Random-walk daily closes (days x symbols); some symbols list late, some miss a few bars."""
+    rng = np.random.default_rng(seed)
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.015, (n_days, n_symbols)), axis=0))
+    listed = rng.integers(0, n_days // 4, n_symbols) * (rng.random(n_symbols) < 0.1)
+    closes[np.arange(n_days)[:, None] < listed[None, :]] = np.nan
+    gapped = rng.random(n_symbols) < 0.05
+    gapped[0] = True
+    closes[(rng.random((n_days, n_symbols)) < 0.005) & gapped[None, :]] = np.nan
+    dates = pd.date_range("2015-01-02", periods=n_days, freq="B", tz="UTC")
+    return dates, closes
+
+
+def check_parity():
+    for path in sorted(DATA_DIR.glob("AAPL_*_1d.csv")):
+        df = pd.read_csv(path)
+        df["Date"] = pd.to_datetime(df["Date"], utc=True)
+        ref_df, ref = simple_backtest(generate_signals(add_rsi(df.copy(), length=14)))
+        closes = df["Close"].to_numpy()[:, None]
+        signals = generate_signals_matrix(closes)
+        out, summary = portfolio_backtest(closes, signals["entry"], signals["exit"], df["Date"], ["AAPL"])
+        # generate_signals drops the warm-up rows, which hold no position
+        assert np.array_equal(out["equity"].to_numpy()[len(df) - len(ref_df):], ref_df["equity"].to_numpy())
+        assert summary["num_trades"] == ref["num_trades"] and summary["final_capital"] == ref["final_capital"]
+        print(f"{path.name}: identical ({ref['num_trades']} trades)")
+
+
+def check_matrix(dates, closes, signals, columns):
+    """generate_signals_matrix == add_rsi + generate_signals on each symbol's own bars."""
+    for col in columns:
+        df = generate_signals(add_rsi(pd.DataFrame({"Date": dates, "Close": closes[:, col]}).dropna(), length=14))
+        rows = df.index.to_numpy()  # positions on the common index
+        for name in ("RSI", "SMA_fast", "SMA_slow"):
+            np.testing.assert_allclose(signals[name][rows, col], df[name].to_numpy(), rtol=1e-9, err_msg=name)
+        for name in ("entry", "exit"):
+            assert np.array_equal(signals[name][rows, col], df[name].to_numpy()), f"symbol {col}: {name}"
+            assert signals[name][:, col].sum() == df[name].sum(), f"symbol {col}: {name} outside its bars"
+    gaps = sum(np.isnan(closes[np.argmax(~np.isnan(closes[:, col])):, col]).any() for col in columns)
+    print(f"batched signals == per-symbol generate_signals on {len(columns)} symbols ({gaps} with missing bars)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--days", type=int, default=2520)
+    parser.add_argument("--per-symbol", type=int, default=50,
+                        help="symbols to time through the per-symbol pandas path (extrapolated)")
+    args = parser.parse_args()
+
+    check_parity()
+    dates, closes = synthetic_universe(args.days, args.symbols)
+
+    start = time.perf_counter()
+    signals = generate_signals_matrix(closes)
+    batched = time.perf_counter() - start
+    missing = np.isnan(closes)
+    gapped = np.flatnonzero(missing.sum(axis=0) > np.argmin(missing, axis=0))
+    check_matrix(dates, closes, signals, sorted(set(range(min(args.per_symbol, args.symbols))) | set(gapped[:20])))
+
+    sample = min(args.per_symbol, args.symbols)
+    start = time.perf_counter()
+    for col in range(sample):
+        generate_signals(add_rsi(pd.DataFrame({"Date": dates, "Close": closes[:, col]}).dropna(), length=14))
+    per_symbol = (time.perf_counter() - start) / sample * args.symbols
+    print(f"signals for {args.symbols} symbols x {args.days} bars: batched {batched:.3f}s, "
+          f"per-symbol ~{per_symbol:.3f}s ({per_symbol / batched:.0f}x)")
+
+    for sizing in SIZING_RULES:
+        start = time.perf_counter()
+        _, summary = portfolio_backtest(closes, signals["entry"], signals["exit"], dates,
+                                        initial_capital=1_000_000, sizing=sizing, qty=10, notional=5_000)
+        elapsed = time.perf_counter() - start
+        print(f"{sizing:>15}: {elapsed:.3f}s, {summary['num_trades']} trades, "
+              f"final {summary['final_capital']:,.0f}, Sharpe {summary['Sharpe_Ratio']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# benchmarks/bench_portfolio_engine.py
+"""
+PortfolioEngine (src.portfolio_engine) on MockBroker and FakeAlpacaREST.
+
+For each --symbols universe size: daily bars for every symbol, one in ten of
+them halted a week before the others stop, seed() over the history, then one
+tick() per remaining bar, with a simulated clock that closes one bar a tick.
+
+1. Parity: every symbol's orders at the MockBroker (bar, side, price) and its
+   final position equal a per-symbol EventEngine warmed up on the same
+   history and then replaying the bars the ticks delivered.
+2. Requests: every tick makes ceil(n / BATCH_SIZE) get_bars requests per
+   group of symbols sharing a last bar (the live ones, the halted ones),
+   whatever the universe size. Also prints the decision latency per tick.
+
+    python -m benchmarks.bench_portfolio_engine --symbols 50 500 1000 --ticks 20
+"""
+import argparse
+import asyncio
+import logging
+import math
+
+import numpy as np
+import pandas as pd
+
+from src.broker_mock import MockBroker
+from src.event_engine import EventEngine, SignalStrategy, replay_bars
+from src.fake_alpaca import FakeAlpacaREST, session_timestamps
+from src.portfolio_engine import BATCH_SIZE, AlpacaBarSource, PortfolioEngine
+from src.strategy import StreamingSignals
+
+PARAMS = dict(fast_sma=5, slow_sma=20, rsi_threshold=70)
+QTY = 10
+HALTED_EVERY = 10
+HALTED_BARS = 5  # bars a halted symbol misses before the live session starts
+
+
+class _NullLogger:
+    def log_trade(self, *args, **kwargs):
+        pass
+
+
+def universe(n_symbols, days, seed=0):
+    """{symbol: FakeAlpacaREST frame} of daily bars up to yesterday; halted symbols stop early."""
+    end = pd.Timestamp.now(tz="UTC").normalize() - pd.Timedelta(days=1)
+    index = session_timestamps(end - pd.Timedelta(days=days), end, "1Day").rename("timestamp")
+    rng = np.random.default_rng(seed)
+    frames = {}
+    for i in range(n_symbols):
+        close = np.round(100 * np.exp(np.cumsum(rng.normal(0, 0.02, len(index)))), 2)
+        frame = pd.DataFrame({"open": close, "high": close, "low": close, "close": close,
+                              "volume": np.full(len(index), 1e5)}, index=index)
+        frames[f"SYM{i:04d}"] = frame
+    return index, frames
+
+
+def halted(symbol) -> bool:
+    return int(symbol[3:]) % HALTED_EVERY == 0
+
+
+def _frame(bars: pd.DataFrame) -> pd.DataFrame:
+    return pd.DataFrame({"Date": bars.index, "Open": bars["open"].to_numpy(), "High": bars["high"].to_numpy(),
+                         "Low": bars["low"].to_numpy(), "Close": bars["close"].to_numpy(),
+                         "Volume": bars["volume"].to_numpy()})
+
+
+def reference(frame, first_live_ts) -> tuple:
+    """(fills as (bar ts, side, price), final position) of one symbol through EventEngine."""
+    engine = EventEngine(SignalStrategy(StreamingSignals(**PARAMS), qty=QTY))
+    bars = _frame(frame)
+    history = bars[bars["Date"] < first_live_ts]
+    engine.warmup(replay_bars(history))
+    engine.replay(bars[bars["Date"] >= first_live_ts])
+    return [(order.ts, order.side, order.price) for order in engine.fills], engine.position
+
+
+async def measure(n_symbols, ticks, days):
+    index, frames = universe(n_symbols, days)
+    for symbol, frame in frames.items():
+        if halted(symbol):
+            frames[symbol] = frame.iloc[:-(ticks + HALTED_BARS)]
+    api = FakeAlpacaREST(frames)
+    source = AlpacaBarSource(api, timeframe="1Day")
+    bar_ns = int(pd.Timedelta(days=1).value)
+    stamps = index.asi8
+    clock = {"closed": int(stamps[-ticks - 1])}  # the newest closed bar
+    broker = MockBroker(cash=1e12)
+    engine = PortfolioEngine(broker, list(frames), qty=QTY, bar_source=source, strategy_kwargs=PARAMS,
+                             logger=_NullLogger(), clock=lambda: clock["closed"] + bar_ns)
+    await engine.seed(lookback_days=days + 7)
+
+    n_halted = sum(halted(symbol) for symbol in frames)
+    per_tick = math.ceil((n_symbols - n_halted) / BATCH_SIZE) + math.ceil(n_halted / BATCH_SIZE)
+    orders, seen = {symbol: [] for symbol in frames}, 0
+    for ts in stamps[-ticks:].tolist():
+        clock["closed"] = ts
+        before = source.request_count
+        await engine.tick()
+        requests = source.request_count - before
+        assert requests == per_tick, f"{n_symbols} symbols: {requests} get_bars requests in a tick, not {per_tick}"
+        history = broker.history()
+        for row in history.iloc[seen:].itertuples():
+            orders[row.symbol].append((ts, row.side, row.avg_price))
+        seen = len(history)
+
+    first_live_ts = index[-ticks]
+    positions = broker.get_positions()
+    n_orders = 0
+    for symbol, frame in frames.items():
+        fills, position = reference(frame, first_live_ts)
+        assert orders[symbol] == fills, f"{symbol}: orders {orders[symbol]} != replay {fills}"
+        assert positions.get(symbol, 0) == position, f"{symbol}: holds {positions.get(symbol, 0)}, replay {position}"
+        assert engine.states[symbol].in_position == (position > 0), symbol
+        n_orders += len(fills)
+    latency_ms = np.mean(engine.tick_latencies) * 1e3
+    print(f"{n_symbols:>6} symbols ({n_halted} halted): {n_orders:>5} orders == per-symbol replay, "
+          f"{per_tick} get_bars requests/tick, {latency_ms:8.1f} ms/tick")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--symbols", type=int, nargs="+", default=[50, 500, 1000])
+    parser.add_argument("--ticks", type=int, default=20)
+    parser.add_argument("--days", type=int, default=200, help="calendar days of daily bars per symbol")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    for n_symbols in args.symbols:
+        asyncio.run(measure(n_symbols, args.ticks, args.days))
+
+
+if __name__ == "__main__":
+    main()
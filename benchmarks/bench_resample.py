@@ -0,0 +1,140 @@
+# benchmarks/bench_resample.py
+"""
+Resampling minute bars into higher timeframes (src.resample).
+
+1. Correctness: a year of synthetic minute bars with extended hours (DST
+   changes included), resampled to 5Min/15Min/1Hour/1Day/1Week, all hours and
+   regular session only, must equal a pandas groupby on New York time (regular-session intraday
+   bars anchored at the 09:30 open).
+2. Timing per timeframe: a full resample (all hours, regular session), a
+   Resampler cache hit, and the extension after 1 and 390 appended minutes
+   (store write excluded).
+3. Network: DataService serves every timeframe of a range whose minute bars
+   are stored without another get_bars request (FakeAlpacaBroker).
+
+    python -m benchmarks.bench_resample --days 365
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.bar_store import COLUMNS, BarStore
+from src.data_fetcher_alpaca import fetch_bars_incremental
+from src.data_service import DataService
+from src.fake_alpaca import FakeAlpacaBroker, synthetic_bars
+from src.resample import MARKET_TZ, Resampler, resample_arrays
+
+TIMEFRAMES = ["5Min", "15Min", "1Hour", "1Day", "1Week"]
+
+
+def extended_minutes(days, symbol="SYN"):
+    """Weekday minutes 04:00-20:00 New York time (pre-market to after-hours)."""
+    index = pd.date_range(pd.Timestamp("2023-01-02", tz=MARKET_TZ), periods=days * 1440, freq="min")
+    index = index[(index.dayofweek < 5) & (index.hour >= 4) & (index.hour < 20)].tz_convert("UTC")
+    df = synthetic_bars([symbol], index).drop(columns="symbol").rename(columns=str.capitalize)
+    return df.rename_axis("Date").reset_index()
+
+
+def reference(df, timeframe, session):
+    """pandas groupby on New York time."""
+    local = df["Date"].dt.tz_convert(MARKET_TZ)
+    if session == "regular":
+        minutes = local.dt.hour * 60 + local.dt.minute
+        df, local = df[(minutes >= 570) & (minutes < 960)], local[(minutes >= 570) & (minutes < 960)]
+    if timeframe == "1Day":
+        keys = local.dt.normalize()
+    elif timeframe == "1Week":
+        keys = (local.dt.normalize() - pd.to_timedelta(local.dt.dayofweek, unit="D"))
+    else:
+        step = pd.Timedelta(timeframe.replace("Min", "min").replace("Hour", "h"))
+        # regular-session bars start at the 09:30 open
+        origin = pd.Timedelta(minutes=570) if session == "regular" else pd.Timedelta(0)
+        keys = df["Date"] - (local - local.dt.normalize() - origin) % step
+    out = df.groupby(keys.dt.tz_convert("UTC")).agg(Open=("Open", "first"), High=("High", "max"),
+                                                    Low=("Low", "min"), Close=("Close", "last"),
+                                                    Volume=("Volume", "sum"))
+    return out.index.asi8, out
+
+
+def check(df):
+    arrays = {"ts": df["Date"].values.view(np.int64), **{name: df[name].to_numpy() for name in COLUMNS}}
+    for session in (None, "regular"):
+        for timeframe in TIMEFRAMES:
+            got = resample_arrays(arrays, timeframe, session)
+            ts, expected = reference(df, timeframe, session)
+            assert np.array_equal(got["ts"], ts), (timeframe, session)
+            for name in COLUMNS:
+                assert np.array_equal(got[name], expected[name].to_numpy()), (timeframe, session, name)
+        print(f"{session or 'all hours':<10} {', '.join(TIMEFRAMES)} == pandas groupby on New York time")
+
+
+def _best(fn, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def timings(df):
+    arrays = {"ts": df["Date"].values.view(np.int64), **{name: df[name].to_numpy() for name in COLUMNS}}
+    print(f"\n{len(df):,} minute bars (ms)   full   regular   cache hit   +1 min   +390 min")
+    with tempfile.TemporaryDirectory() as root:
+        store = BarStore(root)
+        store.write("SYN", "1Min", df)
+        for timeframe in TIMEFRAMES:
+            full = _best(lambda: resample_arrays(arrays, timeframe))
+            regular = _best(lambda: resample_arrays(arrays, timeframe, "regular"))
+            resampler = Resampler(store)
+            resampler.arrays("SYN", timeframe)
+            hit = _best(lambda: resampler.arrays("SYN", timeframe))
+
+            def extend(k):
+                with tempfile.TemporaryDirectory() as scratch:
+                    growing = BarStore(scratch)
+                    growing.write("SYN", "1Min", df.iloc[:len(df) - k])
+                    fresh = Resampler(growing)
+                    fresh.arrays("SYN", timeframe)
+                    growing.write("SYN", "1Min", df.iloc[len(df) - k:])
+                    start = time.perf_counter()
+                    fresh.arrays("SYN", timeframe)
+                    elapsed = time.perf_counter() - start
+                assert fresh.stats["extend"] == 1
+                return elapsed
+
+            print(f"{timeframe:<22} {full * 1e3:7.2f} {regular * 1e3:9.2f} {hit * 1e3:11.3f} "
+                  f"{min(extend(1) for _ in range(3)) * 1e3:8.2f} {min(extend(390) for _ in range(3)) * 1e3:10.2f}")
+
+
+def network(days=30):
+    broker = FakeAlpacaBroker()
+    with tempfile.TemporaryDirectory() as root:
+        store = BarStore(root)
+        end = pd.Timestamp.now(tz="UTC").normalize() - pd.Timedelta(days=1)
+        start = end - pd.Timedelta(days=days)
+        fetch_bars_incremental(broker.api, "SYN", start, end, "1Min", store=store)
+        fetched = broker.api.request_count
+        service = DataService(broker, store=store)
+        sizes = {timeframe: len(service.bars("SYN", start, end, timeframe)) for timeframe in TIMEFRAMES}
+        print(f"\n{days} days of 1Min bars in {fetched} get_bars requests; then {sizes} bars "
+              f"with {broker.api.request_count - fetched} more requests")
+        assert broker.api.request_count == fetched
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+
+    df = extended_minutes(args.days)
+    check(df)
+    timings(df)
+    network()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# benchmarks/bench_robustness.py
+"""
+Throughput of walk-forward folds and Monte Carlo resamples on the bundled 5y
+daily file, for an increasing number of worker processes.
+
+    python -m benchmarks.bench_robustness --workers 1 4 --sims 100000
+"""
+import argparse
+import os
+from pathlib import Path
+
+import pandas as pd
+
+from src.backtest import simple_backtest
+from src.indicators import add_rsi
+from src.robustness import monte_carlo_returns, monte_carlo_trades, walk_forward
+from src.strategy import generate_signals
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+
+GRID = dict(fast_sma=range(5, 30, 5), slow_sma=range(20, 120, 10), rsi_threshold=range(50, 90, 10))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, os.cpu_count() or 1}))
+    parser.add_argument("--sims", type=int, default=50_000)
+    args = parser.parse_args()
+
+    df = pd.read_csv(DATA_DIR / "AAPL_5y_1d.csv")
+    df["Date"] = pd.to_datetime(df["Date"], utc=True)
+    bt_df, summary = simple_backtest(generate_signals(add_rsi(df.copy(), length=14)))
+    pnls = [t["pnl"] for t in summary["trades"] if t["type"] == "SELL"]
+
+    print(f"{'run':<34} {'workers':>7} {'seconds':>8} {'per sec':>10}")
+    for workers in args.workers:
+        # one-week step -> one fold per week of the file after the first year
+        report = walk_forward(df, **GRID, train_bars=252, test_bars=21, step=5, max_workers=workers)
+        print(f"{f'walk-forward {len(report)} folds':<34} {workers:>7} {report.attrs['elapsed']:>8.2f} "
+              f"{report.attrs['folds_per_sec']:>10,.0f}")
+        for name, fn, sample in (("bootstrap trade P&L", monte_carlo_trades, pnls),
+                                 ("block-resampled returns", monte_carlo_returns, bt_df["equity"])):
+            sims = fn(sample, n_sims=args.sims, seed=0, max_workers=workers)
+            print(f"{f'{name} {args.sims}':<34} {workers:>7} {sims.attrs['elapsed']:>8.2f} "
+                  f"{sims.attrs['sims_per_sec']:>10,.0f}")
+
+
+if __name__ == "__main__":
+    main()
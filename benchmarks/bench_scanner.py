@@ -0,0 +1,211 @@
+# benchmarks/bench_scanner.py
+"""
+Market scanner (src.scanner) on a synthetic daily universe.
+
+A temporary bar store is filled with --symbols random-walk symbols of up to
+--bars daily bars (some listed later, so shorter, with occasional volume
+spikes), then:
+
+1. Golden check: for --check symbols, the scanner's row must equal add_rsi +
+   generate_signals (and a pandas rolling volume mean) over the symbol's full
+   history, to 1e-9 relative, with identical flags.
+2. Timings, best of --repeat: loading the universe from the store, serving
+   sorted tables (typical scans), one new bar for every symbol
+   (update + scan), and picking up bars written to the store (refresh +
+   scan), against a full recompute with generate_signals_matrix and against
+   add_rsi + generate_signals symbol by symbol (timed on 200 symbols and
+   scaled).
+3. Incremental == reload: after --new-bars more bars per symbol go through
+   the store and refresh(), the table must equal a scanner loaded from
+   scratch.
+
+Exits with status 1 when a check fails or a warm path (scan, update + scan,
+refresh + scan) exceeds --budget seconds.
+
+    python -m benchmarks.bench_scanner --symbols 5000 --bars 750 --budget 1
+"""
+import argparse
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.bar_store import BarStore
+from src.indicators import add_rsi
+from src.scanner import Scanner
+from src.strategy import generate_signals, generate_signals_matrix
+
+PARAMS = dict(fast_sma=10, slow_sma=50, rsi_threshold=60, rsi_length=14, volume_window=20)
+SCANS = [("oversold", "RSI", True), ("golden_cross", "(SMA_fast - SMA_slow) / Close", False),
+         (["long", "volume_spike"], "volume_ratio", False), (None, "change_pct", False)]
+RTOL = 1e-9
+
+
+def universe(n_symbols, n_bars, seed=0):
+    """{symbol: DataFrame} of daily bars ending on the same day, 20% of them listed later."""
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end="2024-12-31", periods=n_bars, tz="UTC")
+    lengths = np.where(rng.random(n_symbols) < 0.2, rng.integers(1, n_bars, n_symbols), n_bars)
+    closes = 50 * np.exp(np.cumsum(rng.normal(0, 0.02, (n_bars, n_symbols)), axis=0))
+    volumes = rng.lognormal(10, 0.3, (n_bars, n_symbols)) * np.where(rng.random((n_bars, n_symbols)) < 0.02, 4, 1)
+    frames = {}
+    for j in range(n_symbols):
+        close = closes[n_bars - lengths[j]:, j]
+        frames[f"S{j:05d}"] = pd.DataFrame({"Date": dates[n_bars - lengths[j]:], "Open": close, "High": close * 1.01,
+                                            "Low": close * 0.99, "Close": close,
+                                            "Volume": volumes[n_bars - lengths[j]:, j]})
+    return frames
+
+
+def next_bars(scanner, seed):
+    """One more bar per symbol after its last one: (closes, volumes, ts) aligned with scanner.symbols."""
+    rng = np.random.default_rng(seed)
+    closes = scanner.close * np.exp(rng.normal(0, 0.02, len(scanner.symbols)))
+    volumes = rng.lognormal(10, 0.3, len(scanner.symbols))
+    ts = (pd.DatetimeIndex(pd.to_datetime(scanner.ts, utc=True)) + pd.offsets.BDay()).asi8
+    return closes, volumes, ts
+
+
+def _best(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def _same(got: pd.DataFrame, expected: pd.DataFrame) -> bool:
+    """Equal tables: floats to RTOL (NaN in the same places), everything else exactly."""
+    for column in got.columns:
+        a, b = got[column].to_numpy(), expected[column].to_numpy()
+        if a.dtype.kind == "f":
+            if not np.array_equal(np.isnan(a), np.isnan(b)):
+                return False
+            valid = ~np.isnan(a) & np.isfinite(b)
+            if np.any(np.abs(a[valid] - b[valid]) > RTOL * np.abs(b[valid])):
+                return False
+        elif not np.array_equal(a, b):
+            return False
+    return True
+
+
+def golden(store, scanner, n_check):
+    table = scanner.table()
+    worst = 0.0
+    for symbol in scanner.symbols[:: max(1, len(scanner.symbols) // n_check)][:n_check]:
+        bars = store.read(symbol, "1Day")
+        expected = generate_signals(add_rsi(bars), PARAMS["fast_sma"], PARAMS["slow_sma"], PARAMS["rsi_threshold"])
+        row = table.loc[symbol]
+        last = expected.iloc[-1] if len(expected) else pd.Series({"RSI": np.nan, "SMA_fast": np.nan, "SMA_slow": np.nan,
+                                                                   "signal": 0, "entry": False, "exit": False})
+        window = bars["Volume"].shift(1).rolling(PARAMS["volume_window"]).mean()
+        pairs = [("RSI", row["RSI"] if len(expected) else np.nan, last["RSI"]),
+                 ("SMA_fast", row["SMA_fast"], last["SMA_fast"]), ("SMA_slow", row["SMA_slow"], last["SMA_slow"]),
+                 ("volume_ratio", row["volume_ratio"], (bars["Volume"] / window).iloc[-1])]
+        for name, got, want in pairs:
+            assert np.isnan(got) == np.isnan(want), f"{symbol} {name}: {got} vs {want}"
+            if not np.isnan(want):
+                worst = max(worst, abs(got - want) / abs(want))
+        flags = [(row[c], bool(last[c])) for c in ("entry", "exit")] + [(row["signal"], int(last["signal"]))]
+        assert all(got == want for got, want in flags), f"{symbol}: flags {flags}"
+    assert worst <= RTOL, f"relative error {worst:.1e} > {RTOL:.0e}"
+    print(f"1. {n_check} symbols: scanner rows == add_rsi + generate_signals over full history "
+          f"(max rel. error {worst:.0e}), flags identical")
+
+
+def timings(store, scanner, symbols, repeat, budget):
+    failures = []
+    n = len(symbols)
+    print(f"\n2. {n} symbols{'':<50} seconds")
+
+    def report(label, seconds, budgeted=False):
+        over = budgeted and seconds > budget
+        print(f"   {label:<60} {seconds:8.4f}" + (f"   > budget {budget:g} s" if over else ""))
+        if over:
+            failures.append(f"{label}: {seconds:.3f} s > budget {budget:g} s")
+
+    report("load from store (Scanner.from_store)", _best(lambda: Scanner.from_store(symbols, store=store, **PARAMS),
+                                                        repeat))
+    report("table() of every symbol", _best(scanner.table, repeat))
+    for where, sort, ascending in SCANS:
+        seconds = _best(lambda: scanner.scan(where, sort=sort, ascending=ascending, top=50), repeat)
+        rows = len(scanner.scan(where))
+        name = where if isinstance(where, str) else " & ".join(where or ["all"])
+        report(f"scan {name} by {sort} ({rows} rows)", seconds, True)
+
+    closes, volumes, ts = next_bars(scanner, seed=1)
+    copies = [Scanner.from_store(symbols, store=store, **PARAMS) for _ in range(repeat)]
+
+    def update_and_scan(fresh):
+        fresh.update(closes, volumes, ts)
+        return fresh.scan("oversold", sort="RSI", ascending=True)
+
+    report("new bar for every symbol: update + scan", _best(lambda: update_and_scan(copies.pop()), repeat), True)
+    report("full recompute: read_matrix + generate_signals_matrix",
+           _best(lambda: generate_signals_matrix(store.read_matrix(symbols, "1Day")[1], PARAMS["fast_sma"],
+                                                 PARAMS["slow_sma"], PARAMS["rsi_threshold"]), 1))
+    sample = symbols[:200]
+    per_symbol = _best(lambda: [generate_signals(add_rsi(store.read(s, "1Day")), PARAMS["fast_sma"],
+                                                 PARAMS["slow_sma"], PARAMS["rsi_threshold"]) for s in sample], 1)
+    report(f"per symbol: add_rsi + generate_signals (x{n / len(sample):g})", per_symbol * n / len(sample))
+    return failures
+
+
+def incremental(store, scanner, symbols, n_new, budget):
+    """Write n_new bars per symbol to the store, refresh, and compare with a fresh load."""
+    failures = []
+    refresh = 0.0
+    for k in range(n_new):
+        closes, volumes, ts = next_bars(scanner, seed=100 + k)
+        for j, symbol in enumerate(symbols):
+            store.write(symbol, "1Day", pd.DataFrame({"Open": closes[j], "High": closes[j], "Low": closes[j],
+                                                      "Close": closes[j], "Volume": volumes[j]},
+                                                     index=pd.DatetimeIndex([ts[j]], tz="UTC")))
+        start = time.perf_counter()
+        scanner.refresh()
+        scanner.scan("oversold", sort="RSI", ascending=True)
+        refresh = max(refresh, time.perf_counter() - start)
+    fresh = Scanner.from_store(symbols, store=store, **PARAMS)
+    same = _same(scanner.table().drop(columns="bars"), fresh.table().drop(columns="bars"))
+    print(f"\n3. {n_new} new bars per symbol through the store: refresh + scan {refresh:.4f} s (slowest); "
+          f"table {'==' if same else '!='} a fresh load")
+    if not same:
+        failures.append("incremental table differs from a fresh load")
+    if refresh > budget:
+        failures.append(f"refresh + scan: {refresh:.3f} s > budget {budget:g} s")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--symbols", type=int, default=5000)
+    parser.add_argument("--bars", type=int, default=750, help="daily bars per symbol (at most)")
+    parser.add_argument("--check", type=int, default=50, help="symbols in the golden check")
+    parser.add_argument("--new-bars", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--budget", type=float, default=1.0, help="seconds allowed for each warm path")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        store = BarStore(root)
+        start = time.perf_counter()
+        for symbol, frame in universe(args.symbols, args.bars).items():
+            store.write(symbol, "1Day", frame)
+        print(f"synthetic universe: {args.symbols} symbols x up to {args.bars} daily bars, "
+              f"written to the store in {time.perf_counter() - start:.1f} s\n")
+        scanner = Scanner.from_store(store=store, **PARAMS)
+        symbols = scanner.symbols
+
+        golden(store, scanner, args.check)
+        failures = timings(store, scanner, symbols, args.repeat, args.budget)
+        failures += incremental(store, scanner, symbols, args.new_bars, args.budget)
+    if failures:
+        print("\nFAILED:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# benchmarks/bench_startup.py
+"""
+Cold start: import cost of the core modules and of the CLI, with a budget.
+
+Every measurement is a fresh interpreter (best of --repeat runs), so nothing
+is cached in sys.modules:
+
+1. Side effects: importing the core modules (backtest, indicators, strategy,
+   utils, optimizer, data fetchers, config, paper trading engine, cli) must
+   not load any of the heavy optional packages (plotly, matplotlib,
+   pandas_ta, numba, the Alpaca SDK, yfinance, python-dotenv, requests), must not
+   create directories and must not read .env.
+2. What deferring saves: the import time each heavy package adds on top of
+   pandas, i.e. what the modules used to pay at import.
+3. Wall time of `python -m src backtest --help`, and of a backtest on cached
+   bars (data/AAPL_5y_1d.csv), against the budget.
+
+Exits with status 1 when a check fails or a budget is exceeded, so it can
+gate CI like benchmarks.suite --compare.
+
+    python -m benchmarks.bench_startup --help-budget 0.5 --backtest-budget 3
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+CORE_MODULES = ["src.backtest", "src.indicators", "src.strategy", "src.utils", "src.optimizer", "src.data_fetcher",
+                "src.data_fetcher_alpaca", "src.data_service", "src.config", "src.broker_alpaca",
+                "src.order_gateway", "src.engine_state", "src.paper_trading_engine", "src.scanner",
+                "src.cli"]
+HEAVY = {"plotly": "plotly.graph_objects", "matplotlib": "matplotlib.pyplot", "pandas_ta": "pandas_ta",
+         "numba": "numba", "alpaca_trade_api": "alpaca_trade_api.rest", "yfinance": "yfinance", "dotenv": "dotenv",
+         "requests": "requests"}
+CACHED_CSV = ROOT / "data" / "AAPL_5y_1d.csv"
+
+PROBE = """
+import json, os, sys
+created, mkdir = [], os.mkdir
+os.mkdir = lambda path, *args, **kwargs: (created.append(str(path)), mkdir(path, *args, **kwargs))[1]
+for name in {modules!r}:
+    __import__(name)
+print(json.dumps({{"loaded": sorted(m for m in {heavy!r} if m in sys.modules),
+                  "created": created,
+                  "env_loaded": "src.config" in sys.modules and sys.modules["src.config"]._loaded}}))
+"""
+
+
+def _run(args, repeat=1):
+    """(best wall time in seconds, stdout of the last run) of `python args` in a fresh interpreter."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        done = subprocess.run([sys.executable, *args], cwd=ROOT, capture_output=True, text=True)
+        best = min(best, time.perf_counter() - start)
+        if done.returncode:
+            raise RuntimeError(f"python {' '.join(args)} failed:\n{done.stderr}")
+    return best, done.stdout
+
+
+def check_side_effects():
+    _, out = _run(["-c", PROBE.format(modules=CORE_MODULES, heavy=sorted(HEAVY))])
+    result = json.loads(out)
+    print(f"import {', '.join(m.split('.')[1] for m in CORE_MODULES)}:")
+    print(f"  heavy packages loaded: {result['loaded'] or 'none'}; created: {result['created'] or 'nothing'}; "
+          f".env read: {result['env_loaded']}")
+    return not result["loaded"] and not result["created"] and not result["env_loaded"]
+
+
+def deferred_costs(repeat):
+    """Import time each installed heavy package adds after pandas."""
+    base, _ = _run(["-c", "import pandas"], repeat)
+    print(f"\n{'deferred package':<28} {'import s (after pandas)':>24}")
+    for name, module in HEAVY.items():
+        try:
+            elapsed, _ = _run(["-c", f"import pandas, {module}"], repeat)
+        except RuntimeError:
+            print(f"{module:<28} {'not installed':>24}")
+            continue
+        print(f"{module:<28} {elapsed - base:>24.3f}")
+
+
+def cold_starts(repeat):
+    runs = {"backtest --help": ["-m", "src", "backtest", "--help"],
+            "backtest (cached bars)": ["-m", "src", "backtest", "--csv", str(CACHED_CSV)]}
+    interpreter, _ = _run(["-c", "pass"], repeat)
+    print(f"\n{'cold start':<28} {'wall s':>8}   (bare interpreter {interpreter:.3f} s)")
+    times = {}
+    for name, args in runs.items():
+        times[name], _ = _run(args, repeat)
+        print(f"{name:<28} {times[name]:>8.3f}")
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--help-budget", type=float, default=0.5, help="seconds for `backtest --help`")
+    parser.add_argument("--backtest-budget", type=float, default=3.0, help="seconds for a cached-data backtest")
+    args = parser.parse_args()
+
+    clean = check_side_effects()
+    deferred_costs(args.repeat)
+    times = cold_starts(args.repeat)
+
+    failures = [] if clean else ["importing core modules loads heavy packages or has side effects"]
+    for name, budget in (("backtest --help", args.help_budget), ("backtest (cached bars)", args.backtest_budget)):
+        if times[name] > budget:
+            failures.append(f"{name}: {times[name]:.3f} s > budget {budget:.3f} s")
+    if failures:
+        print("\nFAILED:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print("\nall startup checks within budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# benchmarks/bench_streaming.py
+"""
+Websocket ingestion (StreamingBarFeed on a local ReplayServer): parity and
+latency against REST polling. Needs alpaca-trade-api (websockets, msgpack).
+
+1. Parity: data/AAPL_5y_1d.csv replayed as trades and as bars must come out
+   of StreamingBarFeed as the stored bars, and EventEngine must make the same
+   trades on them as on replay_bars.
+2. Synthetic minute bars: throughput flat out, and latency paced at one trade
+   per millisecond, from the server sending the closing trade to the bar in
+   hand and to the strategy's decision.
+3. Against polling: REST requests per session and the wait from a bar's end
+   to its decision for poll intervals of 10 and 60 seconds.
+
+    python -m benchmarks.bench_streaming --bars 20000
+"""
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.event_engine import EventEngine, SignalStrategy, replay_bars
+from src.market_stream import StreamingBarFeed
+from src.replay_server import ReplayServer, load_bars
+from src.strategy import StreamingSignals
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+PARAMS = dict(fast_sma=20, slow_sma=50, rsi_threshold=70)
+SESSION_SECONDS = 6.5 * 3600
+POLL_INTERVALS = (10, 60)
+
+
+def until(feed, last_ts):
+    """Bars from feed up to and including the one starting at last_ts."""
+    for bar in feed:
+        yield bar
+        if bar.ts >= last_ts:
+            return
+
+
+def check_parity():
+    df = load_bars(DATA_DIR / "AAPL_5y_1d.csv")
+    expected = [(b.ts, b.open, b.high, b.low, b.close, b.volume) for b in replay_bars(df)]
+    replay = EventEngine(SignalStrategy(StreamingSignals(**PARAMS)))
+    replay.run(replay_bars(df))
+    for source in ("trades", "bars"):
+        server = ReplayServer({"AAPL": df}).start()
+        try:
+            feed = StreamingBarFeed(server.stream(), "AAPL", "1Day", source=source, clock=None,
+                                    source_timeframe="1Day")
+            bars = list(until(feed, expected[-1][0]))
+        finally:
+            server.stop()
+        assert [(b.ts, b.open, b.high, b.low, b.close, b.volume) for b in bars] == expected, source
+        live = EventEngine(SignalStrategy(StreamingSignals(**PARAMS)))
+        live.run(bars)
+        assert [o.as_tuple() for o in live.fills] == [o.as_tuple() for o in replay.fills], source
+        print(f"AAPL 5y daily from {source:<6}: {len(bars)} bars == stored, {len(live.fills)} fills == replay")
+
+
+def synthetic_minutes(n_bars, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 5e-4, n_bars)))
+    open_ = np.concatenate(([100.0], close[:-1]))
+    return pd.DataFrame({"Date": pd.date_range("2024-01-02 14:30", periods=n_bars, freq="min", tz="UTC"),
+                         "Open": open_, "High": np.maximum(open_, close) * 1.0005,
+                         "Low": np.minimum(open_, close) * 0.9995, "Close": close,
+                         "Volume": rng.integers(100, 10_000, n_bars).astype(np.float64)})
+
+
+def measure_latency(df, speed=None):
+    """Per closed bar: (send -> bar in hand, send -> decision) in seconds, plus the wall time."""
+    server = ReplayServer({"SYN": df}, speed=speed, stamp=True).start()
+    engine = EventEngine(SignalStrategy(StreamingSignals(**PARAMS)))
+    in_hand, decided = [], []
+    started = time.perf_counter()
+    try:
+        feed = StreamingBarFeed(server.stream(), "SYN", "1Min", clock=None)
+        for bar in until(feed, int(df["Date"].iloc[-1].value)):
+            got = time.perf_counter_ns()
+            engine.on_bar(bar)
+            sent = feed.closing_message["rt"]
+            in_hand.append(got - sent)
+            decided.append(time.perf_counter_ns() - sent)
+    finally:
+        server.stop()
+    assert len(in_hand) == len(df)
+    return np.array(in_hand) / 1e9, np.array(decided) / 1e9, time.perf_counter() - started
+
+
+def report_latency(n_bars, paced_bars):
+    df = synthetic_minutes(n_bars)
+    # flat out the server outruns the client, so messages queue up: only throughput is meaningful
+    _, _, wall = measure_latency(df)
+    print(f"\nflat out: {n_bars} minute bars ({4 * n_bars} trades) in {wall:.2f} s, {n_bars / wall:,.0f} bars/s")
+    in_hand, decided, wall = measure_latency(df.iloc[:paced_bars], speed=15_000)
+    print(f"paced, one trade per ms ({paced_bars} bars)   p50     p90     p99     max (us)")
+    for stage, values in (("send -> bar in hand", in_hand), ("send -> decision", decided)):
+        p50, p90, p99 = np.percentile(values, [50, 90, 99]) * 1e6
+        print(f"  {stage:<38} {p50:7.0f} {p90:7.0f} {p99:7.0f} {values.max() * 1e6:7.0f}")
+    return decided
+
+
+def report_polling(decided):
+    """Polling finds a bar on the first poll after it ends: on average half an interval late."""
+    print(f"\n1Min bars, one session        REST requests   bar closed -> decision (mean / worst)")
+    for interval in POLL_INTERVALS:
+        print(f"REST poll every {interval:>2} s        {SESSION_SECONDS / interval:>13.0f}   "
+              f"{interval / 2:>8.1f} s / {interval:.0f} s  + a REST round trip")
+    print(f"websocket stream             {'1-2':>13}   {decided.mean() * 1e3:>8.3f} ms / "
+          f"{decided.max() * 1e3:.1f} ms  (REST: history, backfill of the first bar)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bars", type=int, default=20_000)
+    parser.add_argument("--paced-bars", type=int, default=2_000)
+    args = parser.parse_args()
+
+    check_parity()
+    decided = report_latency(args.bars, args.paced_bars)
+    report_polling(decided)
+
+
+if __name__ == "__main__":
+    main()
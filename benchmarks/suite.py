@@ -0,0 +1,316 @@
+# benchmarks/suite.py
+"""
+Benchmark suite for the indicator, signal, backtest, logging and plotting hot
+paths, with saved results and regression checks against a baseline.
+
+Every stage runs on synthetic OHLCV (1k, 100k and 10M bars by default) and on
+the bundled data/AAPL_5y_1d.csv. For each stage and dataset it records:
+
+    seconds   best wall time of several untraced runs (and ns per item:
+              per bar, or per fill for the log stages)
+    peak_mb   peak traced memory above the start of the stage (tracemalloc)
+    blocks    memory blocks allocated by the stage and still alive after it,
+              including its result (tracemalloc snapshot diff)
+
+Results are written to benchmarks/results/<name>.json. --compare loads a
+previous run and exits with status 1 if any stage got slower, or used more
+peak memory, by more than --threshold. Everything runs offline; a stage whose
+dependency is not installed is reported as skipped.
+
+    python -m benchmarks.suite --save baseline
+    python -m benchmarks.suite --sizes 1k 100k aapl --compare baseline --threshold 0.2
+    python -m benchmarks.suite --stages generate_signals simple_backtest --sizes 10m
+"""
+import argparse
+import gc
+import json
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+DATA_DIR = ROOT / "data"
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+SIZES = {"1k": 1_000, "100k": 100_000, "10m": 10_000_000}
+PARAMS = dict(fast_sma=20, slow_sma=50, rsi_threshold=70)
+MIN_SECONDS = 0.2  # keep repeating a stage until this much time was measured...
+MAX_REPEAT = 50    # ...or this many runs
+NOISE_SECONDS = 1e-3  # time regressions smaller than this are ignored
+MAX_FILLS = 100_000   # fills logged per log_trade run
+
+
+def synthetic_ohlcv(n_bars: int, seed: int = 0) -> pd.DataFrame:
+    """Random-walk minute bars in the normalized schema (Date, Open, High, Low, Close, Volume)."""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 5e-4, n_bars)))
+    spread = np.abs(rng.normal(0, 5e-4, n_bars)) * close
+    return pd.DataFrame({
+        "Date": pd.date_range("2020-01-01 09:30", periods=n_bars, freq="min", tz="UTC"),
+        "Open": np.concatenate([close[:1], close[:-1]]),
+        "High": close + spread,
+        "Low": close - spread,
+        "Close": close,
+        "Volume": rng.integers(100, 10_000, n_bars).astype(np.float64),
+    })
+
+
+def load_dataset(name: str) -> pd.DataFrame:
+    if name == "aapl":
+        df = pd.read_csv(DATA_DIR / "AAPL_5y_1d.csv")
+        df["Date"] = pd.to_datetime(df["Date"], utc=True)
+        return df
+    return synthetic_ohlcv(SIZES[name])
+
+
+# ------------------------
+# Stages
+# ------------------------
+# setup(df) -> state runs untimed before every run, run(state) is timed and
+# teardown(state) cleans up afterwards. Datasets larger than max_bars are skipped;
+# items(df) is the work done per run, for the ns/item column.
+
+def _add_sma(df):
+    from src.indicators import add_sma
+    return add_sma(df, 50)
+
+
+def _add_rsi(df):
+    from src.indicators import add_rsi
+    return add_rsi(df, length=14)
+
+
+def _add_macd(df):
+    from src.indicators import add_macd
+    return add_macd(df)
+
+
+def _generate_signals(df):
+    from src.strategy import generate_signals
+    return generate_signals(df, **PARAMS)
+
+
+def _backtest(df):
+    from src.backtest import simple_backtest
+    return simple_backtest(df)
+
+
+def _plot(state):
+    from src.utils import plot_trades
+    return plot_trades(*state)
+
+
+def _copy(df):
+    return df.copy()
+
+
+def _with_rsi(df):
+    from src.indicators import add_rsi
+    return add_rsi(df.copy(), length=14)
+
+
+def _signals(df):
+    return _generate_signals(_with_rsi(df))
+
+
+def _trades(df):
+    signals = _signals(df)
+    return signals, _backtest(signals)[1]["trades"]
+
+
+def _logger(df):
+    from src.trade_logger import TradeLogger
+    tmp = tempfile.TemporaryDirectory()
+    n = min(len(df), MAX_FILLS)
+    return tmp, TradeLogger(Path(tmp.name) / "trades.db"), df["Close"].iloc[:n].tolist()
+
+
+def _log_trades(state):
+    _, logger, prices = state
+    for i, price in enumerate(prices):
+        logger.log_trade("SYN", "buy" if i % 2 == 0 else "sell", 1, price, i, pnl=None if i % 2 == 0 else 0.0)
+
+
+def _log_and_flush(state):
+    _log_trades(state)
+    state[1].flush()
+
+
+def _fills(df):
+    return min(len(df), MAX_FILLS)
+
+
+def _close_logger(state):
+    tmp, logger, _ = state
+    logger.close()
+    tmp.cleanup()
+
+
+class Stage:
+    def __init__(self, name, run, setup=lambda df: df, teardown=None, max_bars=None, items=len):
+        self.name = name
+        self.run = run
+        self.setup = setup
+        self.teardown = teardown
+        self.max_bars = max_bars
+        self.items = items
+
+
+STAGES = [
+    Stage("add_sma", _add_sma, setup=_copy),
+    Stage("add_rsi", _add_rsi, setup=_copy),
+    Stage("add_macd", _add_macd, setup=_copy),
+    Stage("generate_signals", _generate_signals, setup=_with_rsi),
+    Stage("simple_backtest", _backtest, setup=_signals),
+    # enqueue cost on the order path, then the same plus the journal commit
+    Stage("log_trade", _log_trades, setup=_logger, teardown=_close_logger, items=_fills),
+    Stage("log_trade+flush", _log_and_flush, setup=_logger, teardown=_close_logger, items=_fills),
+    # candles and markers are aggregated to at most MAX_CANDLES, so the figure is bounded at any size
+    Stage("plot_trades", _plot, setup=_trades),
+]
+
+
+# ------------------------
+# Measurement
+# ------------------------
+def _run_once(stage, df, traced=False):
+    state = stage.setup(df)
+    gc.collect()
+    try:
+        if not traced:
+            start = time.perf_counter()
+            stage.run(state)
+            return time.perf_counter() - start
+        tracemalloc.start()
+        try:
+            before = tracemalloc.take_snapshot()
+            base, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            result = stage.run(state)  # noqa: F841 -- keeps the result alive for the snapshot
+            _, peak = tracemalloc.get_traced_memory()
+            after = tracemalloc.take_snapshot()
+        finally:
+            tracemalloc.stop()
+        blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+        return (peak - base) / 1e6, blocks
+    finally:
+        if stage.teardown:
+            stage.teardown(state)
+
+
+def measure(stage, df) -> dict:
+    times = []
+    while len(times) < MAX_REPEAT and (len(times) < 3 or sum(times) < MIN_SECONDS):
+        times.append(_run_once(stage, df))
+        if len(df) >= 1_000_000:  # one timed run is enough (and all we can afford)
+            break
+    peak_mb, blocks = _run_once(stage, df, traced=True)
+    return {"seconds": min(times), "runs": len(times), "peak_mb": peak_mb, "blocks": blocks}
+
+
+def run_suite(sizes, stage_names=None) -> dict:
+    stages = STAGES
+    if stage_names:
+        unknown = set(stage_names) - {s.name for s in stages}
+        if unknown:
+            raise SystemExit(f"Unknown stages: {sorted(unknown)}")
+        stages = [s for s in stages if s.name in stage_names]
+
+    results = {}
+    for size in sizes:
+        df = load_dataset(size)
+        for stage in stages:
+            key = f"{stage.name}[{size}]"
+            if stage.max_bars is not None and len(df) > stage.max_bars:
+                results[key] = {"skipped": f"more than {stage.max_bars} bars"}
+            else:
+                try:
+                    results[key] = dict(measure(stage, df), items=stage.items(df))
+                except ImportError as e:
+                    results[key] = {"skipped": str(e)}
+            _print_row(key, results[key])
+        del df
+    return results
+
+
+def _print_row(key, result, baseline=None):
+    if "skipped" in result:
+        print(f"{key:<30} skipped ({result['skipped']})")
+        return
+    line = (f"{key:<30} {result['seconds'] * 1e3:>11.3f} ms {result['seconds'] / result['items'] * 1e9:>9.1f} ns/item "
+            f"{result['peak_mb']:>9.1f} MB peak {result['blocks']:>9} blocks")
+    if baseline:
+        line += f"  x{result['seconds'] / baseline['seconds']:.2f} time, x{_ratio(result, baseline, 'peak_mb'):.2f} mem"
+    print(line, flush=True)
+
+
+def _ratio(result, baseline, field):
+    return result[field] / baseline[field] if baseline[field] > 0 else (1.0 if result[field] <= 0 else float("inf"))
+
+
+def regressions(results: dict, baseline: dict, threshold: float) -> list:
+    """Stages slower (beyond NOISE_SECONDS) or using more peak memory than baseline x (1 + threshold)."""
+    found = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if "skipped" in result or not base or "skipped" in base:
+            continue
+        if (result["seconds"] > base["seconds"] * (1 + threshold)
+                and result["seconds"] - base["seconds"] > NOISE_SECONDS):
+            found.append(f"{key}: {base['seconds'] * 1e3:.3f} ms -> {result['seconds'] * 1e3:.3f} ms")
+        if _ratio(result, base, "peak_mb") > 1 + threshold and result["peak_mb"] - base["peak_mb"] > 1.0:
+            found.append(f"{key}: {base['peak_mb']:.1f} MB -> {result['peak_mb']:.1f} MB peak")
+    return found
+
+
+def _results_path(name) -> Path:
+    path = Path(name)
+    return path if path.suffix == ".json" else RESULTS_DIR / f"{name}.json"
+
+
+def environment() -> dict:
+    return {"python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__,
+            "platform": platform.platform(), "machine": platform.machine(), "processor": platform.processor()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", default=[*SIZES, "aapl"], choices=[*SIZES, "aapl"])
+    parser.add_argument("--stages", nargs="+", help="subset of stage names (default: all)")
+    parser.add_argument("--save", default=datetime.now(timezone.utc).strftime("run-%Y%m%dT%H%M%SZ"),
+                        help="results name under benchmarks/results/ or a .json path")
+    parser.add_argument("--compare", help="baseline results name or .json path")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown, e.g. 0.25 = +25%%")
+    args = parser.parse_args()
+
+    baseline = json.loads(_results_path(args.compare).read_text())["results"] if args.compare else None
+    results = run_suite(args.sizes, args.stages)
+
+    path = _results_path(args.save)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"created": datetime.now(timezone.utc).isoformat(), "environment": environment(),
+                                "results": results}, indent=2))
+    print(f"saved {path}")
+
+    if baseline is not None:
+        print(f"\ncompared with {args.compare}:")
+        for key, result in results.items():
+            if "skipped" not in result and "skipped" not in baseline.get(key, {"skipped": ""}):
+                _print_row(key, result, baseline[key])
+        found = regressions(results, baseline, args.threshold)
+        if found:
+            print(f"\n{len(found)} regression(s) beyond +{args.threshold:.0%}:")
+            print("\n".join(f"  {line}" for line in found))
+            sys.exit(1)
+        print(f"no regressions beyond +{args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+# examples/run_data_service_demo.py
+"""
+Offline DataService demo: simulated page renders against a FakeAlpacaBroker
+with 50 ms REST latency. Prints render times, broker calls and cache stats
+with the background refresher running, then after an order.
+"""
+import tempfile
+import time
+
+from src.bar_store import BarStore
+from src.data_service import DataService
+from src.fake_alpaca import FakeAlpacaBroker
+
+
+def render(service, symbol="AAPL"):
+    """What one rerun of the trading app reads (both tabs)."""
+    started = time.perf_counter()
+    service.account()
+    service.positions()
+    service.recent_bars(symbol, "1Hour", lookback_days=30)
+    service.positions()
+    return time.perf_counter() - started
+
+
+def main():
+    broker = FakeAlpacaBroker(latency=0.05)
+    service = DataService(broker, ttl={"account": 1.0, "positions": 1.0, "bars": 5.0}, refresh_interval=0.25,
+                          store=BarStore(tempfile.mkdtemp())).start()
+    try:
+        print(f"cold render: {render(service) * 1000:.1f} ms")
+        times = []
+        for _ in range(50):  # ~5 s of reruns, several TTLs
+            times.append(render(service))
+            time.sleep(0.1)
+        print(f"warm renders: max {max(times) * 1000:.2f} ms over {len(times)}")
+        print(f"broker calls: {dict(broker.calls)}, get_bars requests: {broker.api.request_count}")
+        print(f"cache: {service.stats()}")
+
+        service.place_order("AAPL", 10, side="buy")
+        print(f"first render after order: {render(service) * 1000:.1f} ms (positions reloaded)")
+        print(f"positions: {service.positions()}")
+    finally:
+        service.stop()
+
+
+if __name__ == "__main__":
+    main()
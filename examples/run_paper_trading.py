@@ -3,19 +3,22 @@ from src.paper_trading_engine import PaperTradingEngine
 from src.strategy import generate_signals
 from src.indicators import add_rsi
 
+def add_indicators(df):
+    return add_rsi(df, length=14)
+
 def strategy_wrapper(df, fast_sma=20, slow_sma=50, rsi_threshold=70):
     """
     Wrap Phase 1 strategy for live trading.
     Works with Alpaca schema (Date, Open, High, Low, Close, Volume).
     """
-    df = add_rsi(df, length=14)
-    df = generate_signals(df, fast_sma=fast_sma, slow_sma=slow_sma, rsi_threshold=rsi_threshold)
-    return df
+    return generate_signals(df, fast_sma=fast_sma, slow_sma=slow_sma, rsi_threshold=rsi_threshold)
 
 def main():
     broker = AlpacaBroker()
-    engine = PaperTradingEngine(broker, symbol="AAPL", qty=1, poll_interval=60)
-    engine.run(strategy_wrapper, strategy_kwargs={"fast_sma": 20, "slow_sma": 50, "rsi_threshold": 70})
+    # per-stage timings at http://127.0.0.1:9108/metrics (Prometheus text format)
+    engine = PaperTradingEngine(broker, symbol="AAPL", qty=1, poll_interval=60, metrics_port=9108)
+    engine.run(strategy_wrapper, strategy_kwargs={"fast_sma": 20, "slow_sma": 50, "rsi_threshold": 70},
+               indicators_fn=add_indicators)
 
 if __name__ == "__main__":
     main()
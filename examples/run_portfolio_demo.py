@@ -0,0 +1,42 @@
+# examples/run_portfolio_demo.py
+"""
+Offline portfolio engine demo: MockBroker + FakeAlpacaREST over a synthetic
+universe. Prints per-tick decision latency and get_bars requests per tick for
+growing universe sizes.
+"""
+import asyncio
+import logging
+
+from src.broker_mock import MockBroker
+from src.fake_alpaca import FakeAlpacaREST
+from src.portfolio_engine import AlpacaBarSource, PortfolioEngine
+
+
+class _NullLogger:
+    def log_trade(self, *args, **kwargs):
+        pass
+
+
+async def measure(n_symbols, ticks=5):
+    api = FakeAlpacaREST()
+    source = AlpacaBarSource(api, timeframe="1Day")
+    engine = PortfolioEngine(MockBroker(cash=10_000_000), [f"SYM{i:04d}" for i in range(n_symbols)],
+                             bar_source=source, logger=_NullLogger(),
+                             strategy_kwargs={"fast_sma": 5, "slow_sma": 20, "rsi_threshold": 70})
+    await engine.seed(lookback_days=120)
+    seeded = api.request_count
+    for _ in range(ticks):
+        await engine.tick()
+    per_tick = (api.request_count - seeded) / ticks
+    latency_ms = sum(engine.tick_latencies) / len(engine.tick_latencies) * 1e3
+    print(f"{n_symbols:>6} symbols: {latency_ms:8.1f} ms/tick, {per_tick:.1f} requests/tick")
+
+
+def main():
+    logging.getLogger().setLevel(logging.WARNING)
+    for n_symbols in (10, 50, 200):
+        asyncio.run(measure(n_symbols))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,8 @@
+# src/__main__.py
+"""python -m src: see src.cli."""
+import sys
+
+from src.cli import main
+
+if __name__ == "__main__":
+    sys.exit(main())
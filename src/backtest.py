@@ -1,15 +1,41 @@
 import pandas as pd
 import numpy as np
 
-def simple_backtest(df: pd.DataFrame, 
+from src.compact_bars import CompactBars
+
+def simple_backtest(df: pd.DataFrame,
                     entry_col='entry',
                     exit_col='exit',
                     price_col='Close',
-                    initial_capital=10000):
+                    initial_capital=10000,
+                    mode="vectorized"):
     """
     Backtest using normalized Alpaca schema (Date, Open, High, Low, Close, Volume).
+
+    mode="vectorized" (default) only walks the bars that carry a signal and
+    fills cash/position/equity with array operations; mode="loop" is the
+    original bar-by-bar reference. Both return identical results.
+
+    A CompactBars is backtested per symbol instead (vectorized engine): its
+    equity column is written in place and the summaries come back keyed by
+    symbol, as (bars, {symbol: summary}).
     """
-    df = df.copy().set_index("Date")
+    if isinstance(df, CompactBars):
+        return _backtest_compact(df, entry_col, exit_col, price_col, initial_capital)
+    df = df.set_index("Date")  # a new frame, so the caller's df is never modified
+    if mode == "vectorized":
+        equity_curve, trades, trade_pnls = _run_vectorized(df, entry_col, exit_col, price_col, initial_capital)
+    elif mode == "loop":
+        equity_curve, trades, trade_pnls = _run_loop(df, entry_col, exit_col, price_col, initial_capital)
+    else:
+        raise ValueError(f"Unknown backtest mode: {mode!r} (expected 'vectorized' or 'loop')")
+
+    df["equity"] = equity_curve
+    final_capital = equity_curve[-1] if len(equity_curve) else initial_capital
+    return df, _summarize(df, initial_capital, final_capital, trades, trade_pnls)
+
+
+def _run_loop(df, entry_col, exit_col, price_col, initial_capital):
     cash = initial_capital
     position = 0
     equity_curve = []
@@ -38,8 +64,141 @@ def simple_backtest(df: pd.DataFrame,
         total_value = cash + position * price
         equity_curve.append(total_value)
 
-    df["equity"] = equity_curve
-    final_capital = equity_curve[-1] if equity_curve else initial_capital
+    return equity_curve, trades, trade_pnls
+
+
+def _signal_mask(df, col):
+    """Boolean array for a signal column, using the same truthiness as row.get(col)."""
+    if col not in df.columns:
+        return np.zeros(len(df), dtype=bool)
+    return np.asarray(df[col].to_numpy(), dtype=bool)
+
+
+def _run_vectorized(df, entry_col, exit_col, price_col, initial_capital):
+    equity_curve, fill_index, fill_qty, fill_price, trade_pnls = vectorized_core(
+        df[price_col].to_numpy(), _signal_mask(df, entry_col), _signal_mask(df, exit_col), initial_capital
+    )
+    trades = []
+    for k, (i, qty, price) in enumerate(zip(fill_index, fill_qty, fill_price)):
+        if k % 2 == 0:
+            trades.append({"type": "BUY", "qty": qty, "price": price, "date": df.index[i]})
+        else:
+            trades.append({"type": "SELL", "qty": qty, "price": price, "date": df.index[i], "pnl": trade_pnls[k // 2]})
+    return equity_curve, trades, trade_pnls.tolist()
+
+
+def _backtest_compact(bars, entry_col, exit_col, price_col, initial_capital):
+    valid = bars.columns.get("valid")  # rows generate_signals kept
+    equity = np.full(len(bars), np.nan, dtype=bars.dtype)
+    summaries = {}
+    for symbol in bars.symbols:
+        rows = bars.rows(symbol)
+        keep = np.arange(rows.start, rows.stop) if valid is None else np.flatnonzero(valid[rows]) + rows.start
+        entry = np.asarray(bars[entry_col][keep], dtype=bool) if entry_col in bars else np.zeros(len(keep), bool)
+        exit_ = np.asarray(bars[exit_col][keep], dtype=bool) if exit_col in bars else np.zeros(len(keep), bool)
+        curve, fill_index, fill_qty, fill_price, trade_pnls = vectorized_core(
+            bars[price_col][keep].astype(np.float64), entry, exit_, initial_capital)
+        equity[keep] = curve
+        dates = bars.ts[keep]
+        trades = []
+        for k, (i, qty, price) in enumerate(zip(fill_index, fill_qty, fill_price)):
+            trade = {"type": "BUY" if k % 2 == 0 else "SELL", "qty": qty, "price": price,
+                     "date": pd.Timestamp(dates[i], tz="UTC")}
+            if k % 2:
+                trade["pnl"] = trade_pnls[k // 2]
+            trades.append(trade)
+        summaries[symbol] = dict(equity_metrics(curve, dates, initial_capital, trade_pnls), trades=trades)
+    bars["equity"] = equity
+    return bars, summaries
+
+
+def _fill_state_machine(prices, entry, exit_, initial_capital, fill_pos, fill_qty, cash_after):
+    """
+    All-in long state machine over signal bars only. Writes the event position,
+    quantity and resulting cash of every fill into the preallocated outputs and
+    returns the number of fills. Compiled with numba when it is installed.
+    """
+    cash = float(initial_capital)
+    position = 0.0
+    n_fills = 0
+    for k in range(len(prices)):
+        price = prices[k]
+        if entry[k] and position == 0:
+            qty = cash // price
+            if qty > 0:
+                position = qty
+                cash -= qty * price
+                fill_pos[n_fills] = k
+                fill_qty[n_fills] = qty
+                cash_after[n_fills] = cash
+                n_fills += 1
+        elif exit_[k] and position > 0:
+            cash += position * price
+            fill_pos[n_fills] = k
+            fill_qty[n_fills] = position
+            cash_after[n_fills] = cash
+            n_fills += 1
+            position = 0.0
+    return n_fills
+
+
+_compiled = {}
+
+
+def _compiled_state_machine():
+    """_fill_state_machine compiled by numba, or None without it; numba is imported on first use."""
+    if "fills" not in _compiled:
+        try:
+            from numba import njit  # optional, compiles the fill state machine
+        except ImportError:
+            njit = None
+        _compiled["fills"] = njit(cache=True, nogil=True)(_fill_state_machine) if njit is not None else None
+    return _compiled["fills"]
+
+
+def vectorized_core(prices: np.ndarray, entry: np.ndarray, exit_: np.ndarray, initial_capital=10000):
+    """
+    Array-only all-in long backtest shared by simple_backtest and the optimizer.
+    Returns (equity_curve, fill_index, fill_qty, fill_price, trade_pnls); fills
+    alternate BUY/SELL starting with a BUY.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    # All-in sizing (cash // price) makes each fill depend on the previous one,
+    # so the state machine only walks the signal bars; in between, cash and
+    # position are constant and get broadcast below.
+    events = np.flatnonzero(entry | exit_)
+    fill_pos = np.empty(len(events), dtype=np.int64)
+    fill_qty = np.empty(len(events), dtype=np.float64)
+    cash_states = np.empty(len(events) + 1, dtype=np.float64)
+    cash_states[0] = initial_capital
+    compiled = _compiled_state_machine()
+    if compiled is not None:
+        n_fills = compiled(prices[events], entry[events], exit_[events],
+                           float(initial_capital), fill_pos, fill_qty, cash_states[1:])
+    else:
+        # plain Python scalars keep the interpreted loop cheap (same IEEE doubles)
+        n_fills = _fill_state_machine(prices[events].tolist(), entry[events].tolist(), exit_[events].tolist(),
+                                      initial_capital, fill_pos, fill_qty, cash_states[1:])
+
+    fill_index = events[fill_pos[:n_fills]]
+    fill_qty = fill_qty[:n_fills]
+    fill_price = prices[fill_index]
+    n_sells = n_fills // 2
+    trade_pnls = (fill_price[1::2] - fill_price[0:2 * n_sells:2]) * fill_qty[1::2]
+
+    cash_states = cash_states[:n_fills + 1]
+    position_states = np.zeros(n_fills + 1, dtype=np.float64)
+    position_states[1::2] = fill_qty[0::2]
+
+    # state k applies from fill k-1 (inclusive) until the next fill
+    run_lengths = np.diff(np.concatenate(([0], fill_index, [len(prices)])))
+    cash_arr = np.repeat(cash_states, run_lengths)
+    position_arr = np.repeat(position_states, run_lengths)
+    equity_curve = cash_arr + position_arr * prices
+    return equity_curve, fill_index, fill_qty, fill_price, trade_pnls
+
+
+def _summarize(df, initial_capital, final_capital, trades, trade_pnls):
     returns = pd.Series(df["equity"]).pct_change().dropna()
 
     # --- Performance Metrics ---
@@ -63,4 +222,41 @@ def simple_backtest(df: pd.DataFrame,
         "num_trades": len(trade_pnls),
         "trades": trades
     }
-    return df, summary
+    return summary
+
+
+def equity_metrics(equity: np.ndarray, dates_ns: np.ndarray, initial_capital, trade_pnls) -> dict:
+    """
+    NumPy version of the simple_backtest summary metrics (no trade list), for
+    callers that score many equity curves such as the parameter optimizer.
+    dates_ns are int64 epoch nanoseconds aligned with equity.
+    """
+    final_capital = equity[-1] if len(equity) else initial_capital
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = equity[1:] / equity[:-1] - 1
+    returns = returns[~np.isnan(returns)]
+    mean = returns.mean() if len(returns) else np.nan
+    std = returns.std(ddof=1) if len(returns) > 1 else np.nan
+
+    total_return = (final_capital - initial_capital) / initial_capital * 100
+    days = int((dates_ns[-1] - dates_ns[0]) // 86_400_000_000_000) if len(equity) > 1 else 1
+    cagr = (final_capital / initial_capital) ** (365.0 / days) - 1 if days > 0 else 0
+    sharpe = (mean / std * np.sqrt(252)) if std != 0 else 0
+    if len(equity):
+        roll_max = np.maximum.accumulate(equity)
+        max_drawdown = np.min((equity - roll_max) / roll_max)
+    else:
+        max_drawdown = np.nan
+    pnls = np.asarray(trade_pnls, dtype=np.float64)
+    win_rate = (np.count_nonzero(pnls > 0) / len(pnls) * 100) if len(pnls) else 0
+
+    return {
+        "initial_capital": initial_capital,
+        "final_capital": final_capital,
+        "total_return_pct": total_return,
+        "CAGR": cagr,
+        "Sharpe_Ratio": sharpe,
+        "Max_Drawdown": max_drawdown,
+        "Win_Rate": win_rate,
+        "num_trades": len(pnls),
+    }
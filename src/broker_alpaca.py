@@ -1,38 +1,63 @@
-from alpaca_trade_api.rest import REST, TimeFrame
 from src import config
 
 class AlpacaBroker:
-    def __init__(self):
-        self.api = REST(
-            key_id=config.ALPACA_API_KEY_ID,
-            secret_key=config.ALPACA_API_SECRET_KEY,
-            base_url=config.ALPACA_BASE_URL
-        )
+    def __init__(self, gateway_options=None, api=None):
+        if api is None:
+            from alpaca_trade_api.rest import REST  # the SDK loads only when a broker is created
+            api = REST(
+                key_id=config.ALPACA_API_KEY_ID,
+                secret_key=config.ALPACA_API_SECRET_KEY,
+                base_url=config.ALPACA_BASE_URL
+            )
+        self.api = api  # market data client (e.g. src.fake_alpaca.FakeAlpacaREST offline)
+        self.gateway_options = gateway_options or {}  # OrderGateway keyword arguments
+        self._orders = None
+
+    @property
+    def orders(self):
+        """The OrderGateway orders, account and positions go through (started on first use)."""
+        if self._orders is None:
+            from src.order_gateway import OrderGateway
+            self._orders = OrderGateway(**self.gateway_options)
+        return self._orders
 
     def get_account(self):
         """Return account info (cash, portfolio value, etc.)"""
-        return self.api.get_account()._raw
+        return self.orders.account()
 
     def get_latest_price(self, symbol: str):
         """Fetch latest trade price for a symbol"""
         barset = self.api.get_latest_trade(symbol,feed="iex")
         return barset.price
 
-    def place_order(self, symbol: str, qty: int, side="buy", order_type="market", time_in_force="gtc"):
-        """Place a simple order"""
-        order = self.api.submit_order(
-            symbol=symbol,
-            qty=qty,
-            side=side,
-            type=order_type,
-            time_in_force=time_in_force
-        )
-        return order._raw
+    def submit_order(self, symbol: str, qty: int, side="buy", order_type="market", time_in_force="gtc",
+                     on_update=None, client_order_id=None):
+        """Queue an order without waiting for the broker; returns its OrderTicket"""
+        return self.orders.submit(symbol, qty, side=side, order_type=order_type, time_in_force=time_in_force,
+                                  client_order_id=client_order_id, on_update=on_update)
+
+    def find_order(self, client_order_id: str):
+        """Look an order up by client order id (None if the broker never received it)"""
+        return self.orders.find(client_order_id)
+
+    def track_order(self, order: dict, on_update=None):
+        """Follow an order placed earlier (e.g. found by find_order after a restart) until it finishes"""
+        return self.orders.track(order, on_update=on_update)
+
+    def place_order(self, symbol: str, qty: int, side="buy", order_type="market", time_in_force="gtc", price=None):
+        """Place a simple order and wait for it to be accepted (`price` is the caller's reference price, unused for market orders)"""
+        return self.submit_order(symbol, qty, side=side, order_type=order_type, time_in_force=time_in_force).result()
 
     def get_positions(self):
         """Get all open positions"""
-        return [pos._raw for pos in self.api.list_positions()]
+        return self.orders.positions()
 
     def close_position(self, symbol: str):
         """Close an open position"""
         return self.api.close_position(symbol)._raw
+
+    def close(self):
+        """Send the orders still queued in the order gateway and stop it"""
+        if self._orders is not None:
+            self._orders.close()
+            self._orders = None
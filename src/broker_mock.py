@@ -1,39 +1,320 @@
 # src/broker_mock.py
 """
-A simple in-memory broker simulator for paper trading.
+An in-memory broker simulator for paper trading and stress tests.
+
+Market, limit and stop orders are matched against the bars or ticks passed
+to on_bar()/on_tick(), with configurable slippage, commission, simulated
+latency and partial fills (a cap on the share of each bar's volume an order
+can take). Open orders sit in per-symbol heaps keyed by price (then arrival),
+so a bar only touches the orders that actually trigger or fill: O(log n) each.
+
+Finished orders are not kept as objects: each becomes one row of a
+structured NumPy array (history()), as does every fill (fills()), so millions
+of orders stay compact.
+
+Calling place_order(symbol, qty, price, side) with a reference price and no
+latency keeps the original behaviour: the order fills immediately at that
+price (plus slippage and commission).
 """
-from dataclasses import dataclass
+import heapq
+import math
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+ORDER_TYPES = ("market", "limit", "stop")
+SIDES = ("buy", "sell")
+STATUSES = ("pending", "open", "partially_filled", "filled", "canceled")
+PENDING, OPEN, PARTIAL, FILLED, CANCELED = range(len(STATUSES))
+
+ORDER_DTYPE = np.dtype([("id", "i8"), ("ts", "i8"), ("symbol", "i4"), ("side", "i1"), ("type", "i1"),
+                        ("status", "i1"), ("qty", "f8"), ("limit_price", "f8"), ("stop_price", "f8"),
+                        ("filled_qty", "f8"), ("avg_price", "f8"), ("commission", "f8")])
+FILL_DTYPE = np.dtype([("order_id", "i8"), ("ts", "i8"), ("qty", "f8"), ("price", "f8"), ("commission", "f8")])
+
+
+class _RecordLog:
+    """Append-only log of tuples, packed into structured-array chunks as it grows."""
+
+    def __init__(self, dtype, chunk_size=65536):
+        self.dtype = dtype
+        self.chunk_size = chunk_size
+        self.chunks = []
+        self.buffer = []
+
+    def append(self, row):
+        self.buffer.append(row)
+        if len(self.buffer) == self.chunk_size:
+            self.chunks.append(np.array(self.buffer, dtype=self.dtype))
+            self.buffer = []
+
+    def __len__(self):
+        return sum(len(c) for c in self.chunks) + len(self.buffer)
+
+    @property
+    def nbytes(self):
+        return sum(c.nbytes for c in self.chunks) + len(self.buffer) * self.dtype.itemsize
+
+    def view(self, extra=()) -> np.ndarray:
+        return np.concatenate(self.chunks + [np.array(self.buffer + list(extra), dtype=self.dtype)])
+
 
-@dataclass
 class Order:
-    id: int
-    symbol: str
-    qty: int
-    price: float
-    side: str  # 'buy' or 'sell'
-    status: str  # 'filled', 'open', etc.
+    """A live order. Once it is filled or canceled its history row is the permanent record."""
+    __slots__ = ("id", "ts", "symbol", "side", "type", "qty", "limit_price", "stop_price", "filled_qty",
+                 "avg_price", "commission", "status_code", "active_at", "fill_from", "_code")
+
+    def __init__(self, id, ts, symbol, side, type, qty, limit_price, stop_price, active_at, code):
+        self.id = id
+        self.ts = ts
+        self.symbol = symbol
+        self.side = side
+        self.type = type
+        self.qty = qty
+        self.limit_price = limit_price
+        self.stop_price = stop_price
+        self.filled_qty = 0.0
+        self.avg_price = math.nan
+        self.commission = 0.0
+        self.status_code = PENDING
+        self.active_at = active_at
+        self.fill_from = None  # price a triggered stop fills from (else the bar open)
+        self._code = code
+
+    @property
+    def status(self) -> str:
+        return STATUSES[self.status_code]
+
+    @property
+    def price(self) -> float:
+        """Average fill price (NaN until filled)."""
+        return self.avg_price
+
+    @property
+    def remaining(self) -> float:
+        return self.qty - self.filled_qty
+
+    def record(self) -> tuple:
+        """The order as an ORDER_DTYPE row."""
+        return (self.id, self.ts, self._code, SIDES.index(self.side), ORDER_TYPES.index(self.type),
+                self.status_code, self.qty, math.nan if self.limit_price is None else self.limit_price,
+                math.nan if self.stop_price is None else self.stop_price, self.filled_qty, self.avg_price,
+                self.commission)
+
+    def __repr__(self):
+        return (f"Order(id={self.id}, {self.side} {self.qty} {self.symbol} {self.type}, "
+                f"status={self.status}, filled={self.filled_qty} @ {self.avg_price})")
+
+
+class _Book:
+    __slots__ = ("pending", "markets", "buy_limits", "sell_limits", "buy_stops", "sell_stops")
+
+    def __init__(self):
+        self.pending = []      # (active_at, id, order) waiting out the latency
+        self.markets = deque()  # market orders and triggered stops, FIFO
+        self.buy_limits = []   # (-limit, id, order): highest bid first
+        self.sell_limits = []  # (limit, id, order): lowest ask first
+        self.buy_stops = []    # (stop, id, order): triggers when high >= stop
+        self.sell_stops = []   # (-stop, id, order): triggers when low <= stop
+
 
 class MockBroker:
-    def __init__(self, cash=100000):
+    def __init__(self, cash=100000, slippage_bps=0.0, commission_per_share=0.0, commission_pct=0.0,
+                 participation=None, latency=0.0):
+        """
+        slippage_bps: adverse price move applied to market and stop fills.
+        commission_per_share / commission_pct: charged per fill (pct of notional).
+        participation: max fraction of a bar's volume filled per side (None = unlimited).
+        latency: seconds between placing an order and it reaching the book.
+        """
         self.cash = cash
+        self.slippage = slippage_bps / 10_000
+        self.commission_per_share = commission_per_share
+        self.commission_pct = commission_pct
+        self.participation = participation
+        self.latency_ns = int(latency * 1e9)
         self.positions = {}  # symbol -> qty
-        self.orders = []
+        self.now = 0         # simulation clock (epoch ns of the last bar/tick seen)
+        self._books = {}
+        self._open = {}      # id -> live Order
+        self._symbols = {}   # symbol -> code in the history arrays
+        self._orders = _RecordLog(ORDER_DTYPE)  # finished orders
+        self._fills = _RecordLog(FILL_DTYPE)
         self._next_id = 1
 
-    def place_order(self, symbol, qty, price, side):
-        order = Order(self._next_id, symbol, qty, price, side, 'filled')
+    # ------------------------
+    # orders
+    # ------------------------
+    def place_order(self, symbol, qty, price=None, side="buy", order_type="market", limit_price=None,
+                    stop_price=None, ts=None, **kwargs):
+        """
+        Submit an order. A market order with a reference `price` and no
+        latency fills immediately at that price; everything else is matched by
+        later on_bar()/on_tick() calls. Returns the Order.
+        """
+        if order_type not in ORDER_TYPES:
+            raise ValueError(f"Unknown order type: {order_type!r} (expected one of {ORDER_TYPES})")
+        if side not in SIDES:
+            raise ValueError(f"Unknown side: {side!r} (expected 'buy' or 'sell')")
+        if order_type == "limit" and limit_price is None or order_type == "stop" and stop_price is None:
+            raise ValueError(f"{order_type} orders need a {order_type}_price")
+        ts = self.now if ts is None else ts
+        code = self._symbols.setdefault(symbol, len(self._symbols))
+        order_id = self._next_id
         self._next_id += 1
-        self.orders.append(order)
-        if side == 'buy':
-            self.cash -= qty * price
-            self.positions[symbol] = self.positions.get(symbol, 0) + qty
+        order = Order(order_id, ts, symbol, side, order_type, float(qty), limit_price, stop_price,
+                      ts + self.latency_ns, code)
+
+        if order_type == "market" and price is not None and not self.latency_ns:
+            self._fill(order, order.qty, self._slipped(price, side), ts)
+            return order
+        self._open[order_id] = order
+        book = self._books.get(symbol) or self._books.setdefault(symbol, _Book())
+        if self.latency_ns:
+            heapq.heappush(book.pending, (order.active_at, order_id, order))
         else:
-            self.cash += qty * price
-            self.positions[symbol] = self.positions.get(symbol, 0) - qty
+            self._activate(book, order)
         return order
 
+    def cancel_order(self, order_id) -> bool:
+        """Cancel the unfilled rest of an open order (heap entries are dropped lazily)."""
+        order = self._open.pop(order_id, None)
+        if order is None:
+            return False
+        order.status_code = CANCELED
+        self._orders.append(order.record())
+        return True
+
+    def open_orders(self, symbol=None) -> list:
+        return [o for o in self._open.values() if symbol is None or o.symbol == symbol]
+
+    def _activate(self, book, order):
+        order.status_code = OPEN
+        if order.type == "market":
+            book.markets.append(order)
+        elif order.type == "limit":
+            if order.side == "buy":
+                heapq.heappush(book.buy_limits, (-order.limit_price, order.id, order))
+            else:
+                heapq.heappush(book.sell_limits, (order.limit_price, order.id, order))
+        elif order.side == "buy":
+            heapq.heappush(book.buy_stops, (order.stop_price, order.id, order))
+        else:
+            heapq.heappush(book.sell_stops, (-order.stop_price, order.id, order))
+
+    # ------------------------
+    # market data
+    # ------------------------
+    def on_bar(self, symbol, ts, open, high, low, close, volume=math.inf):
+        """Match the symbol's open orders against one OHLCV bar (ts = bar start, epoch ns)."""
+        self.now = max(self.now, ts)
+        book = self._books.get(symbol)
+        if book is None:
+            return
+        while book.pending and book.pending[0][0] <= ts:
+            order = heapq.heappop(book.pending)[2]
+            if order.status_code == PENDING:
+                self._activate(book, order)
+
+        cap = math.inf if self.participation is None else self.participation * volume
+        liquidity = {"buy": cap, "sell": cap}
+
+        # stops become market orders, filling from the stop (or the open if it gapped through)
+        while book.buy_stops and book.buy_stops[0][0] <= high:
+            order = heapq.heappop(book.buy_stops)[2]
+            if order.status_code in (OPEN, PARTIAL):
+                order.fill_from = max(open, order.stop_price)
+                book.markets.append(order)
+        while book.sell_stops and -book.sell_stops[0][0] >= low:
+            order = heapq.heappop(book.sell_stops)[2]
+            if order.status_code in (OPEN, PARTIAL):
+                order.fill_from = min(open, order.stop_price)
+                book.markets.append(order)
+
+        if book.markets:
+            waiting = deque()
+            while book.markets:
+                order = book.markets.popleft()
+                if order.status_code not in (OPEN, PARTIAL):
+                    continue
+                qty = min(order.remaining, liquidity[order.side])
+                if qty > 0:
+                    liquidity[order.side] -= qty
+                    base = open if order.fill_from is None else order.fill_from
+                    self._fill(order, qty, self._slipped(base, order.side), ts)
+                if order.status_code != FILLED:
+                    waiting.append(order)
+            book.markets = waiting
+
+        # limits fill at the limit, or at the open when the bar opened through it
+        self._match_limits(book.buy_limits, -1, low, open, liquidity, "buy", ts)
+        self._match_limits(book.sell_limits, 1, high, open, liquidity, "sell", ts)
+
+    def _match_limits(self, heap, sign, extreme, open, liquidity, side, ts):
+        while heap:
+            key, _, order = heap[0]
+            if order.status_code not in (OPEN, PARTIAL):
+                heapq.heappop(heap)
+                continue
+            limit = sign * key
+            if (side == "buy" and extreme > limit) or (side == "sell" and extreme < limit) or liquidity[side] <= 0:
+                return
+            qty = min(order.remaining, liquidity[side])
+            liquidity[side] -= qty
+            self._fill(order, qty, min(open, limit) if side == "buy" else max(open, limit), ts)
+            if order.status_code == FILLED:
+                heapq.heappop(heap)
+
+    def on_tick(self, symbol, ts, price, size=math.inf):
+        """Match against a single trade print."""
+        self.on_bar(symbol, ts, price, price, price, price, size)
+
+    # ------------------------
+    # fills and bookkeeping
+    # ------------------------
+    def _slipped(self, price, side):
+        return price * (1 + self.slippage) if side == "buy" else price * (1 - self.slippage)
+
+    def _fill(self, order, qty, price, ts):
+        commission = qty * self.commission_per_share + qty * price * self.commission_pct
+        filled = order.filled_qty + qty
+        order.avg_price = price if order.filled_qty == 0 else (order.avg_price * order.filled_qty + price * qty) / filled
+        order.filled_qty = filled
+        order.commission += commission
+        signed = qty if order.side == "buy" else -qty
+        self.cash -= signed * price + commission
+        self.positions[order.symbol] = self.positions.get(order.symbol, 0) + signed
+
+        self._fills.append((order.id, ts, qty, price, commission))
+        if filled >= order.qty:
+            order.status_code = FILLED
+            self._open.pop(order.id, None)
+            self._orders.append(order.record())
+        else:
+            order.status_code = PARTIAL
+
+    # ------------------------
+    # queries
+    # ------------------------
     def get_positions(self):
         return self.positions
 
     def get_cash(self):
         return self.cash
+
+    def history(self) -> pd.DataFrame:
+        """Every order placed (finished and open), one row each, ordered by id."""
+        rows = self._orders.view(extra=[order.record() for order in self._open.values()])
+        rows = rows[np.argsort(rows["id"], kind="stable")]
+        names = np.array(list(self._symbols), dtype=object)
+        df = pd.DataFrame(rows)
+        df["symbol"] = names[rows["symbol"]] if len(rows) else []
+        df["side"] = np.array(SIDES, dtype=object)[rows["side"]]
+        df["type"] = np.array(ORDER_TYPES, dtype=object)[rows["type"]]
+        df["status"] = np.array(STATUSES, dtype=object)[rows["status"]]
+        return df
+
+    def fills(self) -> np.ndarray:
+        """All fills as a structured array (order_id, ts, qty, price, commission)."""
+        return self._fills.view()
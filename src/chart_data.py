@@ -0,0 +1,141 @@
+# src/chart_data.py
+"""
+Chart payloads bounded by the screen, not by the history.
+
+A chart can only show a few thousand candles, so the bars are aggregated
+before they reach Plotly:
+
+    candles(df, max_bars=2000, start=None, end=None)
+        bars in [start, end] (the zoom window) resampled to the shortest
+        timeframe of TIMEFRAME_LADDER giving at most max_bars candles
+        (src.resample: calendar-aligned, highs and lows preserved)
+    markers(trades, candle_ts, start=None, end=None)
+        trades snapped to the candle they fall in, one marker per candle and
+        side (count and average price), via searchsorted
+    lttb(x, y, n_out)
+        Largest-Triangle-Three-Buckets reduction for line series such as an
+        equity curve: keeps the first and last points and, per bucket, the
+        point that best preserves the shape
+
+Each returns at most max_bars / n_out points whatever the input length, so
+payload size and render time stay flat; zooming re-aggregates the window at a
+finer timeframe.
+"""
+import numpy as np
+import pandas as pd
+
+from src.bar_store import COLUMNS, dates_to_ns, timeframe_delta, to_ns
+from src.resample import resample_arrays
+
+MAX_CANDLES = 2000
+TIMEFRAME_LADDER = ["1Min", "2Min", "5Min", "10Min", "15Min", "30Min", "1Hour", "2Hour", "4Hour", "1Day", "1Week",
+                    "4Week"]
+
+
+def _dates(df):
+    return pd.DatetimeIndex(df["Date"] if "Date" in df.columns else df.index)
+
+
+def _window(ts, start, end):
+    lo = 0 if start is None else int(np.searchsorted(ts, to_ns(start), side="left"))
+    hi = len(ts) if end is None else int(np.searchsorted(ts, to_ns(end), side="right"))
+    return slice(lo, hi)
+
+
+def _count(ts, bar_ns):
+    """Candles an epoch-aligned intraday timeframe gives for sorted ts."""
+    return 1 + int(np.count_nonzero(np.diff(ts // bar_ns))) if len(ts) else 0
+
+
+def candles(df: pd.DataFrame, max_bars=MAX_CANDLES, start=None, end=None):
+    """
+    (arrays {'ts', OHLCV}, timeframe) for the bars of df (Date column or
+    DatetimeIndex, time-sorted) in [start, end]: the bars themselves
+    (timeframe None) if there are at most max_bars, else resampled.
+    """
+    dates = _dates(df)
+    ts = dates_to_ns(dates)
+    rows = _window(ts, start, end)
+    arrays = {"ts": ts[rows], **{name: df[name].to_numpy(dtype=np.float64)[rows]
+                                 for name in COLUMNS if name in df.columns}}
+    n = len(arrays["ts"])
+    if n <= max_bars:
+        return arrays, None
+    if "Volume" not in arrays:
+        arrays["Volume"] = np.zeros(n)
+    spacing = int(np.median(np.diff(arrays["ts"])))
+    out = arrays
+    for timeframe in TIMEFRAME_LADDER:
+        bar_ns = int(timeframe_delta(timeframe).value)
+        if bar_ns <= spacing:
+            continue
+        # intraday counts are cheap to check before resampling
+        if bar_ns < timeframe_delta("1Day").value and _count(arrays["ts"], bar_ns) > max_bars:
+            continue
+        out = resample_arrays(arrays, timeframe)
+        if len(out["ts"]) <= max_bars:
+            return out, timeframe
+    # longer than the ladder covers: equal-count buckets of the largest timeframe
+    return _every(out, -(-len(out["ts"]) // max_bars)), TIMEFRAME_LADDER[-1]
+
+
+def _every(arrays, k):
+    """OHLCV buckets of k consecutive bars."""
+    first = np.arange(0, len(arrays["ts"]), k)
+    last = np.append(first[1:], len(arrays["ts"])) - 1
+    return {"ts": arrays["ts"][first], "Open": arrays["Open"][first],
+            "High": np.maximum.reduceat(arrays["High"], first), "Low": np.minimum.reduceat(arrays["Low"], first),
+            "Close": arrays["Close"][last], "Volume": np.add.reduceat(arrays["Volume"], first)}
+
+
+def markers(trades, candle_ts, start=None, end=None) -> pd.DataFrame:
+    """
+    One row per (candle, side) holding trades in [start, end]: ts (the
+    candle's start, UTC ns), type (BUY/SELL), count, price (average).
+    trades: plot_trades-style dicts ('type', 'date', 'price') or a
+    DataFrame with those columns.
+    """
+    trades = pd.DataFrame(trades, columns=["type", "date", "price"]) if not isinstance(trades, pd.DataFrame) \
+        else trades[["type", "date", "price"]]
+    if trades.empty or not len(candle_ts):
+        return pd.DataFrame({"ts": np.empty(0, np.int64), "type": [], "count": np.empty(0, np.int64),
+                             "price": np.empty(0)})
+    ts = dates_to_ns(pd.to_datetime(trades["date"], utc=True, cache=False))
+    keep = np.ones(len(ts), bool)
+    if start is not None:
+        keep &= ts >= to_ns(start)
+    if end is not None:
+        keep &= ts <= to_ns(end)
+    # trades before the first candle are drawn on it
+    candle = np.maximum(np.searchsorted(candle_ts, ts[keep], side="right") - 1, 0)
+    joined = pd.DataFrame({"ts": np.asarray(candle_ts)[candle], "type": trades["type"].to_numpy()[keep],
+                           "price": trades["price"].to_numpy(dtype=np.float64)[keep]})
+    return joined.groupby(["ts", "type"], sort=False).agg(count=("price", "size"), price=("price", "mean")) \
+        .reset_index()
+
+
+def lttb(x, y, n_out: int):
+    """Indices of the n_out points of (x, y) that Largest-Triangle-Three-Buckets keeps (all if fewer)."""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        raise ValueError("lttb keeps the first and last points: n_out must be at least 3")
+    # n_out - 2 buckets between the fixed first and last points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    sums_x, sums_y = np.add.reduceat(x[:-1], edges[:-1]), np.add.reduceat(y[:-1], edges[:-1])
+    counts = np.diff(edges)
+    means_x = np.append(sums_x / counts, x[-1])  # next bucket's centroid; the last point after the last bucket
+    means_y = np.append(sums_y / counts, y[-1])
+    keep = np.empty(n_out, np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        cx, cy = means_x[i + 1], means_y[i + 1]
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
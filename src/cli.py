@@ -0,0 +1,197 @@
+# src/cli.py
+"""
+Command line entry point for headless runs:
+
+    python -m src backtest --symbol AAPL --period 5y --fast 20 --slow 50 --rsi 70
+    python -m src backtest --csv data/AAPL_5y_1d.csv
+    python -m src optimize --symbol AAPL --fast 5 10 20 --slow 50 100 --rsi 60 70 80 --workers 4
+    python -m src fetch --symbol AAPL --source alpaca --timeframe 1Min --days 30
+    python -m src paper-trade --symbol AAPL --timeframe 1Min --stream
+    python -m src scan --where oversold --where volume_spike --sort volume_ratio --top 20
+
+Only argparse is imported up front: each command imports what it uses when it
+runs (pandas and the engine for a backtest, the Alpaca SDK and .env only for
+--source alpaca and paper-trade, never plotly), so `--help` and runs on cached
+bars start quickly. benchmarks/bench_startup.py keeps it that way.
+"""
+import argparse
+import sys
+
+SOURCES = ("yfinance", "alpaca")
+
+
+def _add_data_args(parser):
+    parser.add_argument("--symbol", default="AAPL")
+    parser.add_argument("--csv", help="read bars from this .csv/.parquet instead of a data source")
+    parser.add_argument("--source", choices=SOURCES, default="yfinance",
+                        help="yfinance (period/interval, cached in data/store) or alpaca (timeframe/days)")
+    parser.add_argument("--period", default="5y", help="yfinance period, e.g. 6mo, 1y, 5y, max")
+    parser.add_argument("--interval", default="1d", help="yfinance interval, e.g. 1m, 1h, 1d")
+    parser.add_argument("--timeframe", default="1Day", help="Alpaca timeframe, e.g. 1Min, 15Min, 1Day")
+    parser.add_argument("--days", type=int, default=365, help="Alpaca lookback in days")
+
+
+def _load(args):
+    """OHLCV DataFrame with a Date column for the data arguments."""
+    if args.csv:
+        from src.replay_server import load_bars
+        return load_bars(args.csv)
+    if args.source == "yfinance":
+        from src.data_fetcher import fetch_history_yfinance
+        return fetch_history_yfinance(args.symbol, period=args.period, interval=args.interval).reset_index()
+    from datetime import datetime, timedelta, timezone
+    from src.broker_alpaca import AlpacaBroker
+    from src.data_fetcher_alpaca import fetch_bars_incremental
+    end = datetime.now(timezone.utc)
+    return fetch_bars_incremental(AlpacaBroker().api, args.symbol, end - timedelta(days=args.days), end,
+                                  args.timeframe)
+
+
+def backtest(args):
+    from src.backtest import simple_backtest
+    from src.indicators import add_rsi
+    from src.strategy import generate_signals
+
+    df = add_rsi(_load(args), length=args.rsi_length)
+    df = generate_signals(df, fast_sma=args.fast, slow_sma=args.slow, rsi_threshold=args.rsi)
+    _, summary = simple_backtest(df, initial_capital=args.capital)
+    trades = summary.pop("trades")
+    for name, value in summary.items():
+        print(f"{name:<18} {value:,.4f}" if isinstance(value, float) else f"{name:<18} {value}")
+    for trade in trades if args.trades else ():
+        print(f"{trade['date']}  {trade['type']:<4} {trade['qty']:>8g} @ {trade['price']:.2f}")
+
+
+def optimize(args):
+    from src.optimizer import grid_search
+    import pandas as pd
+
+    ranked = grid_search(_load(args), args.fast, args.slow, args.rsi, rsi_length=args.rsi_length,
+                         metric=args.metric, initial_capital=args.capital, max_workers=args.workers)
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(ranked.head(args.top).to_string(index=False))
+
+
+def fetch(args):
+    df = _load(args)
+    if len(df):
+        print(f"{args.symbol}: {len(df)} bars, {df['Date'].iloc[0]} .. {df['Date'].iloc[-1]} (stored locally)")
+    else:
+        print(f"{args.symbol}: no bars")
+
+
+def paper_trade(args):
+    import logging
+    from src.broker_alpaca import AlpacaBroker
+    from src.engine_state import STATE_DIR, SnapshotStore
+    from src.paper_trading_engine import PaperTradingEngine
+    from src.strategy import StreamingSignals
+
+    logging.basicConfig(level=logging.INFO)
+    broker = AlpacaBroker()
+    snapshots = SnapshotStore(args.state_dir or STATE_DIR)
+    if args.fresh:
+        snapshots.clear(args.symbol, args.timeframe)
+    engine = PaperTradingEngine(broker, symbol=args.symbol, qty=args.qty, poll_interval=args.poll_interval,
+                                timeframe=args.timeframe, metrics_port=args.metrics_port, snapshots=snapshots)
+    stream = None
+    if args.stream:
+        from src.market_stream import alpaca_stream
+        stream = alpaca_stream(feed=args.feed)
+    signals = StreamingSignals(fast_sma=args.fast, slow_sma=args.slow, rsi_threshold=args.rsi,
+                               rsi_length=args.rsi_length)
+    try:
+        engine.run_streaming(signals, lookback_days=args.days, stream=stream, source=args.stream_source)
+    except KeyboardInterrupt:
+        engine.stop()
+    finally:
+        broker.close()
+
+
+def scan(args):
+    from src.scanner import Scanner
+    import pandas as pd
+
+    scanner = Scanner.from_store(args.symbols or None, timeframe=args.timeframe, fast_sma=args.fast,
+                                 slow_sma=args.slow, rsi_threshold=args.rsi, rsi_length=args.rsi_length,
+                                 volume_window=args.volume_window, lookback=args.lookback)
+    table = scanner.scan(args.where, sort=args.sort, ascending=args.ascending, top=args.top)
+    print(f"{len(table)} of {len(scanner.symbols)} symbols")
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(table.to_string())
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m src", description="SMA crossover + RSI trading assistant")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("backtest", help="backtest the SMA/RSI strategy on one symbol")
+    _add_data_args(run)
+    run.add_argument("--fast", type=int, default=20, help="fast SMA window")
+    run.add_argument("--slow", type=int, default=50, help="slow SMA window")
+    run.add_argument("--rsi", type=float, default=70, help="RSI threshold")
+    run.add_argument("--rsi-length", type=int, default=14)
+    run.add_argument("--capital", type=float, default=10000)
+    run.add_argument("--trades", action="store_true", help="also list the trades")
+    run.set_defaults(handler=backtest)
+
+    sweep = commands.add_parser("optimize", help="grid search over strategy parameters")
+    _add_data_args(sweep)
+    sweep.add_argument("--fast", type=int, nargs="+", default=[5, 10, 20, 30])
+    sweep.add_argument("--slow", type=int, nargs="+", default=[50, 100, 150, 200])
+    sweep.add_argument("--rsi", type=float, nargs="+", default=[60, 70, 80])
+    sweep.add_argument("--rsi-length", type=int, nargs="+", default=[14])
+    sweep.add_argument("--metric", default="Sharpe_Ratio",
+                       help="Sharpe_Ratio, CAGR, Max_Drawdown, total_return_pct or Win_Rate")
+    sweep.add_argument("--capital", type=float, default=10000)
+    sweep.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    sweep.add_argument("--top", type=int, default=10, help="rows to print")
+    sweep.set_defaults(handler=optimize)
+
+    get = commands.add_parser("fetch", help="download bars into the local bar store")
+    _add_data_args(get)
+    get.set_defaults(handler=fetch)
+
+    live = commands.add_parser("paper-trade", help="trade the strategy on the Alpaca paper account")
+    live.add_argument("--symbol", default="AAPL")
+    live.add_argument("--qty", type=int, default=1)
+    live.add_argument("--timeframe", default="1Min")
+    live.add_argument("--days", type=int, default=90, help="history to warm the indicators up on")
+    live.add_argument("--poll-interval", type=int, default=60, help="seconds between REST polls")
+    live.add_argument("--stream", action="store_true", help="websocket market data instead of polling")
+    live.add_argument("--stream-source", choices=("trades", "bars"), default="trades")
+    live.add_argument("--feed", default="iex", help="Alpaca data feed for --stream (iex or sip)")
+    live.add_argument("--fast", type=int, default=20)
+    live.add_argument("--slow", type=int, default=50)
+    live.add_argument("--rsi", type=float, default=70)
+    live.add_argument("--rsi-length", type=int, default=14)
+    live.add_argument("--metrics-port", type=int, default=None, help="serve Prometheus metrics on this port")
+    live.add_argument("--state-dir", help="engine snapshots for warm restarts (default: data/engine_state)")
+    live.add_argument("--fresh", action="store_true", help="discard the saved snapshot and warm up from history")
+    live.set_defaults(handler=paper_trade)
+
+    screen = commands.add_parser("scan", help="screen every symbol in the local bar store")
+    screen.add_argument("--symbols", nargs="*", help="default: every symbol stored for --timeframe")
+    screen.add_argument("--timeframe", default="1Day")
+    screen.add_argument("--where", action="append",
+                        help="condition, e.g. 'RSI < 30' or oversold, golden_cross, volume_spike (repeatable)")
+    screen.add_argument("--sort", help="column or expression to rank by, e.g. volume_ratio")
+    screen.add_argument("--ascending", action="store_true")
+    screen.add_argument("--top", type=int, default=20, help="rows to print")
+    screen.add_argument("--fast", type=int, default=20)
+    screen.add_argument("--slow", type=int, default=50)
+    screen.add_argument("--rsi", type=float, default=70)
+    screen.add_argument("--rsi-length", type=int, default=14)
+    screen.add_argument("--volume-window", type=int, default=20, help="bars in the volume_ratio baseline")
+    screen.add_argument("--lookback", type=int, default=500, help="bars replayed per symbol")
+    screen.set_defaults(handler=scan)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+# src/compact_bars.py
+"""
+Memory-lean bar container (opt-in alternative to OHLCV DataFrames).
+
+CompactBars keeps one or many symbols' bars in flat typed columns, grouped by
+symbol and time-sorted within each group:
+
+    ts                    int64    UTC epoch ns
+    symbol                pandas Categorical (int16 codes + one copy of each name)
+    Open/High/Low/Close   float32  (dtype=np.float64 keeps full precision)
+    Volume                int64
+
+Unused source columns (yfinance's Dividends / Stock Splits) are dropped. The
+DataFrame functions accept a CompactBars in place of a DataFrame:
+add_sma/add_rsi/add_macd write float32 columns into it, generate_signals adds
+the signal columns and simple_backtest an equity column, all in place. Each
+symbol is processed through views of its slice, upcast to float64 one symbol
+at a time, so no full-universe copy is ever made.
+
+float32 drift: prices are rounded once on load (relative error <= 2**-24,
+about 6e-8); indicators and signals are then computed in float64 from the
+rounded prices, and stored indicator columns are rounded again. Measured
+against the float64 pipeline (benchmarks/bench_compact_bars.py):
+
+    SMA   ~6e-8 relative
+    RSI   built from bar-to-bar changes, so the price error is scaled by
+          price / |change|: ~4e-6 points on daily AAPL, ~2e-3 points on
+          minute bars moving ~0.05%
+    fills at the rounded price, P&L ~1e-7 relative per trade (exact for
+          yfinance closes, which are float32 values already)
+    signals flip only where fast/slow SMA or RSI/threshold are within that
+          error of each other: 2 of 200k minute bars, one extra trade
+
+Use dtype=np.float64 for results bit-identical to the DataFrame pipeline.
+"""
+import numpy as np
+import pandas as pd
+
+from src.bar_store import COLUMNS, dates_to_ns
+
+PRICE_COLUMNS = ["Open", "High", "Low", "Close"]
+
+
+class CompactBars:
+    def __init__(self, ts, symbol: pd.Categorical, columns: dict, dtype=np.float32):
+        self.ts = ts
+        self.symbol = symbol
+        self.columns = columns  # name -> 1-D array aligned with ts
+        self.dtype = np.dtype(dtype)
+        codes = symbol.codes
+        # symbols are contiguous groups: boundaries where the code changes
+        edges = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+        starts = np.concatenate(([0], edges)) if len(codes) else np.empty(0, np.int64)
+        ends = np.concatenate((edges, [len(codes)])) if len(codes) else np.empty(0, np.int64)
+        self._slices = {symbol.categories[codes[lo]]: slice(int(lo), int(hi)) for lo, hi in zip(starts, ends)}
+        if len(self._slices) != len(starts):
+            raise ValueError("CompactBars rows must be grouped by symbol")
+
+    # ------------------------
+    # construction
+    # ------------------------
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, symbol=None, dtype=np.float32) -> "CompactBars":
+        """
+        From an OHLCV DataFrame (Date column or DatetimeIndex) of one symbol, or
+        of many with a 'symbol' column. Rows are grouped by symbol (stable).
+        """
+        dates = df["Date"] if "Date" in df.columns else df.index
+        ts = dates_to_ns(pd.DatetimeIndex(dates))
+        if "symbol" in df.columns:
+            names = pd.Categorical(df["symbol"])
+            order = np.lexsort((ts, names.codes))
+        else:
+            names = pd.Categorical.from_codes(np.zeros(len(df), np.int16), [symbol or ""])
+            order = np.argsort(ts, kind="stable")
+        identity = np.array_equal(order, np.arange(len(order)))
+        take = (lambda a: a) if identity else (lambda a: a[order])
+        columns = {name: take(df[name].to_numpy(dtype=dtype)) for name in PRICE_COLUMNS}
+        columns["Volume"] = take(df["Volume"].to_numpy(dtype=np.float64)).astype(np.int64)
+        codes = take(names.codes).astype(_code_dtype(len(names.categories)))
+        return cls(take(ts), pd.Categorical.from_codes(codes, names.categories), columns, dtype)
+
+    @classmethod
+    def from_store(cls, store, symbols, timeframe: str, start=None, end=None, dtype=np.float32) -> "CompactBars":
+        """
+        Load symbols from a BarStore into one container. Columns are filled
+        straight from the memory-mapped files, so the float64 data is never
+        fully materialized.
+        """
+        arrays = [store.read_arrays(symbol, timeframe, start, end) for symbol in symbols]
+        present = [(symbol, a) for symbol, a in zip(symbols, arrays) if len(a["ts"])]
+        n = sum(len(a["ts"]) for _, a in present)
+        ts = np.empty(n, np.int64)
+        codes = np.empty(n, _code_dtype(len(present)))
+        columns = {name: np.empty(n, dtype) for name in PRICE_COLUMNS}
+        columns["Volume"] = np.empty(n, np.int64)
+        lo = 0
+        for code, (_, a) in enumerate(present):
+            hi = lo + len(a["ts"])
+            ts[lo:hi] = a["ts"]
+            codes[lo:hi] = code
+            for name in COLUMNS:
+                columns[name][lo:hi] = a[name]
+            lo = hi
+        return cls(ts, pd.Categorical.from_codes(codes, [symbol for symbol, _ in present]), columns, dtype)
+
+    # ------------------------
+    # access
+    # ------------------------
+    def __len__(self):
+        return len(self.ts)
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def __getitem__(self, name) -> np.ndarray:
+        return self.columns[name]
+
+    def __setitem__(self, name, values):
+        values = np.asarray(values)
+        if values.shape != self.ts.shape:
+            raise ValueError(f"column {name!r} has shape {values.shape}, expected {self.ts.shape}")
+        self.columns[name] = values
+
+    @property
+    def symbols(self) -> list:
+        return list(self._slices)
+
+    def rows(self, symbol) -> slice:
+        """Row range of one symbol (column[bars.rows(symbol)] is a view)."""
+        return self._slices[symbol]
+
+    def column(self, name, dtype=None) -> np.ndarray:
+        """Existing column, or a new NaN-filled one (default: the price dtype)."""
+        if name not in self.columns:
+            self.columns[name] = np.full(len(self), np.nan, dtype=dtype or self.dtype)
+        return self.columns[name]
+
+    def apply(self, name, fn, column="Close"):
+        """
+        Per symbol: out[rows] = fn(float64 copy of column[rows]). Writes the
+        result column `name` in place and returns self.
+        """
+        source = self.columns[column]
+        out = self.column(name)
+        for rows in self._slices.values():
+            out[rows] = fn(source[rows].astype(np.float64))
+        return self
+
+    @property
+    def nbytes(self) -> int:
+        return (self.ts.nbytes + self.symbol.codes.nbytes + sum(c.nbytes for c in self.columns.values()))
+
+    def to_frame(self, symbol=None) -> pd.DataFrame:
+        """One symbol (or all, with a categorical 'symbol' column) as a DataFrame with a UTC Date column."""
+        rows = self.rows(symbol) if symbol is not None else slice(None)
+        df = pd.DataFrame({name: values[rows] for name, values in self.columns.items()}, copy=False)
+        df.insert(0, "Date", pd.to_datetime(self.ts[rows], utc=True))
+        if symbol is None:
+            df.insert(1, "symbol", self.symbol)
+        return df
+
+    def __repr__(self):
+        return (f"CompactBars({len(self)} bars, {len(self._slices)} symbols, {self.dtype.name}, "
+                f"{self.nbytes / 1e6:.1f} MB, columns={list(self.columns)})")
+
+
+def _code_dtype(n_symbols):
+    return np.int16 if n_symbols < 2 ** 15 else np.int32
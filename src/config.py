@@ -1,9 +1,34 @@
-import os
-from dotenv import load_dotenv
+# src/config.py
+"""
+Settings read from the environment (and a .env file, via python-dotenv).
 
-load_dotenv()
+Importing this module has no side effects: .env is loaded on the first
+attribute access, e.g. config.ALPACA_API_KEY_ID when a broker is created, so
+headless tools that never talk to Alpaca do not pay for it.
+"""
+import os
 
 # Alpaca
-ALPACA_API_KEY_ID = os.getenv("ALPACA_API_KEY_ID")
-ALPACA_API_SECRET_KEY = os.getenv("ALPACA_API_SECRET_KEY")
-ALPACA_BASE_URL = os.getenv("ALPACA_BASE_URL", "https://paper-api.alpaca.markets")
+_DEFAULTS = {
+    "ALPACA_API_KEY_ID": None,
+    "ALPACA_API_SECRET_KEY": None,
+    "ALPACA_BASE_URL": "https://paper-api.alpaca.markets",
+}
+
+_loaded = False
+
+
+def load():
+    """Load .env into os.environ once (variables already set win)."""
+    global _loaded
+    if not _loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _loaded = True
+
+
+def __getattr__(name):
+    if name not in _DEFAULTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    load()
+    return os.getenv(name, _DEFAULTS[name])
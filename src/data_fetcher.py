@@ -1,22 +1,89 @@
 # src/data_fetcher.py
-import yfinance as yf
+import re
 import pandas as pd
 from pathlib import Path
+from src.bar_store import BarStore, STORE_DIR, to_ns
+from src.resample import Resampler
 
-CACHE_DIR = Path(__file__).resolve().parent.parent / "data"
-CACHE_DIR.mkdir(exist_ok=True)
+CACHE_DIR = Path(__file__).resolve().parent.parent / "data"  # legacy CSV cache, read only
 
-def fetch_history_yfinance(ticker: str, period="1y", interval="1d", force_download=False) -> pd.DataFrame:
+YF_STORE = BarStore(STORE_DIR / "yfinance")
+# longer intervals from stored 1m bars; yfinance bars cover the regular session only
+YF_RESAMPLER = Resampler(YF_STORE, source="1m", session="regular")
+
+_PERIOD_UNITS = {"d": "days", "wk": "weeks", "mo": "months", "y": "years"}
+
+# coverage start recorded for period="max" downloads
+MAX_START = pd.Timestamp.min.value
+
+
+def period_start(period: str, anchor: pd.Timestamp):
+    """Start of a yfinance `period` ending at `anchor` (None for 'max')."""
+    if period == "max":
+        return None
+    if period == "ytd":
+        return anchor.normalize().replace(month=1, day=1)
+    match = re.fullmatch(r"(\d+)(d|wk|mo|y)", period)
+    if not match:
+        raise ValueError(f"Unsupported period: {period!r}")
+    return anchor - pd.DateOffset(**{_PERIOD_UNITS[match.group(2)]: int(match.group(1))})
+
+
+def _covered_window(ticker, period, interval):
     """
-    Returns DataFrame with columns: ['Open','High','Low','Close','Adj Close','Volume']
-    Caches to data/<ticker>.csv
+    [start, end] of `period` anchored at the end of what the store already
+    holds (the old CSV cache was never refreshed either), or None when the
+    store does not cover it.
     """
+    coverage = YF_STORE.coverage(ticker, interval)
+    if not coverage:
+        return None
+    cov_start, cov_end = coverage[-1]
+    anchor = pd.Timestamp(cov_end, tz="UTC")
+    start = period_start(period, anchor)
+    if cov_start <= (MAX_START if start is None else to_ns(start)):
+        return start, anchor
+    return None
+
+
+def _import_legacy_csv(ticker, period, interval):
+    """Move an old data/<ticker>_<period>_<interval>.csv cache into the bar store."""
     cache_file = CACHE_DIR / f"{ticker.replace(':','_')}_{period}_{interval}.csv"
-    if cache_file.exists() and not force_download:
-        df = pd.read_csv(cache_file, index_col=0, parse_dates=True)
-        return df
+    if not cache_file.exists():
+        return
+    df = pd.read_csv(cache_file)
+    df = df.rename(columns={df.columns[0]: "Date"})
+    df["Date"] = pd.to_datetime(df["Date"], utc=True)
+    if df.empty:
+        return
+    last = df["Date"].iloc[-1]
+    start = period_start(period, last)
+    YF_STORE.write(ticker, interval, df, start=MAX_START if start is None else start, end=last)
+
+
+def fetch_history_yfinance(ticker: str, period="1y", interval="1d", force_download=False) -> pd.DataFrame:
+    """
+    Returns DataFrame indexed by Date with columns: ['Open','High','Low','Close','Volume']
+    Served from the local bar store (data/store/yfinance), derived from its 1m
+    bars when those cover `period`; downloads only when the store does not
+    cover `period` yet or force_download is set.
+    """
+    if not force_download:
+        if YF_RESAMPLER.derives(interval):
+            window = _covered_window(ticker, period, "1m")
+            if window is not None:
+                return YF_RESAMPLER.bars(ticker, interval, start=window[0], end=window[1]).set_index("Date")
+        window = _covered_window(ticker, period, interval)
+        if window is None:
+            _import_legacy_csv(ticker, period, interval)
+            window = _covered_window(ticker, period, interval)
+        if window is not None:
+            return YF_STORE.read(ticker, interval, start=window[0], end=window[1]).set_index("Date")
 
+    import yfinance as yf
     tk = yf.Ticker(ticker)
     df = tk.history(period=period, interval=interval)
-    df.to_csv(cache_file)
-    return df
+    now = pd.Timestamp.now(tz="UTC")
+    start = period_start(period, now)
+    YF_STORE.write(ticker, interval, df, start=MAX_START if start is None else start, end=now)
+    return YF_STORE.read(ticker, interval, start=start, end=now).set_index("Date")
@@ -1,27 +1,135 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import numpy as np
 import pandas as pd
-from src.broker_alpaca import AlpacaBroker
+from src.bar_store import BarStore, STORE_DIR, timeframe_delta, to_ns
 from src.utils import to_rfc3339
 
-def fetch_history_alpaca(symbol: str, 
-                         start: datetime, 
-                         end: datetime, 
-                         timeframe="1Day") -> pd.DataFrame:
+ALPACA_STORE = BarStore(STORE_DIR / "alpaca")
+
+# bars per get_bars request when splitting large backfills into pages
+MAX_BARS_PER_REQUEST = 10_000
+MARKET_TZ = "America/New_York"
+
+BAR_COLUMNS = ["Date", "Open", "High", "Low", "Close", "Volume"]
+
+
+def fetch_history_alpaca(symbol: str,
+                         start: datetime,
+                         end: datetime,
+                         timeframe="1Day",
+                         store: BarStore = None,
+                         api=None) -> pd.DataFrame:
     """
     Fetch historical OHLCV bars from Alpaca using IEX feed (free plan).
+    Only the parts of [start, end] missing from the local bar store are requested.
+    """
+    if api is None:
+        from src.broker_alpaca import AlpacaBroker
+        api = AlpacaBroker().api
+    return fetch_bars_incremental(api, symbol, start, end, timeframe, store=store)
+
+
+def fetch_bars_incremental(api, symbol: str, start, end, timeframe="1Day", store: BarStore = None,
+                           max_workers=4, max_bars=MAX_BARS_PER_REQUEST) -> pd.DataFrame:
+    """
+    Serve [start, end] from the bar store, requesting only the missing head,
+    tail (and interior) segments. Large segments are split into pages that
+    are fetched concurrently, then merged into the store in one write.
+    """
+    store = store or ALPACA_STORE
+    start_ns, end_ns = to_ns(start), to_ns(end)
+    gaps = missing_ranges(store.coverage(symbol, timeframe), start_ns, end_ns)
+
+    if gaps:
+        pages = [page for lo, hi in gaps for page in split_range(lo, hi, timeframe, max_bars)]
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pages)))) as pool:
+            frames = list(pool.map(lambda page: download_bars_alpaca(
+                api, symbol, _ts(page[0]).floor("s"), _ts(page[1]).ceil("s"), timeframe), pages))
+        bars = pd.concat(frames, ignore_index=True)
+
+        # the newest bar may still be forming, so only mark the tail as covered
+        # up to one bar ago; the next call re-requests that bar
+        safe_end = min(end_ns, to_ns(pd.Timestamp.now(tz="UTC") - timeframe_delta(timeframe)))
+        coverage = [(lo, min(hi, safe_end)) for lo, hi in gaps if lo <= min(hi, safe_end)]
+        store.write(symbol, timeframe, bars, coverage=coverage)
+
+    df = store.read(symbol, timeframe, start=start_ns, end=end_ns)
+    gaps_found = find_session_gaps(df["Date"], timeframe)
+    if gaps_found:
+        logging.warning(f"{symbol} {timeframe}: {len(gaps_found)} gap(s) inside market sessions, "
+                        f"first after {gaps_found[0][0]}")
+    return df
+
+
+def missing_ranges(coverage, start_ns: int, end_ns: int):
+    """Parts of [start_ns, end_ns] not inside any covered (inclusive) range."""
+    missing = []
+    cursor = start_ns
+    for lo, hi in sorted(coverage):
+        if hi < cursor:
+            continue
+        if lo > end_ns:
+            break
+        if lo > cursor:
+            missing.append((cursor, lo - 1))
+        cursor = max(cursor, hi + 1)
+        if cursor > end_ns:
+            return missing
+    if cursor <= end_ns:
+        missing.append((cursor, end_ns))
+    return missing
+
+
+def split_range(lo: int, hi: int, timeframe, max_bars=MAX_BARS_PER_REQUEST):
+    """Split [lo, hi] (ns) into consecutive pages of at most `max_bars` bar lengths."""
+    page = int(timeframe_delta(timeframe).value) * max_bars
+    return [(s, min(s + page - 1, hi)) for s in range(lo, hi + 1, page)]
+
+
+def find_session_gaps(dates, timeframe, max_missing=0):
+    """
+    Continuity check across market sessions: returns (prev, next) timestamp
+    pairs where more than `max_missing` bars are absent inside one New York
+    trading day (intraday), or where daily bars skip more than a long weekend.
+    Overnight and weekend breaks are not gaps. IEX bars can legitimately be
+    sparse, so callers treat the result as a warning.
     """
-    broker = AlpacaBroker()
+    dates = pd.DatetimeIndex(dates)
+    if len(dates) < 2:
+        return []
+    if dates.tz is None:
+        dates = dates.tz_localize("UTC")
+    step = timeframe_delta(timeframe)
+    diffs = np.diff(dates.asi8)
+    if step >= pd.Timedelta(days=1):
+        bad = diffs > pd.Timedelta(days=4).value
+    else:
+        local_day = dates.tz_convert(MARKET_TZ).normalize().asi8
+        bad = (local_day[1:] == local_day[:-1]) & (diffs > step.value * (max_missing + 1))
+    idx = np.flatnonzero(bad)
+    return [(dates[i], dates[i + 1]) for i in idx]
+
+
+def _ts(ns: int) -> pd.Timestamp:
+    return pd.Timestamp(ns, tz="UTC")
+
 
+def download_bars_alpaca(api, symbol: str, start: datetime, end: datetime, timeframe="1Day") -> pd.DataFrame:
+    """One get_bars request, normalized to the backtester schema."""
     start_str = to_rfc3339(start)
     end_str = to_rfc3339(end)
 
-    bars = broker.api.get_bars(
+    bars = api.get_bars(
         symbol,
         timeframe,
         start=start_str,
         end=end_str,
         feed="iex"   # 👈 free plan requires IEX feed
     ).df
+    if bars.empty:
+        return pd.DataFrame(columns=BAR_COLUMNS)
 
     # Reset index so timestamp is a column
     bars = bars.reset_index()
@@ -37,4 +145,4 @@ def fetch_history_alpaca(symbol: str,
     })
 
     # Keep only what backtester needs
-    return bars[["Date", "Open", "High", "Low", "Close", "Volume"]]
+    return bars[BAR_COLUMNS]
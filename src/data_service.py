@@ -0,0 +1,243 @@
+# src/data_service.py
+"""
+Shared, cached market/account data for the UI and the engines.
+
+One DataService owns one broker client (its REST session is reused for every
+call) and keeps account, positions and bars in TTL caches. A background
+refresher reloads the watched entries before they expire, so page renders
+read memory instead of waiting on REST round trips; an entry that has expired
+is still served while its reload runs (stale-while-revalidate). Unwatched
+entries (fixed bar ranges) are evicted least recently used beyond
+`max_entries`. Orders placed through the service, and every update of one,
+invalidate account and positions immediately. Cached values are shared
+between callers: copy before mutating them.
+
+The service also quacks like a broker (.api, place_order, and submit_order,
+find_order and track_order when the wrapped broker has an order gateway) so
+an engine built on it routes its orders through the same client and cache
+invalidation.
+"""
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from src.data_fetcher_alpaca import fetch_bars_incremental
+from src.resample import Resampler
+
+DEFAULT_TTL = {"account": 10.0, "positions": 10.0, "bars": 60.0}
+_GATEWAY_CALLS = ("submit_order", "find_order", "track_order")
+
+
+class _Entry:
+    __slots__ = ("value", "loaded_at", "ttl", "loader", "watch", "loading", "lock")
+
+    def __init__(self, loader, ttl, watch):
+        self.value = None
+        self.loaded_at = None
+        self.ttl = ttl
+        self.loader = loader
+        self.watch = watch
+        self.loading = False
+        self.lock = threading.Lock()
+
+
+class TTLCache:
+    """
+    Thread-safe cache of loader results. A missing entry is loaded by the
+    caller (concurrent callers wait for one load); an expired one is returned
+    as is while a background reload runs. Past `max_entries`, the least
+    recently used unwatched entries are dropped.
+    """
+
+    def __init__(self, max_workers=4, max_entries=None):
+        self._entries = OrderedDict()
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="cache-refresh")
+        self.stats = Counter()
+
+    def get(self, key, loader, ttl, watch=False):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry(loader, ttl, watch)
+                self._evict()
+            else:
+                self._entries.move_to_end(key)
+            entry.loader, entry.ttl, entry.watch = loader, ttl, entry.watch or watch
+        if entry.loaded_at is None:
+            with entry.lock:  # single flight: the first caller loads, the others reuse its result
+                if entry.loaded_at is None:
+                    self._count("miss")
+                    self._load(entry)
+                    return entry.value
+        if time.monotonic() - entry.loaded_at < entry.ttl:
+            self._count("hit")
+        else:
+            self._count("stale")
+            self.refresh(key)
+        return entry.value
+
+    def _evict(self):
+        """Drop least recently used unwatched entries beyond max_entries (holding self._lock)."""
+        if self.max_entries is None or len(self._entries) <= self.max_entries:
+            return
+        for key in [key for key, e in self._entries.items() if not e.watch][:len(self._entries) - self.max_entries]:
+            del self._entries[key]
+            self.stats["evict"] += 1
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _load(self, entry):
+        value = entry.loader()
+        entry.value, entry.loaded_at = value, time.monotonic()
+
+    def refresh(self, key):
+        """Reload one entry in the background (no-op if a reload is already running)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.loading:
+                return
+            entry.loading = True
+        self._pool.submit(self._reload, entry)
+
+    def _reload(self, entry):
+        try:
+            with entry.lock:
+                self._load(entry)
+            self._count("refresh")
+        except Exception as e:
+            logging.warning(f"Cache refresh failed: {e}")
+        finally:
+            entry.loading = False
+
+    def invalidate(self, *keys):
+        """Drop entries (a key or a key prefix tuple, e.g. ('bars',)) so the next get reloads them."""
+        with self._lock:
+            for key in list(self._entries):
+                if any(key == k or (isinstance(key, tuple) and key[:len(k)] == k) for k in keys):
+                    del self._entries[key]
+                    self.stats["invalidate"] += 1
+
+    def due(self, lead=0.8):
+        """Watched keys older than `lead` x their TTL."""
+        now = time.monotonic()
+        with self._lock:
+            return [key for key, e in self._entries.items()
+                    if e.watch and e.loaded_at is not None and now - e.loaded_at >= lead * e.ttl]
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+class DataService:
+    def __init__(self, broker=None, ttl=None, refresh_interval=2.0, store=None, max_entries=256):
+        if broker is None:
+            from src.broker_alpaca import AlpacaBroker
+            broker = AlpacaBroker()
+        self.broker = broker
+        self.ttl = {**DEFAULT_TTL, **(ttl or {})}
+        self.refresh_interval = refresh_interval
+        self.store = store
+        self.resampler = Resampler(store)  # higher timeframes from stored minute bars
+        self.cache = TTLCache(max_entries=max_entries)
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ------------------------
+    # cached reads
+    # ------------------------
+    def account(self) -> dict:
+        return self.cache.get(("account",), self.broker.get_account, self.ttl["account"], watch=True)
+
+    def positions(self) -> list:
+        return self.cache.get(("positions",), self.broker.get_positions, self.ttl["positions"], watch=True)
+
+    def bars(self, symbol, start, end, timeframe="1Day"):
+        """
+        Historical bars for a fixed range (cached until invalidated or expired,
+        not refreshed). Derived from the stored 1Min bars when they cover the
+        range, so any timeframe of data already held costs no request.
+        """
+        def load():
+            if self.resampler.covers(symbol, timeframe, start, end):
+                return self.resampler.bars(symbol, timeframe, start, end)
+            return fetch_bars_incremental(self.broker.api, symbol, start, end, timeframe, store=self.store)
+        return self.cache.get(("bars", symbol, timeframe, str(start), str(end)), load, self.ttl["bars"])
+
+    def recent_bars(self, symbol, timeframe="1Day", lookback_days=30):
+        """The last `lookback_days` of bars, kept current by the refresher."""
+        def load():
+            end = datetime.now(timezone.utc)
+            return fetch_bars_incremental(self.broker.api, symbol, end - timedelta(days=lookback_days), end,
+                                          timeframe, store=self.store)
+        return self.cache.get(("bars", symbol, timeframe, "recent", lookback_days), load, self.ttl["bars"],
+                              watch=True)
+
+    # ------------------------
+    # broker pass-through
+    # ------------------------
+    @property
+    def api(self):
+        return self.broker.api
+
+    def place_order(self, symbol, qty, *args, **kwargs):
+        """Place an order with the shared client and drop the account/position entries it changes."""
+        try:
+            return self.broker.place_order(symbol, qty, *args, **kwargs)
+        finally:
+            self.cache.invalidate(("account",), ("positions",))
+
+    def __getattr__(self, name):
+        # the order gateway calls exist only if the wrapped broker has them: engines test for them
+        if name in _GATEWAY_CALLS and hasattr(self.__dict__.get("broker"), name):
+            return getattr(self, f"_{name}")
+        raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+
+    def _submit_order(self, symbol, qty, *args, on_update=None, **kwargs):
+        """Queue an order through the broker's gateway; each of its updates drops the account/positions."""
+        return self.broker.submit_order(symbol, qty, *args, on_update=self._invalidating(on_update), **kwargs)
+
+    def _find_order(self, client_order_id):
+        return self.broker.find_order(client_order_id)
+
+    def _track_order(self, order, on_update=None):
+        return self.broker.track_order(order, on_update=self._invalidating(on_update))
+
+    def _invalidating(self, on_update):
+        def update(ticket, event):
+            self.cache.invalidate(("account",), ("positions",))
+            if on_update is not None:
+                on_update(ticket, event)
+        return update
+
+    def stats(self) -> dict:
+        """Cache hit/miss/stale/refresh/invalidate counters."""
+        return dict(self.cache.stats)
+
+    # ------------------------
+    # background refresher
+    # ------------------------
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._refresh_loop, name="data-service", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the refresher and the cache's reload threads (the service is not restartable)."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.cache.close()
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.refresh_interval):
+            for key in self.cache.due():
+                self.cache.refresh(key)
@@ -0,0 +1,358 @@
+# src/event_engine.py
+"""
+Event-driven core shared by backtests and live trading.
+
+Bars are fed one at a time into a strategy object with incremental state
+(e.g. SignalStrategy around StreamingSignals). The strategy calls buy()/sell()
+on the engine, which sizes the order, hands it to an execution backend and
+books the fill. Only the bar source and the execution backend differ between
+modes:
+
+    backtest: replay_bars(...) over stored history + SimulatedExecution
+    live:     PolledBarFeed(...) over polled bars  + BrokerExecution
+
+Live feeds only emit closed bars, so a strategy sees exactly the bars a
+replay of the same history would and places the same trades.
+"""
+import inspect
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.bar_store import dates_to_ns, timeframe_delta
+
+
+class Bar:
+    __slots__ = ("ts", "open", "high", "low", "close", "volume")
+
+    def __init__(self, ts, open, high, low, close, volume):
+        self.ts = ts  # UTC epoch ns of the bar start
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+
+    def __repr__(self):
+        return f"Bar({pd.Timestamp(self.ts, tz='UTC')}, close={self.close})"
+
+
+class Order:
+    __slots__ = ("id", "ts", "symbol", "side", "qty", "price", "pnl")
+
+    def __init__(self, ts, symbol, side, qty, price, id=None, pnl=None):
+        self.id = id
+        self.ts = ts
+        self.symbol = symbol
+        self.side = side  # 'buy' or 'sell'
+        self.qty = qty
+        self.price = price  # fill price once executed, else the reference price
+        self.pnl = pnl
+
+    def as_tuple(self):
+        return self.ts, self.side, self.qty, self.price
+
+    def __repr__(self):
+        return f"Order({self.side} {self.qty} {self.symbol} @ {self.price}, ts={self.ts}, id={self.id})"
+
+
+# ------------------------
+# Bar sources
+# ------------------------
+def replay_bars(data, start=None, end=None):
+    """
+    Yield Bars from a DataFrame (Date column or DatetimeIndex, OHLCV columns)
+    or a BarStore.read_arrays() dict, oldest first, at full speed.
+    """
+    return _bars(_replay_columns(data, start, end))
+
+
+def _bars(columns):
+    for row in zip(*(c.tolist() for c in columns)):
+        yield Bar(*row)
+
+
+def _replay_columns(data, start, end) -> list:
+    """[ts, open, high, low, close, volume] arrays of the bars between start and end."""
+    if isinstance(data, pd.DataFrame):
+        dates = data["Date"] if "Date" in data.columns else data.index
+        columns = [dates_to_ns(pd.to_datetime(dates, utc=True))] + [data[c].to_numpy(dtype=np.float64) for c in
+                                                                    ("Open", "High", "Low", "Close", "Volume")]
+    else:
+        columns = [np.asarray(data["ts"])] + [np.asarray(data[c]) for c in ("Open", "High", "Low", "Close", "Volume")]
+    ts = columns[0]
+    lo = 0 if start is None else int(np.searchsorted(ts, start))
+    hi = len(ts) if end is None else int(np.searchsorted(ts, end, side="right"))
+    return [c[lo:hi] for c in columns]
+
+
+class PolledBarFeed:
+    """
+    Live bar source: polls fetch(start) -> DataFrame every `poll_interval`
+    seconds and yields each bar once it has closed (start + timeframe <= now),
+    in order and without duplicates. Iteration ends when running() is False.
+    """
+
+    def __init__(self, fetch, timeframe, poll_interval=60, start=None, running=lambda: True, clock=time.time_ns,
+                 sleep=time.sleep):
+        self.fetch = fetch
+        self.bar_ns = int(timeframe_delta(timeframe).value)
+        self.poll_interval = poll_interval
+        self.last_ts = start  # epoch ns of the last bar emitted
+        self.running = running
+        self.clock = clock
+        self.sleep = sleep
+
+    def poll(self) -> list:
+        """Closed bars newer than the last emitted one, from a single fetch."""
+        start = pd.Timestamp(self.last_ts, tz="UTC") if self.last_ts is not None else None
+        df = self.fetch(start)
+        if df is None or df.empty:
+            return []
+        closed_before = self.clock() - self.bar_ns
+        bars = [bar for bar in replay_bars(df) if bar.ts <= closed_before
+                and (self.last_ts is None or bar.ts > self.last_ts)]
+        if bars:
+            self.last_ts = bars[-1].ts
+        return bars
+
+    def __iter__(self):
+        while self.running():
+            try:
+                yield from self.poll()
+            except Exception as e:
+                logging.error(f"Error polling bars: {e}")
+            if self.running():
+                self.sleep(self.poll_interval)
+
+
+# ------------------------
+# Execution backends
+# ------------------------
+class SimulatedExecution:
+    """Fills every order immediately at its reference price (the bar close), like simple_backtest."""
+
+    def __init__(self):
+        self._next_id = 1
+
+    def execute(self, order: Order, bar: Bar) -> Order:
+        order.id = self._next_id
+        self._next_id += 1
+        return order
+
+
+class BrokerExecution:
+    """
+    Sends orders to a broker (AlpacaBroker, DataService, FakeAlpacaBroker) as
+    market orders. Brokers with submit_order (AlpacaBroker's order gateway)
+    are not waited on: the order is queued, order.id is its client order id
+    (the one already set on the order, if any) and on_update(ticket, event)
+    follows it from the gateway's threads. Others get the order's reference
+    price too when their place_order takes one (MockBroker fills market
+    orders at it).
+    """
+
+    def __init__(self, broker):
+        self.broker = broker
+        place_order = getattr(broker, "place_order", None)
+        self._pass_price = place_order is not None and _accepts(place_order, "price")
+
+    def execute(self, order: Order, bar: Bar, on_update=None) -> Order:
+        submit = getattr(self.broker, "submit_order", None)
+        if submit is not None:
+            order.id = submit(order.symbol, order.qty, side=order.side, on_update=on_update,
+                              client_order_id=order.id).client_order_id
+            return order
+        if self._pass_price:
+            response = self.broker.place_order(order.symbol, order.qty, side=order.side, price=order.price)
+        else:
+            response = self.broker.place_order(order.symbol, order.qty, side=order.side)
+        logging.info(f"Order response: {response}")
+        order.id = response["id"] if isinstance(response, dict) else response.id
+        # P&L is booked at the bar close the decision was made on, as in the backtest
+        return order
+
+
+def _accepts(fn, name) -> bool:
+    try:
+        parameters = inspect.signature(fn).parameters.values()
+    except (TypeError, ValueError):
+        return False
+    return any(p.name == name or p.kind is p.VAR_KEYWORD for p in parameters)
+
+
+# ------------------------
+# Strategies
+# ------------------------
+class SignalStrategy:
+    """
+    Long-only entry/exit strategy around an incremental signal generator such
+    as StreamingSignals: buys on entry when flat, sells on exit when long.
+    qty=None sizes entries all-in (cash // price) like simple_backtest.
+
+    For replays (EventEngine.replay) precompute(closes) has the signals
+    computed for every bar at once when the generator has a batch(closes)
+    giving what update() would, bit for bit (StreamingSignals: pandas'
+    rolling and ewm, whose arithmetic its indicators follow); on_bar then
+    only reads them. The incremental signals do not see those bars.
+    """
+
+    def __init__(self, signals, qty=None):
+        self.signals = signals
+        self.qty = qty
+        self._latest = None
+        self._batch = None  # precomputed columns while on_bar reads them
+        self._entry = self._exit = ()
+        self._next = 0
+
+    @property
+    def latest(self):
+        """The signals of the last bar seen (a dict like StreamingSignals.update's)."""
+        if self._batch is not None and self._next:
+            return {name: values[self._next - 1].item() for name, values in self._batch.items()}
+        return self._latest
+
+    def on_bar(self, bar: Bar, engine: "EventEngine"):
+        if self._batch is not None:
+            i = self._next
+            if i < len(self._entry):
+                self._next = i + 1
+                entry, exit_ = self._entry[i], self._exit[i]
+            else:
+                # past the precomputed bars: back to the incremental signals
+                self._latest, self._batch = self.latest, None
+                return self.on_bar(bar, engine)
+        else:
+            latest = self._latest = self.signals.update(bar.close)
+            entry, exit_ = latest["entry"], latest["exit"]
+        if entry and engine.position == 0:
+            engine.buy(self.qty)
+        elif exit_ and engine.position > 0:
+            engine.sell()
+
+    def precompute(self, closes) -> bool:
+        """Compute the signals of the next len(closes) bars at once; False if the generator cannot."""
+        batch = getattr(self.signals, "batch", None)
+        columns = batch(closes) if batch is not None else None
+        if columns is None:
+            return False
+        self._batch, self._next = columns, 0
+        self._entry, self._exit = columns["entry"].tolist(), columns["exit"].tolist()
+        return True
+
+
+# ------------------------
+# Engine
+# ------------------------
+class EventEngine:
+    """
+    Position and cash bookkeeping for one symbol. Call on_bar() per bar (or
+    run(feed)); strategies place orders with buy()/sell() from on_bar.
+    on_fill(order) is called after every fill, e.g. to journal it.
+    """
+
+    def __init__(self, strategy, execution=None, symbol="", initial_capital=10000, on_fill=None,
+                 record_equity=False):
+        self.strategy = strategy
+        self.execution = execution or SimulatedExecution()
+        self.symbol = symbol
+        self.initial_capital = initial_capital
+        self.cash = float(initial_capital)
+        self.position = 0
+        self.entry_price = None
+        self.fills = []
+        self.on_fill = on_fill
+        self.trading = True
+        self.bar = None
+        self.equity = [] if record_equity else None
+
+    def on_bar(self, bar: Bar):
+        self.bar = bar
+        self.strategy.on_bar(bar, self)
+        if self.equity is not None:
+            self.equity.append(self.cash + self.position * bar.close)
+
+    def run(self, feed):
+        """Consume a bar source (replay_bars, PolledBarFeed, any iterable of Bars); returns the fills."""
+        on_bar = self.on_bar
+        for bar in feed:
+            on_bar(bar)
+        return self.fills
+
+    def replay(self, data, start=None, end=None):
+        """
+        run(replay_bars(data, start, end)), but a strategy with precompute()
+        (SignalStrategy) first computes its signals for all the bars at once.
+        Same fills; use run() for history a live session continues from.
+        """
+        columns = _replay_columns(data, start, end)
+        precompute = getattr(self.strategy, "precompute", None)
+        if precompute is not None:
+            precompute(columns[4])
+        return self.run(_bars(columns))
+
+    def warmup(self, feed):
+        """Feed history to the strategy without trading (live start-up)."""
+        self.trading = False
+        try:
+            for bar in feed:
+                self.bar = bar
+                self.strategy.on_bar(bar, self)
+        finally:
+            self.trading = True
+
+    def buy(self, qty=None):
+        price = self.bar.close
+        qty = self.cash // price if qty is None else qty
+        if not self.trading or qty <= 0:
+            return None
+        order = self.execution.execute(Order(self.bar.ts, self.symbol, "buy", qty, price), self.bar)
+        self.cash -= order.qty * order.price
+        self.position += order.qty
+        self.entry_price = order.price
+        return self._filled(order)
+
+    def sell(self, qty=None):
+        qty = self.position if qty is None else qty
+        if not self.trading or qty <= 0:
+            return None
+        order = self.execution.execute(Order(self.bar.ts, self.symbol, "sell", qty, self.bar.close), self.bar)
+        self.cash += order.qty * order.price
+        self.position -= order.qty
+        if self.entry_price is not None:
+            order.pnl = (order.price - self.entry_price) * order.qty
+        if self.position == 0:
+            self.entry_price = None
+        return self._filled(order)
+
+    def _filled(self, order):
+        self.fills.append(order)
+        if self.on_fill is not None:
+            self.on_fill(order)
+        return order
+
+    def undo(self, order: Order, entry_price=None):
+        """
+        Take back an order booked as filled that the broker then failed,
+        canceled or rejected: position and cash return to what they were, the
+        entry price to `entry_price` (the one before the order) and the fill,
+        if listed, is dropped.
+        """
+        sign = 1 if order.side == "buy" else -1
+        self.position -= sign * order.qty
+        self.cash += sign * order.qty * order.price
+        self.entry_price = entry_price if self.position else None
+        self.fills = [fill for fill in self.fills if fill.id != order.id or order.id is None]
+
+    def trades(self) -> list:
+        """Fills in simple_backtest's trade-dict format."""
+        trades = []
+        for order in self.fills:
+            trade = {"type": order.side.upper(), "qty": order.qty, "price": order.price,
+                     "date": pd.Timestamp(order.ts, tz="UTC")}
+            if order.side == "sell":
+                trade["pnl"] = order.pnl
+            trades.append(trade)
+        return trades
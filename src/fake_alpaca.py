@@ -0,0 +1,434 @@
+# src/fake_alpaca.py
+"""
+Offline stand-in for alpaca_trade_api.rest.REST market data calls.
+
+Serves deterministic synthetic bars (regular US sessions only) or bars taken
+from given DataFrames, and records every request so tests and benchmarks can
+count the network calls a fetch layer would have made. FakeAlpacaBroker wraps
+it with AlpacaBroker's account/position/order calls; FakeAlpacaServer serves
+the trading REST API over local HTTP, with injected latency and failures, for
+src.order_gateway.
+"""
+import heapq
+import json
+import random
+import socket
+import threading
+import time
+import uuid
+import zlib
+from collections import Counter
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from src.bar_store import normalize_timeframe, timeframe_delta
+
+MARKET_TZ = "America/New_York"
+
+
+def session_timestamps(start, end, timeframe="1Day") -> pd.DatetimeIndex:
+    """
+    Bar start times Alpaca would return for [start, end]: weekdays only,
+    09:30-16:00 New York time for intraday bars and midnight New York time
+    for daily bars. Exchange holidays are not modelled.
+    """
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    start = start.tz_localize("UTC") if start.tzinfo is None else start.tz_convert("UTC")
+    end = end.tz_localize("UTC") if end.tzinfo is None else end.tz_convert("UTC")
+    step = timeframe_delta(timeframe)
+    days = pd.date_range(start.tz_convert(MARKET_TZ).normalize() - pd.Timedelta(days=1),
+                         end.tz_convert(MARKET_TZ).normalize(), freq="D")
+    days = days[days.dayofweek < 5]
+    if step >= pd.Timedelta(days=1):
+        stamps = days
+    else:
+        # wall-clock session times per day, localized afterwards so DST is handled
+        n_bars = int(pd.Timedelta(hours=6, minutes=30) / step)
+        offsets = np.timedelta64(pd.Timedelta(hours=9, minutes=30)) + np.timedelta64(step) * np.arange(n_bars)
+        naive = days.tz_localize(None).values[:, None] + offsets[None, :]
+        stamps = pd.DatetimeIndex(naive.ravel()).tz_localize(MARKET_TZ)
+    stamps = stamps.tz_convert("UTC")
+    return stamps[(stamps >= start) & (stamps <= end)]
+
+
+def synthetic_bars(symbols, index: pd.DatetimeIndex) -> pd.DataFrame:
+    """
+    Deterministic per-symbol OHLCV for the given timestamps, stacked symbol by
+    symbol (with a 'symbol' column) and built in one vectorized pass.
+    """
+    symbols = [symbols] if isinstance(symbols, str) else list(symbols)
+    seeds = np.array([zlib.crc32(sym.encode()) for sym in symbols], dtype=np.int64)[:, None]
+    # price depends only on symbol and timestamp, so overlapping requests agree
+    t = (index.asi8 // 60_000_000_000)[None, :]
+    noise = np.sin(t * 1e-3 + seeds) * 0.05 + np.sin(t * 7.3e-5 + seeds % 97) * 0.2
+    close = (50 + seeds % 200) * (1 + noise)
+    open_ = close * (1 - 0.001 * np.cos(t + seeds))
+    high = np.maximum(open_, close) * 1.002
+    low = np.minimum(open_, close) * 0.998
+    volume = (1000 + (t * 2654435761 + seeds) % 5000).astype(np.float64)
+    return pd.DataFrame({"open": open_.ravel(), "high": high.ravel(), "low": low.ravel(), "close": close.ravel(),
+                         "volume": volume.ravel(), "trade_count": (volume // 10).ravel(),
+                         "vwap": ((high + low + close) / 3).ravel(),
+                         "symbol": np.repeat(symbols, len(index))},
+                        index=pd.DatetimeIndex(np.tile(index.values, len(symbols)), name="timestamp", tz="UTC")
+                        if len(symbols) else pd.DatetimeIndex([], name="timestamp", tz="UTC"))
+
+
+class FakeAlpacaREST:
+    """
+    Minimal REST look-alike: get_bars(symbol or [symbols], timeframe, start, end)
+    returning an object with a .df like the SDK's BarsV2. Pass `frames` as
+    {symbol: DataFrame indexed by timestamp with lowercase OHLCV columns} to
+    serve real data; other symbols get synthetic bars.
+    """
+
+    def __init__(self, frames: dict = None):
+        self.frames = frames or {}
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def get_bars(self, symbol, timeframe, start=None, end=None, feed=None, limit=None, **kwargs):
+        symbols = [symbol] if isinstance(symbol, str) else list(symbol)
+        with self._lock:
+            self.calls.append(SimpleNamespace(symbols=symbols, timeframe=normalize_timeframe(str(timeframe)),
+                                              start=start, end=end))
+        start = pd.Timestamp(start) if start is not None else pd.Timestamp("1970-01-01", tz="UTC")
+        end = pd.Timestamp(end) if end is not None else pd.Timestamp.now(tz="UTC")
+
+        parts = []
+        for sym in symbols:
+            if sym in self.frames:
+                frame = self.frames[sym]
+                parts.append(frame[(frame.index >= start) & (frame.index <= end)].assign(symbol=sym))
+        synthetic = [sym for sym in symbols if sym not in self.frames]
+        if synthetic:
+            # one shared session calendar for every synthetic symbol in the request
+            index = session_timestamps(start, end, str(timeframe))
+            parts.append(synthetic_bars(synthetic, index))
+        df = pd.concat(parts) if parts else pd.DataFrame()
+        if len(symbols) == 1 and not df.empty:
+            df = df.drop(columns="symbol")
+        return SimpleNamespace(df=df)
+
+    @property
+    def request_count(self):
+        return len(self.calls)
+
+
+class FakeAlpacaBroker:
+    """
+    Offline AlpacaBroker look-alike: market orders fill instantly at the
+    latest bar's close, bars come from a FakeAlpacaREST (`.api`). Every
+    broker call is counted in `.calls` and can be slowed down by `latency`
+    seconds to mimic REST round trips.
+    """
+
+    def __init__(self, cash=100000.0, frames: dict = None, latency: float = 0.0):
+        self.api = FakeAlpacaREST(frames)
+        self.cash = float(cash)
+        self.latency = latency
+        self.positions = {}  # symbol -> [qty, avg_entry_price]
+        self.calls = Counter()
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def _call(self, name):
+        with self._lock:
+            self.calls[name] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def get_latest_price(self, symbol: str):
+        self._call("get_latest_price")
+        return self._price(symbol)
+
+    def _price(self, symbol):
+        if symbol in self.api.frames:
+            return float(self.api.frames[symbol]["close"].iloc[-1])
+        minute = pd.DatetimeIndex([pd.Timestamp.now(tz="UTC").floor("min")])
+        return float(synthetic_bars([symbol], minute)["close"].iloc[0])
+
+    def get_account(self):
+        self._call("get_account")
+        with self._lock:
+            market_value = sum(qty * self._price(sym) for sym, (qty, _) in self.positions.items())
+            cash = self.cash
+        equity = cash + market_value
+        return {"cash": f"{cash:.2f}", "equity": f"{equity:.2f}", "portfolio_value": f"{equity:.2f}",
+                "buying_power": f"{cash:.2f}", "status": "ACTIVE"}
+
+    def get_positions(self):
+        self._call("get_positions")
+        with self._lock:
+            held = list(self.positions.items())
+        return [{"symbol": sym, "qty": str(qty), "avg_entry_price": f"{avg:.4f}",
+                 "market_value": f"{qty * self._price(sym):.2f}", "side": "long"} for sym, (qty, avg) in held]
+
+    def place_order(self, symbol: str, qty: int, side="buy", order_type="market", time_in_force="gtc", price=None):
+        self._call("place_order")
+        fill = self._price(symbol)
+        with self._lock:
+            held, avg = self.positions.get(symbol, (0, 0.0))
+            if side == "buy":
+                self.cash -= qty * fill
+                avg = (held * avg + qty * fill) / (held + qty)
+                held += qty
+            else:
+                self.cash += qty * fill
+                held -= qty
+            if held:
+                self.positions[symbol] = [held, avg]
+            else:
+                self.positions.pop(symbol, None)
+            order_id = str(self._next_id)
+            self._next_id += 1
+        return {"id": order_id, "symbol": symbol, "qty": str(qty), "side": side, "type": order_type,
+                "status": "filled", "filled_avg_price": f"{fill:.4f}"}
+
+    def close_position(self, symbol: str):
+        held = self.positions.get(symbol, (0, 0.0))[0]
+        if not held:
+            raise ValueError(f"No open position for {symbol}")
+        return self.place_order(symbol, abs(held), side="sell" if held > 0 else "buy")
+
+
+class FakeAlpacaServer:
+    """
+    Local HTTP/1.1 (keep-alive) server for the part of Alpaca's trading REST
+    API the order gateway uses:
+
+        POST /v2/orders                          market orders fill after fill_delay at FakeAlpacaBroker prices
+        GET  /v2/orders                          status=open|closed|all, after, direction, limit
+        GET  /v2/orders/{id}
+        GET  /v2/orders:by_client_order_id       ?client_order_id=...
+        GET  /v2/account, GET /v2/positions
+
+    Faults, drawn from a seeded RNG:
+        latency + exponential jitter   added to every response
+        error_rate                     requests answered 500 without being processed
+        drop_rate                      orders placed whose response is lost (connection closed)
+        rate_limit per rate_window s   further requests get 429 and X-RateLimit-* headers
+    A repeated client_order_id gets Alpaca's 422, a buy above the cash 403.
+
+    `stats` counts requests by route and status, `connections` the TCP
+    connections accepted, `orders` every order ever placed. subscribe(fn)
+    calls fn({'event': ..., 'order': ...}) like a trade_updates stream.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, drop_rate=0.0, rate_limit=None, rate_window=60.0,
+                 fill_delay=0.0, cash=1e9, seed=0, host="127.0.0.1", port=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.fill_delay = fill_delay
+        self.broker = FakeAlpacaBroker(cash=cash)
+        self.orders = {}           # id -> order
+        self.by_client_id = {}     # client_order_id -> order
+        self.stats = Counter()
+        self.connections = 0
+        self._listeners = []
+        self._rng = random.Random(seed)
+        self._window = (None, 0)   # (window start, requests in it)
+        self._fills = []           # heap of (due, sequence, order id)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._running = False
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._running = True
+        threading.Thread(target=self._httpd.serve_forever, name="fake-alpaca-http", daemon=True).start()
+        threading.Thread(target=self._fill_loop, name="fake-alpaca-fills", daemon=True).start()
+        return self
+
+    def stop(self):
+        with self._lock:
+            self._running = False
+            self._wakeup.notify()
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def subscribe(self, listener):
+        self._listeners.append(listener)
+
+    # ------------------------
+    # request handling
+    # ------------------------
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True  # headers and body are separate writes
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+
+            def do_GET(self):
+                self._dispatch("GET")
+
+            def do_POST(self):
+                self._dispatch("POST")
+
+            def _dispatch(self, method):
+                url = urlparse(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length)) if length else None
+                query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                status, payload, headers = server._respond(method, url.path, query, body)
+                if status is None:  # processed, but the answer never arrives
+                    self.close_connection = True
+                    self.connection.shutdown(socket.SHUT_RDWR)
+                    return
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def _respond(self, method, path, query, body):
+        with self._lock:
+            delay = self.latency + (self._rng.expovariate(1 / self.jitter) if self.jitter else 0.0)
+            error, drop = self._rng.random() < self.error_rate, self._rng.random() < self.drop_rate
+        time.sleep(delay)
+        route = "/v2/orders/{id}" if path.startswith("/v2/orders/") else path
+        headers = self._rate_headers()
+        if headers.get("X-RateLimit-Remaining") == "-1":
+            headers["X-RateLimit-Remaining"] = "0"
+            return self._count(method, route, 429, {"code": 42910000, "message": "rate limit exceeded"}, headers)
+        if error:
+            return self._count(method, route, 500, {"message": "internal server error"}, headers)
+        if method == "POST" and path == "/v2/orders":
+            status, payload = self._place(body)
+            if status == 200 and drop:
+                self._count(method, route, "dropped", None, headers)
+                return None, None, None
+        elif method != "GET":
+            status, payload = 405, {"message": "method not allowed"}
+        elif path == "/v2/orders":
+            status, payload = 200, self._list(query)
+        elif path == "/v2/orders:by_client_order_id":
+            order = self.by_client_id.get(query.get("client_order_id"))
+            status, payload = (200, dict(order)) if order else (404, {"message": "order not found"})
+        elif route == "/v2/orders/{id}":
+            order = self.orders.get(path.rsplit("/", 1)[1])
+            status, payload = (200, dict(order)) if order else (404, {"message": "order not found"})
+        elif path == "/v2/account":
+            status, payload = 200, self.broker.get_account()
+        elif path == "/v2/positions":
+            status, payload = 200, self.broker.get_positions()
+        else:
+            status, payload = 404, {"message": "not found"}
+        return self._count(method, route, status, payload, headers)
+
+    def _count(self, method, route, status, payload, headers):
+        with self._lock:
+            self.stats[(method, route, status)] += 1
+        return status, payload, headers
+
+    def _rate_headers(self):
+        if self.rate_limit is None:
+            return {}
+        now = time.time()
+        start = now - now % self.rate_window
+        with self._lock:
+            window, used = self._window
+            used = used + 1 if window == start else 1
+            self._window = (start, used)
+        return {"X-RateLimit-Limit": str(self.rate_limit),
+                "X-RateLimit-Remaining": str(self.rate_limit - used) if used <= self.rate_limit else "-1",
+                "X-RateLimit-Reset": str(int(start + self.rate_window))}
+
+    def _place(self, body):
+        body = body or {}
+        try:
+            qty = float(body["qty"])
+            symbol, side = body["symbol"], body["side"]
+        except (KeyError, TypeError, ValueError):
+            return 422, {"code": 40010001, "message": "invalid order: symbol, qty and side are required"}
+        if qty <= 0 or side not in ("buy", "sell"):
+            return 422, {"code": 40010001, "message": "qty must be > 0 and side buy or sell"}
+        price = self.broker._price(symbol)
+        client_order_id = body.get("client_order_id") or uuid.uuid4().hex
+        now = _timestamp()
+        with self._lock:
+            if client_order_id in self.by_client_id:
+                return 422, {"code": 40010001, "message": "client_order_id must be unique"}
+            if side == "buy" and qty * price > self.broker.cash:
+                return 403, {"code": 40310000, "message": "insufficient buying power"}
+            order = {"id": uuid.uuid4().hex, "client_order_id": client_order_id, "symbol": symbol,
+                     "qty": body["qty"], "side": side, "type": body.get("type", "market"),
+                     "time_in_force": body.get("time_in_force", "gtc"), "status": "accepted",
+                     "created_at": now, "submitted_at": now, "filled_at": None, "filled_qty": "0",
+                     "filled_avg_price": None}
+            self.orders[order["id"]] = self.by_client_id[client_order_id] = order
+            if order["type"] == "market":
+                heapq.heappush(self._fills, (time.monotonic() + self.fill_delay, len(self.orders), order["id"]))
+                self._wakeup.notify()
+            return 200, dict(order)
+
+    def _list(self, query):
+        status = query.get("status", "open")
+        after = _parse(query["after"]) if "after" in query else None
+        with self._lock:
+            orders = [dict(o) for o in self.orders.values()
+                      if (status == "all" or (o["status"] in ("filled", "canceled")) == (status == "closed"))
+                      and (after is None or _parse(o["submitted_at"]) > after)]
+        orders.sort(key=lambda o: o["submitted_at"], reverse=query.get("direction", "desc") == "desc")
+        return orders[:int(query.get("limit", 50))]
+
+    def _fill_loop(self):
+        while True:
+            with self._lock:
+                while self._running and (not self._fills or self._fills[0][0] > time.monotonic()):
+                    self._wakeup.wait(self._fills[0][0] - time.monotonic() if self._fills else None)
+                if not self._running:
+                    return
+                order = self.orders[heapq.heappop(self._fills)[2]]
+            qty = float(order["qty"])
+            qty = int(qty) if qty.is_integer() else qty
+            fill = self.broker.place_order(order["symbol"], qty, side=order["side"])
+            with self._lock:
+                order.update(status="filled", filled_at=_timestamp(), filled_qty=order["qty"],
+                             filled_avg_price=fill["filled_avg_price"])
+                update = {"event": "fill", "order": dict(order)}
+            for listener in self._listeners:
+                listener(update)
+
+
+def _timestamp() -> str:
+    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _parse(stamp: str) -> datetime:
+    return datetime.fromisoformat(stamp.replace("Z", "+00:00"))
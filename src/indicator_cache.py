@@ -0,0 +1,266 @@
+# src/indicator_cache.py
+"""
+Memoized indicators shared across backtests and UI reruns.
+
+IndicatorCache keys every result on (series fingerprint, indicator,
+parameters). The fingerprint is a SHA-256 of the input's float64 bytes, so
+the same bars hit the cache wherever they come from (a refetch, a copy,
+another tab). Results are read-only float64 arrays (n, or n x 3 for MACD)
+equal to what the add_* functions compute.
+
+    cache = IndicatorCache(max_bytes=256 * 2**20, disk_dir="data/indicator_cache")
+    df = add_rsi(df, length=14, cache=cache)
+    df = generate_signals(df, fast_sma=20, slow_sma=50, cache=cache)
+    cache.stats   # Counter: hit, disk_hit, extend, miss, evict
+
+Tiers:
+    memory  LRU bounded by the bytes of the cached arrays
+    disk    optional: one .npy per result, written atomically and read on a
+            memory miss, so results survive restarts (not size-bounded;
+            clear(disk=True) empties it)
+
+Appended bars: when a cached input is a prefix of the requested one (bars
+were only added at the end), just the tail is recomputed, starting a warm-up
+before the old end: the SMA window, or for the exponential averages in RSI and
+MACD enough bars for the starting value's weight to drop below float64
+resolution. Extended values agree with a full recompute to a few ulp; the
+recomputed overlap with the cached values is checked and any mismatch falls
+back to a full recompute. Appends longer than the cached series are
+recomputed in full.
+"""
+import hashlib
+import logging
+import math
+import os
+import threading
+from collections import Counter, OrderedDict, defaultdict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_MAX_BYTES = 256 * 2 ** 20
+OVERLAP = 16  # cached bars recomputed along with an extension to check it
+
+
+def _decay_bars(alpha):
+    """Bars after which an exponential average's starting value weighs less than float64 resolution."""
+    return math.ceil(math.log(2.0 ** -53) / math.log(1.0 - alpha))
+
+
+def macd_columns(fast=12, slow=26, signal=9):
+    """Column names of ta.macd's output (and of IndicatorCache.macd's columns)."""
+    return [f"MACD_{fast}_{slow}_{signal}", f"MACDh_{fast}_{slow}_{signal}", f"MACDs_{fast}_{slow}_{signal}"]
+
+
+# ------------------------
+# Indicators
+# ------------------------
+# compute(values, **params) -> float64 array, same arithmetic as src.indicators;
+# warmup(**params) -> bars a recomputed tail needs before its values are exact.
+
+def _sma(values, window):
+    return pd.Series(values, copy=False).rolling(window).mean().to_numpy()
+
+
+def _rsi(values, length=14):
+    from src.indicator_kernels import rsi
+    return rsi(values, length)
+
+
+def _macd(values, fast=12, slow=26, signal=9):
+    from src.indicator_kernels import macd
+    return macd(values, fast, slow, signal)
+
+
+INDICATORS = {
+    "sma": (_sma, lambda window: window - 1),
+    "rsi": (_rsi, lambda length=14: length + _decay_bars(1.0 / length)),
+    "macd": (_macd, lambda fast=12, slow=26, signal=9:
+             slow + signal + _decay_bars(2.0 / (slow + 1)) + _decay_bars(2.0 / (signal + 1))),
+}
+
+
+class _Entry:
+    __slots__ = ("key", "result", "n", "last", "path")
+
+    def __init__(self, key, result, last, path):
+        self.key = key
+        self.result = result
+        self.n = len(result)
+        self.last = last  # bytes of the input's last value, a cheap pre-check for the prefix hash
+        self.path = path
+
+
+class IndicatorCache:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, disk_dir=None):
+        self.max_bytes = max_bytes
+        self.disk_dir = Path(disk_dir) if disk_dir is not None else None
+        self.nbytes = 0
+        self.stats = Counter()
+        self._memory = OrderedDict()      # key -> _Entry, least recently used first
+        self._groups = defaultdict(dict)  # (indicator, params) -> {key: _Entry}, for prefix lookups
+        self._lock = threading.Lock()
+
+    # ------------------------
+    # indicators
+    # ------------------------
+    def sma(self, values, window: int) -> np.ndarray:
+        return self.get("sma", values, window=window)
+
+    def rsi(self, values, length: int = 14) -> np.ndarray:
+        return self.get("rsi", values, length=length)
+
+    def macd(self, values, fast: int = 12, slow: int = 26, signal: int = 9) -> np.ndarray:
+        """n x 3: MACD, histogram, signal (see macd_columns)."""
+        return self.get("macd", values, fast=fast, slow=slow, signal=signal)
+
+    def get(self, indicator, values, **params) -> np.ndarray:
+        compute, warmup = INDICATORS[indicator]
+        values = np.ascontiguousarray(values, dtype=np.float64)
+        n = len(values)
+        group = (indicator, tuple(sorted(params.items())))
+        with self._lock:
+            candidates = sorted((e for e in self._groups[group].values()
+                                 if 0 < e.n < n and e.last == values[e.n - 1:e.n].tobytes()),
+                                key=lambda e: e.n)
+        digest, prefixes = _fingerprint(values, [e.n for e in candidates])
+        key = (*group, digest)
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.stats["hit"] += 1
+                return entry.result
+
+        path = self._path(indicator, params, digest)
+        result = self._read(path)
+        if result is not None:
+            self._count("disk_hit")
+            return self._store(key, result, values, path, write=False)
+
+        base = next((e for e in reversed(candidates) if e.key[2] == prefixes[e.n]), None)
+        if base is not None and n - base.n <= base.n:
+            result = self._extend(compute, warmup(**params), params, values, base)
+        if result is not None:
+            self._count("extend")
+            self._discard(base)
+        else:
+            self._count("miss")
+            result = compute(values, **params)
+        return self._store(key, result, values, path)
+
+    @staticmethod
+    def _extend(compute, warmup, params, values, base):
+        """Cached result + recomputed tail, or None if the recomputed overlap does not match."""
+        m = base.n
+        start = max(0, m - OVERLAP - warmup)
+        tail = compute(values[start:], **params)
+        check = slice(max(start, m - OVERLAP), m)
+        got, cached = tail[check.start - start:m - start], base.result[check]
+        if not np.allclose(got, cached, rtol=1e-9, atol=1e-12, equal_nan=True):
+            logging.warning(f"IndicatorCache: extension of {base.key[:2]} did not match, recomputing")
+            return None
+        return np.concatenate((base.result, tail[m - start:]))
+
+    # ------------------------
+    # storage
+    # ------------------------
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _store(self, key, result, values, path, write=True):
+        result.flags.writeable = False
+        if write and path is not None:
+            self._write(path, result)
+        if result.nbytes > self.max_bytes:
+            return result
+        entry = _Entry(key, result, values[-1:].tobytes(), path)
+        with self._lock:
+            if key in self._memory:
+                return self._memory[key].result
+            self._memory[key] = entry
+            self._groups[key[:2]][key] = entry
+            self.nbytes += result.nbytes
+            while self.nbytes > self.max_bytes:
+                _, old = self._memory.popitem(last=False)
+                del self._groups[old.key[:2]][old.key]
+                self.nbytes -= old.result.nbytes
+                self.stats["evict"] += 1
+        return result
+
+    def _discard(self, entry):
+        """Drop an entry superseded by its extension (memory and disk)."""
+        with self._lock:
+            if self._memory.pop(entry.key, None) is not None:
+                del self._groups[entry.key[:2]][entry.key]
+                self.nbytes -= entry.result.nbytes
+        if entry.path is not None:
+            entry.path.unlink(missing_ok=True)
+
+    def _path(self, indicator, params, digest):
+        if self.disk_dir is None:
+            return None
+        name = "-".join([indicator, *(f"{k}{v}" for k, v in sorted(params.items())), digest.hex()])
+        return self.disk_dir / f"{name}.npy"
+
+    @staticmethod
+    def _read(path):
+        if path is None:
+            return None
+        try:
+            return np.load(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logging.warning(f"IndicatorCache: unreadable {path.name}: {e}")
+            return None
+
+    @staticmethod
+    def _write(path, result):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, result)
+        os.replace(tmp, path)
+
+    # ------------------------
+    # housekeeping
+    # ------------------------
+    def __len__(self):
+        return len(self._memory)
+
+    def clear(self, disk=False):
+        with self._lock:
+            self._memory.clear()
+            self._groups.clear()
+            self.nbytes = 0
+        if disk and self.disk_dir is not None and self.disk_dir.exists():
+            for path in self.disk_dir.glob("*.npy"):
+                path.unlink(missing_ok=True)
+
+    def info(self) -> dict:
+        """Entries, bytes and counters, e.g. for a dashboard table."""
+        with self._lock:
+            stats = dict(self.stats)
+            entries, nbytes = len(self._memory), self.nbytes
+        lookups = sum(stats.get(k, 0) for k in ("hit", "disk_hit", "extend", "miss"))
+        return {"entries": entries, "mb": nbytes / 1e6, "max_mb": self.max_bytes / 1e6, **stats,
+                "hit_rate": (stats.get("hit", 0) + stats.get("disk_hit", 0)) / lookups if lookups else math.nan}
+
+    def __repr__(self):
+        return f"IndicatorCache({len(self)} entries, {self.nbytes / 1e6:.1f}/{self.max_bytes / 1e6:.1f} MB)"
+
+
+def _fingerprint(values, prefix_lengths):
+    """SHA-256 of values, plus of values[:m] for each m in prefix_lengths (ascending), in one pass."""
+    h = hashlib.sha256()
+    data = memoryview(values).cast("B")
+    prefixes, done = {}, 0
+    for m in prefix_lengths:
+        h.update(data[done * 8:m * 8])
+        prefixes[m], done = h.copy().digest(), m
+    h.update(data[done * 8:])
+    return h.digest(), prefixes
@@ -0,0 +1,331 @@
+# src/indicator_kernels.py
+"""
+Indicators on raw NumPy arrays, without pandas_ta.
+
+Every function takes arrays of shape (n,) or (n, k) -- k symbols side by
+side, time along axis 0, as in the *_matrix functions of src.indicators --
+and writes into `out` (preallocated, any float dtype and layout) or a new
+float64 array, which it returns:
+
+    sma(values, window)                       rolling mean
+    ema(values, length)                       SMA of the first `length` values, then alpha = 2 / (length + 1)
+    rsi(values, length=14)                    Wilder RSI (RMA = ewm(alpha=1/length))
+    macd(values, fast=12, slow=26, signal=9)  (n, 3[, k]): MACD, histogram, signal
+    atr(high, low, close, length=14)          RMA of the true range
+    bbands(values, length=5, std=2.0)         (n, 3[, k]): lower, middle, upper band
+    vwap(high, low, close, volume, groups)    typical-price VWAP, restarting where `groups` changes
+
+The exponential averages are first-order recursive filters
+y[t] = b * x[t] + r * y[t - 1], run by a loop compiled with numba when it is
+installed, else by scipy.signal.lfilter (both import on first use). Rolling
+sums are cumulative sums restarted every BLOCK rows around a local
+reference, which keeps their rounding error near pandas' rolling kernels.
+
+Values follow pandas_ta's pandas code path (talib=False) to ~1e-12 relative
+and are NaN exactly where pandas_ta's are (benchmarks/bench_indicators.py
+checks this on the bundled AAPL data). Leading NaNs, e.g. symbols without
+bars yet, are skipped per column; columns with NaN gaps after their first
+value go through pandas' ewm instead, which weights across the gaps.
+"""
+import numpy as np
+import pandas as pd
+
+BLOCK = 4096  # rows per restarted cumulative sum
+
+_kernels = {}
+
+
+# ------------------------
+# building blocks
+# ------------------------
+
+def _2d(a):
+    """(n, k) view of a (n,) or (n, k) array."""
+    if a.ndim not in (1, 2):
+        raise ValueError(f"expected a 1-D or 2-D (time x symbols) array, got {a.ndim}-D")
+    return a[:, None] if a.ndim == 1 else a
+
+
+def _output(out, shape):
+    if out is None:
+        return np.empty(shape)
+    if out.shape != shape:
+        raise ValueError(f"out has shape {out.shape}, expected {shape}")
+    return out
+
+
+def _filter_loop(x, b, r, y0, out):
+    """out[t] = b * x[t] + r * out[t - 1] down each column of x (n, k), from out[-1] = y0."""
+    y = y0.copy()
+    for t in range(x.shape[0]):
+        for j in range(x.shape[1]):
+            y[j] = b * x[t, j] + r * y[j]
+            out[t, j] = y[j]
+
+
+def _load_filter():
+    """_filter_loop compiled by numba, else scipy.signal.lfilter, else the interpreted loop."""
+    try:
+        from numba import njit
+    except ImportError:
+        pass
+    else:
+        compiled = njit(cache=True, nogil=True)(_filter_loop)
+
+        def run(x, b, r, y0):
+            out = np.empty(x.shape)
+            compiled(x, b, r, y0, out)
+            return out
+        return run
+    try:
+        from scipy.signal import lfilter
+    except ImportError:
+        lfilter = None
+
+    def run(x, b, r, y0):
+        if lfilter is not None:
+            return lfilter([b], [1.0, -r], x, axis=0, zi=(r * y0)[None, :])[0]
+        out = np.empty(x.shape)
+        _filter_loop(x, b, r, y0, out)
+        return out
+    return run
+
+
+def _filter(x, b, r, y0):
+    """_filter_loop's recursion into a new array, by the fastest kernel available (imported on first use)."""
+    if "filter" not in _kernels:
+        _kernels["filter"] = _load_filter()
+    if not len(x):
+        return np.empty(x.shape)
+    return _kernels["filter"](x, float(b), float(r), np.array(y0, dtype=np.float64))
+
+
+def _segments(x):
+    """
+    (first valid row, column selector) for the columns of x (n, k) grouped
+    by their first valid row; columns with NaN after it come with None.
+    """
+    missing = np.isnan(x)
+    if not missing.any():
+        yield 0, slice(None)
+        return
+    n = len(x)
+    first = np.where(missing.all(axis=0), n, np.argmin(missing, axis=0))
+    gaps = missing.sum(axis=0) > first
+    if not gaps.any() and (first == first[0]).all():
+        yield int(first[0]), slice(None)
+        return
+    for start in np.unique(first[~gaps]):
+        yield int(start), np.flatnonzero(~gaps & (first == start))
+    if gaps.any():
+        yield None, np.flatnonzero(gaps)
+
+
+def _rma(x, length, out):
+    """pandas' ewm(alpha=1/length, min_periods=length).mean() (adjust=True) of each column into out."""
+    alpha = 1.0 / length
+    out[...] = np.nan
+    for start, cols in _segments(x):
+        if start is None:
+            out[:, cols] = pd.DataFrame(x[:, cols]).ewm(alpha=alpha, min_periods=length).mean().to_numpy()
+            continue
+        if start + length > len(x):
+            continue
+        part = x[start:, cols]
+        weighted = _filter(part, 1.0, 1.0 - alpha, np.zeros(part.shape[1]))
+        # adjust=True divides by the sum of the weights so far: (1 - (1 - alpha)^m) / alpha
+        weights = -np.expm1(np.arange(1, len(weighted) + 1) * np.log1p(-alpha)) / alpha
+        out[start + length - 1:, cols] = (weighted / weights[:, None])[length - 1:]
+    return out
+
+
+def _ema(x, length, out):
+    """Per column from its first valid row: SMA of `length` values, then ewm(span=length, adjust=False)."""
+    alpha = 2.0 / (length + 1.0)
+    out[...] = np.nan
+    for start, cols in _segments(x):
+        if start is None:
+            for j in cols:
+                column = pd.Series(x[:, j])
+                valid = column.loc[column.first_valid_index():]
+                seeded = valid.copy()
+                seeded.iloc[:length - 1] = np.nan
+                seeded.iloc[length - 1:length] = valid.iloc[:length].mean()
+                out[valid.index[0]:, j] = seeded.ewm(span=length, adjust=False).mean().to_numpy()
+            continue
+        seed = start + length - 1
+        if seed >= len(x):
+            continue
+        # summed per column from contiguous rows, as pandas sums a single series
+        first = np.ascontiguousarray(x[start:seed + 1, cols].T).sum(axis=1) / length
+        out[seed, cols] = first
+        out[seed + 1:, cols] = _filter(x[seed + 1:, cols], alpha, 1.0 - alpha, first)
+    return out
+
+
+def _rolling_moments(x, window, mean_out, var_out=None, ddof=0):
+    """
+    Rolling mean (and variance) of each column of x (n, k) over `window`
+    rows into mean_out (var_out); NaN until a full window and wherever the
+    window holds a NaN, as pandas' rolling(window).mean() / .var(ddof).
+    """
+    n = len(x)
+    mean_out[:min(window - 1, n)] = np.nan
+    if var_out is not None:
+        var_out[:min(window - 1, n)] = np.nan
+    missing = np.isnan(x)
+    has_missing = missing.any()
+    for lo in range(window - 1, n, BLOCK):
+        hi = min(lo + BLOCK, n)
+        chunk = x[lo - window + 1:hi]
+        if has_missing:
+            chunk_missing = missing[lo - window + 1:hi]
+            chunk = np.where(chunk_missing, 0.0, chunk)
+        # sums of deviations from the chunk's first row: small values, small rounding errors
+        ref = chunk[0]
+        deviation = chunk - ref
+        sums = _window_sums(np.cumsum(deviation, axis=0), window)
+        mean = ref + sums / window
+        if var_out is not None:
+            squares = _window_sums(np.cumsum(deviation * deviation, axis=0), window)
+            var_out[lo:hi] = np.maximum(squares - sums * sums / window, 0.0) / (window - ddof)
+        mean_out[lo:hi] = mean
+        if has_missing:
+            holes = _window_sums(np.cumsum(chunk_missing, axis=0), window) > 0
+            mean_out[lo:hi][holes] = np.nan
+            if var_out is not None:
+                var_out[lo:hi][holes] = np.nan
+
+
+def _window_sums(cumulative, window):
+    """Sums of every `window` consecutive rows from the cumulative sums of a chunk."""
+    sums = cumulative[window - 1:].copy()
+    sums[1:] -= cumulative[:len(cumulative) - window]
+    return sums
+
+
+# ------------------------
+# indicators
+# ------------------------
+
+def sma(values, window: int, out=None) -> np.ndarray:
+    """Rolling mean over `window` rows (ta.sma, Series.rolling(window).mean())."""
+    x = np.asarray(values, dtype=np.float64)
+    out = _output(out, x.shape)
+    _rolling_moments(_2d(x), window, _2d(out))
+    return out
+
+
+def ema(values, length: int = 10, out=None) -> np.ndarray:
+    """ta.ema: SMA of the first `length` values as seed, then the EMA with alpha = 2 / (length + 1)."""
+    x = np.asarray(values, dtype=np.float64)
+    out = _output(out, x.shape)
+    _ema(_2d(x), length, _2d(out))
+    return out
+
+
+def rsi(values, length: int = 14, scalar: float = 100.0, out=None) -> np.ndarray:
+    """ta.rsi: Wilder RSI, the RMA of gains over the RMA of gains plus absolute losses."""
+    x = np.asarray(values, dtype=np.float64)
+    out = _output(out, x.shape)
+    x2, out2 = _2d(x), _2d(out)
+    change = np.empty(x2.shape)
+    change[:1] = np.nan
+    np.subtract(x2[1:], x2[:-1], out=change[1:])
+    out2[...] = np.nan
+    alpha = 1.0 / length
+    for start, cols in _segments(change):
+        if start is None:
+            frame = pd.DataFrame(change[:, cols])
+            gains = frame.where(~(frame < 0), 0.0).ewm(alpha=alpha, min_periods=length).mean()
+            losses = frame.where(~(frame > 0), 0.0).ewm(alpha=alpha, min_periods=length).mean()
+            out2[:, cols] = (scalar * gains / (gains + losses.abs())).to_numpy()
+            continue
+        if start + length > len(x2):
+            continue
+        part = change[start:, cols]
+        zeros = np.zeros(part.shape[1])
+        # both averages divide by the same sum of weights, which cancels in the ratio
+        gains = _filter(np.maximum(part, 0.0), 1.0, 1.0 - alpha, zeros)[length - 1:]
+        losses = _filter(np.minimum(part, 0.0), 1.0, 1.0 - alpha, zeros)[length - 1:]
+        # scalar * gains / (gains + |losses|), in place
+        losses = np.abs(losses, out=losses)
+        losses += gains
+        gains *= scalar
+        with np.errstate(invalid="ignore"):  # 0 / 0 while prices have not moved: NaN, as in pandas
+            out2[start + length - 1:, cols] = np.divide(gains, losses, out=losses)
+    return out
+
+
+def macd(values, fast: int = 12, slow: int = 26, signal: int = 9, out=None) -> np.ndarray:
+    """
+    ta.macd as (n, 3) for a single series, (n, 3, k) for k symbols: MACD
+    (fast EMA - slow EMA), histogram (MACD - signal) and signal (EMA of
+    MACD from its first value), in the order of
+    src.indicator_cache.macd_columns.
+    """
+    x = np.asarray(values, dtype=np.float64)
+    out = _output(out, (len(x), 3, *x.shape[1:]))
+    x2 = _2d(x)
+    line, histogram, signal_line = (_2d(out[:, i]) for i in range(3))
+    slow_ema = _ema(x2, slow, np.empty(x2.shape))
+    _ema(x2, fast, line)
+    line -= slow_ema
+    _ema(np.asarray(line, dtype=np.float64), signal, signal_line)
+    np.subtract(line, signal_line, out=histogram)
+    return out
+
+
+def atr(high, low, close, length: int = 14, out=None) -> np.ndarray:
+    """ta.atr (mamode 'rma'): Wilder average of the true range; the first bar has no true range."""
+    high, low, close = (np.asarray(a, dtype=np.float64) for a in (high, low, close))
+    out = _output(out, close.shape)
+    h, l, c = _2d(high), _2d(low), _2d(close)
+    true_range = np.empty(c.shape)
+    true_range[:1] = np.nan
+    previous = c[:-1]
+    # fmax skips a NaN previous close like ta.true_range's max(skipna=True)
+    np.fmax(np.abs(h[1:] - previous), np.abs(l[1:] - previous), out=true_range[1:])
+    np.fmax(h[1:] - l[1:], true_range[1:], out=true_range[1:])
+    _rma(true_range, length, _2d(out))
+    return out
+
+
+def bbands(values, length: int = 5, std: float = 2.0, ddof: int = 0, out=None) -> np.ndarray:
+    """
+    ta.bbands (mamode 'sma') as (n, 3) for a single series, (n, 3, k) for k
+    symbols: lower, middle (SMA) and upper band, std standard deviations
+    (with ddof) from the middle.
+    """
+    x = np.asarray(values, dtype=np.float64)
+    out = _output(out, (len(x), 3, *x.shape[1:]))
+    lower, middle, upper = (_2d(out[:, i]) for i in range(3))
+    deviation = np.empty(middle.shape)
+    _rolling_moments(_2d(x), length, middle, deviation, ddof)
+    np.sqrt(deviation, out=deviation)
+    deviation *= std
+    np.subtract(middle, deviation, out=lower)
+    np.add(middle, deviation, out=upper)
+    return out
+
+
+def vwap(high, low, close, volume, groups=None, out=None) -> np.ndarray:
+    """
+    ta.vwap: cumulative (high + low + close) / 3 weighted by volume, over
+    all bars or restarting wherever `groups` (one key per row, e.g. the
+    session day from src.resample.bucket_starts) changes value.
+    """
+    high, low, close, volume = (np.asarray(a, dtype=np.float64) for a in (high, low, close, volume))
+    out = _output(out, close.shape)
+    v = _2d(volume)
+    weighted = np.cumsum((_2d(high) + _2d(low) + _2d(close)) / 3.0 * v, axis=0)
+    volumes = np.cumsum(v, axis=0)
+    if groups is not None and len(close):
+        groups = np.asarray(groups)
+        first = np.flatnonzero(np.concatenate(([True], groups[1:] != groups[:-1])))
+        lengths = np.diff(np.append(first, len(groups)))
+        for totals in (weighted, volumes):
+            before = np.concatenate((np.zeros((1, totals.shape[1])), totals[first[1:] - 1]))
+            totals -= np.repeat(before, lengths, axis=0)
+    np.divide(weighted, volumes, out=_2d(out))
+    return out
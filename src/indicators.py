@@ -1,18 +1,391 @@
 # src/indicators.py
+import math
+import numpy as np
 import pandas as pd
-import pandas_ta as ta
 
-def add_sma(df: pd.DataFrame, window: int, column='Close', name=None):
+from src import indicator_kernels as kernels
+from src.compact_bars import CompactBars
+from src.indicator_cache import macd_columns
+
+# The add_* functions also accept a CompactBars and then write the column into
+# it in place, one symbol at a time (see src.compact_bars). With cache= (an
+# IndicatorCache, see src.indicator_cache) unchanged inputs are not recomputed.
+# RSI and MACD come from src.indicator_kernels (NumPy, pandas_ta's formulas).
+
+def add_sma(df: pd.DataFrame, window: int, column='Close', name=None, cache=None):
     name = name or f"SMA_{window}"
+    if cache is not None:
+        if isinstance(df, CompactBars):
+            return df.apply(name, lambda values: cache.sma(values, window), column)
+        df[name] = cache.sma(df[column], window)
+        return df
+    if isinstance(df, CompactBars):
+        return df.apply(name, lambda values: pd.Series(values).rolling(window).mean().to_numpy(), column)
     df[name] = df[column].rolling(window).mean()
     return df
 
-def add_rsi(df: pd.DataFrame, length: int = 14, column='Close', name='RSI'):
-    df[name] = ta.rsi(df[column], length=length)
+def add_rsi(df: pd.DataFrame, length: int = 14, column='Close', name='RSI', cache=None):
+    if cache is not None:
+        if isinstance(df, CompactBars):
+            return df.apply(name, lambda values: cache.rsi(values, length), column)
+        df[name] = cache.rsi(df[column], length)
+        return df
+    if isinstance(df, CompactBars):
+        return df.apply(name, lambda values: kernels.rsi(values, length), column)
+    df[name] = kernels.rsi(df[column].to_numpy(dtype=np.float64), length)
     return df
 
-def add_macd(df: pd.DataFrame, column='Close'):
-    macd = ta.macd(df[column])
-    # returns macd columns like 'MACD_12_26_9', 'MACDh_12_26_9', 'MACDs_12_26_9'
-    df = pd.concat([df, macd], axis=1)
+def add_macd(df: pd.DataFrame, column='Close', cache=None):
+    # columns 'MACD_12_26_9', 'MACDh_12_26_9', 'MACDs_12_26_9', added in place
+    if isinstance(df, CompactBars):
+        for symbol in df.symbols:
+            rows = df.rows(symbol)
+            values = df[column][rows].astype(np.float64)
+            macd = cache.macd(values) if cache is not None else kernels.macd(values)
+            for name, result in zip(macd_columns(), macd.T):
+                df.column(name)[rows] = result
+        return df
+    values = df[column].to_numpy(dtype=np.float64)
+    macd = cache.macd(values) if cache is not None else kernels.macd(values)
+    for name, result in zip(macd_columns(), macd.T):
+        df[name] = result
     return df
+
+
+# ------------------------
+# Streaming indicators
+# ------------------------
+# One bar in, one value out, O(1) time and memory per bar. Seed them once from
+# history with seed(), then call update() for every new bar. amend() re-applies
+# the most recent bar with a revised value (e.g. the still-forming live bar).
+# NaN is returned wherever the batch functions above return NaN.
+
+NAN = float("nan")
+
+
+class _EWM:
+    """
+    Exponentially weighted mean following pandas' Series.ewm(...).mean()
+    recursion step for step, so streaming values equal the batch ones.
+    """
+
+    def __init__(self, alpha: float, adjust=True, min_periods=0):
+        self.alpha = alpha
+        self.adjust = adjust
+        self.min_periods = max(min_periods, 1)
+        self.weighted = NAN
+        self.old_wt = 1.0
+        self.nobs = 0
+        self._prev = (self.weighted, self.old_wt, self.nobs)
+
+    def update(self, value: float) -> float:
+        weighted, old_wt, nobs = self._prev = (self.weighted, self.old_wt, self.nobs)
+        is_observation = value == value
+        if is_observation:
+            nobs += 1
+        if weighted == weighted:
+            old_wt *= 1.0 - self.alpha
+            if is_observation:
+                new_wt = 1.0 if self.adjust else self.alpha
+                if weighted != value:
+                    weighted = (old_wt * weighted + new_wt * value) / (old_wt + new_wt)
+                old_wt = old_wt + new_wt if self.adjust else 1.0
+        elif is_observation:
+            weighted = value
+        self.weighted, self.old_wt, self.nobs = weighted, old_wt, nobs
+        return weighted if nobs >= self.min_periods else NAN
+
+    def restore(self):
+        self.weighted, self.old_wt, self.nobs = self._prev
+
+    def amend(self, value: float) -> float:
+        self.restore()
+        return self.update(value)
+
+    @property
+    def value(self) -> float:
+        return self.weighted if self.nobs >= self.min_periods else NAN
+
+    def state(self) -> tuple:
+        return self.weighted, self.old_wt, self.nobs
+
+    def load_state(self, state):
+        self.weighted, self.old_wt, self.nobs = state
+        self._prev = tuple(state)
+
+
+class StreamingSMA:
+    """
+    Rolling mean over a fixed-size ring buffer, with the arithmetic of
+    pandas' rolling(window).mean() (add_sma) step for step: Kahan-compensated
+    running sum (separate compensations for values entering and leaving),
+    NaN values skipped, a run of equal values returned as that value and
+    the sign clamps, so streaming values equal the batch ones bit for bit.
+    """
+
+    def __init__(self, window: int):
+        self.window = window
+        self.buffer = [0.0] * window
+        self.pos = 0
+        self.count = 0  # values pushed into the window, NaN included (rows, as in pandas)
+        self.total = 0.0
+        self.add_error = 0.0  # Kahan compensations of the running sum
+        self.remove_error = 0.0
+        self.nobs = 0  # non-NaN values in the window
+        self.negative = 0  # ... of them negative
+        self.last = NAN  # last non-NaN value and how many equal ones were pushed in a row
+        self.same = 0
+        self._prev = None
+
+    def update(self, value: float) -> float:
+        pos, count, total, buffer, window = self.pos, self.count, self.total, self.buffer, self.window
+        add_error, remove_error, nobs, negative = self.add_error, self.remove_error, self.nobs, self.negative
+        same, last = self.same, self.last
+        replaced = buffer[pos]
+        self._prev = (pos, count, total, add_error, remove_error, nobs, negative, same, last, replaced)
+        if count == window:
+            if replaced == replaced:
+                nobs -= 1
+                y = -replaced - remove_error
+                t = total + y
+                remove_error = t - total - y
+                total = t
+                if replaced < 0 or (replaced == 0 and math.copysign(1.0, replaced) < 0):
+                    negative -= 1
+        else:
+            count += 1
+        buffer[pos] = value
+        if value == value:
+            nobs += 1
+            y = value - add_error
+            t = total + y
+            add_error = t - total - y
+            total = t
+            if value < 0 or (value == 0 and math.copysign(1.0, value) < 0):
+                negative += 1
+            same = same + 1 if value == last else 1
+            last = value
+        pos += 1
+        self.pos = 0 if pos == window else pos
+        self.count, self.total, self.add_error, self.remove_error = count, total, add_error, remove_error
+        self.nobs, self.negative, self.same, self.last = nobs, negative, same, last
+        if nobs < window:
+            return NAN
+        if same >= nobs:
+            return last
+        mean = total / nobs
+        if (negative == 0 and mean < 0) or (negative == nobs and mean > 0):
+            return 0.0
+        return mean
+
+    def amend(self, value: float) -> float:
+        (pos, self.count, self.total, self.add_error, self.remove_error, self.nobs, self.negative, self.same,
+         self.last, replaced) = self._prev
+        self.pos = pos
+        self.buffer[pos] = replaced
+        return self.update(value)
+
+    def seed(self, values) -> float:
+        value = NAN
+        for value in values:
+            value = self.update(value)
+        return value
+
+    def batch(self, values) -> np.ndarray:
+        """What update() returns for each of `values` from a fresh state, computed at once (pandas)."""
+        return pd.Series(np.asarray(values, dtype=np.float64), copy=False).rolling(self.window).mean().to_numpy()
+
+    @property
+    def value(self) -> float:
+        nobs = self.nobs
+        if nobs < self.window:
+            return NAN
+        if self.same >= nobs:
+            return self.last
+        mean = self.total / nobs
+        if (self.negative == 0 and mean < 0) or (self.negative == nobs and mean > 0):
+            return 0.0
+        return mean
+
+    def state(self) -> tuple:
+        """
+        (pos, count, total, add_error, remove_error, buffer): everything
+        update() needs, e.g. for src.engine_state snapshots (the counts, the
+        last value and its run are recovered from the buffer).
+        """
+        return self.pos, self.count, self.total, self.add_error, self.remove_error, list(self.buffer)
+
+    def load_state(self, state):
+        pos, count, total, add_error, remove_error, buffer = state
+        if len(buffer) != self.window:
+            raise ValueError(f"SMA state for window {len(buffer)}, not {self.window}")
+        self.pos, self.count, self.total, self.buffer = pos, count, total, list(buffer)
+        self.add_error, self.remove_error = add_error, remove_error
+        # oldest first; the same run only matters while it covers every value in the window
+        values = [v for v in self.buffer[pos:] + self.buffer[:pos] if v == v] if count == self.window else \
+            [v for v in self.buffer[:count] if v == v]
+        self.nobs = len(values)
+        self.negative = sum(math.copysign(1.0, v) < 0 for v in values)
+        self.last = values[-1] if values else NAN
+        same = 0
+        for v in reversed(values):
+            if v != self.last:
+                break
+            same += 1
+        self.same = same
+        self._prev = None
+
+
+def _split_change(change):
+    """Gain/loss parts of a price change, as ta.rsi builds them (NaN stays NaN)."""
+    if change != change:
+        return NAN, NAN
+    return (change, 0.0) if change > 0 else (0.0, change)
+
+
+class StreamingRSI:
+    """Wilder RSI matching add_rsi (pandas_ta's pandas path: RMA = ewm(alpha=1/length))."""
+
+    def __init__(self, length: int = 14, scalar: float = 100.0):
+        self.length = length
+        self.scalar = scalar
+        self.gain = _EWM(1.0 / length, adjust=True, min_periods=length)
+        self.loss = _EWM(1.0 / length, adjust=True, min_periods=length)
+        self.last_close = None
+        self._prev_close = None
+
+    def update(self, close: float) -> float:
+        last = self._prev_close = self.last_close
+        self.last_close = close
+        if last is None:
+            return NAN
+        change = close - last
+        if change != change:
+            gain = loss = NAN
+        elif change > 0:
+            gain, loss = change, 0.0
+        else:
+            gain, loss = 0.0, change
+        return self._rsi(self.gain.update(gain), self.loss.update(loss))
+
+    def amend(self, close: float) -> float:
+        if self._prev_close is None:
+            self.last_close = close
+            return NAN
+        gain, loss = _split_change(close - self._prev_close)
+        self.last_close = close
+        return self._rsi(self.gain.amend(gain), self.loss.amend(loss))
+
+    def seed(self, closes) -> float:
+        value = NAN
+        for close in closes:
+            value = self.update(close)
+        return value
+
+    def batch(self, closes) -> np.ndarray:
+        """What update() returns for each of `closes` from a fresh state, computed at once (pandas' ewm)."""
+        change = pd.Series(np.asarray(closes, dtype=np.float64), copy=False).diff()
+        rma = dict(alpha=1.0 / self.length, adjust=True, min_periods=self.length)
+        positive_avg = change.where(~(change < 0), 0.0).ewm(**rma).mean().to_numpy()
+        negative_avg = change.where(~(change > 0), 0.0).ewm(**rma).mean().to_numpy()
+        total = positive_avg + np.abs(negative_avg)
+        with np.errstate(invalid="ignore"):
+            return np.where(total != 0, self.scalar * positive_avg / total, NAN)
+
+    def _rsi(self, positive_avg, negative_avg):
+        total = positive_avg + abs(negative_avg)
+        # no move at all yet (a flat or illiquid start): 0 / 0, NaN as in add_rsi
+        return self.scalar * positive_avg / total if total else NAN
+
+    @property
+    def value(self) -> float:
+        return self._rsi(self.gain.value, self.loss.value)
+
+    def state(self) -> tuple:
+        return self.last_close, self.gain.state(), self.loss.state()
+
+    def load_state(self, state):
+        self.last_close, gain, loss = state
+        self.gain.load_state(gain)
+        self.loss.load_state(loss)
+        self._prev_close = None
+
+
+class _StreamingEMA:
+    """pandas_ta ema: SMA of the first `length` values as seed, then ewm(span, adjust=False)."""
+
+    def __init__(self, length: int):
+        self.length = length
+        self.seed_values = []
+        self.ewm = _EWM(2.0 / (length + 1.0), adjust=False)
+        self._last = "skip"
+
+    def update(self, value: float) -> float:
+        if len(self.seed_values) < self.length:
+            if value != value and not self.seed_values:
+                self._last = "skip"  # leading NaNs, e.g. MACD before the slow EMA is ready
+                return NAN
+            self.seed_values.append(value)
+            if len(self.seed_values) < self.length:
+                self._last = "seed"
+                return NAN
+            self._last = "seeded"
+            # same reduction pandas uses for Series.mean() on float64
+            return self.ewm.update(float(np.asarray(self.seed_values, dtype=float).sum() / self.length))
+        self._last = "ewm"
+        return self.ewm.update(value)
+
+    def amend(self, value: float) -> float:
+        if self._last == "ewm":
+            return self.ewm.amend(value)
+        if self._last in ("seed", "seeded"):
+            self.seed_values.pop()
+            if self._last == "seeded":
+                self.ewm.restore()
+        return self.update(value)
+
+
+class StreamingMACD:
+    """MACD, histogram and signal matching add_macd's MACD_*, MACDh_* and MACDs_* columns."""
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        self.fast = _StreamingEMA(fast)
+        self.slow = _StreamingEMA(slow)
+        self.signal = _StreamingEMA(signal)
+        self.names = (f"MACD_{fast}_{slow}_{signal}", f"MACDh_{fast}_{slow}_{signal}",
+                      f"MACDs_{fast}_{slow}_{signal}")
+
+    def update(self, close: float) -> dict:
+        macd = self.fast.update(close) - self.slow.update(close)
+        return self._result(macd, self.signal.update(macd))
+
+    def amend(self, close: float) -> dict:
+        macd = self.fast.amend(close) - self.slow.amend(close)
+        return self._result(macd, self.signal.amend(macd))
+
+    def seed(self, closes) -> dict:
+        result = self._result(NAN, NAN)
+        for close in closes:
+            result = self.update(close)
+        return result
+
+    def _result(self, macd, signal):
+        return dict(zip(self.names, (macd, macd - signal, signal)))
+
+
+# ------------------------
+# Batched (time x symbols) indicators
+# ------------------------
+# Each column of `values` is one symbol, each row one timestamp. pandas'
+# 2-D rolling kernel and src.indicator_kernels run every column in one call
+# with the same per-column arithmetic as the single-series functions above,
+# so results are identical to calling them symbol by symbol.
+
+def sma_matrix(values: np.ndarray, window: int) -> np.ndarray:
+    """Rolling mean per column (NaN until `window` valid values), like add_sma."""
+    return pd.DataFrame(values, copy=False).rolling(window).mean().to_numpy()
+
+
+def rsi_matrix(values: np.ndarray, length: int = 14, scalar: float = 100.0) -> np.ndarray:
+    """Wilder RSI per column, same kernel as add_rsi."""
+    return kernels.rsi(values, length, scalar)
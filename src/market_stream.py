@@ -0,0 +1,269 @@
+# src/market_stream.py
+"""
+Streaming market data: websocket trades (or minute bars) in, bars of the
+engine's timeframe out, instead of polling REST.
+
+    stream = alpaca_stream()                    # Alpaca market data v2 websocket
+    stream = server.stream()                    # ... or a local ReplayServer (src.replay_server)
+    feed = StreamingBarFeed(stream, "AAPL", "5Min", start=last_ts, backfill=fetch)
+    for bar in feed: ...                        # closed bars, like PolledBarFeed
+
+BarAggregator builds the bars in memory. Every trade updates the forming bar
+(on_update sees it after each message), and a bar closes when the first trade
+of a later bar arrives, when its last minute bar arrives (source="bars"), or
+`grace` seconds after its end by the wall clock if the symbol goes quiet.
+The websocket client runs in its own thread and hands raw messages to the
+consumer through a queue, so a closed bar reaches the strategy microseconds
+after the message that closed it. REST is only needed for the warm-up
+history and, through `backfill`, for the bar the stream joined half-way and
+any bars between the history and the first streamed bar.
+"""
+import logging
+import queue
+import threading
+import time
+
+import pandas as pd
+
+from src.bar_store import timeframe_delta, to_ns
+from src.event_engine import Bar, replay_bars
+
+MARKET_TZ = "America/New_York"
+DAY_NS = 86_400 * 10 ** 9
+WEEK_NS = 7 * DAY_NS
+MINUTE_NS = 60 * 10 ** 9
+
+
+def bucket_bounds(ts: int, bar_ns: int):
+    """
+    [start, end) in epoch ns of the bar containing ts. Intraday bars are
+    aligned to the epoch (so to the hour in New York), daily bars start at
+    New York midnight and weekly bars on Monday, across DST changes.
+    """
+    if bar_ns < DAY_NS:
+        start = ts - ts % bar_ns
+        return start, start + bar_ns
+    day = pd.Timestamp(ts, tz="UTC").tz_convert(MARKET_TZ).tz_localize(None).normalize()
+    if bar_ns % WEEK_NS == 0:
+        day -= pd.Timedelta(days=day.dayofweek)
+    end = day + pd.Timedelta(days=bar_ns // DAY_NS)
+    return day.tz_localize(MARKET_TZ).value, end.tz_localize(MARKET_TZ).value
+
+
+class BarAggregator:
+    """
+    Bars of `timeframe` built from trades (add_trade) or from shorter bars
+    (add_bar, each `source_ns` long). Closed bars go to on_close(bar); the
+    forming bar goes to on_update(bar) after every change (the same object is
+    updated in place until it closes). Messages older than the forming bar
+    arrive too late to be counted and are dropped (counted in .late).
+    """
+
+    def __init__(self, timeframe, on_close, on_update=None, source_ns=MINUTE_NS):
+        self.bar_ns = int(timeframe_delta(timeframe).value)
+        self.on_close = on_close
+        self.on_update = on_update
+        self.source_ns = source_ns
+        self.bar = None
+        self.end = None
+        self.closed_end = None  # end of the last closed bar
+        self.late = 0
+
+    def add_trade(self, ts: int, price: float, size: float):
+        bar = self.bar
+        if bar is not None and ts < self.end:
+            if ts < bar.ts:
+                self.late += 1
+                return
+            if price > bar.high:
+                bar.high = price
+            elif price < bar.low:
+                bar.low = price
+            bar.close = price
+            bar.volume += size
+        else:
+            start = self._open(ts)
+            if start is None:
+                return
+            bar = self.bar = Bar(start, price, price, price, price, size)
+        if self.on_update is not None:
+            self.on_update(bar)
+
+    def add_bar(self, ts: int, open: float, high: float, low: float, close: float, volume: float):
+        bar = self.bar
+        if bar is not None and self.end > ts >= bar.ts:
+            bar.high = max(bar.high, high)
+            bar.low = min(bar.low, low)
+            bar.close = close
+            bar.volume += volume
+        elif bar is not None and ts < bar.ts:
+            self.late += 1
+            return
+        else:
+            start = self._open(ts)
+            if start is None:
+                return
+            bar = self.bar = Bar(start, open, high, low, close, volume)
+        if ts + self.source_ns >= self.end:  # the last shorter bar of this one
+            self._close()
+        elif self.on_update is not None:
+            self.on_update(bar)
+
+    def flush(self, now: int) -> bool:
+        """Close the forming bar if it ended before `now` (epoch ns)."""
+        if self.bar is not None and now >= self.end:
+            self._close()
+            return True
+        return False
+
+    def _open(self, ts):
+        """Close the forming bar and return the start of the one containing ts (None if that one closed already)."""
+        if self.bar is not None:
+            self._close()
+        if self.closed_end is not None and ts < self.closed_end:
+            self.late += 1
+            return None
+        start, self.end = bucket_bounds(ts, self.bar_ns)
+        return start
+
+    def _close(self):
+        bar, self.bar, self.closed_end = self.bar, None, self.end
+        self.on_close(bar)
+
+
+def _ns(ts) -> int:
+    """Epoch ns of a message timestamp (msgpack Timestamp, int ns or ISO string)."""
+    to_unix_nano = getattr(ts, "to_unix_nano", None)
+    return to_unix_nano() if to_unix_nano is not None else to_ns(ts)
+
+
+class StreamingBarFeed:
+    """
+    Live bar source on a websocket stream (alpaca_trade_api Stream created
+    with raw_data=True, see alpaca_stream): yields each closed bar of
+    `symbol` once, in order, like PolledBarFeed. source="trades" aggregates
+    trades, source="bars" the provider's bars (source_timeframe long: Alpaca
+streams minute bars).
+
+    start is the epoch ns of the last bar already processed (e.g. the end of
+    the warm-up history). backfill(start) -> DataFrame, a REST fetch, replaces
+    the bar the stream joined half-way and fills bars between the history and
+    the first streamed bar; without it those bars are taken as built.
+    clock=None disables closing quiet bars by wall-clock time (for replays).
+    Iteration ends, and the stream is stopped, when running() is False.
+    """
+
+    def __init__(self, stream, symbol, timeframe, source="trades", start=None, backfill=None, on_update=None,
+                 running=lambda: True, grace=2.0, clock=time.time_ns, wait=0.25, source_timeframe="1Min"):
+        if source not in ("trades", "bars"):
+            raise ValueError(f"Unknown source: {source!r} (expected 'trades' or 'bars')")
+        self.stream = stream
+        self.symbol = symbol
+        self.source = source
+        self.last_ts = start
+        self.backfill = backfill
+        self.running = running
+        self.grace_ns = int(grace * 1e9)
+        self.clock = clock
+        self.wait = wait
+        self.aggregator = BarAggregator(timeframe, self._closed, on_update,
+                                        source_ns=int(timeframe_delta(source_timeframe).value))
+        self.closed_at = None         # perf_counter when the message closing the last bar was received
+        self.closing_message = None   # that message (None if the bar closed by the clock)
+        self._closed_bars = []
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._joined = None  # wall clock when the stream started; the bar forming then is incomplete
+        self._first = True
+
+    # ------------------------
+    # stream side (websocket thread)
+    # ------------------------
+    def start(self):
+        put = self._queue.put
+
+        async def on_message(msg):
+            put((time.perf_counter(), msg))
+
+        subscribe = self.stream.subscribe_trades if self.source == "trades" else self.stream.subscribe_bars
+        subscribe(on_message, self.symbol)
+        self._joined = self.clock() if self.clock is not None else None
+        self._thread = threading.Thread(target=self.stream.run, name="market-stream", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is None:
+            return
+        try:
+            self.stream.stop()
+        except Exception as e:  # the SDK raises if its loops never started
+            logging.warning(f"Stopping market stream: {e}")
+        self._thread = None
+
+    # ------------------------
+    # consumer side
+    # ------------------------
+    def __iter__(self):
+        if self._thread is None:
+            self.start()
+        get, add = self._queue.get, self._add
+        try:
+            while self.running():
+                try:
+                    received, msg = get(timeout=self.wait)
+                except queue.Empty:
+                    if self.clock is not None and self.aggregator.flush(self.clock() - self.grace_ns):
+                        self.closed_at, self.closing_message = time.perf_counter(), None
+                else:
+                    add(msg)
+                    if self._closed_bars:
+                        self.closed_at, self.closing_message = received, msg
+                while self._closed_bars:
+                    yield from self._complete(self._closed_bars.pop(0))
+        finally:
+            self.stop()
+
+    def _add(self, msg):
+        if self.source == "trades":
+            self.aggregator.add_trade(_ns(msg["t"]), msg["p"], msg["s"])
+        else:
+            self.aggregator.add_bar(_ns(msg["t"]), msg["o"], msg["h"], msg["l"], msg["c"], msg["v"])
+
+    def _closed(self, bar):
+        self._closed_bars.append(bar)
+
+    def _complete(self, bar):
+        """The bar, preceded by any missed bars; the first streamed bar is checked against REST."""
+        first, self._first = self._first, False
+        partial = first and self._joined is not None and bar.ts < self._joined
+        gap = first and self.last_ts is not None and bar.ts > self.last_ts + self.aggregator.bar_ns
+        if self.backfill is not None and (partial or gap):
+            start = pd.Timestamp(self.last_ts, tz="UTC") if self.last_ts is not None else None
+            try:
+                fetched = [b for b in replay_bars(self.backfill(start))
+                           if (self.last_ts is None or b.ts > self.last_ts) and b.ts <= bar.ts]
+            except Exception as e:
+                logging.error(f"Backfill failed: {e}")
+                fetched = []
+            for b in fetched:
+                self.last_ts = b.ts
+                yield b
+            if fetched and fetched[-1].ts == bar.ts:
+                return
+            if partial:
+                logging.warning(f"{self.symbol}: {bar} was streamed from part-way through and is not on REST yet")
+        if self.last_ts is None or bar.ts > self.last_ts:
+            self.last_ts = bar.ts
+            yield bar
+
+
+def alpaca_stream(url=None, feed="iex", key_id=None, secret_key=None):
+    """
+    alpaca_trade_api Stream delivering raw messages, as StreamingBarFeed
+    reads them. url overrides the market data stream URL (e.g. a ReplayServer's).
+    """
+    from alpaca_trade_api.stream import Stream
+    from src import config
+    return Stream(key_id or config.ALPACA_API_KEY_ID, secret_key or config.ALPACA_API_SECRET_KEY,
+                  base_url=config.ALPACA_BASE_URL, data_stream_url=url, data_feed=feed, raw_data=True)
@@ -0,0 +1,258 @@
+# src/metrics.py
+"""
+Low-overhead in-process metrics for the live trading loop.
+
+Counters and fixed-bucket histograms (Prometheus-style, seconds) kept in a
+Metrics registry. Recording is a bisect plus a few adds with no lock (each
+metric expects one writer thread; readers in any thread see a consistent
+enough copy), so instrumentation can stay on in production. Metrics written
+from several threads (e.g. the order gateway's workers) are created with
+shared=True and take a lock of their own per update. Read the values
+in-process with snapshot()/to_frame(), or serve them in the Prometheus text
+format from a small local HTTP endpoint:
+
+    metrics = Metrics()
+    with metrics.time("fetch"):
+        df = fetch()
+    metrics.serve(port=9108)   # GET http://127.0.0.1:9108/metrics
+"""
+import bisect
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+# upper bounds in seconds: sub-millisecond stages up to minute-long stalls
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Counter:
+    __slots__ = ("name", "labels", "help", "value")
+    kind = "counter"
+
+    def __init__(self, name, labels=(), help=""):
+        self.name = name
+        self.labels = labels
+        self.help = help
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def snapshot(self) -> dict:
+        return {"count": self.value}
+
+    def samples(self):
+        yield self.name, self.labels, self.value
+
+
+class Histogram:
+    __slots__ = ("name", "labels", "help", "buckets", "counts", "sum", "count", "max")
+    kind = "histogram"
+
+    def __init__(self, name, labels=(), help="", buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.labels = labels
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot: above the largest bound
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """Estimate from the buckets (linear within a bucket, like Prometheus' histogram_quantile)."""
+        counts, largest = list(self.counts), self.max
+        total = sum(counts)
+        if not total:
+            return math.nan
+        rank = q * total
+        seen = 0
+        for i, n in enumerate(counts):
+            if n and seen + n >= rank:
+                lo = self.buckets[i - 1] if i else 0.0
+                hi = self.buckets[i] if i < len(self.buckets) else largest
+                return min(lo + (hi - lo) * (rank - seen) / n, largest)
+            seen += n
+        return largest
+
+    def snapshot(self) -> dict:
+        count = self.count
+        return {"count": count, "mean": self.sum / count if count else math.nan, "p50": self.quantile(0.5),
+                "p90": self.quantile(0.9), "p99": self.quantile(0.99), "max": self.max if count else math.nan}
+
+    def samples(self):
+        counts, sum_ = list(self.counts), self.sum
+        total = sum(counts)
+        cumulative = 0
+        for bound, n in zip((*self.buckets, math.inf), counts):
+            cumulative += n
+            le = "+Inf" if bound == math.inf else repr(bound)
+            yield f"{self.name}_bucket", (*self.labels, ("le", le)), cumulative
+        yield f"{self.name}_sum", self.labels, sum_
+        yield f"{self.name}_count", self.labels, total
+
+
+class SharedCounter(Counter):
+    """Counter for several writer threads: `+=` is not atomic, so each inc() holds the counter's lock."""
+    __slots__ = ("_lock",)
+
+    def __init__(self, name, labels=(), help=""):
+        super().__init__(name, labels, help)
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class SharedHistogram(Histogram):
+    """Histogram for several writer threads: each observe() holds the histogram's lock."""
+    __slots__ = ("_lock",)
+
+    def __init__(self, name, labels=(), help="", buckets=DEFAULT_BUCKETS):
+        super().__init__(name, labels, help, buckets)
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            Histogram.observe(self, value)
+
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    """
+    Registry of counters and histograms, keyed by name and labels. Names get
+    `prefix` (e.g. trading_stage_seconds{stage="fetch"}).
+    """
+
+    def __init__(self, prefix="trading"):
+        self.prefix = prefix
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._stages = {}  # stage -> stage_seconds histogram, skips the keyed lookup in time()
+        self._server = None
+
+    def _get(self, cls, name, help, labels, **kwargs):
+        key = (name, tuple(sorted(labels.items())))
+        metric = self._metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(key)
+                if metric is None:
+                    full_name = f"{self.prefix}_{name}" if self.prefix else name
+                    metric = self._metrics[key] = cls(full_name, key[1], help, **kwargs)
+        return metric
+
+    def counter(self, name, help="", shared=False, **labels) -> Counter:
+        """shared=True: updated from several threads (SharedCounter), on its first request."""
+        return self._get(SharedCounter if shared else Counter, name, help, labels)
+
+    def histogram(self, name, help="", buckets=DEFAULT_BUCKETS, shared=False, **labels) -> Histogram:
+        """shared=True: updated from several threads (SharedHistogram), on its first request."""
+        return self._get(SharedHistogram if shared else Histogram, name, help, labels, buckets=buckets)
+
+    def time(self, stage) -> _Timer:
+        """Context manager recording the block's wall time in stage_seconds{stage=...}."""
+        histogram = self._stages.get(stage)
+        if histogram is None:
+            histogram = self._stages[stage] = self.histogram("stage_seconds", "Wall time per hot-path stage",
+                                                             stage=stage)
+        return _Timer(histogram)
+
+    # ------------------------
+    # reading
+    # ------------------------
+    def snapshot(self) -> dict:
+        """{'name{label=value}': {count, mean, p50, p90, p99, max} or {count}}"""
+        with self._lock:
+            metrics = list(self._metrics.items())
+        out = {}
+        for (name, labels), metric in sorted(metrics, key=lambda item: item[0]):
+            label_str = ",".join(f"{k}={v}" for k, v in labels)
+            out[f"{name}{{{label_str}}}" if labels else name] = metric.snapshot()
+        return out
+
+    def to_frame(self) -> pd.DataFrame:
+        """snapshot() as a table (one row per metric, times in ms) for dashboards."""
+        df = pd.DataFrame.from_dict(self.snapshot(), orient="index")
+        for col in ("mean", "p50", "p90", "p99", "max"):
+            if col in df.columns:
+                df[f"{col}_ms"] = df.pop(col) * 1e3
+        return df
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: (m.name, m.labels))
+        lines = []
+        described = set()
+        for metric in metrics:
+            if metric.name not in described:
+                described.add(metric.name)
+                if metric.help:
+                    lines.append(f"# HELP {metric.name} {metric.help}")
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                label_str = ",".join(f'{k}="{v}"' for k, v in labels)
+                lines.append(f"{name}{{{label_str}}} {value}" if labels else f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    # ------------------------
+    # HTTP endpoint
+    # ------------------------
+    def serve(self, port=9108, host="127.0.0.1"):
+        """Serve render() at http://host:port/metrics from a daemon thread; returns the server."""
+        if self._server is not None:
+            return self._server
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        return self._server
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
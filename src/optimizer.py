@@ -0,0 +1,208 @@
+# src/optimizer.py
+"""
+Grid and random-search parameter sweeps for the SMA crossover + RSI strategy.
+
+Every distinct SMA window and RSI length is computed once for the whole sweep
+and placed in one shared-memory block; worker processes attach to it instead
+of receiving a pickled DataFrame per combination. Signals and backtests are
+then evaluated with the array engine from src.backtest, using the same rules
+as generate_signals + simple_backtest.
+"""
+import itertools
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from src.backtest import equity_metrics, vectorized_core
+from src.bar_store import dates_to_ns
+from src.indicators import add_rsi
+
+RANK_METRICS = ("Sharpe_Ratio", "CAGR", "Max_Drawdown", "total_return_pct", "Win_Rate")
+PARAM_NAMES = ("fast_sma", "slow_sma", "rsi_threshold", "rsi_length")
+
+# arrays attached by the current process (parent or pool worker)
+_ARRAYS = {}
+_SHM = None
+
+
+class SharedArrays:
+    """A set of named 1-D arrays packed into one SharedMemory block."""
+
+    def __init__(self, arrays: dict):
+        self.layout = {}
+        offset = 0
+        for key, arr in arrays.items():
+            arr = np.ascontiguousarray(arr)
+            offset = -(-offset // 8) * 8  # keep every array 8-byte aligned
+            self.layout[key] = (offset, arr.dtype.str, arr.shape[0])
+            offset += arr.nbytes
+        self.shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        for key, arr in arrays.items():
+            _view(self.shm, self.layout[key])[:] = arr
+
+    @property
+    def spec(self):
+        """Picklable handle passed to workers: (block name, layout)."""
+        return self.shm.name, self.layout
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+def _view(shm, entry):
+    offset, dtype, length = entry
+    return np.ndarray((length,), dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)
+
+
+def attach(spec):
+    """Map a SharedArrays block into this process without taking ownership of it."""
+    global _SHM, _ARRAYS
+    name, layout = spec
+    try:
+        shm = shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13; pool workers share the parent's resource tracker
+        shm = shared_memory.SharedMemory(name=name)
+    _SHM = shm
+    _ARRAYS = {key: _view(shm, entry) for key, entry in layout.items()}
+
+
+def detach():
+    """Drop this process's views and mapping of the attached block."""
+    global _SHM, _ARRAYS
+    _ARRAYS = {}
+    if _SHM is not None:
+        _SHM.close()
+        _SHM = None
+
+
+def _normalize(df: pd.DataFrame) -> pd.DataFrame:
+    """Positional copy with a Date column (accepts both Alpaca and yfinance frames)."""
+    if "Date" not in df.columns:
+        df = df.rename_axis("Date").reset_index()
+    return df.reset_index(drop=True)
+
+
+def precompute_indicators(df: pd.DataFrame, windows, rsi_lengths, cache=None) -> dict:
+    """
+    Build the flat arrays a sweep needs: per RSI length, the rows that survive
+    generate_signals' dropna(), their closes, dates, RSI and every SMA window.
+    With cache (an IndicatorCache) repeated sweeps over the same bars reuse them.
+    """
+    df = _normalize(df)
+    arrays = {}
+    for length in sorted(set(rsi_lengths)):
+        base = add_rsi(df.copy(), length=length, cache=cache).dropna()
+        close = base["Close"]
+        arrays[("close", length)] = close.to_numpy(dtype=np.float64)
+        arrays[("dates", length)] = dates_to_ns(pd.to_datetime(base["Date"], utc=True))
+        arrays[("rsi", length)] = base["RSI"].to_numpy(dtype=np.float64)
+        for window in sorted(set(windows)):
+            if cache is not None:
+                arrays[("sma", length, window)] = cache.sma(close, window)
+            else:
+                arrays[("sma", length, window)] = close.rolling(window).mean().to_numpy(dtype=np.float64)
+    return arrays
+
+
+def attached(key) -> np.ndarray:
+    """An array of the block attached by this process (see precompute_indicators for keys)."""
+    return _ARRAYS[key]
+
+
+def evaluate(fast_sma, slow_sma, rsi_threshold, rsi_length, initial_capital=10000, start=0, stop=None) -> dict:
+    """
+    Score one combination against the attached indicator arrays, optionally
+    on the [start, stop) rows only (the position starts flat at `start`).
+    """
+    rows = slice(start, stop)
+    close = _ARRAYS[("close", rsi_length)][rows]
+    signal = ((_ARRAYS[("sma", rsi_length, fast_sma)][rows] > _ARRAYS[("sma", rsi_length, slow_sma)][rows])
+              & (_ARRAYS[("rsi", rsi_length)][rows] < rsi_threshold))
+    prev = np.concatenate(([False], signal[:-1]))
+    equity, _, _, _, trade_pnls = vectorized_core(close, signal & ~prev, ~signal & prev, initial_capital)
+    result = equity_metrics(equity, _ARRAYS[("dates", rsi_length)][rows], initial_capital, trade_pnls)
+    result.update(fast_sma=fast_sma, slow_sma=slow_sma, rsi_threshold=rsi_threshold, rsi_length=rsi_length)
+    return result
+
+
+def _evaluate_chunk(combos, initial_capital):
+    return [evaluate(*combo, initial_capital=initial_capital) for combo in combos]
+
+
+def _chunks(items, n_chunks):
+    size = max(1, -(-len(items) // n_chunks))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def run_sweep(df: pd.DataFrame, combos, metric="Sharpe_Ratio", initial_capital=10000,
+              max_workers=None, cache=None) -> pd.DataFrame:
+    """
+    Evaluate (fast_sma, slow_sma, rsi_threshold, rsi_length) tuples and return
+    a DataFrame ranked by `metric` (best first). cache: optional IndicatorCache
+    for the precomputed RSI/SMA arrays.
+    """
+    if metric not in RANK_METRICS:
+        raise ValueError(f"Unknown metric: {metric!r} (expected one of {RANK_METRICS})")
+    combos = [tuple(c) for c in combos]
+    if not combos:
+        return pd.DataFrame(columns=list(PARAM_NAMES) + [metric])
+
+    windows = {c[0] for c in combos} | {c[1] for c in combos}
+    shared = SharedArrays(precompute_indicators(df, windows, {c[3] for c in combos}, cache=cache))
+    max_workers = max_workers or os.cpu_count() or 1
+    try:
+        if max_workers == 1:
+            attach(shared.spec)
+            results = _evaluate_chunk(combos, initial_capital)
+        else:
+            results = []
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=attach,
+                                     initargs=(shared.spec,)) as pool:
+                futures = [pool.submit(_evaluate_chunk, chunk, initial_capital)
+                           for chunk in _chunks(combos, max_workers * 4)]
+                for future in futures:
+                    results.extend(future.result())
+    finally:
+        detach()
+        shared.close()
+
+    ranked = pd.DataFrame(results)
+    ranked = ranked[list(PARAM_NAMES) + [c for c in ranked.columns if c not in PARAM_NAMES]]
+    return ranked.sort_values(metric, ascending=False, na_position="last", kind="stable").reset_index(drop=True)
+
+
+def _valid(combo):
+    return combo[0] < combo[1]
+
+
+def grid_search(df: pd.DataFrame, fast_sma, slow_sma, rsi_threshold, rsi_length=(14,),
+                metric="Sharpe_Ratio", initial_capital=10000, max_workers=None, cache=None) -> pd.DataFrame:
+    """Exhaustive sweep over every fast < slow combination of the given values."""
+    combos = [c for c in itertools.product(fast_sma, slow_sma, rsi_threshold, rsi_length) if _valid(c)]
+    return run_sweep(df, combos, metric=metric, initial_capital=initial_capital, max_workers=max_workers, cache=cache)
+
+
+def random_search(df: pd.DataFrame, fast_sma, slow_sma, rsi_threshold, rsi_length=(14,), n_iter=100,
+                  seed=None, metric="Sharpe_Ratio", initial_capital=10000, max_workers=None,
+                  cache=None) -> pd.DataFrame:
+    """Sweep `n_iter` distinct random fast < slow combinations drawn from the given values."""
+    space = [list(fast_sma), list(slow_sma), list(rsi_threshold), list(rsi_length)]
+    rng = random.Random(seed)
+    total = 1
+    for values in space:
+        total *= len(values)
+
+    combos = set()
+    attempts = 0
+    while len(combos) < n_iter and attempts < max(10 * n_iter, total):
+        combo = tuple(rng.choice(values) for values in space)
+        if _valid(combo):
+            combos.add(combo)
+        attempts += 1
+    return run_sweep(df, sorted(combos), metric=metric, initial_capital=initial_capital, max_workers=max_workers,
+                     cache=cache)
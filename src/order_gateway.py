@@ -0,0 +1,491 @@
+# src/order_gateway.py
+"""
+Non-blocking order execution against Alpaca's trading REST API.
+
+    gateway = OrderGateway()                       # credentials from src.config
+    ticket = gateway.submit("AAPL", 1, "buy")      # returns at once
+    ticket.client_order_id                         # known before the broker answers
+    ticket.result(timeout=5)                       # the accepted order (dict), or raises OrderError
+    ticket.wait(timeout=30)                        # the order once filled / canceled / rejected
+    gateway.close()
+
+Pipeline:
+
+    queue          submit() only puts the order on a bounded queue (queue_size);
+                   a full queue raises OrderError instead of blocking the caller
+    workers        `workers` threads send orders over one requests.Session whose
+                   pool keeps as many keep-alive connections
+    TokenBucket    every request takes a token (rate per second, bursts of
+                   `burst`; the defaults stay under Alpaca's 200 requests per
+                   minute); a 429 or an exhausted X-RateLimit-Remaining pauses
+                   the bucket until the server's reset time
+    retries        connection errors, timeouts, 429 and 5xx are retried with
+                   exponential backoff and jitter. Every order carries a
+                   client_order_id made here, so a retry cannot place it twice:
+                   after an answer that may have been lost, the order is first
+                   looked up by that id, and a "client_order_id must be unique"
+                   422 resolves to the existing order
+    fill tracking  accepted orders are polled every poll_interval (one list
+                   request for all open orders) until filled, canceled, expired
+                   or rejected, or updated at once from a trade_updates stream
+                   (attach() / on_trade_update())
+
+Each state change calls the ticket's on_update(ticket, event), event being
+'accepted', 'failed' or the order's new status, from a gateway thread. Failures
+are never just a log line: result() and wait() raise them. `metrics`
+(src.metrics) records order_queue_seconds (submit to first send),
+order_ack_seconds (submit to accepted), order_fill_seconds (submit to filled
+as seen here) and counters of orders, retries, rate limiting and failures.
+"""
+import logging
+import queue
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from src.metrics import Metrics
+
+ORDERS_PATH = "/v2/orders"
+TERMINAL = ("filled", "canceled", "expired", "rejected", "replaced")
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+PAGE_SIZE = 500  # orders per list request (Alpaca's maximum)
+
+
+class OrderError(RuntimeError):
+    """An order the gateway could not place (status is the HTTP status, None for local failures)."""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, holding at most `burst`."""
+
+    def __init__(self, rate: float, burst: int = 1, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = float(burst)
+        self.updated = clock()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take one token, waiting for it if needed; returns the seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self.clock()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now >= self.paused_until and self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return waited
+                delay = max(self.paused_until - now, (1.0 - self.tokens) / self.rate)
+            self.sleep(delay)
+            waited += delay
+
+    def pause_until(self, until: float):
+        """Hand out no tokens before `until` (clock time), e.g. the server's rate-limit reset."""
+        with self._lock:
+            self.paused_until = max(self.paused_until, until)
+            self.tokens = 0.0
+
+
+class OrderTicket:
+    """
+    One submitted order. `order` is the broker's latest view of it (None
+    until accepted); timestamps are time.perf_counter() values.
+    """
+
+    def __init__(self, request: dict, on_update=None):
+        self.request = request
+        self.client_order_id = request["client_order_id"]
+        self.on_update = on_update
+        self.order = None
+        self.error = None
+        self.attempts = 0
+        self.submitted_at = time.perf_counter()
+        self.submitted_wall = time.time()
+        self.sent_at = self.accepted_at = self.finished_at = None
+        self._accepted = threading.Event()
+        self._finished = threading.Event()
+
+    @property
+    def id(self):
+        """The broker's order id (None until accepted)."""
+        return self.order["id"] if self.order else None
+
+    @property
+    def status(self) -> str:
+        if self.error is not None:
+            return "failed"
+        return self.order["status"] if self.order else "queued"
+
+    @property
+    def done(self) -> bool:
+        return self._finished.is_set()
+
+    def result(self, timeout=None) -> dict:
+        """The accepted order; raises the OrderError if it could not be placed."""
+        if not self._accepted.wait(timeout):
+            raise TimeoutError(f"order {self.client_order_id} not accepted within {timeout} s")
+        if self.error is not None:
+            raise self.error
+        return self.order
+
+    def wait(self, timeout=None) -> dict:
+        """The order in its final state (filled, canceled, expired, rejected)."""
+        if not self._finished.wait(timeout):
+            raise TimeoutError(f"order {self.client_order_id} still {self.status} after {timeout} s")
+        if self.error is not None:
+            raise self.error
+        return self.order
+
+    def __repr__(self):
+        return (f"OrderTicket({self.request['side']} {self.request['qty']} {self.request['symbol']}, "
+                f"{self.client_order_id}, {self.status})")
+
+
+class OrderGateway:
+    def __init__(self, base_url=None, key_id=None, secret_key=None, workers=4, queue_size=1024, rate=3.0, burst=10,
+                 max_retries=5, backoff=0.1, max_backoff=5.0, timeout=10.0, poll_interval=1.0, metrics=None):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from src import config
+
+        self.base_url = (base_url or config.ALPACA_BASE_URL).rstrip("/")
+        self.session = requests.Session()
+        # retries are ours (idempotent by client_order_id), not urllib3's
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers + 1, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"APCA-API-KEY-ID": key_id or config.ALPACA_API_KEY_ID or "",
+                                     "APCA-API-SECRET-KEY": secret_key or config.ALPACA_API_SECRET_KEY or ""})
+        self._transport_errors = (requests.ConnectionError, requests.Timeout)
+        self.bucket = TokenBucket(rate, burst)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.metrics = metrics or Metrics()
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._open = {}      # client_order_id -> accepted, unfinished ticket
+        self._tickets = {}   # client_order_id -> unfinished ticket, for stream updates
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._closed = False
+        self._workers = [threading.Thread(target=self._work, name=f"order-gateway-{i}", daemon=True)
+                         for i in range(workers)]
+        self._poller = threading.Thread(target=self._poll_loop, name="order-gateway-poll", daemon=True)
+        for thread in self._workers + [self._poller]:
+            thread.start()
+
+    # ------------------------
+    # orders
+    # ------------------------
+    def submit(self, symbol: str, qty, side="buy", order_type="market", time_in_force="gtc", limit_price=None,
+               stop_price=None, client_order_id=None, on_update=None) -> OrderTicket:
+        """Queue an order and return its ticket at once (OrderError if the queue is full or closed)."""
+        if self._closed:
+            raise OrderError("order gateway is closed")
+        request = {"symbol": symbol, "qty": str(qty), "side": side, "type": order_type,
+                   "time_in_force": time_in_force, "client_order_id": client_order_id or uuid.uuid4().hex}
+        if limit_price is not None:
+            request["limit_price"] = str(limit_price)
+        if stop_price is not None:
+            request["stop_price"] = str(stop_price)
+        ticket = OrderTicket(request, on_update)
+        with self._lock:
+            self._tickets[ticket.client_order_id] = ticket
+        try:
+            self._queue.put_nowait(ticket)
+        except queue.Full:
+            with self._lock:
+                self._tickets.pop(ticket.client_order_id, None)
+            self.metrics.counter("order_failures_total", "Orders that could not be placed", shared=True,
+                                 reason="queue_full").inc()
+            raise OrderError(f"order queue full ({self._queue.maxsize} pending)") from None
+        self.metrics.counter("orders_submitted_total", "Orders submitted to the gateway", shared=True,
+                             side=side).inc()
+        return ticket
+
+    def track(self, order: dict, on_update=None) -> OrderTicket:
+        """
+        A ticket for an order placed earlier, e.g. by a process that has since
+        restarted (see find()), followed like a submitted one until it finishes.
+        """
+        request = {key: order.get(key) for key in ("symbol", "qty", "side", "type", "time_in_force",
+                                                   "client_order_id")}
+        ticket = OrderTicket(request, on_update)
+        if order.get("submitted_at"):
+            ticket.submitted_wall = datetime.fromisoformat(order["submitted_at"]).timestamp()
+        with self._lock:
+            self._tickets[ticket.client_order_id] = ticket
+        self._accept(ticket, order)
+        return ticket
+
+    def pending(self) -> int:
+        """Orders queued or in flight, not yet accepted or failed."""
+        return self._queue.unfinished_tasks
+
+    def open_orders(self) -> list:
+        """Tickets accepted by the broker and not finished yet."""
+        with self._lock:
+            return list(self._open.values())
+
+    def find(self, client_order_id: str):
+        """The broker's order with this client order id, None if it never reached the broker."""
+        try:
+            return self.request("GET", f"{ORDERS_PATH}:by_client_order_id", params={"client_order_id": client_order_id})
+        except OrderError as exc:
+            if exc.status == 404:
+                return None
+            raise
+
+    # ------------------------
+    # account
+    # ------------------------
+    def account(self) -> dict:
+        return self.request("GET", "/v2/account")
+
+    def positions(self) -> list:
+        return self.request("GET", "/v2/positions")
+
+    def request(self, method, path, **kwargs):
+        """One REST call on the pooled session, retried like orders; meant for reads (GET is idempotent)."""
+        error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self._sleep_backoff(attempt, "read")
+            try:
+                status, body = self._http(method, path, **kwargs)
+            except self._transport_errors as exc:
+                error = OrderError(f"{method} {path}: {exc}")
+                continue
+            if status < 300:
+                return body
+            error = OrderError(f"{method} {path}: HTTP {status} {_message(body)}", status)
+            if status not in RETRY_STATUSES:
+                break
+        raise error
+
+    # ------------------------
+    # fill updates
+    # ------------------------
+    def attach(self, stream):
+        """Take fill updates from an alpaca_trade_api Stream's trade_updates (polling stays as a fallback)."""
+        async def on_update(data):
+            self.on_trade_update(data)
+        stream.subscribe_trade_updates(on_update)
+        return stream
+
+    def on_trade_update(self, message):
+        """Apply one trade_updates message ({'event': ..., 'order': {...}}, or the SDK's entity)."""
+        message = getattr(message, "_raw", message)
+        order = message.get("order") or {}
+        with self._lock:
+            ticket = self._tickets.get(order.get("client_order_id"))
+        if ticket is not None:
+            self._update(ticket, order)
+
+    # ------------------------
+    # lifecycle
+    # ------------------------
+    def close(self, timeout=None):
+        """Send everything queued, stop the workers and the fill poller, and close the session."""
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._workers:
+            self._queue.put(None)
+        for thread in self._workers:
+            thread.join(timeout)
+        self._stop.set()
+        self._poller.join(timeout)
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ------------------------
+    # internals
+    # ------------------------
+    def _http(self, method, path, **kwargs):
+        """(status, JSON body or None) of one request, after taking a rate-limit token."""
+        if self.bucket.acquire():
+            self.metrics.counter("rate_limit_waits_total", "Requests that waited for a rate-limit token",
+                                 shared=True).inc()
+        response = self.session.request(method, self.base_url + path, timeout=self.timeout, **kwargs)
+        self._rate_limit(response)
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        return response.status_code, body
+
+    def _rate_limit(self, response):
+        """Pause the bucket when the server says the budget is spent (429, X-RateLimit-Remaining: 0)."""
+        headers = response.headers
+        remaining = headers.get("X-RateLimit-Remaining")
+        if response.status_code != 429 and remaining not in ("0", 0):
+            return
+        if response.status_code == 429:
+            self.metrics.counter("rate_limited_total", "Requests answered 429 Too Many Requests",
+                                 shared=True).inc()
+        if "Retry-After" in headers:
+            delay = float(headers["Retry-After"])
+        elif "X-RateLimit-Reset" in headers:
+            delay = float(headers["X-RateLimit-Reset"]) - time.time()
+        else:
+            delay = self.backoff
+        self.bucket.pause_until(time.monotonic() + max(delay, 0.0))
+
+    def _sleep_backoff(self, attempt, reason):
+        self.metrics.counter("order_retries_total", "Retried requests", shared=True, reason=reason).inc()
+        time.sleep(min(self.max_backoff, self.backoff * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0))
+
+    def _work(self):
+        while True:
+            ticket = self._queue.get()
+            try:
+                if ticket is None:
+                    return
+                self._send(ticket)
+            except Exception as exc:  # a worker must survive anything, the ticket reports it
+                self._fail(ticket, OrderError(f"order {ticket.client_order_id}: {exc!r}"))
+            finally:
+                self._queue.task_done()
+
+    def _send(self, ticket):
+        ticket.sent_at = time.perf_counter()
+        self.metrics.histogram("order_queue_seconds", "From submit to the first send", shared=True).observe(
+            ticket.sent_at - ticket.submitted_at)
+        error, lookup, reason = None, False, None
+        for attempt in range(self.max_retries + 1):
+            if attempt and reason is not None:
+                self._sleep_backoff(attempt, reason)
+            ticket.attempts = attempt + 1
+            try:
+                if lookup:
+                    # the last attempt may have placed the order: never send it twice
+                    status, body = self._http("GET", f"{ORDERS_PATH}:by_client_order_id",
+                                              params={"client_order_id": ticket.client_order_id})
+                    if status == 200:
+                        return self._accept(ticket, body)
+                    if status != 404:
+                        error, reason = OrderError(f"lookup: HTTP {status} {_message(body)}", status), "lookup"
+                        continue
+                    lookup = False
+                status, body = self._http("POST", ORDERS_PATH, json=ticket.request)
+            except self._transport_errors as exc:
+                error, lookup, reason = OrderError(f"no answer: {exc}"), True, "connection"
+                continue
+            if status in (200, 201):
+                return self._accept(ticket, body)
+            error = OrderError(f"HTTP {status} {_message(body)}", status)
+            if status == 422 and "client_order_id" in _message(body):
+                lookup, reason = True, None  # already placed by an attempt whose answer was lost
+            elif status == 429:
+                reason = "rate_limited"  # not processed: send again once the bucket allows
+            elif status in RETRY_STATUSES:
+                lookup, reason = True, "server_error"
+            else:
+                break  # rejected (403 buying power, 422 invalid order, ...): retrying cannot help
+        self._fail(ticket, error)
+
+    def _accept(self, ticket, order):
+        ticket.accepted_at = time.perf_counter()
+        self.metrics.histogram("order_ack_seconds", "From submit to accepted by the broker", shared=True).observe(
+            ticket.accepted_at - ticket.submitted_at)
+        ticket.order = order
+        with self._lock:
+            self._open[ticket.client_order_id] = ticket
+        ticket._accepted.set()
+        self._notify(ticket, "accepted")
+        self._update(ticket, order)
+
+    def _update(self, ticket, order):
+        """New broker view of an order: record it, finish the ticket on a terminal status."""
+        if ticket.done:
+            return
+        previous = ticket.order["status"] if ticket.order else None
+        ticket.order = order
+        if order["status"] in TERMINAL:
+            with self._lock:
+                if ticket.done:
+                    return
+                self._open.pop(ticket.client_order_id, None)
+                self._tickets.pop(ticket.client_order_id, None)
+                ticket.finished_at = time.perf_counter()
+                ticket._finished.set()
+            if order["status"] == "filled":
+                self.metrics.histogram("order_fill_seconds", "From submit to filled, as seen by the gateway",
+                                       shared=True).observe(ticket.finished_at - ticket.submitted_at)
+            self._notify(ticket, order["status"])
+        elif order["status"] != previous and previous is not None:
+            self._notify(ticket, order["status"])
+
+    def _fail(self, ticket, error):
+        logging.error(f"Order {ticket.request['side']} {ticket.request['qty']} {ticket.request['symbol']} "
+                      f"({ticket.client_order_id}) failed: {error}")
+        reason = "rejected" if error.status is not None and error.status not in RETRY_STATUSES else "exhausted"
+        self.metrics.counter("order_failures_total", "Orders that could not be placed", shared=True,
+                             reason=reason).inc()
+        ticket.error = error
+        with self._lock:
+            self._tickets.pop(ticket.client_order_id, None)
+        ticket.finished_at = time.perf_counter()
+        ticket._accepted.set()
+        ticket._finished.set()
+        self._notify(ticket, "failed")
+
+    def _notify(self, ticket, event):
+        if ticket.on_update is not None:
+            try:
+                ticket.on_update(ticket, event)
+            except Exception:
+                logging.exception(f"on_update failed for order {ticket.client_order_id}")
+
+    def _poll_loop(self):
+        while not self._stop.wait(self.poll_interval):
+            tickets = self.open_orders()
+            if not tickets:
+                continue
+            try:
+                self._poll(tickets)
+            except Exception as exc:
+                self.metrics.counter("order_poll_errors_total", "Failed fill-status polls", shared=True).inc()
+                logging.warning(f"Order status poll failed: {exc}")
+
+    def _poll(self, tickets):
+        """Refresh open tickets from list requests covering every order since the oldest of them."""
+        by_id = {ticket.client_order_id: ticket for ticket in tickets}
+        after = _rfc3339(min(ticket.submitted_wall for ticket in tickets) - 1.0)
+        while by_id:
+            page = self.request("GET", ORDERS_PATH, params={"status": "all", "after": after, "direction": "asc",
+                                                            "limit": PAGE_SIZE})
+            for order in page:
+                ticket = by_id.pop(order.get("client_order_id"), None)
+                if ticket is not None:
+                    self._update(ticket, order)
+            if len(page) < PAGE_SIZE:
+                break
+            after = page[-1]["submitted_at"]
+
+
+def _message(body) -> str:
+    return str(body.get("message", body)) if isinstance(body, dict) else str(body or "")
+
+
+def _rfc3339(epoch_seconds: float) -> str:
+    return datetime.fromtimestamp(epoch_seconds, tz=timezone.utc).isoformat().replace("+00:00", "Z")
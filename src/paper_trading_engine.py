@@ -1,90 +1,475 @@
 import time
 import logging
-from datetime import datetime, timedelta
+import threading
+import uuid
+from functools import partial
+from datetime import datetime, timedelta, timezone
 from src.broker_alpaca import AlpacaBroker
 from src.trade_logger import TradeLogger
-from src.utils import to_rfc3339
+from src.data_fetcher_alpaca import fetch_bars_incremental
+from src.engine_state import EngineState, signal_params
+from src.event_engine import BrokerExecution, EventEngine, Order, PolledBarFeed, SignalStrategy
+from src.market_stream import StreamingBarFeed
+from src.metrics import Metrics
+from src.order_gateway import TERMINAL
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
 
+
+class _TimedSignals:
+    """Times each signal update and marks when the bar's decision started (for signal-to-order)."""
+
+    def __init__(self, signals, engine):
+        self.signals = signals
+        self.engine = engine
+        self.histogram = engine.metrics.histogram("stage_seconds", stage="signals")
+
+    def update(self, close):
+        start = self.engine._signal_at = time.perf_counter()
+        latest = self.signals.update(close)
+        self.histogram.observe(time.perf_counter() - start)
+        return latest
+
+
+class _TimedExecution:
+    def __init__(self, execution, engine):
+        self.execution = execution
+        self.engine = engine
+
+    def execute(self, order, bar):
+        engine = self.engine
+        # written ahead: after a crash from here on, the restarted engine looks the order up by this id
+        client_order_id = order.id = engine._intend(order)
+        # with an order gateway this only queues the order; the ack arrives in _order_update
+        on_update = partial(engine._order_update, order.side, engine._signal_at)
+        try:
+            with engine.metrics.time("order"):
+                order = self.execution.execute(order, bar, on_update=on_update)
+        finally:
+            engine._sending = None
+        if not hasattr(engine.broker, "submit_order"):
+            engine._finished(client_order_id)
+            engine._order_sent(order.side)
+        return order
+
 class PaperTradingEngine:
     def __init__(self, broker: AlpacaBroker, symbol: str, qty: int = 1,
-                 poll_interval: int = 60, timeframe: str = "1Day"):
+                 poll_interval: int = 60, timeframe: str = "1Day", store=None, metrics=None,
+                 metrics_port=None, snapshots=None, logger=None):
         self.broker = broker
+        self.execution = BrokerExecution(broker)  # sends the orders of run() and of run_streaming's core
         self.symbol = symbol
         self.qty = qty
         self.poll_interval = poll_interval
         self.timeframe = timeframe   # 👈 store timeframe
+        self.store = store           # local bar store (None = default Alpaca store)
         self.in_position = False
         self.last_buy_price = None
-        self.logger = TradeLogger()
+        self.logger = logger or TradeLogger()
         self.running = False
+        # src.engine_state.SnapshotStore: run_streaming resumes from its snapshot and saves one per bar
+        self.snapshots = snapshots
+        self.core = None      # EventEngine and StreamingSignals of run_streaming, once prepared
+        self.signals = None
+        self.last_bar_ts = None
+        # orders sent and not known to be finished: client_order_id -> (side, qty, price, bar ts)
+        self.pending = {}
+        self._pending_lock = threading.Lock()
+        self._sending = None  # the order being handed to the broker (not in core.position yet)
+        self._entry_before = {}  # client_order_id -> core.entry_price before it, to undo it
+        self._unfilled = []  # orders the gateway reported failed or unfilled, undone on the engine's thread
+        self._to_journal = {}  # client_order_id -> log_trade arguments, journaled once the broker fills it
+        self._filled = set()  # orders whose fill arrived before they were handed to _journal
+        # per-stage timings, poll lateness and signal-to-order latency (see src.metrics);
+        # metrics_port also serves them for Prometheus while the engine runs
+        self.metrics = metrics or Metrics()
+        self.metrics_port = metrics_port
+        self._last_poll = None
+        self._signal_at = None
+
+    def fetch_data(self, lookback_days=90, start=None):
+        """Fetch bars with chosen timeframe (from `start` if given, else the lookback window)"""
+        end = datetime.now(timezone.utc)
+        start = start or end - timedelta(days=lookback_days)
+        # only the bars not already in the local store are requested
+        return fetch_bars_incremental(self.broker.api, self.symbol, start, end, self.timeframe, store=self.store)
 
-    def fetch_data(self, lookback_days=90):
-        """Fetch bars with chosen timeframe"""
-        end = datetime.now()
-        start = end - timedelta(days=lookback_days)
-
-        start_str = to_rfc3339(start)
-        end_str = to_rfc3339(end)
-
-        bars = self.broker.api.get_bars(
-            self.symbol,
-            self.timeframe,   # 👈 use selected timeframe
-            start=start_str,
-            end=end_str,
-            feed="iex"
-        ).df.reset_index()
-
-        bars = bars.rename(columns={
-            "timestamp": "Date",
-            "open": "Open",
-            "high": "High",
-            "low": "Low",
-            "close": "Close",
-            "volume": "Volume"
-        })
-
-        return bars[["Date", "Open", "High", "Low", "Close", "Volume"]]
-
-    def run(self, strategy_fn, strategy_kwargs=None):
+    def run(self, strategy_fn, strategy_kwargs=None, indicators_fn=None):
+        """
+        Poll loop over full lookback frames. indicators_fn(df), if given, runs
+        (and is timed) before strategy_fn; otherwise strategy_fn's time is all
+        recorded as the signals stage.
+        """
         logging.info("Starting generic paper trading engine...")
         strategy_kwargs = strategy_kwargs or {}
         self.running = True   # 👈 set flag
+        self._start_metrics()
 
         while self.running:   # 👈 loop until stopped
             try:
-                df = self.fetch_data()
-                df = strategy_fn(df, **strategy_kwargs)
-                latest = df.iloc[-1]
-
-                if latest.get("entry", False) and not self.in_position:
-                    price = latest["Close"]
-                    logging.info(f"BUY {self.qty} {self.symbol} @ {price}")
-                    order = self.broker.place_order(self.symbol, self.qty, side="buy")
-                    logging.info(f"Order response: {order}")
-                    self.in_position = True
-                    self.last_buy_price = price
-                    self.logger.log_trade(self.symbol, "BUY", self.qty, price, order["id"])
-
-                elif latest.get("exit", False) and self.in_position:
-                    price = latest["Close"]
-                    logging.info(f"SELL {self.qty} {self.symbol} @ {price}")
-                    order = self.broker.place_order(self.symbol, self.qty, side="sell")
-                    logging.info(f"Order response: {order}")
-                    self.in_position = False
-
-                    pnl = (price - self.last_buy_price) * self.qty if self.last_buy_price else None
-                    self.logger.log_trade(self.symbol, "SELL", self.qty, price, order["id"], pnl=pnl)
-                    self.last_buy_price = None
+                df = self._timed_fetch()
+                self._signal_at = time.perf_counter()
+                if indicators_fn is not None:
+                    with self.metrics.time("indicators"):
+                        df = indicators_fn(df)
+                with self.metrics.time("signals"):
+                    df = strategy_fn(df, **strategy_kwargs)
+                self.on_signal(df.iloc[-1])
 
             except Exception as e:
+                self.metrics.counter("errors_total", "Exceptions in the trading loop").inc()
                 logging.error(f"Error in trading loop: {e}")
 
             time.sleep(self.poll_interval)
 
         logging.info("Trading engine stopped gracefully ✅")
 
+    def run_streaming(self, signals, lookback_days=90, stream=None, source="trades", clock=time.time_ns):
+        """
+        Like run(), but on the event-driven core shared with backtests
+        (src.event_engine): history is replayed once into the incremental
+        strategy (e.g. StreamingSignals) without trading, then every poll feeds
+        the bars that have closed since, so live trades match a replay of the
+        same bars.
+
+        With a websocket `stream` (src.market_stream.alpaca_stream, or a
+        ReplayServer's), bars are built from its trades (source="trades") or
+        minute bars (source="bars") instead of polling, and REST is only used
+        for the history and to backfill around the first streamed bar.
+        clock=None turns off closing quiet bars by wall-clock time (replays).
+        """
+        logging.info("Starting streaming paper trading engine...")
+        self.running = True
+        self._start_metrics()
+
+        _, feed = self.prepare(signals, lookback_days)
+        if stream is not None:
+            feed = StreamingBarFeed(stream, self.symbol, self.timeframe, source=source, start=feed.last_ts,
+                                    backfill=feed.fetch, running=lambda: self.running, clock=clock)
+            delay = self.metrics.histogram("stream_delay_seconds", "From closing message received to bar in hand")
+        bars = self.metrics.counter("bars_total", "Closed bars processed")
+        for bar in feed:
+            if stream is not None:
+                delay.observe(time.perf_counter() - feed.closed_at)
+            self.on_bar(bar)
+            bars.inc()
+
+        self.snapshot()
+        logging.info("Trading engine stopped gracefully ✅")
+
+    def prepare(self, signals, lookback_days=90):
+        """
+        Ready run_streaming's event core: returns (core, polled feed) with the
+        strategy warmed up and the position reconciled with the broker.
+
+        With `snapshots` holding a snapshot of this symbol, timeframe and
+        strategy parameters, the indicators, position and open orders are
+        restored from it and only the bars closed since are fetched and
+        replayed (without trading, like the history on a cold start).
+        Otherwise the whole lookback is. Either way the position then follows
+        the broker (see _reconcile), so a restart never enters twice.
+        """
+        started = time.perf_counter()
+        strategy = SignalStrategy(signals, qty=self.qty)
+        core = EventEngine(strategy, _TimedExecution(self.execution, self),
+                           symbol=self.symbol, on_fill=self._on_fill)
+        fetch = lambda start: self._timed_fetch(lookback_days=lookback_days, start=start)
+        feed = PolledBarFeed(fetch, self.timeframe, poll_interval=self.poll_interval, running=lambda: self.running)
+        state = self._load_snapshot(signals)
+        if state is not None:
+            signals.load_state(state.signals)
+            feed.last_ts, core.cash = state.last_ts, state.cash
+        history = feed.poll()
+        core.warmup(history)
+        self._reconcile(core, state)
+        # only live bars are timed; incremental indicators are part of the signals stage here
+        strategy.signals = _TimedSignals(signals, self)
+        self.core, self.signals, self.last_bar_ts = core, signals, feed.last_ts
+        self.snapshot()
+        seconds = time.perf_counter() - started
+        self.metrics.histogram("startup_seconds", "From start to ready to trade").observe(seconds)
+        logging.info(f"Ready in {seconds * 1e3:.1f} ms: {'resumed from snapshot, ' if state else ''}"
+                     f"{len(history)} bars replayed, position {core.position}")
+        return core, feed
+
+    def on_bar(self, bar):
+        """One closed bar through the prepared core (signals, orders), then a snapshot."""
+        self._settle()
+        # set first: a snapshot written ahead of an order already holds this bar's indicator state
+        self.last_bar_ts = bar.ts
+        self.core.on_bar(bar)
+        self.snapshot()
+
+    # ------------------------
+    # snapshots
+    # ------------------------
+    def snapshot(self):
+        """Save the prepared engine's state to `snapshots` (no-op without one)."""
+        if self.snapshots is None or self.core is None:
+            return
+        self._settle()
+        core = self.core
+        with self._pending_lock:
+            orders = [(client_order_id, *order) for client_order_id, order in self.pending.items()]
+        # the position without the orders listed: on restart those count as the broker reports them
+        booked = sum(qty if side == "buy" else -qty for client_order_id, side, qty, _, _ in orders
+                     if client_order_id != self._sending)
+        state = EngineState(self.symbol, self.timeframe, signal_params(self.signals), self.last_bar_ts,
+                            core.position - booked, core.entry_price, core.cash, self.signals.state(), orders)
+        with self.metrics.time("snapshot"):
+            self.snapshots.save(state)
+
+    def _load_snapshot(self, signals):
+        if self.snapshots is None:
+            return None
+        state = self.snapshots.load(self.symbol, self.timeframe)
+        if state is None:
+            return None
+        if (state.symbol, state.timeframe, state.params) != (self.symbol, self.timeframe, signal_params(signals)):
+            logging.warning(f"Snapshot of {state.symbol} {state.timeframe} {state.params} does not match this "
+                            f"engine's strategy; warming up from history")
+            return None
+        return state
+
+    def _reconcile(self, core, state):
+        """
+        Set the position from the snapshot's, plus each of its orders the
+        broker has filled or still holds open (a market order that is open
+        will fill), capped by what the broker holds plus those open buys.
+        Orders that never reached the broker or ended unfilled do not count;
+        orders whose lookup fails count as open, so an order sent just before
+        a crash can at worst be waited on, never sent twice. Without a
+        snapshot, a position the broker holds counts as the engine's (up to
+        qty).
+        """
+        position = state.position if state is not None else 0
+        entry_price = state.entry_price if state is not None else None
+        find = getattr(self.broker, "find_order", None)
+        track = getattr(self.broker, "track_order", None)
+        open_buys = 0
+        for client_order_id, side, qty, price, ts in state.orders if state is not None else []:
+            try:
+                # without lookups (brokers placing orders synchronously) the broker's position tells
+                order = find(client_order_id) if find is not None else {"status": "filled"}
+            except Exception as e:
+                logging.warning(f"Could not look up order {client_order_id}: {e}")
+                order = {"status": "unknown"}
+            status = "never placed" if order is None else order["status"]
+            logging.info(f"Snapshot order {side} {qty} {self.symbol} ({client_order_id}): {status}")
+            if order is None or (status in TERMINAL and status != "filled"):
+                continue
+            position += qty if side == "buy" else -qty
+            if side == "buy":
+                entry_price = entry_price or price
+            if status not in TERMINAL:
+                open_buys += qty if side == "buy" else 0
+                with self._pending_lock:
+                    self.pending[client_order_id] = (side, qty, price, ts)
+                    self._to_journal[client_order_id] = (side, qty, price, None)
+                if track is not None and status != "unknown":
+                    track(order, on_update=partial(self._order_update, side, None))
+
+        held = self._broker_position()
+        if held is not None:
+            qty, avg_price = held
+            if state is None:
+                position, entry_price = min(qty, self.qty), avg_price
+            if position != min(position, qty + open_buys):
+                logging.warning(f"Broker holds {qty} {self.symbol} (+{open_buys} on order), the engine expected "
+                                f"{position}: following the broker")
+            position = min(position, qty + open_buys)
+        position = max(position, 0)
+        core.position = position
+        core.entry_price = (entry_price or (held[1] if held else None)) if position else None
+        self.in_position, self.last_buy_price = position > 0, core.entry_price
+
+    def _broker_position(self):
+        """
+        (qty, avg entry price) the broker holds in the symbol, (0, None) if
+        none; None if it cannot say. Positions come as Alpaca's list of dicts
+        or, from MockBroker, as {symbol: qty} (no entry price).
+        """
+        get_positions = getattr(self.broker, "get_positions", None) or getattr(self.broker, "positions", None)
+        try:
+            positions = get_positions()
+            if isinstance(positions, dict):
+                positions = [{"symbol": symbol, "qty": qty, "avg_entry_price": None}
+                             for symbol, qty in positions.items()]
+            for position in positions:
+                if position["symbol"] == self.symbol:
+                    qty, avg_price = float(position["qty"]), position.get("avg_entry_price")
+                    return int(qty) if qty.is_integer() else qty, None if avg_price is None else float(avg_price)
+        except Exception as e:
+            logging.warning(f"Could not read broker positions, trusting the snapshot: {e}")
+            return None
+        return 0, None
+
+    def _intend(self, order) -> str:
+        """Record an order about to be sent (and save the snapshot) before the broker sees it; returns its id."""
+        client_order_id = uuid.uuid4().hex
+        with self._pending_lock:
+            self.pending[client_order_id] = (order.side, order.qty, order.price, order.ts)
+            self._entry_before[client_order_id] = self.core.entry_price if self.core is not None else None
+        self._sending = client_order_id
+        self.snapshot()
+        return client_order_id
+
+    def _finished(self, client_order_id):
+        with self._pending_lock:
+            self.pending.pop(client_order_id, None)
+            self._entry_before.pop(client_order_id, None)
+
+    def _settle(self):
+        """
+        Undo in the core (on the engine's thread) the orders the gateway
+        reported failed or ended unfilled, so the strategy and the snapshot
+        stop counting them.
+        """
+        if not self._unfilled or self.core is None:
+            return
+        with self._pending_lock:
+            undone = [(client_order_id, self.pending.pop(client_order_id, None),
+                       self._entry_before.pop(client_order_id, None))
+                      for client_order_id in self._unfilled if client_order_id != self._sending]
+            for client_order_id, _, _ in undone:
+                self._to_journal.pop(client_order_id, None)
+            # one failing while still being handed over is booked after this: undone next time
+            self._unfilled = [client_order_id for client_order_id in self._unfilled
+                              if client_order_id == self._sending]
+        core = self.core
+        for client_order_id, order, entry_price in undone:
+            if order is None:
+                continue
+            side, qty, price, ts = order
+            core.undo(Order(ts, self.symbol, side, qty, price, id=client_order_id),
+                      entry_price if entry_price is not None else core.entry_price or price)
+            logging.warning(f"Took back {side.upper()} {qty} {self.symbol} ({client_order_id}): position "
+                            f"{core.position}")
+        self.in_position, self.last_buy_price = core.position > 0, core.entry_price
+
+    def _on_fill(self, order):
+        logging.info(f"{order.side.upper()} {order.qty} {self.symbol} @ {order.price}")
+        self.in_position = order.side == "buy"
+        self.last_buy_price = order.price if self.in_position else None
+        self._journal(order.id, order.side, order.qty, order.price, order.pnl)
+
+    def _journal(self, order_id, side, qty, price, pnl=None):
+        """Journal a trade: at once with a synchronous broker, through an order gateway once it is filled."""
+        if hasattr(self.broker, "submit_order"):
+            with self._pending_lock:
+                if order_id not in self._filled:
+                    self._to_journal[order_id] = (side, qty, price, pnl)
+                    return
+                self._filled.discard(order_id)
+        self._log_trade(order_id, side, qty, price, pnl)
+
+    def _log_trade(self, order_id, side, qty, price, pnl=None):
+        with self.metrics.time("journal"):
+            self.logger.log_trade(self.symbol, side.upper(), qty, price, order_id, pnl=pnl)
+
+    # ------------------------
+    # instrumentation
+    # ------------------------
+    def _start_metrics(self):
+        self._last_poll = None
+        if self.metrics_port is not None:
+            self.metrics.serve(self.metrics_port)
+
+    def _timed_fetch(self, **kwargs):
+        """fetch_data, timed, recording how late this poll started against poll_interval."""
+        started = time.monotonic()
+        if self._last_poll is not None:
+            self.metrics.histogram("poll_lateness_seconds", "Poll start delay beyond poll_interval").observe(
+                max(0.0, started - self._last_poll - self.poll_interval))
+        self._last_poll = started
+        self.metrics.counter("polls_total", "Data polls").inc()
+        with self.metrics.time("fetch"):
+            return self.fetch_data(**kwargs)
+
+    def _order_sent(self, side, signal_at=None):
+        """Count an acknowledged order and record the time since its bar's decision started."""
+        # from the order gateway's threads too
+        self.metrics.counter("orders_total", "Orders acknowledged by the broker", shared=True, side=side).inc()
+        signal_at = signal_at or self._signal_at
+        if signal_at is not None:
+            self.metrics.histogram("signal_to_order_seconds", "From bar in hand to order acknowledged",
+                                   shared=True).observe(time.perf_counter() - signal_at)
+
+    def _order_update(self, side, signal_at, ticket, event):
+        """
+        Order gateway callback (from its threads): count the ack, journal the
+        fill, and take back an order that failed or ended unfilled: the
+        position flags here, the event core's position, cash and entry price
+        on the engine's thread (_settle) before its next bar or snapshot.
+        """
+        client_order_id = ticket.client_order_id
+        if event == "accepted":
+            self._order_sent(side, signal_at)
+        elif event == "filled":
+            self._finished(client_order_id)
+            with self._pending_lock:
+                trade = self._to_journal.pop(client_order_id, None)
+                if trade is None:
+                    self._filled.add(client_order_id)
+            if trade is not None:
+                self._log_trade(client_order_id, *trade)
+        elif event in ("failed", "canceled", "expired", "rejected"):
+            with self._pending_lock:
+                self._to_journal.pop(client_order_id, None)
+                if client_order_id in self.pending:  # booked in (or being handed to) the event core
+                    self._unfilled.append(client_order_id)
+            self.metrics.counter("order_errors_total", "Orders that failed or ended unfilled", shared=True,
+                                 side=side).inc()
+            logging.error(f"{side.upper()} {self.qty} {self.symbol} ({client_order_id}) {event}: "
+                          f"{ticket.error or ticket.order}")
+            self.in_position = side == "sell"
+            if side == "buy":
+                self.last_buy_price = None
+        elif event in TERMINAL:
+            self._finished(client_order_id)
+
+    def _send(self, side, price):
+        """
+        Place a market order (reference `price`, for brokers that fill at it)
+        through BrokerExecution and return its id; with an order gateway it is
+        only queued (client order id).
+        """
+        on_update = partial(self._order_update, side, self._signal_at)
+        with self.metrics.time("order"):
+            order = self.execution.execute(Order(None, self.symbol, side, self.qty, price), None,
+                                           on_update=on_update)
+        if getattr(self.broker, "submit_order", None) is None:
+            self._order_sent(side)
+        return order.id
+
+    def on_signal(self, latest):
+        """Act on the latest bar's entry/exit flags (a DataFrame row or a dict)."""
+        if latest.get("entry", False) and not self.in_position:
+            price = latest["Close"]
+            logging.info(f"BUY {self.qty} {self.symbol} @ {price}")
+            # flags first: through an order gateway a failure may be reported (and undone) before _send returns
+            self.in_position, self.last_buy_price = True, price
+            try:
+                order_id = self._send("buy", price)
+            except Exception:
+                self.in_position, self.last_buy_price = False, None
+                raise
+            self._journal(order_id, "buy", self.qty, price)
+
+        elif latest.get("exit", False) and self.in_position:
+            price = latest["Close"]
+            logging.info(f"SELL {self.qty} {self.symbol} @ {price}")
+            bought = self.last_buy_price
+            pnl = (price - bought) * self.qty if bought else None
+            self.in_position, self.last_buy_price = False, None
+            try:
+                order_id = self._send("sell", price)
+            except Exception:
+                self.in_position, self.last_buy_price = True, bought
+                raise
+            self._journal(order_id, "sell", self.qty, price, pnl)
+
     def stop(self):
-        """Stop the trading loop gracefully."""
+        """Stop the trading loop gracefully (and the metrics endpoint, if serving)."""
         self.running = False
+        self.metrics.close()
@@ -0,0 +1,165 @@
+# src/portfolio_backtest.py
+"""
+Multi-asset backtest with one shared cash balance.
+
+Takes aligned (time x symbols) closes and entry/exit masks -- e.g. from
+strategy.generate_signals_matrix -- and keeps positions as a vector per
+symbol. Cash only changes on rows that carry a signal, so the Python loop
+walks those rows and handles all symbols of a row with array operations; the
+equity of the rows in between is one matrix-vector product per segment.
+
+Per row, exits are filled before entries (sales fund the buys of the same
+bar) and entries are filled in column order while cash lasts. Quantities are
+whole shares, as in simple_backtest.
+"""
+import numpy as np
+import pandas as pd
+
+from src.backtest import equity_metrics
+
+SIZING_RULES = ("equal_weight", "fixed_notional", "fixed_qty")
+
+
+def _forward_fill(prices: np.ndarray) -> np.ndarray:
+    """Last valid price per column (0 before a symbol's first bar), for marking positions."""
+    valid = ~np.isnan(prices)
+    last = np.where(valid, np.arange(len(prices))[:, None], 0)
+    np.maximum.accumulate(last, axis=0, out=last)
+    filled = prices[last, np.arange(prices.shape[1])]
+    filled[~np.maximum.accumulate(valid, axis=0)] = 0.0
+    return filled
+
+
+def _target_qty(sizing, prices, equity, n_symbols, qty, notional):
+    if sizing == "fixed_qty":
+        return np.full(len(prices), float(qty))
+    if sizing == "fixed_notional":
+        return np.floor(notional / prices)
+    return np.floor(equity / n_symbols / prices)
+
+
+def portfolio_backtest(closes: np.ndarray, entry: np.ndarray, exit_: np.ndarray, dates=None, symbols=None,
+                       initial_capital=10000, sizing="equal_weight", qty=1, notional=1000):
+    """
+    Backtest many symbols against one cash balance.
+
+    sizing: "equal_weight" buys floor(equity / n_symbols / price) shares at
+    entry (with one symbol this is simple_backtest's all-in rule),
+    "fixed_notional" floor(notional / price) and "fixed_qty" `qty` shares.
+    Entries that no longer fit the remaining cash are skipped.
+
+    Returns (df, summary) like simple_backtest: df has Date, equity and cash
+    per row; summary holds the usual metrics plus 'per_asset' and 'trades'
+    DataFrames.
+    """
+    if sizing not in SIZING_RULES:
+        raise ValueError(f"Unknown sizing rule: {sizing!r} (expected one of {SIZING_RULES})")
+    closes = np.asarray(closes)
+    if closes.dtype not in (np.float32, np.float64):
+        closes = closes.astype(np.float64)
+    n_rows, n_symbols = closes.shape
+    symbols = list(symbols) if symbols is not None else [str(i) for i in range(n_symbols)]
+    dates = pd.DatetimeIndex(dates) if dates is not None else pd.RangeIndex(n_rows)
+
+    tradable = ~np.isnan(closes) & (closes > 0)
+    entry = np.asarray(entry, dtype=bool) & tradable
+    exit_ = np.asarray(exit_, dtype=bool) & tradable
+    marks = _forward_fill(closes)
+
+    position = np.zeros(n_symbols)
+    entry_price = np.zeros(n_symbols)
+    realized = np.zeros(n_symbols)
+    n_trades = np.zeros(n_symbols, dtype=np.int64)
+    n_wins = np.zeros(n_symbols, dtype=np.int64)
+    cash = float(initial_capital)
+    equity = np.empty(n_rows)
+    cash_curve = np.empty(n_rows)
+    fills = []  # (row, symbol columns, qty, price, pnl) arrays per signal row and side
+
+    events = np.flatnonzero((entry | exit_).any(axis=1))
+    bounds = np.append(events, n_rows)
+    if len(events) == 0 or events[0] > 0:
+        first = events[0] if len(events) else n_rows
+        equity[:first] = cash
+        cash_curve[:first] = cash
+
+    for k, row in enumerate(events):
+        price = closes[row].astype(np.float64)
+        held = position > 0
+
+        sells = np.flatnonzero(exit_[row] & held)
+        if len(sells):
+            sell_qty = position[sells]
+            pnl = (price[sells] - entry_price[sells]) * sell_qty
+            cash += float(sell_qty @ price[sells])
+            realized[sells] += pnl
+            n_trades[sells] += 1
+            n_wins[sells] += pnl > 0
+            position[sells] = 0.0
+            fills.append((row, sells, -sell_qty, price[sells], pnl))
+
+        buys = np.flatnonzero(entry[row] & ~held)
+        if len(buys):
+            equity_now = cash + float(position @ marks[row])
+            want = _target_qty(sizing, price[buys], equity_now, n_symbols, qty, notional)
+            cost = want * price[buys]
+            if cost.sum() <= cash:
+                affordable = np.flatnonzero(want > 0)
+            else:
+                affordable = _greedy_fill(cost, want, cash)
+            if len(affordable):
+                cols = buys[affordable]
+                cash -= float(cost[affordable].sum())
+                position[cols] = want[affordable]
+                entry_price[cols] = price[cols]
+                fills.append((row, cols, want[affordable], price[cols], np.full(len(cols), np.nan)))
+
+        segment = slice(row, bounds[k + 1])
+        equity[segment] = cash + marks[segment] @ position
+        cash_curve[segment] = cash
+
+    trades = _trade_frame(fills, dates, symbols)
+    closed_pnls = trades.loc[trades["type"] == "SELL", "pnl"].to_numpy()
+    unrealized = position * (marks[-1] - entry_price) if n_rows else np.zeros(n_symbols)
+    per_asset = pd.DataFrame({
+        "symbol": symbols,
+        "num_trades": n_trades,
+        "Win_Rate": np.divide(n_wins * 100.0, n_trades, out=np.zeros(n_symbols), where=n_trades > 0),
+        "realized_pnl": realized,
+        "open_qty": position,
+        "unrealized_pnl": unrealized,
+        "total_pnl": realized + unrealized,
+    }).set_index("symbol")
+
+    dates_ns = (np.asarray(dates.asi8) if isinstance(dates, pd.DatetimeIndex)
+                else np.arange(n_rows, dtype=np.int64) * 86_400_000_000_000)
+    summary = equity_metrics(equity, dates_ns, initial_capital, closed_pnls)
+    summary.update(per_asset=per_asset, trades=trades)
+    df = pd.DataFrame({"Date": dates, "equity": equity, "cash": cash_curve})
+    return df, summary
+
+
+def _greedy_fill(cost, want, cash):
+    """Entries filled one by one in column order, skipping those that do not fit."""
+    taken = []
+    for i, (c, w) in enumerate(zip(cost.tolist(), want.tolist())):
+        if w > 0 and c <= cash:
+            cash -= c
+            taken.append(i)
+    return np.asarray(taken, dtype=np.int64)
+
+
+def _trade_frame(fills, dates, symbols) -> pd.DataFrame:
+    if not fills:
+        return pd.DataFrame({"date": dates[:0], "symbol": [], "type": [], "qty": [], "price": [], "pnl": []})
+    rows = np.concatenate([np.full(len(f[1]), f[0]) for f in fills])
+    cols = np.concatenate([f[1] for f in fills])
+    signed = np.concatenate([f[2] for f in fills])
+    return pd.DataFrame({
+        "date": dates[rows],
+        "symbol": np.asarray(symbols, dtype=object)[cols],
+        "type": np.where(signed > 0, "BUY", "SELL"),
+        "qty": np.abs(signed),
+        "price": np.concatenate([f[3] for f in fills]),
+        "pnl": np.concatenate([f[4] for f in fills]),
+    })
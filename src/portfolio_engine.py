@@ -0,0 +1,197 @@
+# src/portfolio_engine.py
+"""
+Multi-symbol paper trading on one asyncio event loop.
+
+Every tick fetches the new bars for the whole universe with a few batched
+get_bars calls (Alpaca accepts symbol lists), feeds them to one incremental
+strategy per symbol and routes orders through a single shared broker.
+
+Symbols are fetched from their own last bar, grouped by it, so a halted or
+stale symbol does not make every tick refetch the others' history. Like
+PolledBarFeed, only closed bars reach the strategies (a forming bar waits
+until it closes), so live decisions match a replay of the same bars.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from src.bar_store import dates_to_ns, timeframe_delta
+from src.strategy import StreamingSignals
+from src.trade_logger import TradeLogger
+from src.utils import to_rfc3339
+
+# symbols per get_bars request
+BATCH_SIZE = 200
+# ticks whose latency is kept (tick_latencies)
+LATENCY_HISTORY = 1000
+
+
+class AlpacaBarSource:
+    """Batched bar fetches through an Alpaca REST client (or FakeAlpacaREST)."""
+
+    def __init__(self, api, timeframe="1Day", batch_size=BATCH_SIZE, feed="iex"):
+        self.api = api
+        self.timeframe = timeframe
+        self.batch_size = batch_size
+        self.feed = feed
+        self.request_count = 0
+
+    async def fetch(self, symbols, start) -> dict:
+        """{symbol: (epoch-ns timestamps, closes)} of bars at or after `start`, one request per batch."""
+        batches = [symbols[i:i + self.batch_size] for i in range(0, len(symbols), self.batch_size)]
+        results = await asyncio.gather(*(asyncio.to_thread(self._fetch_batch, batch, start) for batch in batches))
+        bars = {}
+        for result in results:
+            bars.update(result)
+        return bars
+
+    def _fetch_batch(self, symbols, start):
+        self.request_count += 1
+        df = self.api.get_bars(symbols, self.timeframe, start=to_rfc3339(start),
+                               end=to_rfc3339(datetime.now(timezone.utc)), feed=self.feed).df
+        if df.empty:
+            return {}
+        ts = dates_to_ns(df.index)
+        close = df["close"].to_numpy(dtype=float)
+        if "symbol" not in df.columns:  # single-symbol responses carry no symbol column
+            return {symbols[0]: (ts, close)}
+        # split the flat response per symbol with array ops instead of a pandas groupby
+        codes, names = pd.factorize(df["symbol"])
+        order = np.argsort(codes, kind="stable")
+        groups = np.split(order, np.flatnonzero(np.diff(codes[order])) + 1)
+        return {names[codes[idx[0]]]: (ts[idx], close[idx]) for idx in groups}
+
+
+@dataclass
+class SymbolState:
+    signals: StreamingSignals
+    in_position: bool = False
+    last_buy_price: float = None
+    last_ts: int = None  # epoch ns of the newest bar fed to the strategy
+    latest: dict = field(default_factory=dict)
+
+
+class PortfolioEngine:
+    def __init__(self, broker, symbols, qty: int = 1, poll_interval: int = 60, timeframe: str = "1Day",
+                 bar_source=None, strategy_kwargs=None, logger=None, clock=time.time_ns):
+        self.broker = broker
+        self.symbols = list(symbols)
+        self.qty = qty
+        self.poll_interval = poll_interval
+        self.timeframe = timeframe
+        self.bar_ns = int(timeframe_delta(timeframe).value)
+        self.clock = clock  # epoch ns now: bars starting after clock() - bar_ns are still forming
+        self.bar_source = bar_source or AlpacaBarSource(broker.api, timeframe=timeframe)
+        strategy_kwargs = strategy_kwargs or {}
+        self.states = {symbol: SymbolState(StreamingSignals(**strategy_kwargs)) for symbol in self.symbols}
+        self.logger = logger or TradeLogger()
+        self.running = False
+        # seconds from poll start to all decisions made, for the last LATENCY_HISTORY ticks
+        self.tick_latencies = deque(maxlen=LATENCY_HISTORY)
+
+    async def seed(self, lookback_days=90):
+        """Replay history once for every symbol (batched, like a tick)."""
+        start = datetime.now(timezone.utc) - timedelta(days=lookback_days)
+        bars = await self.bar_source.fetch(self.symbols, start)
+        closed_before = self.clock() - self.bar_ns
+        for symbol, (ts, close) in bars.items():
+            state = self.states.get(symbol)
+            if state is not None:
+                self._consume(state, ts, close, closed_before)
+
+    async def tick(self):
+        """One poll: fetch new bars for all symbols, update strategies, place orders."""
+        started = time.perf_counter()
+        groups = {}
+        for symbol, state in self.states.items():
+            groups.setdefault(state.last_ts, []).append(symbol)
+        default = datetime.now(timezone.utc) - timedelta(days=1)
+        fetched = await asyncio.gather(*(
+            self.bar_source.fetch(symbols, default if last_ts is None else pd.Timestamp(last_ts, tz="UTC"))
+            for last_ts, symbols in groups.items()))
+
+        closed_before = self.clock() - self.bar_ns
+        decisions = []
+        for bars in fetched:
+            for symbol, (ts, close) in bars.items():
+                state = self.states.get(symbol)
+                if state is None:
+                    continue
+                latest = self._consume(state, ts, close, closed_before)
+                if latest is not None:
+                    decisions.append((symbol, state, latest))
+        self.tick_latencies.append(time.perf_counter() - started)
+
+        # one shared broker: submit in order so cash/position bookkeeping stays consistent
+        for symbol, state, latest in decisions:
+            await self._act(symbol, state, latest)
+
+    @staticmethod
+    def _consume(state: SymbolState, timestamps, closes, closed_before):
+        """Feed the closed bars newer than the symbol's last one; returns the newest result (None: no bar)."""
+        keep = timestamps <= closed_before
+        if state.last_ts is not None:
+            keep &= timestamps > state.last_ts
+        if not keep.any():
+            return None
+        update = state.signals.update
+        for close in closes[keep].tolist():
+            latest = update(close)
+        state.latest, state.last_ts = latest, int(timestamps[keep][-1])
+        return latest
+
+    async def _act(self, symbol, state: SymbolState, latest):
+        if latest.get("entry", False) and not state.in_position:
+            side = "buy"
+        elif latest.get("exit", False) and state.in_position:
+            side = "sell"
+        else:
+            return
+        price = latest["Close"]
+        logging.info(f"{side.upper()} {self.qty} {symbol} @ {price}")
+        try:
+            order = await asyncio.to_thread(self.broker.place_order, symbol, self.qty, price=price, side=side)
+        except Exception as e:
+            logging.error(f"Order failed for {symbol}: {e}")
+            return
+        state.in_position = side == "buy"
+        order_id = order["id"] if isinstance(order, dict) else order.id
+        if side == "buy":
+            state.last_buy_price = price
+            self.logger.log_trade(symbol, "BUY", self.qty, price, order_id)
+        else:
+            pnl = (price - state.last_buy_price) * self.qty if state.last_buy_price else None
+            self.logger.log_trade(symbol, "SELL", self.qty, price, order_id, pnl=pnl)
+            state.last_buy_price = None
+
+    async def run(self, lookback_days=90):
+        logging.info(f"Starting portfolio engine for {len(self.symbols)} symbols...")
+        self.running = True
+        await self.seed(lookback_days)
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while self.running:
+            try:
+                await self.tick()
+            except Exception as e:
+                logging.error(f"Error in portfolio loop: {e}")
+            # fixed schedule: a slow tick shortens the next sleep instead of drifting
+            next_tick += self.poll_interval
+            await asyncio.sleep(max(0.0, next_tick - loop.time()))
+        logging.info("Portfolio engine stopped gracefully ✅")
+
+    def run_forever(self, lookback_days=90):
+        """Blocking entry point (e.g. for a worker thread)."""
+        asyncio.run(self.run(lookback_days))
+
+    def stop(self):
+        self.running = False
+
+    def positions(self) -> dict:
+        return {symbol: state.in_position for symbol, state in self.states.items()}
@@ -0,0 +1,192 @@
+# src/replay_server.py
+"""
+Local stand-in for Alpaca's market data websocket (v2 protocol, msgpack).
+
+Streams stored bars (CSV or Parquet files, DataFrames, or a BarStore) to
+alpaca_trade_api's Stream, the client StreamingBarFeed reads, so the live
+ingestion path can be tested offline. Each bar becomes four trades (open,
+then low and high in the order the bar moved, then close; the volume is
+split between them), and the bar message itself goes out when the bar ends,
+so a StreamingBarFeed on the same timeframe rebuilds the stored bars exactly
+from either. The
+stream ends with a zero-size print at the end of every symbol's last bar,
+which closes that bar the way the next trade would live.
+
+    server = ReplayServer({"AAPL": "data/AAPL_5y_1d.csv"}).start()
+    feed = StreamingBarFeed(server.stream(), "AAPL", "1Day", clock=None)
+    ...
+    server.stop()
+
+speed=None sends as fast as the client reads (one frame per timestamp);
+speed=60 plays one minute of market time per second. stamp=True adds the
+send time (time.perf_counter_ns) to every message as "rt", for latency
+measurements. Authentication is accepted without checking the keys.
+"""
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.bar_store import COLUMNS, dates_to_ns, timeframe_delta
+from src.market_stream import DAY_NS, MINUTE_NS, alpaca_stream, bucket_bounds
+
+
+def load_bars(source) -> pd.DataFrame:
+    """Bars from a DataFrame or a .csv/.parquet path, as Date (UTC) + OHLCV columns in time order."""
+    if isinstance(source, (str, Path)):
+        path = Path(source)
+        df = pd.read_parquet(path) if path.suffix == ".parquet" else pd.read_csv(path)
+    else:
+        df = source
+    df = df.rename(columns={c.lower(): c for c in COLUMNS} | {"timestamp": "Date", "date": "Date"})
+    if "Date" not in df.columns:
+        df = df.rename_axis("Date").reset_index()
+    df = df.assign(Date=pd.to_datetime(df["Date"], utc=True))
+    return df.sort_values("Date", kind="stable")[["Date", *COLUMNS]].reset_index(drop=True)
+
+
+class ReplayServer:
+    """
+    data: {symbol: DataFrame or .csv/.parquet path}, or a BarStore together
+    with symbols and timeframe. The bar length (for trade times and the final
+    print) is the smallest gap between stored bars unless bar_timeframe is given.
+    """
+
+    def __init__(self, data, symbols=None, timeframe=None, speed=None, host="127.0.0.1", port=0, stamp=False,
+                 bar_timeframe=None):
+        if symbols is not None:
+            self.frames = {symbol: data.read(symbol, timeframe) for symbol in symbols}
+        else:
+            self.frames = {symbol: load_bars(source) for symbol, source in data.items()}
+        bar_timeframe = bar_timeframe or timeframe
+        self.bar_ns = int(timeframe_delta(bar_timeframe).value) if bar_timeframe else _smallest_gap(self.frames)
+        self.speed = speed
+        self.host = host
+        self.port = port
+        self.stamp = stamp
+        self.done = threading.Event()  # set once the first client received everything
+        self._loop = None
+        self._stopping = None
+        self._ready = threading.Event()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """Base URL for alpaca_stream (the client appends /v2/<feed>)."""
+        return f"http://{self.host}:{self.port}"
+
+    def stream(self, feed="iex"):
+        """An alpaca_trade_api Stream connected to this server."""
+        return alpaca_stream(self.url, feed=feed, key_id="replay", secret_key="replay")
+
+    # ------------------------
+    # events
+    # ------------------------
+    @staticmethod
+    def _symbol_events(symbol, df, bar_ns):
+        """(ts, order, symbol, message) in time order: four trades per bar, the bar at its end, a final print."""
+        ts = dates_to_ns(df["Date"]).tolist()
+        columns = [df[c].to_numpy(dtype=np.float64).tolist() for c in COLUMNS]
+        end = None
+        for t, o, h, l, c, v in zip(ts, *columns):
+            end = bucket_bounds(t, bar_ns)[1] if bar_ns >= DAY_NS else t + bar_ns
+            step = (end - t) // 4
+            first, second = (l, h) if c >= o else (h, l)
+            size = int(v) // 4
+            for k, (price, qty) in enumerate(((o, size), (first, size), (second, size), (c, int(v) - 3 * size))):
+                yield t + k * step, 1, symbol, ("t", price, qty)
+            yield end, 0, symbol, ("b", t, o, h, l, c, v)  # sent as the bar completes, before later trades
+        if end is not None:
+            yield end, 2, symbol, ("t", columns[3][-1], 0)
+
+    def _events(self):
+        """Events of all symbols merged in time order, grouped by timestamp."""
+        merged = heapq.merge(*(self._symbol_events(symbol, df, self.bar_ns) for symbol, df in self.frames.items()))
+        return itertools.groupby(merged, key=lambda event: event[0])
+
+    # ------------------------
+    # server
+    # ------------------------
+    def start(self):
+        self._thread = threading.Thread(target=lambda: asyncio.run(self._serve()), name="replay-server",
+                                        daemon=True)
+        self._thread.start()
+        if not self._ready.wait(10):
+            raise RuntimeError("replay server did not start")
+        return self
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stopping.set)
+            self._thread.join(timeout=10)
+            self._loop = None
+
+    async def _serve(self):
+        import websockets
+        self._loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        async with websockets.serve(self._handle, self.host, self.port) as server:
+            self.port = server.sockets[0].getsockname()[1]
+            self._ready.set()
+            await self._stopping.wait()
+
+    async def _handle(self, ws, path=None):
+        import msgpack
+        await ws.send(msgpack.packb([{"T": "success", "msg": "connected"}]))
+        subscribed = {"trades": set(), "bars": set()}
+        replay = None
+        try:
+            async for raw in ws:
+                msg = msgpack.unpackb(raw)
+                if msg.get("action") == "auth":
+                    await ws.send(msgpack.packb([{"T": "success", "msg": "authenticated"}]))
+                elif msg.get("action") == "subscribe":
+                    for kind in subscribed:
+                        subscribed[kind].update(msg.get(kind, ()))
+                    await ws.send(msgpack.packb([{"T": "subscription", "trades": sorted(subscribed["trades"]),
+                                                  "quotes": [], "bars": sorted(subscribed["bars"])}]))
+                    if replay is None:
+                        replay = asyncio.ensure_future(self._replay(ws, subscribed))
+        finally:
+            if replay is not None:
+                replay.cancel()
+
+    async def _replay(self, ws, subscribed):
+        from msgpack import Timestamp, packb
+        trades, bars = subscribed["trades"], subscribed["bars"]
+        started, first = time.monotonic(), None
+        for t, group in self._events():
+            if self.speed:
+                first = t if first is None else first
+                delay = started + (t - first) / 1e9 / self.speed - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            messages = []
+            for _, _, symbol, event in group:
+                if event[0] == "t":
+                    if symbol in trades or "*" in trades:
+                        messages.append({"T": "t", "S": symbol, "i": 0, "x": "V", "p": event[1], "s": event[2],
+                                         "t": Timestamp.from_unix_nano(t), "c": ["@"], "z": "C"})
+                elif symbol in bars or "*" in bars:
+                    _, ts, o, h, l, c, v = event
+                    messages.append({"T": "b", "S": symbol, "o": o, "h": h, "l": l, "c": c, "v": v,
+                                     "t": Timestamp.from_unix_nano(ts)})
+            if messages:
+                if self.stamp:
+                    sent = time.perf_counter_ns()
+                    for message in messages:
+                        message["rt"] = sent
+                await ws.send(packb(messages))
+        self.done.set()
+
+
+def _smallest_gap(frames) -> int:
+    """Smallest positive spacing between stored bars, in ns (the replayed bar length)."""
+    gaps = [np.diff(dates_to_ns(df["Date"])) for df in frames.values() if len(df) > 1]
+    gaps = np.concatenate(gaps) if gaps else np.empty(0, np.int64)
+    return int(gaps[gaps > 0].min()) if (gaps > 0).any() else MINUTE_NS
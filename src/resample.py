@@ -0,0 +1,219 @@
+# src/resample.py
+"""
+Higher timeframes derived from locally stored minute bars.
+
+Instead of fetching 5Min, 15Min, 1Hour and 1Day bars separately, they are
+aggregated from the 1Min series already in a BarStore, in one vectorized
+pass: every minute bar gets the start of its target bar, group boundaries
+are where that start changes, and OHLCV come from reduceat over the groups.
+
+Target bars follow Alpaca's alignment (the same as market_stream.bucket_bounds):
+
+    intraday   aligned to the epoch, i.e. to the clock hour in New York
+    1Day       New York calendar day, stamped at New York midnight
+    1Week      Monday to Sunday in New York
+
+session="regular" first keeps only 09:30-16:00 New York minutes (what
+yfinance bars cover) and anchors intraday bars at the 09:30 open, as yfinance
+does (1Hour: 09:30, 10:30, ..., 15:30); the default keeps the extended hours
+too. DST changes are handled by converting to New York time before grouping.
+
+    resampler = Resampler(store)                           # 1Min bars in store
+    df = resampler.bars("AAPL", "15Min", start, end)       # no network fetch
+
+Resampler caches each derived series and, when minute bars were only
+appended to the store since, re-aggregates just from the last derived bar
+(which may have been incomplete) on. The newest derived bar is still forming
+while its minutes are.
+"""
+import threading
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from src.bar_store import COLUMNS, BarStore, normalize_timeframe, timeframe_delta, to_ns
+
+MARKET_TZ = "America/New_York"
+HOUR_NS = 3_600 * 10 ** 9
+DAY_NS = 24 * HOUR_NS
+WEEK_NS = 7 * DAY_NS
+MONDAY_NS = 4 * DAY_NS  # the epoch was a Thursday: 1970-01-05 was the first Monday
+SESSIONS = {"regular": (9 * 3600 + 30 * 60, 16 * 3600)}  # seconds after midnight, New York
+
+
+def _runs(keys):
+    """Start index of each run of equal consecutive values, and the run lengths."""
+    first = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1]))) if len(keys) else \
+        np.empty(0, np.int64)
+    return first, np.diff(np.append(first, len(keys)))
+
+
+def _local_ns(ts):
+    """New York wall-clock time of UTC epoch ns, as naive epoch ns."""
+    # UTC offsets only change on the hour: convert each run of one hour once (fast for sorted ts)
+    hours = ts - ts % HOUR_NS
+    first, lengths = _runs(hours)
+    starts = hours[first]
+    offsets = pd.DatetimeIndex(starts, tz="UTC").tz_convert(MARKET_TZ).tz_localize(None).asi8 - starts
+    return ts + np.repeat(offsets, lengths)
+
+
+def _to_utc(local_ns):
+    """UTC epoch ns of New York wall-clock times (midnights, which DST never skips)."""
+    return pd.DatetimeIndex(local_ns).tz_localize(MARKET_TZ).tz_convert("UTC").asi8
+
+
+def bucket_starts(ts, bar_ns: int, local=None) -> np.ndarray:
+    """Start (UTC epoch ns) of the bar of length bar_ns containing each ts; see bucket_bounds."""
+    ts = np.asarray(ts, dtype=np.int64)
+    if bar_ns < DAY_NS:
+        return ts - ts % bar_ns
+    local = _local_ns(ts) if local is None else local
+    if bar_ns % WEEK_NS == 0:
+        days = local - (local - MONDAY_NS) % bar_ns
+    else:
+        days = local - local % DAY_NS
+    # convert each distinct local midnight once
+    first, lengths = _runs(days)
+    return np.repeat(_to_utc(days[first]), lengths)
+
+
+def session_mask(ts, session, local=None) -> np.ndarray:
+    """Bars inside the named session (see SESSIONS) by New York time of day."""
+    if session not in SESSIONS:
+        raise ValueError(f"Unknown session: {session!r} (expected one of {list(SESSIONS)})")
+    open_s, close_s = SESSIONS[session]
+    local = _local_ns(ts) if local is None else local
+    seconds = local % DAY_NS // 10 ** 9
+    return (seconds >= open_s) & (seconds < close_s)
+
+
+def resample_arrays(arrays: dict, timeframe, session=None) -> dict:
+    """
+    Aggregate time-sorted bars ({'ts': int64 UTC ns, OHLCV columns}, e.g.
+    BarStore.read_arrays) into `timeframe` bars, same layout. Bars without
+    any source bar are not created.
+    """
+    ts = np.asarray(arrays["ts"], dtype=np.int64)
+    bar_ns = int(timeframe_delta(timeframe).value)
+    local = _local_ns(ts) if session is not None or bar_ns >= DAY_NS else None
+    columns = {name: np.asarray(arrays[name], dtype=np.float64) for name in COLUMNS}
+    if session is not None:
+        keep = session_mask(ts, session, local)
+        if not keep.all():
+            ts, local = ts[keep], local[keep]
+            columns = {name: values[keep] for name, values in columns.items()}
+    if not len(ts):
+        return {"ts": ts, **columns}
+
+    if session is not None and bar_ns < DAY_NS:
+        keys = ts - (local - SESSIONS[session][0] * 10 ** 9) % bar_ns  # anchored at the session open
+    else:
+        keys = bucket_starts(ts, bar_ns, local)
+    first, lengths = _runs(keys)
+    last = first + lengths - 1
+    return {"ts": keys[first],
+            "Open": columns["Open"][first],
+            "High": np.maximum.reduceat(columns["High"], first),
+            "Low": np.minimum.reduceat(columns["Low"], first),
+            "Close": columns["Close"][last],
+            "Volume": np.add.reduceat(columns["Volume"], first)}
+
+
+def resample(df: pd.DataFrame, timeframe, session=None) -> pd.DataFrame:
+    """resample_arrays for an OHLCV DataFrame (Date column or DatetimeIndex); Date keeps its timezone."""
+    dates = pd.DatetimeIndex(df["Date"] if "Date" in df.columns else df.index)
+    ts = dates.tz_convert("UTC").tz_localize(None) if dates.tz is not None else dates
+    out = resample_arrays({"ts": ts.asi8, **{name: df[name] for name in COLUMNS}}, timeframe, session)
+    return _frame(out, dates.tz or "UTC")
+
+
+def _frame(arrays, tz) -> pd.DataFrame:
+    df = pd.DataFrame({name: arrays[name] for name in COLUMNS}, copy=False)
+    df.insert(0, "Date", pd.to_datetime(arrays["ts"], utc=True).tz_convert(tz))
+    return df
+
+
+class _Derived:
+    __slots__ = ("arrays", "n_source", "last_source_ts", "tail_start")
+
+    def __init__(self, arrays, n_source, last_source_ts, tail_start):
+        self.arrays = arrays
+        self.n_source = n_source              # source bars aggregated
+        self.last_source_ts = last_source_ts  # ts of the last of them, to detect rewrites
+        self.tail_start = tail_start          # source index where the last derived bar starts
+
+
+class Resampler:
+    """
+    Any timeframe of a symbol from its `source` bars in a BarStore (default:
+    the Alpaca store), cached per (symbol, timeframe) and extended in place
+    as source bars are appended. Reads the store's memory-mapped file on
+    every call, so bars written by fetches or the engine are picked up.
+    """
+
+    def __init__(self, store: BarStore = None, source="1Min", session=None):
+        if store is None:
+            from src.data_fetcher_alpaca import ALPACA_STORE
+            store = ALPACA_STORE
+        self.store = store
+        self.source = normalize_timeframe(source)
+        self.session = session
+        self.stats = Counter()
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def derives(self, timeframe) -> bool:
+        """True for timeframes longer than the source (shorter ones cannot be derived)."""
+        return timeframe_delta(timeframe) > timeframe_delta(self.source)
+
+    def covers(self, symbol, timeframe, start, end) -> bool:
+        """Whether [start, end] of `timeframe` can be derived from the store without fetching."""
+        return self.derives(timeframe) and self.store.covers(symbol, self.source, start, end)
+
+    def bars(self, symbol, timeframe, start=None, end=None) -> pd.DataFrame:
+        """Derived bars starting in [start, end], with a Date column in the store's timezone."""
+        arrays = self.arrays(symbol, timeframe)
+        ts = arrays["ts"]
+        lo = 0 if start is None else int(np.searchsorted(ts, to_ns(start), side="left"))
+        hi = len(ts) if end is None else int(np.searchsorted(ts, to_ns(end), side="right"))
+        return _frame({name: values[lo:hi] for name, values in arrays.items()},
+                      self.store.meta(symbol, self.source)["tz"])
+
+    def arrays(self, symbol, timeframe) -> dict:
+        """The whole derived series as arrays ({'ts', OHLCV}); treat them as read-only."""
+        timeframe = normalize_timeframe(timeframe)
+        if not self.derives(timeframe):
+            raise ValueError(f"{timeframe} cannot be derived from {self.source} bars")
+        source = self.store.read_arrays(symbol, self.source)
+        ts = source["ts"]
+        n = len(ts)
+        key = (symbol, timeframe)
+        with self._lock:
+            derived = self._cache.get(key)
+            if derived is not None and derived.n_source == n and (not n or ts[n - 1] == derived.last_source_ts):
+                self.stats["hit"] += 1
+                return derived.arrays
+
+            appended = derived is not None and 0 < derived.n_source < n \
+                and ts[derived.n_source - 1] == derived.last_source_ts
+            if appended:
+                # the last derived bar may have been incomplete: rebuild it and everything after
+                tail = resample_arrays({name: values[derived.tail_start:] for name, values in source.items()},
+                                       timeframe, self.session)
+                kept = max(len(derived.arrays["ts"]) - 1, 0)
+                arrays = {name: np.concatenate((values[:kept], tail[name]))
+                          for name, values in derived.arrays.items()}
+                self.stats["extend"] += 1
+            else:
+                arrays = resample_arrays(source, timeframe, self.session)
+                self.stats["build"] += 1
+            last_start = arrays["ts"][-1] if len(arrays["ts"]) else None
+            tail_start = 0 if last_start is None else int(np.searchsorted(ts, last_start, side="left"))
+            self._cache[key] = _Derived(arrays, n, int(ts[n - 1]) if n else None, tail_start)
+            return arrays
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
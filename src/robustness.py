@@ -0,0 +1,269 @@
+# src/robustness.py
+"""
+Out-of-sample and resampling checks for the SMA crossover + RSI strategy.
+
+walk_forward re-optimizes the strategy on rolling train windows and scores the
+chosen parameters on the following test window. Indicators are computed once
+for the whole series (src.optimizer.precompute_indicators) and shared with
+every worker, so a fold is only slicing plus the array backtest.
+
+monte_carlo_trades / monte_carlo_returns bootstrap a backtest's trade P&L or
+block-resample its bar returns into drawdown, Sharpe and return
+distributions. Simulations are generated in vectorized batches per worker.
+
+All runners fan out over processes, accept a progress(done, total, elapsed)
+callback and record wall time and throughput in the result's .attrs.
+"""
+import itertools
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from src.bar_store import dates_to_ns
+from src.optimizer import RANK_METRICS, SharedArrays, attach, attached, detach, evaluate, precompute_indicators
+
+# cap on resampled values per batch (rows x samples), bounds worker memory
+MAX_BATCH_VALUES = 2_000_000
+
+
+def print_progress(done, total, elapsed):
+    """Ready-made progress callback: one updating line on stderr."""
+    rate = done / elapsed if elapsed > 0 else float("inf")
+    sys.stderr.write(f"\r{done}/{total} ({rate:,.1f}/s)")
+    if done == total:
+        sys.stderr.write("\n")
+    sys.stderr.flush()
+
+
+def _run_tasks(shared, fn, tasks, sizes, max_workers, progress):
+    """
+    Run fn(task) for every task against the shared arrays, in-process or on a
+    pool. Returns results in task order and the elapsed wall time; `sizes` are
+    the work units per task reported to `progress`.
+    """
+    total = sum(sizes)
+    done = 0
+    results = [None] * len(tasks)
+    started = time.perf_counter()
+    max_workers = max_workers or os.cpu_count() or 1
+    try:
+        if max_workers == 1:
+            attach(shared.spec)
+            for i, task in enumerate(tasks):
+                results[i] = fn(task)
+                done += sizes[i]
+                if progress:
+                    progress(done, total, time.perf_counter() - started)
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=attach,
+                                     initargs=(shared.spec,)) as pool:
+                futures = {pool.submit(fn, task): i for i, task in enumerate(tasks)}
+                for future in as_completed(futures):
+                    i = futures[future]
+                    results[i] = future.result()
+                    done += sizes[i]
+                    if progress:
+                        progress(done, total, time.perf_counter() - started)
+    finally:
+        detach()
+        shared.close()
+    return results, time.perf_counter() - started
+
+
+def _chunks(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+# ------------------------
+# Walk-forward
+# ------------------------
+def fold_bounds(n_bars, train_bars, test_bars, step=None, anchored=False):
+    """
+    (train_start, train_end, test_end) bar positions of each fold; train is
+    [train_start, train_end), test is [train_end, test_end). Windows roll by
+    `step` (default test_bars); anchored=True keeps train_start at 0.
+    """
+    step = step or test_bars
+    folds = []
+    train_end = train_bars
+    while train_end + test_bars <= n_bars:
+        folds.append((0 if anchored else train_end - train_bars, train_end, train_end + test_bars))
+        train_end += step
+    return folds
+
+
+def _rows(rsi_length, lo_ns, hi_ns):
+    """Positions in the precomputed arrays of one RSI length for dates in [lo_ns, hi_ns)."""
+    dates = attached(("dates", rsi_length))
+    return int(np.searchsorted(dates, lo_ns, side="left")), int(np.searchsorted(dates, hi_ns, side="left"))
+
+
+def _run_folds(task):
+    folds, combos, metric, initial_capital = task
+    out = []
+    for fold_id, train_lo, train_hi, test_hi in folds:
+        best, best_score = None, -math.inf
+        for combo in combos:
+            start, stop = _rows(combo[3], train_lo, train_hi)
+            score = evaluate(*combo, initial_capital=initial_capital, start=start, stop=stop)[metric]
+            if score == score and score > best_score:  # NaN scores never win; ties keep the first
+                best, best_score = combo, score
+        row = {"fold": fold_id}
+        if best is None:
+            out.append(row)
+            continue
+        row.update(zip(("fast_sma", "slow_sma", "rsi_threshold", "rsi_length"), best))
+        row[f"train_{metric}"] = best_score
+        start, stop = _rows(best[3], train_hi, test_hi)
+        test = evaluate(*best, initial_capital=initial_capital, start=start, stop=stop)
+        row.update({f"test_{key}": test[key] for key in (*RANK_METRICS, "final_capital", "num_trades")})
+        out.append(row)
+    return out
+
+
+def walk_forward(df: pd.DataFrame, fast_sma, slow_sma, rsi_threshold, rsi_length=(14,), train_bars=504,
+                 test_bars=126, step=None, anchored=False, metric="Sharpe_Ratio", initial_capital=10000,
+                 max_workers=None, folds_per_task=8, progress=None) -> pd.DataFrame:
+    """
+    Rolling walk-forward analysis. For every fold the fast < slow grid is
+    searched on the train window and the best combination by `metric` is
+    evaluated on the test window (starting flat). Window sizes are in bars of
+    `df`; indicators see the full history, so SMAs are warm at a test window's
+    first bar without looking ahead.
+
+    Returns one row per fold: window dates, chosen parameters, the train score
+    and the test metrics (test_*). .attrs holds elapsed seconds and folds/s.
+    """
+    if metric not in RANK_METRICS:
+        raise ValueError(f"Unknown metric: {metric!r} (expected one of {RANK_METRICS})")
+    combos = [c for c in itertools.product(fast_sma, slow_sma, rsi_threshold, rsi_length) if c[0] < c[1]]
+    if "Date" not in df.columns:
+        df = df.rename_axis("Date").reset_index()
+    df = df.reset_index(drop=True)
+    dates = dates_to_ns(pd.to_datetime(df["Date"], utc=True))
+    bounds = fold_bounds(len(df), train_bars, test_bars, step=step, anchored=anchored)
+    if not combos or not bounds:
+        return pd.DataFrame(columns=["fold", "train_start", "test_start", "test_end"])
+
+    # fold edges as timestamps; each RSI length maps them onto its own (dropna-shortened) arrays
+    edges = np.append(dates, dates[-1] + 1)
+    folds = [(i, int(edges[a]), int(edges[b]), int(edges[c])) for i, (a, b, c) in enumerate(bounds)]
+    windows = {c[0] for c in combos} | {c[1] for c in combos}
+    shared = SharedArrays(precompute_indicators(df, windows, {c[3] for c in combos}))
+    tasks = [(chunk, combos, metric, initial_capital) for chunk in _chunks(folds, folds_per_task)]
+    results, elapsed = _run_tasks(shared, _run_folds, tasks, [len(t[0]) for t in tasks], max_workers, progress)
+
+    report = pd.DataFrame([row for chunk in results for row in chunk])
+    positions = np.array(bounds)
+    date_col = pd.to_datetime(df["Date"], utc=True)
+    report.insert(1, "train_start", date_col.iloc[positions[:, 0]].to_numpy())
+    report.insert(2, "test_start", date_col.iloc[positions[:, 1]].to_numpy())
+    report.insert(3, "test_end", date_col.iloc[positions[:, 2] - 1].to_numpy())
+    report.attrs.update(elapsed=elapsed, folds_per_sec=len(folds) / elapsed if elapsed else float("inf"),
+                        combos_per_fold=len(combos))
+    return report
+
+
+# ------------------------
+# Monte Carlo
+# ------------------------
+def _max_drawdown(equity):
+    """Row-wise minimum of (equity - running max) / running max."""
+    roll_max = np.maximum.accumulate(equity, axis=1)
+    return ((equity - roll_max) / roll_max).min(axis=1)
+
+
+def _sharpe(returns, scale):
+    std = returns.std(axis=1, ddof=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(std != 0, returns.mean(axis=1) / std * scale, 0.0)
+
+
+def _simulate_trades(task):
+    seed, n_sims, initial_capital, scale = task
+    pnls = attached("sample")
+    rng = np.random.default_rng(seed)
+    paths = pnls[rng.integers(0, len(pnls), (n_sims, len(pnls)))]
+    equity = np.empty((n_sims, len(pnls) + 1))
+    equity[:, 0] = initial_capital
+    np.cumsum(paths, axis=1, out=equity[:, 1:])
+    equity[:, 1:] += initial_capital
+    final = equity[:, -1]
+    return {
+        "final_capital": final,
+        "total_return_pct": (final - initial_capital) / initial_capital * 100,
+        "Max_Drawdown": _max_drawdown(equity),
+        "Sharpe_Ratio": _sharpe(paths / equity[:, :-1], scale),
+    }
+
+
+def _simulate_returns(task):
+    seed, n_sims, initial_capital, periods_per_year, block = task
+    returns = attached("sample")
+    n = len(returns)
+    rng = np.random.default_rng(seed)
+    # circular block bootstrap: random block starts, consecutive bars inside a block
+    n_blocks = -(-n // block)
+    starts = rng.integers(0, n, (n_sims, n_blocks))
+    index = (starts[:, :, None] + np.arange(block)).reshape(n_sims, -1)[:, :n] % n
+    paths = returns[index]
+    equity = initial_capital * np.cumprod(1 + paths, axis=1)
+    final = equity[:, -1]
+    years = n / periods_per_year
+    return {
+        "final_capital": final,
+        "total_return_pct": (final - initial_capital) / initial_capital * 100,
+        "CAGR": (final / initial_capital) ** (1 / years) - 1,
+        "Max_Drawdown": _max_drawdown(np.concatenate([np.full((n_sims, 1), float(initial_capital)), equity], axis=1)),
+        "Sharpe_Ratio": _sharpe(paths, math.sqrt(periods_per_year)),
+    }
+
+
+def _monte_carlo(fn, sample, n_sims, extra, seed, max_workers, progress):
+    sample = np.asarray(sample, dtype=np.float64)
+    if len(sample) < 2:
+        raise ValueError("Monte Carlo needs at least two samples to resample")
+    batch = max(1, min(n_sims, MAX_BATCH_VALUES // len(sample)))
+    sizes = [len(chunk) for chunk in _chunks(range(n_sims), batch)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(s, size, *extra) for s, size in zip(seeds, sizes)]
+    results, elapsed = _run_tasks(SharedArrays({"sample": sample}), fn, tasks, sizes, max_workers, progress)
+
+    sims = pd.DataFrame({key: np.concatenate([r[key] for r in results]) for key in results[0]})
+    sims.attrs.update(elapsed=elapsed, sims_per_sec=n_sims / elapsed if elapsed else float("inf"))
+    return sims
+
+
+def monte_carlo_trades(trade_pnls, n_sims=10_000, initial_capital=10000, trades_per_year=None, seed=None,
+                       max_workers=None, progress=None) -> pd.DataFrame:
+    """
+    Bootstrap the order of (and draw with replacement from) closed-trade P&L,
+    e.g. simple_backtest's summary["trades"] pnls. One row per simulated
+    sequence with final capital, return, max drawdown and the Sharpe ratio of
+    per-trade returns (annualized only when trades_per_year is given).
+    """
+    scale = math.sqrt(trades_per_year) if trades_per_year else 1.0
+    return _monte_carlo(_simulate_trades, trade_pnls, n_sims, (initial_capital, scale), seed,
+                        max_workers, progress)
+
+
+def monte_carlo_returns(equity, n_sims=10_000, block=20, initial_capital=10000, periods_per_year=252, seed=None,
+                        max_workers=None, progress=None) -> pd.DataFrame:
+    """
+    Circular block bootstrap of the bar returns of an equity curve (blocks of
+    `block` consecutive bars keep short-range autocorrelation). One row per
+    resampled path with final capital, return, CAGR, max drawdown and Sharpe
+    ratio (annualized with periods_per_year, as in simple_backtest).
+    """
+    equity = np.asarray(equity, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = equity[1:] / equity[:-1] - 1
+    returns = returns[np.isfinite(returns)]
+    return _monte_carlo(_simulate_returns, returns, n_sims,
+                        (initial_capital, periods_per_year, max(1, int(block))), seed,
+                        max_workers, progress)
@@ -0,0 +1,275 @@
+# src/scanner.py
+"""
+Market scanner: the strategy's indicators and signals for every symbol in the
+local bar store, as one table that can be filtered and ranked.
+
+    scanner = Scanner.from_store(timeframe="1Day")            # every stored symbol
+    scanner.scan("RSI < 30 and volume_ratio > 2", sort="volume_ratio", top=20)
+    scanner.scan("golden_cross", sort="(SMA_fast - SMA_slow) / Close")
+    scanner.update(closes, volumes, ts)                        # one new bar per symbol
+    scanner.refresh()                                          # bars written to the store since
+
+State is one array slot per symbol, advanced by the recursions of
+StreamingSignals (src.strategy) for all symbols at once: a new bar costs
+O(symbols), not a recompute over history. Each symbol only moves on its own
+bars (NaN = no bar), so the table row of a symbol equals add_rsi +
+generate_signals over its bars. Loading replays the last `lookback` bars of
+each symbol; the default 500 leaves older bars with less than 1e-16 of the
+RSI's weight.
+
+Table columns (one row per symbol, indexed by symbol):
+
+    Date, Close, Volume, bars        last bar and the number of bars seen
+    change_pct                       last close vs the one before, in %
+    RSI, SMA_fast, SMA_slow          as generate_signals (SMAs over bars with an RSI)
+    signal, entry, exit              generate_signals' flags on the last bar
+    cross_up, cross_down             fast SMA crossed the slow SMA on the last bar
+    volume_ratio                     volume over the mean of the `volume_window` bars before
+
+scan() conditions and sort keys are pandas expressions over these columns
+(DataFrame.query / DataFrame.eval), or a name from CONDITIONS.
+"""
+import numpy as np
+import pandas as pd
+
+from src.bar_store import BarStore, normalize_timeframe
+
+NAN = float("nan")
+
+CONDITIONS = {
+    "oversold": "RSI < 30",
+    "overbought": "RSI > 70",
+    "golden_cross": "cross_up",
+    "death_cross": "cross_down",
+    "volume_spike": "volume_ratio >= 2",
+    "entry": "entry",
+    "exit": "exit",
+    "long": "signal == 1",
+}
+
+
+def _positions(idx, n) -> np.ndarray:
+    """Symbol positions selected by idx: an int array, or slice(None) when every symbol has a bar."""
+    return np.arange(n) if isinstance(idx, slice) else idx
+
+
+def _subset(idx, mask, n):
+    """idx[mask], staying a slice (a view instead of a gather) while nothing is masked out."""
+    return idx if mask.all() else _positions(idx, n)[mask]
+
+
+class _Windows:
+    """Per-symbol ring buffers of the last `window` values, with their means (StreamingSMA per slot)."""
+
+    def __init__(self, window: int, n: int):
+        self.window = window
+        self.buffer = np.zeros(n * window)  # symbol i's ring is buffer[i * window:(i + 1) * window]
+        self.total = np.zeros(n)
+        self.count = np.zeros(n, dtype=np.int64)
+        self.slot = np.zeros(n, dtype=np.int64)  # next ring position (count % window without a division)
+
+    def push(self, idx, values):
+        columns = _positions(idx, len(self.count))
+        slots = self.slot[idx]
+        cells = columns * self.window + slots
+        self.total[idx] += values - self.buffer[cells]
+        self.buffer[cells] = values
+        self.count[idx] += 1
+        slots += 1
+        lapped = slots == self.window
+        slots[lapped] = 0
+        self.slot[idx] = slots
+        # exact re-sum once per lap keeps the running totals from drifting (amortised O(1))
+        if lapped.any():
+            lapped = columns[lapped]
+            self.total[lapped] = self.buffer.reshape(-1, self.window)[lapped].sum(axis=1)
+
+    def mean(self, idx) -> np.ndarray:
+        """NaN until a symbol has `window` values, like a rolling mean."""
+        return np.where(self.count[idx] >= self.window, self.total[idx] / self.window, NAN)
+
+
+class _EWMs:
+    """_EWM (src.indicators) for many series: pandas' adjusted ewm(alpha).mean() recursion, per slot."""
+
+    def __init__(self, alpha: float, n: int, min_periods: int):
+        self.alpha = alpha
+        self.min_periods = min_periods
+        self.weighted = np.full(n, NAN)
+        self.old_wt = np.ones(n)
+        self.nobs = np.zeros(n, dtype=np.int64)
+
+    def update(self, idx, values) -> np.ndarray:
+        weighted, old_wt = self.weighted[idx], self.old_wt[idx]
+        started = ~np.isnan(weighted)
+        old_wt = np.where(started, old_wt * (1.0 - self.alpha), old_wt)
+        mixed = (old_wt * weighted + values) / (old_wt + 1.0)
+        weighted = np.where(started, np.where(weighted != values, mixed, weighted), values)
+        self.weighted[idx] = weighted
+        self.old_wt[idx] = np.where(started, old_wt + 1.0, old_wt)
+        self.nobs[idx] += 1
+        return np.where(self.nobs[idx] >= self.min_periods, weighted, NAN)
+
+
+class Scanner:
+    def __init__(self, symbols, fast_sma=10, slow_sma=50, rsi_threshold=60, rsi_length=14, volume_window=20,
+                 store: BarStore = None, timeframe="1Day", lookback=500):
+        self.symbols = list(symbols)
+        self.fast_sma, self.slow_sma = fast_sma, slow_sma
+        self.rsi_threshold = rsi_threshold
+        self.volume_window = volume_window
+        self.store = store
+        self.timeframe = normalize_timeframe(timeframe)
+        self.lookback = lookback
+        self._position = {symbol: i for i, symbol in enumerate(self.symbols)}
+
+        n = len(self.symbols)
+        self.ts = np.zeros(n, dtype=np.int64)          # last bar, UTC epoch ns
+        self.bars = np.zeros(n, dtype=np.int64)
+        self.close = np.full(n, NAN)
+        self.prev_close = np.full(n, NAN)
+        self.volume = np.full(n, NAN)
+        self.volume_ratio = np.full(n, NAN)
+        self.rsi = np.full(n, NAN)
+        self.sma_fast = np.full(n, NAN)
+        self.sma_slow = np.full(n, NAN)
+        self.signal = np.zeros(n, dtype=bool)
+        self.entry = np.zeros(n, dtype=bool)
+        self.exit = np.zeros(n, dtype=bool)
+        self.cross_up = np.zeros(n, dtype=bool)
+        self.cross_down = np.zeros(n, dtype=bool)
+        self._gain = _EWMs(1.0 / rsi_length, n, rsi_length)
+        self._loss = _EWMs(1.0 / rsi_length, n, rsi_length)
+        self._fast = _Windows(fast_sma, n)
+        self._slow = _Windows(slow_sma, n)
+        self._volumes = _Windows(volume_window, n)
+
+    @classmethod
+    def from_store(cls, symbols=None, timeframe="1Day", store: BarStore = None, **params) -> "Scanner":
+        """A scanner over `symbols` (default: every symbol stored for the timeframe), loaded from the store."""
+        store = store or BarStore()
+        timeframe = normalize_timeframe(timeframe)
+        if symbols is None:
+            symbols = [symbol for symbol, stored in store.keys() if stored == timeframe]
+        scanner = cls(symbols, store=store, timeframe=timeframe, **params)
+        scanner.refresh()
+        return scanner
+
+    # ------------------------
+    # bars in
+    # ------------------------
+    def update(self, closes, volumes=None, ts=None, symbols=None):
+        """
+        One new bar per symbol. Arrays align with self.symbols (or `symbols`);
+        NaN closes mark symbols without a new bar, which keep their state.
+        ts: UTC epoch ns, one per symbol or one for all.
+        """
+        closes = np.asarray(closes, dtype=np.float64)
+        volumes = np.full(len(closes), NAN) if volumes is None else np.asarray(volumes, dtype=np.float64)
+        ts = np.broadcast_to(np.asarray(0 if ts is None else ts, dtype=np.int64), closes.shape)
+        has_bar = ~np.isnan(closes)
+        if symbols is not None:
+            idx = np.array([self._position[symbol] for symbol in symbols], dtype=np.int64)[has_bar]
+        elif has_bar.all():
+            idx = slice(None)  # the common case: whole-universe steps work on views
+        else:
+            idx = np.flatnonzero(has_bar)
+        self._step(idx, closes[has_bar], volumes[has_bar], ts[has_bar])
+
+    def refresh(self) -> int:
+        """
+        Apply the bars the store holds after each symbol's last bar (the last
+        `lookback` for a symbol seen for the first time); returns how many.
+        """
+        tails = []
+        for i, symbol in enumerate(self.symbols):
+            if self.bars[i]:
+                arrays = self.store.read_tail(symbol, self.timeframe, after=self.ts[i])
+            else:
+                arrays = self.store.read_tail(symbol, self.timeframe, count=self.lookback)
+            tails.append((arrays["ts"], arrays["Close"], arrays["Volume"]))
+        # row r holds every symbol's r-th new bar: the replay is O(rows) vectorized steps
+        rows = max((len(tail[0]) for tail in tails), default=0)
+        ts = np.zeros((rows, len(tails)), dtype=np.int64)
+        closes = np.full((rows, len(tails)), NAN)
+        volumes = np.full((rows, len(tails)), NAN)
+        for j, (stamps, close, volume) in enumerate(tails):
+            ts[:len(stamps), j], closes[:len(stamps), j], volumes[:len(stamps), j] = stamps, close, volume
+        for row in range(rows):
+            self.update(closes[row], volumes[row], ts[row])
+        return int(np.count_nonzero(~np.isnan(closes)))
+
+    def _step(self, idx, close, volume, ts):
+        with np.errstate(divide="ignore", invalid="ignore"):  # flat prices and zero volumes give NaN / inf
+            self._advance(idx, close, volume, ts)
+
+    def _advance(self, idx, close, volume, ts):
+        prev_close = self.close[idx].copy()  # a view when idx is a slice
+        self.prev_close[idx] = prev_close
+        self.close[idx], self.volume[idx], self.ts[idx] = close, volume, ts
+        self.bars[idx] += 1
+
+        # volume against the window before this bar
+        self.volume_ratio[idx] = volume / self._volumes.mean(idx)
+        self._volumes.push(idx, volume)
+
+        # StreamingRSI: the first bar of a symbol only sets its previous close
+        n = len(self.symbols)
+        rsi = np.full(len(close), NAN)
+        moved = ~np.isnan(prev_close)
+        change = close[moved] - prev_close[moved]
+        positive_avg = self._gain.update(_subset(idx, moved, n), np.where(change > 0, change, 0.0))
+        negative_avg = self._loss.update(_subset(idx, moved, n), np.where(change > 0, 0.0, change))
+        rsi[moved] = 100.0 * positive_avg / (positive_avg + np.abs(negative_avg))
+        self.rsi[idx] = rsi
+
+        # StreamingSignals: bars without an RSI (dropped by generate_signals) never reach the SMAs
+        had_rsi = ~np.isnan(rsi)
+        decided = _subset(idx, had_rsi, n)
+        prev_fast, prev_slow = self.sma_fast[decided].copy(), self.sma_slow[decided].copy()
+        self._fast.push(decided, close[had_rsi])
+        self._slow.push(decided, close[had_rsi])
+        fast, slow = self._fast.mean(decided), self._slow.mean(decided)
+        self.sma_fast[idx], self.sma_slow[idx] = NAN, NAN
+        self.sma_fast[decided], self.sma_slow[decided] = fast, slow
+
+        signal = (fast > slow) & (rsi[had_rsi] < self.rsi_threshold)
+        previous = self.signal[decided].copy()
+        self.entry[idx] = self.exit[idx] = self.cross_up[idx] = self.cross_down[idx] = False
+        self.entry[decided] = signal & ~previous
+        self.exit[decided] = ~signal & previous
+        self.signal[decided] = signal
+        self.cross_up[decided] = (prev_fast <= prev_slow) & (fast > slow)
+        self.cross_down[decided] = (prev_fast >= prev_slow) & (fast < slow)
+
+    # ------------------------
+    # results out
+    # ------------------------
+    def table(self) -> pd.DataFrame:
+        """The current row of every symbol."""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            change_pct = (self.close / self.prev_close - 1.0) * 100.0
+        return pd.DataFrame({
+            "Date": pd.to_datetime(self.ts, utc=True), "Close": self.close, "change_pct": change_pct,
+            "RSI": self.rsi, "SMA_fast": self.sma_fast, "SMA_slow": self.sma_slow,
+            "signal": self.signal.astype(np.int8), "entry": self.entry, "exit": self.exit,
+            "cross_up": self.cross_up, "cross_down": self.cross_down,
+            "Volume": self.volume, "volume_ratio": self.volume_ratio, "bars": self.bars,
+        }, index=pd.Index(self.symbols, name="symbol"))
+
+    def scan(self, where=None, sort=None, ascending=False, top=None) -> pd.DataFrame:
+        """
+        Rows matching `where` (an expression, a CONDITIONS name, or a list of
+        them, all required), ranked by `sort` (a column or an expression,
+        added as 'score'; NaN last) and cut to `top`.
+        """
+        frame = self.table()
+        conditions = [where] if isinstance(where, str) else list(where or ())
+        if conditions:
+            frame = frame.query(" and ".join(f"({CONDITIONS.get(c, c)})" for c in conditions))
+        if sort is not None:
+            if sort not in frame.columns:
+                frame = frame.assign(score=frame.eval(sort) if len(frame) else pd.Series(dtype=np.float64))
+                sort = "score"
+            frame = frame.sort_values(sort, ascending=ascending, na_position="last", kind="stable")
+        return frame if top is None else frame.head(top)
@@ -1,13 +1,23 @@
 # src/strategy.py
+import numpy as np
 import pandas as pd
 from typing import Tuple
 
+from src.compact_bars import CompactBars
+
 def generate_signals(df: pd.DataFrame,
-                     fast_sma=10, slow_sma=50, rsi_threshold=60) -> pd.DataFrame:
+                     fast_sma=10, slow_sma=50, rsi_threshold=60, cache=None) -> pd.DataFrame:
+    """cache: optional IndicatorCache (src.indicator_cache) for the two SMAs."""
+    if isinstance(df, CompactBars):
+        return _generate_signals_compact(df, fast_sma, slow_sma, rsi_threshold, cache)
     df = df.copy()
     df = df.dropna()
-    df['SMA_fast'] = df['Close'].rolling(fast_sma).mean()
-    df['SMA_slow'] = df['Close'].rolling(slow_sma).mean()
+    if cache is not None:
+        df['SMA_fast'] = cache.sma(df['Close'], fast_sma)
+        df['SMA_slow'] = cache.sma(df['Close'], slow_sma)
+    else:
+        df['SMA_fast'] = df['Close'].rolling(fast_sma).mean()
+        df['SMA_slow'] = df['Close'].rolling(slow_sma).mean()
     # signal: 1 = long, 0 = flat
     df['signal'] = 0
     df.loc[(df['SMA_fast'] > df['SMA_slow']) & (df.get('RSI', 100) < rsi_threshold), 'signal'] = 1
@@ -16,3 +26,208 @@ def generate_signals(df: pd.DataFrame,
     df['entry'] = (df['signal'] == 1) & (df['signal_shift'] == 0)
     df['exit'] = (df['signal'] == 0) & (df['signal_shift'] == 1)
     return df
+
+
+# columns generate_signals / simple_backtest add to a CompactBars (not inputs to its dropna mask)
+COMPACT_OUTPUTS = ("SMA_fast", "SMA_slow", "signal", "entry", "exit", "valid", "equity")
+
+
+def _generate_signals_compact(bars: CompactBars, fast_sma, slow_sma, rsi_threshold, cache=None) -> CompactBars:
+    """
+    generate_signals in place on CompactBars. Rows the DataFrame version's
+    dropna() would remove stay, marked valid=False with no signal; SMAs and
+    signals are computed per symbol over the valid rows only, in float64.
+    """
+    n = len(bars)
+    valid = np.ones(n, dtype=bool)
+    for name, values in bars.columns.items():
+        if name not in COMPACT_OUTPUTS and values.dtype.kind == "f":
+            valid &= ~np.isnan(values)
+    fast_out = np.full(n, np.nan, dtype=bars.dtype)
+    slow_out = np.full(n, np.nan, dtype=bars.dtype)
+    signal = np.zeros(n, dtype=np.int8)
+    entry = np.zeros(n, dtype=bool)
+    exit_ = np.zeros(n, dtype=bool)
+    close, rsi = bars["Close"], bars.columns.get("RSI")
+
+    for symbol in bars.symbols:
+        rows = bars.rows(symbol)
+        keep = np.flatnonzero(valid[rows]) + rows.start
+        closes = pd.Series(close[keep].astype(np.float64))
+        if cache is not None:
+            fast, slow = cache.sma(closes, fast_sma), cache.sma(closes, slow_sma)
+        else:
+            fast = closes.rolling(fast_sma).mean().to_numpy()
+            slow = closes.rolling(slow_sma).mean().to_numpy()
+        # df.get('RSI', 100) < rsi_threshold
+        below = rsi[keep] < rsi_threshold if rsi is not None else np.full(len(keep), 100 < rsi_threshold)
+        long_ = (fast > slow) & below
+        prev = np.concatenate(([False], long_[:-1]))
+        fast_out[keep], slow_out[keep], signal[keep] = fast, slow, long_
+        entry[keep] = long_ & ~prev
+        exit_[keep] = ~long_ & prev
+
+    for name, values in zip(COMPACT_OUTPUTS, (fast_out, slow_out, signal, entry, exit_, valid)):
+        bars[name] = values
+    return bars
+
+
+class StreamingSignals:
+    """
+    Incremental generate_signals for live trading: feed one bar at a time and
+    get the entry/exit decision for that bar in O(1).
+
+    Mirrors the batch pipeline add_rsi(length=rsi_length) + generate_signals:
+    bars before RSI is defined are the ones dropna() removes, so the SMAs only
+    start counting after them.
+    """
+
+    def __init__(self, fast_sma=10, slow_sma=50, rsi_threshold=60, rsi_length=14):
+        from src.indicators import StreamingRSI, StreamingSMA
+
+        self.rsi_threshold = rsi_threshold
+        self.rsi = StreamingRSI(rsi_length)
+        self.fast = StreamingSMA(fast_sma)
+        self.slow = StreamingSMA(slow_sma)
+        self.prev_signal = 0
+        self._prev = None
+
+    def seed(self, df: pd.DataFrame, column='Close') -> dict:
+        """Warm up from history once at startup; returns the last bar's result."""
+        latest = None
+        for close in df[column].tolist():
+            latest = self.update(close)
+        return latest
+
+    def update(self, close: float) -> dict:
+        rsi = self.rsi.update(close)
+        prev_signal = self.prev_signal
+        if rsi != rsi:
+            self._prev = (prev_signal, False)
+            return self._result(close, rsi, float("nan"), float("nan"), 0, False, False)
+        self._prev = (prev_signal, True)
+        # _decide inlined: this is the per-bar hot path of replays and live loops
+        fast = self.fast.update(close)
+        slow = self.slow.update(close)
+        signal = 1 if fast > slow and rsi < self.rsi_threshold else 0
+        self.prev_signal = signal
+        return {"Close": close, "RSI": rsi, "SMA_fast": fast, "SMA_slow": slow, "signal": signal,
+                "entry": signal == 1 and prev_signal == 0, "exit": signal == 0 and prev_signal == 1}
+
+    def amend(self, close: float) -> dict:
+        """Re-evaluate the most recent bar with a revised close (still-forming bar)."""
+        self.prev_signal, had_rsi = self._prev
+        rsi = self.rsi.amend(close)
+        if rsi != rsi:
+            return self._result(close, rsi, float("nan"), float("nan"), 0, False, False)
+        if had_rsi:
+            return self._decide(close, rsi, self.fast.amend(close), self.slow.amend(close))
+        self._prev = (self.prev_signal, True)
+        return self._decide(close, rsi, self.fast.update(close), self.slow.update(close))
+
+    def batch(self, closes):
+        """
+        The update() results for `closes` from this fresh state, as arrays,
+        computed at once with the same arithmetic (the indicators' batch());
+        None once update() has run.
+        """
+        if self.rsi.last_close is not None:
+            return None
+        closes = np.asarray(closes, dtype=np.float64)
+        rsi = self.rsi.batch(closes)
+        valid = ~np.isnan(rsi)
+        # the SMAs only see the bars with an RSI, as in update()
+        fast, slow = np.full(len(closes), np.nan), np.full(len(closes), np.nan)
+        fast[valid], slow[valid] = self.fast.batch(closes[valid]), self.slow.batch(closes[valid])
+        signal = valid & (fast > slow) & (rsi < self.rsi_threshold)
+        prev = np.zeros(len(closes), dtype=bool)
+        kept = signal[valid]
+        prev[valid] = np.concatenate(([False], kept[:-1]))
+        return {"Close": closes, "RSI": rsi, "SMA_fast": fast, "SMA_slow": slow, "signal": signal.astype(np.int8),
+                "entry": signal & ~prev, "exit": valid & ~signal & prev}
+
+    def state(self) -> tuple:
+        """Indicator state after the last update() (restore it with load_state(); amend() needs a new bar first)."""
+        return self.prev_signal, self.rsi.state(), self.fast.state(), self.slow.state()
+
+    def load_state(self, state):
+        prev_signal, rsi, fast, slow = state
+        self.rsi.load_state(rsi)
+        self.fast.load_state(fast)
+        self.slow.load_state(slow)
+        self.prev_signal = prev_signal
+        self._prev = None
+
+    def _decide(self, close, rsi, fast, slow):
+        signal = 1 if fast > slow and rsi < self.rsi_threshold else 0
+        entry = signal == 1 and self.prev_signal == 0
+        exit_ = signal == 0 and self.prev_signal == 1
+        self.prev_signal = signal
+        return self._result(close, rsi, fast, slow, signal, entry, exit_)
+
+    @staticmethod
+    def _result(close, rsi, fast, slow, signal, entry, exit_):
+        return {"Close": close, "RSI": rsi, "SMA_fast": fast, "SMA_slow": slow,
+                "signal": signal, "entry": entry, "exit": exit_}
+
+
+def generate_signals_matrix(closes: np.ndarray, fast_sma=10, slow_sma=50, rsi_threshold=60,
+                            rsi_length=14) -> dict:
+    """
+    generate_signals for a whole universe at once. `closes` is a 2-D
+    (time x symbols) array on a common time index, NaN where a symbol has no
+    bar (not listed yet, or a missing bar). Returns (time x symbols) arrays
+    keyed like the generate_signals columns: 'RSI', 'SMA_fast', 'SMA_slow',
+    'signal', 'entry', 'exit'.
+
+    Matches add_rsi(length=rsi_length) + generate_signals per symbol: rows
+    where RSI is undefined are the ones dropna() removes there, so they are
+    masked out before the SMAs and never signal. A symbol missing bars after
+    its first one is computed over its own bars only, as its DataFrame has
+    no rows for them, and NaN / no signal is scattered into the gaps.
+    """
+    closes = np.asarray(closes, dtype=np.float64)
+    missing = np.isnan(closes)
+    gapped = missing.sum(axis=0) > np.argmin(missing, axis=0)
+    if not gapped.any():
+        return _signals_matrix(closes, fast_sma, slow_sma, rsi_threshold, rsi_length)
+
+    out = {name: np.full(closes.shape, np.nan) for name in ("RSI", "SMA_fast", "SMA_slow")}
+    out.update(signal=np.zeros(closes.shape, dtype=np.int8), entry=np.zeros(closes.shape, dtype=bool),
+               exit=np.zeros(closes.shape, dtype=bool))
+    dense = np.flatnonzero(~gapped)
+    if len(dense):
+        for name, values in _signals_matrix(closes[:, dense], fast_sma, slow_sma, rsi_threshold,
+                                            rsi_length).items():
+            out[name][:, dense] = values
+    for j in np.flatnonzero(gapped):
+        rows = np.flatnonzero(~missing[:, j])
+        if not len(rows):
+            continue
+        for name, values in _signals_matrix(closes[rows, j][:, None], fast_sma, slow_sma, rsi_threshold,
+                                            rsi_length).items():
+            out[name][rows, j] = values[:, 0]
+    return out
+
+
+def _signals_matrix(closes, fast_sma, slow_sma, rsi_threshold, rsi_length) -> dict:
+    """generate_signals_matrix for columns whose bars, once they start, have no gaps."""
+    from src.indicators import rsi_matrix, sma_matrix
+
+    rsi = rsi_matrix(closes, length=rsi_length)
+    valid = ~np.isnan(rsi) & ~np.isnan(closes)
+    kept = np.where(valid, closes, np.nan)
+    sma_fast = sma_matrix(kept, fast_sma)
+    sma_slow = sma_matrix(kept, slow_sma)
+
+    signal = valid & (sma_fast > sma_slow) & (rsi < rsi_threshold)
+    prev = np.zeros_like(signal)
+    prev[1:] = signal[:-1]
+    return {
+        "RSI": rsi,
+        "SMA_fast": sma_fast,
+        "SMA_slow": sma_slow,
+        "signal": signal.astype(np.int8),
+        "entry": signal & ~prev,
+        "exit": valid & ~signal & prev,
+    }
@@ -1,32 +1,219 @@
-import csv
-from pathlib import Path
+# src/trade_logger.py
+"""
+Trade journal.
+
+Fills are appended to a SQLite database in WAL mode (logs/trades.db) by a
+background writer thread: log_trade only puts the row on a queue, so the order
+path never waits for disk. The writer commits in batches and checkpoints the
+WAL (fsync) at most every `sync_interval` seconds and on close().
+
+Rows get an increasing id and an indexed UTC timestamp, so readers -- in
+other threads or processes -- can ask for just the rows they have not seen
+(since), the last few (tail) or a time range without re-reading the history.
+"""
+import atexit
+import logging
+import queue
+import sqlite3
+import threading
+import time
 from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
 
 LOG_DIR = Path(__file__).resolve().parent.parent / "logs"
-LOG_DIR.mkdir(exist_ok=True)
+JOURNAL_FILE = LOG_DIR / "trades.db"
+LEGACY_CSV = LOG_DIR / "trades.csv"
+MAX_UNWRITTEN = 100_000  # rows kept for retry while the database cannot be written
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS trades (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts INTEGER NOT NULL,  -- UTC epoch ns
+    symbol TEXT NOT NULL,
+    side TEXT NOT NULL,
+    qty REAL,
+    price REAL,
+    order_id TEXT,
+    pnl REAL
+);
+CREATE INDEX IF NOT EXISTS trades_ts ON trades (ts);
+"""
+_INSERT = "INSERT INTO trades (ts, symbol, side, qty, price, order_id, pnl) VALUES (?, ?, ?, ?, ?, ?, ?)"
+_SELECT = "SELECT id, ts, symbol, side, qty, price, order_id, pnl FROM trades"
+
+
+def _connect(path) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")  # WAL is fsynced at checkpoints, not per commit
+    return conn
+
+
+def _import_legacy_csv(conn, csv_path: Path):
+    """One-off migration of the old per-trade CSV log into an empty journal."""
+    if not csv_path.exists() or conn.execute("SELECT 1 FROM trades LIMIT 1").fetchone():
+        return
+    legacy = pd.read_csv(csv_path)
+    if legacy.empty:
+        return
+    # the CSV stored naive local wall-clock times
+    local_tz = datetime.now().astimezone().tzinfo
+    ts = pd.to_datetime(legacy["timestamp"], format="ISO8601").dt.tz_localize(local_tz).dt.tz_convert("UTC")
+    rows = zip(ts.astype("int64").tolist(), legacy["symbol"].astype(str), legacy["side"].astype(str),
+               legacy["qty"].astype(float), legacy["price"].astype(float), legacy["order_id"].astype(str),
+               legacy["pnl"].astype(object).where(legacy["pnl"].notna(), None))
+    conn.executemany(_INSERT, rows)
+    conn.commit()
+
 
 class TradeLogger:
-    def __init__(self, filename="trades.csv"):
-        self.filepath = LOG_DIR / filename
-        # If file doesn’t exist, create with header
-        if not self.filepath.exists():
-            with open(self.filepath, mode="w", newline="") as f:
-                writer = csv.DictWriter(f, fieldnames=[
-                    "timestamp", "symbol", "side", "qty", "price", "order_id", "pnl"
-                ])
-                writer.writeheader()
+    def __init__(self, path=JOURNAL_FILE, sync_interval: float = 1.0, batch_size: int = 1000):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.sync_interval = sync_interval
+        self.batch_size = batch_size
+        conn = _connect(self.path)
+        conn.executescript(_SCHEMA)
+        if self.path == JOURNAL_FILE:
+            _import_legacy_csv(conn, LEGACY_CSV)
+        conn.close()
+
+        self._queue = queue.Queue()
+        self._closed = False
+        self._writer = threading.Thread(target=self._write_loop, name="trade-journal", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
 
     def log_trade(self, symbol, side, qty, price, order_id, pnl=None):
-        with open(self.filepath, mode="a", newline="") as f:
-            writer = csv.DictWriter(f, fieldnames=[
-                "timestamp", "symbol", "side", "qty", "price", "order_id", "pnl"
-            ])
-            writer.writerow({
-                "timestamp": datetime.now().isoformat(),
-                "symbol": symbol,
-                "side": side,
-                "qty": qty,
-                "price": price,
-                "order_id": order_id,
-                "pnl": pnl if pnl is not None else ""
-            })
+        """Queue one fill; returns immediately (the writer thread persists it)."""
+        # plain floats: sqlite3 would store NumPy scalars (e.g. cash // price) as BLOBs
+        self._queue.put((time.time_ns(), symbol, side, float(qty), float(price),
+                         None if order_id is None else str(order_id), None if pnl is None else float(pnl)))
+
+    def flush(self):
+        """Block until every queued fill is committed (or its write failed, logged and kept for retry)."""
+        self._queue.join()
+
+    def close(self):
+        """Flush, checkpoint (fsync) and stop the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        atexit.unregister(self.close)
+        self._queue.put(None)
+        self._writer.join()
+
+    def _write_loop(self):
+        conn = _connect(self.path)
+        last_sync = time.monotonic()
+        dirty = stop = False
+        unwritten = []  # rows a failed commit left behind, retried with the next batch
+        while not stop:
+            try:
+                items = [self._queue.get(timeout=self.sync_interval)]
+            except queue.Empty:
+                items = []  # idle wake-up, only the periodic sync below
+            while items and len(items) < self.batch_size:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in items
+            rows = unwritten + [item for item in items if item is not None]
+            # a locked or full database must not kill the writer: flush() would then wait forever
+            if rows:
+                try:
+                    conn.executemany(_INSERT, rows)
+                    conn.commit()
+                    unwritten, dirty = [], True
+                except sqlite3.Error as e:
+                    conn.rollback()
+                    unwritten = rows[-MAX_UNWRITTEN:]
+                    logging.error(f"Trade journal write failed ({len(rows)} rows, retrying"
+                                  f"{'' if len(rows) <= MAX_UNWRITTEN else f' the last {MAX_UNWRITTEN}'}): {e}")
+            if dirty and (stop or time.monotonic() - last_sync >= self.sync_interval):
+                try:
+                    conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+                    last_sync, dirty = time.monotonic(), False
+                except sqlite3.Error as e:
+                    logging.error(f"Trade journal checkpoint failed: {e}")
+            for _ in items:
+                self._queue.task_done()
+        if unwritten:
+            logging.error(f"Trade journal closed with {len(unwritten)} rows unwritten")
+        conn.close()
+
+
+class TradeJournal:
+    """Read side of the journal; safe to use from any thread or process."""
+
+    def __init__(self, path=JOURNAL_FILE):
+        self.path = Path(path)
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, timeout=30)
+            self._local.conn = conn
+        return conn
+
+    def _query(self, sql, params=()) -> pd.DataFrame:
+        if not self.path.exists():
+            rows = []
+        else:
+            rows = self._conn().execute(sql, params).fetchall()
+        df = pd.DataFrame(rows, columns=["id", "ts", "symbol", "side", "qty", "price", "order_id", "pnl"])
+        df.insert(1, "timestamp", pd.to_datetime(df.pop("ts").astype("int64"), utc=True))
+        df[["qty", "price", "pnl"]] = df[["qty", "price", "pnl"]].astype(float)
+        return df.set_index("id")
+
+    def since(self, last_id: int = 0) -> pd.DataFrame:
+        """Rows appended after row id `last_id`, oldest first."""
+        return self._query(f"{_SELECT} WHERE id > ? ORDER BY id", (int(last_id),))
+
+    def tail(self, n: int = 20) -> pd.DataFrame:
+        """The last n rows, oldest first."""
+        return self._query(f"SELECT * FROM ({_SELECT} ORDER BY id DESC LIMIT ?) ORDER BY id", (int(n),))
+
+    def between(self, start=None, end=None) -> pd.DataFrame:
+        """Rows with start <= timestamp <= end (naive = UTC), via the timestamp index."""
+        lo = pd.Timestamp.min.value if start is None else _ns(start)
+        hi = pd.Timestamp.max.value if end is None else _ns(end)
+        return self._query(f"{_SELECT} WHERE ts BETWEEN ? AND ? ORDER BY ts, id", (lo, hi))
+
+
+def _ns(ts) -> int:
+    ts = pd.Timestamp(ts)
+    return (ts.tz_localize("UTC") if ts.tzinfo is None else ts).value
+
+
+class TradeHistory:
+    """
+    In-memory copy of the journal for dashboards: refresh() appends only the
+    rows written since the previous call and keeps a running cumulative P&L.
+    """
+
+    def __init__(self, path=JOURNAL_FILE):
+        self.journal = TradeJournal(path)
+        self.df = self.journal.tail(0).assign(cumulative_pnl=pd.Series(dtype=float))
+        self.last_id = 0
+        self._lock = threading.Lock()
+
+    def refresh(self) -> pd.DataFrame:
+        with self._lock:
+            new = self.journal.since(self.last_id)
+            if len(new):
+                offset = self.df["cumulative_pnl"].iloc[-1] if len(self.df) else 0.0
+                new["cumulative_pnl"] = new["pnl"].fillna(0).cumsum() + offset
+                self.df = pd.concat([self.df, new]) if len(self.df) else new
+                self.last_id = int(new.index[-1])
+            return self.df
+
+    def markers(self, symbol=None) -> list:
+        """Fills as plot_trades markers ({'type', 'date', 'price'})."""
+        df = self.df if symbol is None else self.df[self.df["symbol"] == symbol]
+        return [{"type": side.upper(), "date": date, "price": price}
+                for side, date, price in zip(df["side"], df["timestamp"], df["price"])]
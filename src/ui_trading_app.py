@@ -5,44 +5,72 @@ from datetime import datetime, timedelta
 import threading
 from pathlib import Path
 
-from src.broker_alpaca import AlpacaBroker
+from src.data_service import DataService
+from src.engine_state import SnapshotStore
 from src.paper_trading_engine import PaperTradingEngine
-from src.data_fetcher_alpaca import fetch_history_alpaca
 from src.backtest import simple_backtest
+from src.chart_data import MAX_CANDLES, lttb
+from src.indicator_cache import IndicatorCache
 from src.indicators import add_rsi
-from src.strategy import generate_signals
+from src.market_stream import alpaca_stream
+from src.metrics import Metrics
+from src.scanner import CONDITIONS, Scanner
+from src.strategy import generate_signals, StreamingSignals
+from src.trade_logger import TradeHistory
 from src.utils import plot_trades
 
 # Global engine/thread references
 engine = None
 engine_thread = None
 
-LOG_FILE = Path(__file__).resolve().parent.parent / "logs" / "trades.csv"
 
-# ------------------------
-# Strategy Wrapper
-# ------------------------
-def strategy_wrapper(df, fast_sma=20, slow_sma=50, rsi_threshold=70):
-    df = add_rsi(df, length=14)
-    df = generate_signals(df, fast_sma=fast_sma, slow_sma=slow_sma, rsi_threshold=rsi_threshold)
-    return df
+@st.cache_resource
+def data_service():
+    """One broker client and cache for every session; refreshed in the background."""
+    return DataService().start()
+
+
+@st.cache_resource
+def engine_metrics():
+    """Hot-path timings shared by every engine started from the app (outlives reruns)."""
+    return Metrics()
+
+
+@st.cache_resource
+def indicator_cache():
+    """Indicator results shared by every backtest rerun; spills to data/indicator_cache/."""
+    return IndicatorCache(disk_dir=Path(__file__).resolve().parent.parent / "data" / "indicator_cache")
+
+
+@st.cache_resource
+def trade_history():
+    """One journal view per server; each rerun only reads the trades logged since the last."""
+    return TradeHistory()
+
+
+@st.cache_resource
+def scanner(timeframe, fast_sma, slow_sma, rsi_threshold):
+    """Indicator state for every stored symbol, loaded once; reruns only read bars added since."""
+    return Scanner.from_store(timeframe=timeframe, fast_sma=fast_sma, slow_sma=slow_sma, rsi_threshold=rsi_threshold)
+
 
 # ------------------------
 # Engine Controls
 # ------------------------
-def start_engine(symbol, qty, interval, fast_sma, slow_sma, rsi_threshold, timeframe):
+def start_engine(symbol, qty, interval, fast_sma, slow_sma, rsi_threshold, timeframe, streaming=False):
     global engine, engine_thread
-    broker = AlpacaBroker()
-    engine = PaperTradingEngine(broker, symbol, qty,
+    # orders go through the shared service so they invalidate its account/position cache
+    engine = PaperTradingEngine(data_service(), symbol, qty,
                                 poll_interval=interval,
-                                timeframe=timeframe)  # 👈 pass timeframe
+                                timeframe=timeframe,  # 👈 pass timeframe
+                                metrics=engine_metrics(),
+                                snapshots=SnapshotStore())  # restarts resume where the last engine stopped
 
     def run_engine():
-        engine.run(strategy_wrapper, strategy_kwargs={
-            "fast_sma": fast_sma,
-            "slow_sma": slow_sma,
-            "rsi_threshold": rsi_threshold
-        })
+        # websocket trades build the bars; without it the engine polls REST every `interval` seconds
+        engine.run_streaming(StreamingSignals(fast_sma=fast_sma, slow_sma=slow_sma,
+                                              rsi_threshold=rsi_threshold, rsi_length=14),
+                             stream=alpaca_stream() if streaming else None)
 
     engine_thread = threading.Thread(target=run_engine, daemon=True)
     engine_thread.start()
@@ -59,32 +87,30 @@ def stop_engine():
 st.set_page_config(page_title="Trading Assistant", layout="wide")
 st.title("💹 Smart Trading Assistant")
 
-tabs = st.tabs(["📊 Dashboard", "📈 Backtesting", "🛠 Trade Execution"])
+tabs = st.tabs(["📊 Dashboard", "📈 Backtesting", "🛠 Trade Execution", "🔎 Scanner"])
 
 # ------------------------
 # Tab 1: Dashboard
 # ------------------------
 with tabs[0]:
     st.header("📊 Portfolio Dashboard")
-    broker = AlpacaBroker()
-    account = broker.get_account()
+    service = data_service()
+    account = service.account()
     st.metric("Portfolio Value", f"${account['portfolio_value']}", f"{float(account['equity']) - float(account['cash']):.2f} change")
     st.write(account)
 
     st.subheader("Open Positions")
-    positions = broker.get_positions()
+    positions = service.positions()
     if positions:
         st.dataframe(pd.DataFrame(positions))
     else:
         st.info("No open positions")
 
     st.subheader("Trade History")
-    if LOG_FILE.exists():
-        trades_df = pd.read_csv(LOG_FILE)
+    trades_df = trade_history().refresh()
+    if len(trades_df):
         st.dataframe(trades_df.tail(20))
-        if "pnl" in trades_df.columns:
-            trades_df["cumulative_pnl"] = trades_df["pnl"].cumsum()
-            st.line_chart(trades_df[["cumulative_pnl"]])
+        st.line_chart(trades_df[["cumulative_pnl"]])
     else:
         st.info("No trades logged yet")
 
@@ -100,7 +126,8 @@ with tabs[1]:
         symbol = st.text_input("Symbol", "AAPL", key="bt_symbol")
         fast_sma = st.number_input("Fast SMA Window", min_value=5, value=20, key="bt_fast_sma")
     with col2:
-        timeframe = st.selectbox("Timeframe", ["1Day", "1Hour", "15Min"], index=0, key="bt_timeframe")
+        # derived from stored 1Min bars when they cover the range (no fetch)
+        timeframe = st.selectbox("Timeframe", ["1Day", "1Hour", "15Min", "5Min"], index=0, key="bt_timeframe")
         slow_sma = st.number_input("Slow SMA Window", min_value=10, value=50, key="bt_slow_sma")
     with col3:
         start_date = st.date_input("Start Date", datetime.now() - timedelta(days=365), key="bt_start_date")
@@ -109,18 +136,22 @@ with tabs[1]:
 
     # Run Backtest Button
     if st.button("Run Backtest", key="bt_run"):
-        df = fetch_history_alpaca(
+        df = data_service().bars(
             symbol,
             datetime.combine(start_date, datetime.min.time()),
             datetime.combine(end_date, datetime.min.time()),
             timeframe=timeframe
         )
-        df = add_rsi(df, length=14)
-        df = generate_signals(df, fast_sma=fast_sma, slow_sma=slow_sma, rsi_threshold=rsi_threshold)
+        df = add_rsi(df.copy(), length=14, cache=indicator_cache())  # the cached frame is shared
+        df = generate_signals(df, fast_sma=fast_sma, slow_sma=slow_sma, rsi_threshold=rsi_threshold,
+                              cache=indicator_cache())
 
         bt_df, summary = simple_backtest(
             df, entry_col="entry", exit_col="exit", price_col="Close", initial_capital=10000
         )
+        cache_info = indicator_cache().info()
+        st.caption(f"Indicator cache: {cache_info['entries']} results, {cache_info['mb']:.1f} MB, "
+                   f"hit rate {cache_info['hit_rate']:.0%} ({cache_info.get('evict', 0)} evicted)")
 
                # Show Metrics
         st.subheader("Summary Metrics")
@@ -139,7 +170,8 @@ with tabs[1]:
 
         # Chart
         st.subheader("Performance Chart")
-        st.line_chart(bt_df[["equity"]])
+        # at most MAX_CANDLES points of the curve, chosen to keep its shape
+        st.line_chart(bt_df[["equity"]].iloc[lttb(range(len(bt_df)), bt_df["equity"], MAX_CANDLES)])
 
         # Trade List
         st.subheader("Trade List")
@@ -182,12 +214,15 @@ with tabs[2]:
         rsi_threshold = st.number_input("RSI Threshold", min_value=30, max_value=90, value=70, key="exec_rsi")
 
     timeframe = st.selectbox("Timeframe", ["1Day", "1Hour", "15Min"], index=0, key="exec_timeframe")
+    market_data = st.radio("Market Data", ["Websocket stream", "REST polling"], horizontal=True,
+                           key="exec_market_data")
 
     # Start/Stop Trading
     col1, col2 = st.columns(2)
     with col1:
         if st.button("▶️ Start Trading", key="exec_start"):
-            start_engine(symbol, qty, interval, fast_sma, slow_sma, rsi_threshold, timeframe)
+            start_engine(symbol, qty, interval, fast_sma, slow_sma, rsi_threshold, timeframe,
+                         streaming=market_data == "Websocket stream")
             st.success("Trading engine started")
     with col2:
         if st.button("⏹ Stop Trading", key="exec_stop"):
@@ -197,26 +232,75 @@ with tabs[2]:
 
     # Open Positions
     st.subheader("Open Positions")
-    positions = broker.get_positions()
+    positions = data_service().positions()
     if positions:
         st.dataframe(pd.DataFrame(positions))
     else:
         st.info("No open positions")
 
+    # Engine Metrics
+    st.subheader("Engine Metrics")
+    metrics_df = engine_metrics().to_frame()
+    if len(metrics_df):
+        st.dataframe(metrics_df.round(3))
+    else:
+        st.info("No engine activity yet")
+
     # Trade History
     st.subheader("Trade History")
-    if LOG_FILE.exists():
-        trades_df = pd.read_csv(LOG_FILE)
+    trades_df = trade_history().refresh()
+    if len(trades_df):
         st.dataframe(trades_df.tail(20))
     
     # Live Candlestick Chart with Trades
     st.subheader("Live Price Chart with Trades")
-    if LOG_FILE.exists():
-        trades_df = pd.read_csv(LOG_FILE)
-        trades = trades_df.to_dict("records")
+    if len(trades_df):
+        trades = trade_history().markers(symbol)
 
         # Fetch recent bars
-        df = engine.fetch_data(lookback_days=30) if engine else None
+        df = data_service().recent_bars(symbol, timeframe, lookback_days=30)
         if df is not None and not df.empty:
-            fig = plot_trades(df, trades, title=f"{symbol} Live Trading with Trades")
+            # zooming re-aggregates the window: finer candles for shorter windows
+            first, last = df["Date"].iloc[0].to_pydatetime(), df["Date"].iloc[-1].to_pydatetime()
+            window = st.slider("Chart Window", min_value=first, max_value=last, value=(first, last),
+                               key="live_chart_window") if first < last else (first, last)
+            fig = plot_trades(df, trades, title=f"{symbol} Live Trading with Trades",
+                              start=window[0], end=window[1])
             st.plotly_chart(fig, use_container_width=True)
+
+# ------------------------
+# Tab 4: Scanner
+# ------------------------
+with tabs[3]:
+    st.header("🔎 Market Scanner")
+
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        timeframe = st.selectbox("Timeframe", ["1Day", "1Hour", "15Min"], index=0, key="scan_timeframe")
+    with col2:
+        fast_sma = st.number_input("Fast SMA Window", min_value=5, value=20, key="scan_fast_sma")
+    with col3:
+        slow_sma = st.number_input("Slow SMA Window", min_value=10, value=50, key="scan_slow_sma")
+    with col4:
+        rsi_threshold = st.number_input("RSI Threshold", min_value=30, max_value=90, value=70, key="scan_rsi")
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        conditions = st.multiselect("Conditions", list(CONDITIONS), key="scan_conditions")
+        expression = st.text_input("Filter expression", "", placeholder="RSI < 30 and Close > 20",
+                                   key="scan_expression")
+    with col2:
+        sort = st.text_input("Sort by", "volume_ratio", key="scan_sort")
+        ascending = st.checkbox("Ascending", key="scan_ascending")
+    with col3:
+        top = st.number_input("Rows", min_value=1, value=50, key="scan_top")
+
+    universe = scanner(timeframe, fast_sma, slow_sma, rsi_threshold)
+    universe.refresh()
+    if len(universe.symbols):
+        where = conditions + ([expression] if expression.strip() else [])
+        results = universe.scan(where or None, sort=sort or None, ascending=ascending, top=top)
+        st.caption(f"{len(results)} of {len(universe.symbols)} stored symbols")
+        st.dataframe(results)
+    else:
+        st.info(f"No {timeframe} bars in the local store yet")
@@ -1,43 +1,45 @@
 from datetime import datetime, timezone
-import plotly.graph_objects as go
 import pandas as pd
 
-def plot_trades(df: pd.DataFrame, trades: list, title="Price Chart with Trades"):
+from src.chart_data import MAX_CANDLES, candles, markers
+
+def plot_trades(df: pd.DataFrame, trades, title="Price Chart with Trades", max_bars=MAX_CANDLES,
+                start=None, end=None):
     """
     Creates an interactive candlestick chart with BUY/SELL markers.
     df: DataFrame with Date, Open, High, Low, Close
-    trades: list of trade dicts with 'type', 'date', 'price'
+    trades: list of trade dicts with 'type', 'date', 'price' (or a DataFrame of them)
+    Only [start, end] is drawn (the zoom window), with at most max_bars
+    candles: longer windows are aggregated to a coarser timeframe and trades
+    are grouped per candle (see src.chart_data), so the figure stays small.
     """
+    import plotly.graph_objects as go  # only charting needs plotly
+
+    bars, timeframe = candles(df, max_bars=max_bars, start=start, end=end)
+    tz = pd.DatetimeIndex(df["Date"] if "Date" in df.columns else df.index).tz or "UTC"
     fig = go.Figure(data=[go.Candlestick(
-        x=df["Date"],
-        open=df["Open"],
-        high=df["High"],
-        low=df["Low"],
-        close=df["Close"],
-        name="Price"
+        x=pd.to_datetime(bars["ts"], utc=True).tz_convert(tz),
+        open=bars["Open"],
+        high=bars["High"],
+        low=bars["Low"],
+        close=bars["Close"],
+        name="Price" if timeframe is None else f"Price ({timeframe})"
     )])
 
-    # Add buy markers
-    buys = [t for t in trades if t["type"] == "BUY"]
-    if buys:
-        fig.add_trace(go.Scatter(
-            x=[t["date"] for t in buys],
-            y=[t["price"] for t in buys],
-            mode="markers",
-            marker=dict(symbol="triangle-up", color="green", size=12),
-            name="BUY"
-        ))
-
-    # Add sell markers
-    sells = [t for t in trades if t["type"] == "SELL"]
-    if sells:
-        fig.add_trace(go.Scatter(
-            x=[t["date"] for t in sells],
-            y=[t["price"] for t in sells],
-            mode="markers",
-            marker=dict(symbol="triangle-down", color="red", size=12),
-            name="SELL"
-        ))
+    # Add buy / sell markers, one per candle and side
+    joined = markers(trades, bars["ts"], start=start, end=end)
+    for side, symbol, color in (("BUY", "triangle-up", "green"), ("SELL", "triangle-down", "red")):
+        side_markers = joined[joined["type"] == side]
+        if len(side_markers):
+            fig.add_trace(go.Scatter(
+                x=pd.to_datetime(side_markers["ts"], utc=True).dt.tz_convert(tz),
+                y=side_markers["price"],
+                customdata=side_markers["count"],
+                hovertemplate=f"{side} x%{{customdata}} @ %{{y:.2f}} (avg)<extra></extra>",
+                mode="markers",
+                marker=dict(symbol=symbol, color=color, size=12),
+                name=side
+            ))
 
     fig.update_layout(
         title=title,